@@ -0,0 +1,52 @@
+"""
+BPlusTreeID 追加插入的基准测试
+
+用 ProductManager 的ID生成方式（时间戳前缀，单调递增）逐个插入商品，
+比较启用最右叶节点快速路径与非对称分裂前后的插入吞吐量、叶节点平均装填率和节点数
+
+运行:
+    python -m benchmarks.bench_append_inserts
+"""
+import sys
+import time
+
+from src.model.product import Product
+from src.data_structure.b_plus_tree import BPlusTreeID
+
+
+class _BaselineBPlusTreeID(BPlusTreeID):
+    """关闭追加快速路径的对照组：每次插入都从根下降，分裂总是对半分"""
+    rightmost_append = False
+
+
+def _leaf_stats(tree) -> tuple:
+    """返回 (叶节点数, 平均装填率, 叶节点键列表占用的字节数)"""
+    count = 0
+    keys = 0
+    list_bytes = 0
+    leaf = tree._first_leaf()
+    while leaf is not None:
+        count += 1
+        keys += len(leaf.keys)
+        list_bytes += sys.getsizeof(leaf.keys) + sys.getsizeof(leaf.values)
+        leaf = leaf.next_leaf
+    return count, keys / (count * tree.order), list_bytes
+
+
+def run(num_items: int = 200_000, orders=(4, 16, 64, 128)):
+    products = [Product(f"PROD-20250101000000{i:06d}-{i:032x}") for i in range(num_items)]
+
+    print(f"{'order':>6} {'variant':>9} {'inserts/s':>12} {'leaves':>8} {'fill':>6} {'leaf list KiB':>14}")
+    for order in orders:
+        for name, tree_class in (("baseline", _BaselineBPlusTreeID), ("append", BPlusTreeID)):
+            tree = tree_class(order)
+            start = time.perf_counter()
+            for product in products:
+                tree.insert(product)
+            rate = num_items / (time.perf_counter() - start)
+            leaves, fill, list_bytes = _leaf_stats(tree)
+            print(f"{order:>6} {name:>9} {rate:>12,.0f} {leaves:>8} {fill:>6.2f} {list_bytes / 1024:>14,.0f}")
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,71 @@
+"""
+ProductManager 快照的保存与恢复基准测试
+
+比较三种得到同一个商品目录的方式：
+    replay      逐个调用 add_product 重放全部商品（目前部署时的做法）
+    load        ProductManager.load 读取 save 写出的快照
+    read        只把快照文件读入内存，作为恢复时间的下限
+并报告快照文件的大小
+
+运行:
+    python -m benchmarks.bench_catalog_snapshot
+    python -m benchmarks.bench_catalog_snapshot --size 1000000 --order 64
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from src.module.commodity_retrieval import ProductManager
+
+
+def run(size: int, order: int, composite: bool, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    words = ["手机", "耳机", "phone", "case", "laptop", "充电器", "cable", "watch"]
+    items = [(f"{rng.choice(words)} {rng.randrange(10_000)}", round(rng.uniform(1, 5_000), 2), float(rng.randrange(1_000)))
+             for _ in range(size)]
+
+    start = time.perf_counter()
+    pm = ProductManager(btree_order=order, composite_price_keys=composite)
+    for name, price, heat in items:
+        pm.add_product(name, price, heat)
+    replay = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "catalog.snap")
+        start = time.perf_counter()
+        pm.save(path)
+        save = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with open(path, 'rb') as f:
+            f.read()
+        read = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ProductManager.load(path)
+        load = time.perf_counter() - start
+        file_size = os.path.getsize(path)
+
+    print(f"size={size}, order={order}, composite={composite}")
+    print(f"  file      {file_size / 2 ** 20:8.1f} MiB ({file_size / size:.0f} bytes/product)")
+    print(f"  replay    {replay:8.3f} s")
+    print(f"  save      {save:8.3f} s")
+    print(f"  load      {load:8.3f} s  ({replay / load:.1f}x faster than replay)")
+    print(f"  read      {read:8.3f} s")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="ProductManager 快照的保存与恢复基准测试")
+    parser.add_argument('--size', type=int, default=200_000)
+    parser.add_argument('--order', type=int, default=32)
+    parser.add_argument('--composite', action='store_true', help="价格索引使用复合键")
+    args = parser.parse_args(argv)
+    run(args.size, args.order, args.composite)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
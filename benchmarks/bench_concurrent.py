@@ -0,0 +1,102 @@
+"""
+并发B+树的吞吐量基准测试
+
+多个线程对同一棵ID索引执行读多写少的混合负载（默认 95% 点查、5% 插入/删除），
+比较闩锁耦合的 ConcurrentBPlusTreeID 与“单线程树 + 一把全局锁”的对照组在不同线程数下的总吞吐量。
+在有GIL的CPython上纯Python代码无法并行执行，两者都不会随线程数增长，这时该测试主要衡量闩的额外开销；
+在自由线程（free-threaded）构建上闩锁耦合的读操作可以真正并行
+
+运行:
+    python -m benchmarks.bench_concurrent
+    python -m benchmarks.bench_concurrent --threads 1 2 4 8 16 --read-ratio 0.99
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+
+from src.model.product import Product
+from src.data_structure.b_plus_tree import BPlusTreeID
+from src.data_structure.concurrent_b_plus_tree import ConcurrentBPlusTreeID
+
+
+class _GlobalLockTree:
+    """对照组：所有操作都在一把全局锁内执行"""
+
+    def __init__(self, tree: BPlusTreeID):
+        self._tree = tree
+        self._lock = threading.Lock()
+
+    def search(self, product_id: str):
+        with self._lock:
+            return self._tree.search(product_id)
+
+    def insert(self, product: Product) -> None:
+        with self._lock:
+            self._tree.insert(product)
+
+    def delete(self, product_id: str) -> bool:
+        with self._lock:
+            return self._tree.delete(product_id)
+
+
+def _run_threads(tree, num_threads: int, ops_per_thread: int, read_ratio: float, keys: list) -> float:
+    """所有线程同时开始执行各自的操作序列，返回总吞吐量 (ops/s)"""
+    barrier = threading.Barrier(num_threads + 1)
+
+    def worker(t: int):
+        rng = random.Random(t)
+        plan = []
+        for i in range(ops_per_thread):
+            if rng.random() < read_ratio:
+                plan.append((0, rng.choice(keys)))
+            else:
+                plan.append((1, f"NEW-{t:03d}-{i:08d}"))
+        barrier.wait()
+        for kind, key in plan:
+            if kind == 0:
+                tree.search(key)
+            else:
+                tree.insert(Product(key))
+                tree.delete(key)
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return num_threads * ops_per_thread / (time.perf_counter() - start)
+
+
+def run(size: int, order: int, threads: list[int], ops_per_thread: int, read_ratio: float) -> None:
+    products = [Product(f"PROD-{i:08d}") for i in range(size)]
+    keys = [product.product_id for product in products]
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print(f"Python {sys.version.split()[0]}, GIL {'enabled' if gil else 'disabled'}, "
+          f"size={size}, order={order}, read ratio={read_ratio}")
+    print(f"{'threads':>8} {'global lock ops/s':>18} {'latch crabbing ops/s':>21}")
+    for num_threads in threads:
+        baseline = _GlobalLockTree(BPlusTreeID.bulk_load(products, order=order))
+        crabbing = ConcurrentBPlusTreeID.bulk_load(products, order=order)
+        baseline_rate = _run_threads(baseline, num_threads, ops_per_thread, read_ratio, keys)
+        crabbing_rate = _run_threads(crabbing, num_threads, ops_per_thread, read_ratio, keys)
+        print(f"{num_threads:>8} {baseline_rate:>18,.0f} {crabbing_rate:>21,.0f}", flush=True)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="并发B+树的吞吐量基准测试")
+    parser.add_argument('--size', type=int, default=100_000, help="树中预先装入的商品数")
+    parser.add_argument('--order', type=int, default=64)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--ops', type=int, default=20_000, help="每个线程执行的操作数")
+    parser.add_argument('--read-ratio', type=float, default=0.95, help="点查在操作中所占的比例")
+    args = parser.parse_args(argv)
+    run(args.size, args.order, args.threads, args.ops, args.read_ratio)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+BPlusTreeProducts 连续浮点键叶节点的基准测试
+
+分别用默认叶节点（价格键是 float 对象的列表）和连续浮点键叶节点（array('d')）构建价格索引，报告：
+    key bytes       叶节点中价格键的存储字节数（列表 + float 对象，或数组）
+    traced MiB      tracemalloc 统计的整棵索引的实际分配量，价格由索引独占（例如从文件读入）
+    scan/s          随机价格区间的 search_range 吞吐量
+    exact/s         search_exact 点查吞吐量
+    insert/s        随机价格逐个插入的吞吐量
+区间扫描的时间主要花在把每个价格下的商品ID列表展开成结果上，与键的布局关系不大
+
+运行:
+    python -m benchmarks.bench_float_keys
+    python -m benchmarks.bench_float_keys --size 1000000 --orders 64 256 1024
+"""
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+
+from src.data_structure.b_plus_tree import BPlusTreeProducts
+
+
+def _key_bytes(tree: BPlusTreeProducts) -> int:
+    """叶节点中价格键的存储字节数"""
+    total = 0
+    leaf = tree._first_leaf()
+    while leaf is not None:
+        total += sys.getsizeof(leaf.keys)
+        if not tree.float_keys:
+            total += sum(sys.getsizeof(price) for price in leaf.keys)
+        leaf = leaf.next_leaf
+    return total
+
+
+def _rate(count: int, func) -> float:
+    """重复三次取最快的一次，返回每秒的操作数"""
+    best = float('inf')
+    for _ in range(3):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return count / best
+
+
+def run(size: int, orders: list[int], seed: int = 0) -> None:
+    rng = random.Random(seed)
+    items = sorted((round(rng.uniform(1, 100_000), 2), f"PROD-{i:08d}") for i in range(size))
+    ranges = []
+    for _ in range(1_000):
+        low = rng.uniform(1, 99_000)
+        ranges.append((low, low + rng.uniform(10, 1_000)))
+    exact_prices = [price for price, _ in rng.sample(items, 10_000)]
+    new_prices = [round(rng.uniform(1, 100_000), 2) for _ in range(20_000)]
+
+    print(f"size={size}")
+    print(f"{'order':>6} {'key bytes':>12} {'traced MiB':>11} {'scan/s':>10} {'exact/s':>10} {'insert/s':>10}")
+    for order in orders:
+        for float_keys in (False, True):
+            # 每个价格重新构造一次，避免与 items 共享 float 对象
+            owned = ((float(repr(price)), product_id) for price, product_id in items)
+            tracemalloc.start()
+            tree = BPlusTreeProducts.bulk_load(owned, order=order, float_keys=float_keys)
+            traced = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+
+            scan_rate = _rate(len(ranges), lambda: [tree.search_range(low, high) for low, high in ranges])
+            exact_rate = _rate(len(exact_prices), lambda: [tree.search_exact(price) for price in exact_prices])
+
+            def insert_all():
+                fresh = BPlusTreeProducts(order, float_keys=float_keys)
+                for i, price in enumerate(new_prices):
+                    fresh.insert(price, f"NEW-{i}")
+            insert_rate = _rate(len(new_prices), insert_all)
+
+            label = f"{order}{'f' if float_keys else ''}"
+            print(f"{label:>6} {_key_bytes(tree):>12,} {traced / 2 ** 20:>11.1f} {scan_rate:>10,.0f} "
+                  f"{exact_rate:>10,.0f} {insert_rate:>10,.0f}", flush=True)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="BPlusTreeProducts 连续浮点键叶节点的基准测试")
+    parser.add_argument('--size', type=int, default=200_000)
+    parser.add_argument('--orders', type=int, nargs='+', default=[32, 128, 512])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    run(args.size, args.orders, args.seed)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+冻结（只读、数组化）名称前缀Trie树的基准测试
+
+用 bench_trie_radix 中的中英文商品名称构建 ProductPrefixTrie，比较它与 freeze() 得到的 FrozenProductPrefixTrie：
+    MiB         tracemalloc 统计的内存占用（mmap 打开时只统计 Python 对象，映射的文件页由操作系统按需载入并可共享）
+    cold s      得到一个可以查询的Trie树的时间：可变Trie树逐个插入名称，冻结的Trie树从文件打开
+    query us    随机前缀 get_product_ids_with_prefix 的平均耗时
+    top us      随机前缀 get_top_product_ids_with_prefix(prefix, 10) 的平均耗时
+并报告冻结文件的大小
+
+运行:
+    python -m benchmarks.bench_frozen_trie
+    python -m benchmarks.bench_frozen_trie --size 500000 --radix
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.bench_trie_radix import make_names
+from src.data_structure.trie import ProductPrefixTrie, FrozenProductPrefixTrie
+
+
+def _measure(build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    trie = build()
+    elapsed = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return trie, elapsed, memory
+
+
+def _query(trie, prefixes: list[str]) -> tuple[float, float]:
+    start = time.perf_counter()
+    for prefix in prefixes:
+        trie.get_product_ids_with_prefix(prefix)
+    middle = time.perf_counter()
+    for prefix in prefixes:
+        trie.get_top_product_ids_with_prefix(prefix, 10)
+    end = time.perf_counter()
+    return (middle - start) / len(prefixes), (end - middle) / len(prefixes)
+
+
+def run(size: int, radix: bool, queries: int = 2_000, seed: int = 0) -> None:
+    names = make_names(size, seed)
+    rng = random.Random(seed + 1)
+    heats = [float(rng.randrange(1_000)) for _ in names]
+    prefixes = [name[:rng.randint(1, len(name))] for name in rng.sample(names, queries)]
+
+    def build_trie():
+        trie = ProductPrefixTrie(top_k=10, radix=radix)
+        for i, (name, heat) in enumerate(zip(names, heats)):
+            trie.insert(name, f"PROD-{i:08d}", heat)
+        return trie
+
+    print(f"size={size}, radix={radix}")
+    print(f"  {'variant':<16}{'MiB':>10}{'cold s':>10}{'query us':>11}{'top us':>10}")
+    trie, cold, memory = _measure(build_trie)
+    query, top = _query(trie, prefixes)
+    print(f"  {'mutable':<16}{memory / 2 ** 20:10.1f}{cold:10.3f}{query * 1e6:11.1f}{top * 1e6:10.1f}")
+
+    start = time.perf_counter()
+    frozen = trie.freeze()
+    freeze = time.perf_counter() - start
+    del trie
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "names.trie")
+        frozen.save(path)
+        file_size = os.path.getsize(path)
+        del frozen
+        for variant, use_mmap in (("frozen (read)", False), ("frozen (mmap)", True)):
+            loaded, cold, memory = _measure(lambda: FrozenProductPrefixTrie.load(path, use_mmap=use_mmap))
+            query, top = _query(loaded, prefixes)
+            loaded.close()
+            print(f"  {variant:<16}{memory / 2 ** 20:10.1f}{cold:10.3f}{query * 1e6:11.1f}{top * 1e6:10.1f}")
+    print(f"  freeze {freeze:.3f} s, file {file_size / 2 ** 20:.1f} MiB")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="冻结（只读、数组化）名称前缀Trie树的基准测试")
+    parser.add_argument('--size', type=int, default=100_000)
+    parser.add_argument('--radix', action='store_true', help="可变Trie树使用压缩模式")
+    args = parser.parse_args(argv)
+    run(args.size, args.radix)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
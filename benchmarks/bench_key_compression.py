@@ -0,0 +1,86 @@
+"""
+BPlusTreeID 叶节点前缀压缩的内存报告
+
+用 ProductManager 的ID格式（PROD-<20位时间戳>-<32位十六进制>）生成商品，分别构建默认叶节点和前缀压缩叶节点的ID索引，报告：
+    key bytes       叶节点中键的存储按索引独占键字符串计算的字节数（列表/字符串对象，或公共前缀 + 后缀串 + 偏移数组）
+    traced MiB      tracemalloc 统计的整棵索引的实际分配量（商品对象预先创建，不计入）
+    lookups/s       随机点查的吞吐量
+默认叶节点中的键与 Product.product_id 是同一个字符串对象，实际只多占一个指针，
+所以 traced MiB 反映的是 ProductManager 中的真实开销，key bytes 反映的是索引独占键时（例如从文件读入ID）的开销
+
+运行:
+    python -m benchmarks.bench_key_compression
+    python -m benchmarks.bench_key_compression --size 1000000 --orders 64 128
+"""
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+
+from src.model.product import Product
+from src.data_structure.b_plus_tree import BPlusTreeID
+
+
+def _make_products(size: int, seed: int) -> list[Product]:
+    """按时间戳递增生成商品ID，每个时间戳下有若干个随机后缀"""
+    rng = random.Random(seed)
+    products = []
+    timestamp = 20250101000000_000000
+    for i in range(size):
+        timestamp += rng.randint(0, 2000)
+        products.append(Product(f"PROD-{timestamp}-{rng.getrandbits(128):032x}"))
+    return products
+
+
+def _key_bytes(tree: BPlusTreeID) -> tuple[int, int]:
+    """返回 (叶节点数, 叶节点中键的存储字节数)，字节数按键字符串归索引独占计算"""
+    leaves = total = 0
+    leaf = tree._first_leaf()
+    while leaf is not None:
+        leaves += 1
+        keys = leaf.keys
+        if tree.compress_keys:
+            total += sys.getsizeof(keys) + sys.getsizeof(keys.prefix) + sys.getsizeof(keys._blob) \
+                     + sys.getsizeof(keys._offsets)
+        else:
+            total += sys.getsizeof(keys) + sum(sys.getsizeof(key) for key in keys)
+        leaf = leaf.next_leaf
+    return leaves, total
+
+
+def run(size: int, orders: list[int], seed: int = 0) -> None:
+    products = sorted(_make_products(size, seed), key=lambda p: p.product_id)
+    lookups = [p.product_id for p in random.Random(seed).choices(products, k=50_000)]
+    print(f"size={size}")
+    print(f"{'order':>6} {'leaves':>10} {'key bytes':>14} {'bytes/key':>10} {'traced MiB':>11} {'lookups/s':>12}")
+    for order in orders:
+        for compress in (False, True):
+            tracemalloc.start()
+            tree = BPlusTreeID.bulk_load(products, order=order, compress_keys=compress)
+            traced = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+
+            start = time.perf_counter()
+            for product_id in lookups:
+                tree.search(product_id)
+            rate = len(lookups) / (time.perf_counter() - start)
+
+            leaves, key_bytes = _key_bytes(tree)
+            label = f"{order}{'c' if compress else ''}"
+            print(f"{label:>6} {leaves:>10,} {key_bytes:>14,} {key_bytes / size:>10.1f} "
+                  f"{traced / 2 ** 20:>11.1f} {rate:>12,.0f}", flush=True)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="BPlusTreeID 叶节点前缀压缩的内存报告")
+    parser.add_argument('--size', type=int, default=200_000)
+    parser.add_argument('--orders', type=int, nargs='+', default=[32, 128])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    run(args.size, args.orders, args.seed)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
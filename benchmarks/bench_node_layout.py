@@ -0,0 +1,65 @@
+"""
+B+树节点布局与下降查找的基准测试
+
+对不同阶的 BPlusTreeID / BPlusTreeProducts 测量点查吞吐量以及每个节点对象本身的内存开销
+
+运行:
+    python -m benchmarks.bench_node_layout
+"""
+import random
+import sys
+import time
+
+from src.model.product import Product
+from src.data_structure.b_plus_tree import BPlusTreeID, BPlusTreeProducts
+
+
+def _node_overhead(node) -> int:
+    """节点对象本身（不含键值列表）的内存开销，没有 __slots__ 的节点还要算上实例字典"""
+    size = sys.getsizeof(node)
+    if hasattr(node, '__dict__'):
+        size += sys.getsizeof(node.__dict__)
+    return size
+
+
+def _iter_nodes(tree):
+    stack = [tree.root]
+    while stack:
+        node = stack.pop()
+        yield node
+        if not node.is_leaf:
+            stack.extend(node.children)
+
+
+def run(num_items: int = 100_000, num_lookups: int = 100_000, orders=(4, 16, 64, 128, 256), seed: int = 0):
+    rng = random.Random(seed)
+    products = [Product(f"PROD-{rng.getrandbits(64):016x}", price=round(rng.uniform(1, 1000), 2))
+                for _ in range(num_items)]
+    lookup_ids = [rng.choice(products).product_id for _ in range(num_lookups)]
+    lookup_prices = [rng.choice(products).price for _ in range(num_lookups)]
+
+    print(f"{'order':>6} {'id search/s':>14} {'price search/s':>16} {'nodes':>8} {'bytes/node':>11}")
+    for order in orders:
+        id_tree = BPlusTreeID(order)
+        price_tree = BPlusTreeProducts(order)
+        for product in products:
+            id_tree.insert(product)
+            price_tree.insert(product.price, product.product_id)
+
+        start = time.perf_counter()
+        for product_id in lookup_ids:
+            id_tree.search(product_id)
+        id_rate = num_lookups / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for price in lookup_prices:
+            price_tree.search_exact(price)
+        price_rate = num_lookups / (time.perf_counter() - start)
+
+        nodes = list(_iter_nodes(id_tree))
+        per_node = sum(_node_overhead(node) for node in nodes) / len(nodes)
+        print(f"{order:>6} {id_rate:>14,.0f} {price_rate:>16,.0f} {len(nodes):>8} {per_node:>11.1f}")
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,60 @@
+"""
+按名称分页浏览基准测试
+
+比较取一页结果的两种方式：先用 get_product_ids_with_prefix 收集前缀下的全部商品再排序切片，
+与 iter_product_ids_by_name 按字典序边走边产出、取够一页就停止（翻页时用上一页最后一项跳过之前的子树）
+
+运行:
+    python -m benchmarks.bench_prefix_browse
+    python -m benchmarks.bench_prefix_browse --size 200000 --page 50 --pages 20
+"""
+import argparse
+import sys
+import time
+
+from benchmarks.bench_trie_radix import make_names
+from src.data_structure.trie import ProductPrefixTrie
+
+
+def run(size: int, page: int, pages: int, seed: int = 0) -> None:
+    names = make_names(size, seed)
+    prefixes = ["", names[0][:1], names[0][:4]]
+    print(f"size={size}, page={page}, pages={pages}")
+    print(f"  {'mode':<8}{'prefix':<10}{'matches':>10}{'collect ms':>12}{'iterate ms':>12}")
+    for radix in (False, True):
+        trie = ProductPrefixTrie(radix=radix)
+        for i, name in enumerate(names):
+            trie.insert(name, f"PROD-{i:08d}")
+        for prefix in prefixes:
+            matches = len(trie.get_product_ids_with_prefix(prefix))
+
+            start = time.perf_counter()
+            for p in range(pages):
+                entries = sorted((names[int(pid[5:])], pid) for pid in trie.get_product_ids_with_prefix(prefix))
+                result = entries[p * page:(p + 1) * page]
+            collect = (time.perf_counter() - start) / pages
+
+            start = time.perf_counter()
+            after = None
+            for _ in range(pages):
+                result = list(trie.iter_product_ids_by_name(prefix, page, after))
+                if not result:
+                    break
+                after = result[-1]
+            iterate = (time.perf_counter() - start) / pages
+            print(f"  {'radix' if radix else 'char':<8}{repr(prefix):<10}{matches:>10}"
+                  f"{collect * 1e3:12.2f}{iterate * 1e3:12.3f}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="按名称分页浏览基准测试")
+    parser.add_argument('--size', type=int, default=100_000)
+    parser.add_argument('--page', type=int, default=20, help="每页的商品数")
+    parser.add_argument('--pages', type=int, default=10, help="连续翻的页数")
+    args = parser.parse_args(argv)
+    run(args.size, args.page, args.pages)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
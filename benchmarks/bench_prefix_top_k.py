@@ -0,0 +1,63 @@
+"""
+名称前缀推荐（自动补全）基准测试
+
+比较 Trie树节点不缓存热度最高的商品（prefix_top_k=0，遍历前缀下的整个子树后排序）
+与缓存 top_k 个时 recommend_products_by_prefix 的耗时，以及缓存带来的构建和改热度开销
+
+运行:
+    python -m benchmarks.bench_prefix_top_k
+    python -m benchmarks.bench_prefix_top_k --size 200000 --top-k 16 --k 10
+"""
+import argparse
+import random
+import sys
+import time
+
+from src.module.commodity_retrieval import ProductManager
+
+
+def _timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def run(size: int, top_k: int, k: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    words = ["手机", "耳机", "phone", "case", "laptop", "充电器", "cable", "watch"]
+    items = [(f"{rng.choice(words)} {rng.randrange(10_000)}", round(rng.uniform(1, 5_000), 2), float(rng.randrange(1_000)))
+             for _ in range(size)]
+    prefixes = ["p", "手", "phone 1", "cable 42"]
+
+    print(f"size={size}, k={k}")
+    print(f"  {'top_k':<8}{'build s':>10}{'heat upd us':>14}" + "".join(f"{repr(p):>14}" for p in prefixes))
+    for cache in (0, top_k):
+        start = time.perf_counter()
+        pm = ProductManager(btree_order=32, prefix_top_k=cache)
+        products = pm.bulk_add_products(items)
+        build = time.perf_counter() - start
+
+        sample = rng.sample(products, min(2_000, size))
+        start = time.perf_counter()
+        for product in sample:
+            pm.update_product(product.product_id, new_heat=float(rng.randrange(1_000)))
+        update = (time.perf_counter() - start) / len(sample)
+
+        latencies = [_timed(lambda: pm.recommend_products_by_prefix(prefix, k), 5 if cache == 0 else 200)
+                     for prefix in prefixes]
+        print(f"  {cache:<8}{build:10.3f}{update * 1e6:14.1f}" + "".join(f"{t * 1e6:12.1f}us" for t in latencies))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="名称前缀推荐（自动补全）基准测试")
+    parser.add_argument('--size', type=int, default=100_000)
+    parser.add_argument('--top-k', type=int, default=10, help="每个Trie节点缓存的商品数")
+    parser.add_argument('--k', type=int, default=10, help="每次推荐的商品数")
+    args = parser.parse_args(argv)
+    run(args.size, args.top_k, args.k)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
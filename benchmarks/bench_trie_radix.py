@@ -0,0 +1,68 @@
+"""
+名称前缀Trie树的压缩（Radix）模式基准测试
+
+用中英文混合的商品名称（品牌 + 品类 + 型号 + 规格 + 颜色）分别构建逐字符Trie树和压缩Trie树，比较：
+    nodes       节点数
+    MiB         tracemalloc 统计的Trie树占用的内存
+    build s     插入全部名称的时间
+    query us    随机前缀 get_product_ids_with_prefix 的平均耗时
+
+运行:
+    python -m benchmarks.bench_trie_radix
+    python -m benchmarks.bench_trie_radix --size 500000
+"""
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+
+from src.data_structure.trie import ProductPrefixTrie
+
+BRANDS = ["Apple", "华为", "小米", "Samsung", "OPPO", "联想", "Lenovo", "索尼", "Sony", "Anker", "绿联", "罗技", "Logitech"]
+CATEGORIES = ["手机", "手机壳", "平板电脑", "笔记本电脑", "蓝牙耳机", "充电器", "数据线", "智能手表", "机械键盘", "无线鼠标",
+              "phone case", "wireless earbuds", "USB-C cable", "charger", "smart watch", "keyboard"]
+SPECS = ["", " 128GB", " 256GB", " 512GB", " 1TB", " 20W", " 65W", " 1m", " 2m", " Pro", " Max", " Lite", " 旗舰版", " 标准版"]
+COLORS = ["", " 黑色", " 白色", " 蓝色", " 深空灰", " 银色", " Black", " White", " Blue"]
+
+
+def make_names(size: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    return [f"{rng.choice(BRANDS)} {rng.choice(CATEGORIES)} {rng.randrange(1, 100)}{rng.choice(SPECS)}{rng.choice(COLORS)}"
+            for _ in range(size)]
+
+
+def run(size: int, queries: int = 2_000, seed: int = 0) -> None:
+    names = make_names(size, seed)
+    rng = random.Random(seed + 1)
+    prefixes = [name[:rng.randint(1, len(name))] for name in rng.sample(names, queries)]
+    print(f"size={size}, distinct names={len(set(names))}, total chars={sum(map(len, names))}")
+    print(f"  {'mode':<8}{'nodes':>12}{'MiB':>10}{'build s':>10}{'query us':>11}")
+    for radix in (False, True):
+        tracemalloc.start()
+        start = time.perf_counter()
+        trie = ProductPrefixTrie(radix=radix)
+        for i, name in enumerate(names):
+            trie.insert(name, f"P{i}")
+        build = time.perf_counter() - start
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        start = time.perf_counter()
+        for prefix in prefixes:
+            trie.get_product_ids_with_prefix(prefix)
+        query = (time.perf_counter() - start) / len(prefixes)
+        mode = "radix" if radix else "char"
+        print(f"  {mode:<8}{trie.node_count():12d}{memory / 2 ** 20:10.1f}{build:10.3f}{query * 1e6:11.1f}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="名称前缀Trie树的压缩（Radix）模式基准测试")
+    parser.add_argument('--size', type=int, default=100_000)
+    args = parser.parse_args(argv)
+    run(args.size)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+ProductManager 预写日志的持久化开销基准测试
+
+对同一串修改（新增、改价改热度、删除各占一定比例）比较：
+    memory          不写日志
+    never           组提交，每 N 条修改写给操作系统一次、不 fsync（N 取最大的组大小）
+    batch-<N>       组提交，每 N 条修改 fsync 一次
+    always          每条修改都 fsync
+计时的是让修改持久化的代价，而不只是把记录放进缓冲区：每到组的边界就调用一次 flush，
+把这一组写出并按策略落盘，相当于调用方等待自己所在的组提交完成。
+报告每次修改的平均耗时（包含分摊到每条修改上的 write / fsync）、相对不写日志多出的开销、
+每条修改从开始执行到它所在的组提交完成的平均延迟、fsync 次数，以及从日志重放恢复的时间
+
+运行:
+    python -m benchmarks.bench_wal
+    python -m benchmarks.bench_wal --size 50000 --always-size 500 --group-sizes 16 64 256
+"""
+import argparse
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from src.module.commodity_retrieval import ProductManager
+
+
+def _workload(size: int, seed: int) -> list[tuple]:
+    rng = random.Random(seed)
+    ops = []
+    added = 0
+    for _ in range(size):
+        r = rng.random()
+        if added < 10 or r < 0.6:
+            ops.append(('add', f"item {rng.randrange(10_000)}", round(rng.uniform(1, 5_000), 2),
+                        float(rng.randrange(1_000))))
+            added += 1
+        elif r < 0.9:
+            ops.append(('update', rng.randrange(added), round(rng.uniform(1, 5_000), 2), float(rng.randrange(1_000))))
+        else:
+            ops.append(('delete', rng.randrange(added)))
+    return ops
+
+
+def _apply(pm: ProductManager, ops: list[tuple], group: int) -> tuple[float, float]:
+    """
+    依次执行修改，每 group 条修改（以及最后不满一组的修改）之后调用一次 flush
+
+    返回:
+        tuple[float, float]: 每次修改的平均耗时，以及每条修改从开始执行到所在的组提交完成的平均延迟（秒）
+    """
+    ids = []
+    started = []
+    latency = 0.0
+    start = time.perf_counter()
+    for i, op in enumerate(ops, 1):
+        started.append(time.perf_counter())
+        if op[0] == 'add':
+            ids.append(pm.add_product(op[1], op[2], op[3]).product_id)
+        elif op[0] == 'update':
+            pm.update_product(ids[op[1]], new_price=op[2], new_heat=op[3])
+        else:
+            pm.delete_product(ids[op[1]])
+        if i % group == 0 or i == len(ops):
+            pm.flush()
+            durable = time.perf_counter()
+            latency += sum(durable - t for t in started)
+            started.clear()
+    return (time.perf_counter() - start) / len(ops), latency / len(ops)
+
+
+def run(size: int, always_size: int, group_sizes: list[int], order: int, seed: int = 0) -> None:
+    # 组的边界由 _apply 显式 flush，group_interval 设得足够大，后台提交线程不会在测量中途提交
+    largest = max(group_sizes)
+    configs = [('never', dict(fsync='never', group_size=largest, group_interval=60.0), size, largest)]
+    configs += [(f'batch-{n}', dict(fsync='batch', group_size=n, group_interval=60.0), size, n) for n in group_sizes]
+    configs.append(('always', dict(fsync='always'), always_size, 1))
+
+    ops = _workload(size, seed)
+    # 开销相对于不写日志执行同样多次修改的耗时，always 只跑一部分修改，单独取基线
+    baselines = {count: _apply(ProductManager(btree_order=order), ops[:count], 1)[0]
+                 for count in {size, always_size}}
+    baseline = baselines[size]
+    print(f"size={size}, order={order} (always 只跑前 {always_size} 次修改)")
+    print(f"  {'mode':<12}{'us/op':>10}{'overhead':>12}{'durable us':>12}{'fsyncs':>10}{'recover s':>12}")
+    print(f"  {'memory':<12}{baseline * 1e6:10.1f}{'':>12}{'':>12}{'':>10}{'':>12}")
+    for name, options, count, group in configs:
+        directory = tempfile.mkdtemp()
+        try:
+            # 日志段足够大，测量时不触发压缩
+            pm = ProductManager.recover(directory, btree_order=order, segment_bytes=1 << 30, **options)
+            per_op, latency = _apply(pm, ops[:count], group)
+            syncs = pm._wal.syncs
+            pm.close()
+            start = time.perf_counter()
+            ProductManager.recover(directory, btree_order=order).close()
+            recover = time.perf_counter() - start
+        finally:
+            shutil.rmtree(directory)
+        print(f"  {name:<12}{per_op * 1e6:10.1f}{(per_op - baselines[count]) * 1e6:+10.1f}us{latency * 1e6:12.1f}"
+              f"{syncs:10d}{recover:12.3f}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="ProductManager 预写日志的持久化开销基准测试")
+    parser.add_argument('--size', type=int, default=20_000)
+    parser.add_argument('--always-size', type=int, default=2_000, help="always 策略只跑前这么多次修改")
+    parser.add_argument('--group-sizes', type=int, nargs='+', default=[8, 64, 512])
+    parser.add_argument('--order', type=int, default=32)
+    args = parser.parse_args(argv)
+    run(args.size, min(args.always_size, args.size), args.group_sizes, args.order)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""
+B+树阶与工作负载的基准测试套件
+
+对 BPlusTreeID / BPlusTreeProducts 按 阶 × 数据规模 × 键分布 扫描以下工作负载：
+    insert       逐个插入全部条目
+    bulk_load    用有序数据自底向上批量构建
+    search       随机点查
+    range_scan   随机价格区间扫描（只对价格索引）
+    mixed        插入与删除交替的混合负载
+每个场景重复若干次取最快的一次，结果以 JSON 写出，并可以与保存的基线比较，吞吐量下降超过阈值的场景会被标记为回归
+
+运行:
+    python -m benchmarks.bench_workloads --quick
+    python -m benchmarks.bench_workloads --output results.json --baseline benchmarks/baseline_workloads.json
+    python -m benchmarks.bench_workloads --quick --save-baseline benchmarks/baseline_workloads.json
+"""
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import time
+
+from src.model.product import Product
+from src.data_structure.b_plus_tree import BPlusTreeID, BPlusTreeProducts
+
+FULL_CONFIG = {'orders': [3, 8, 32, 64, 128], 'sizes': [10_000, 100_000],
+               'distributions': ['uniform', 'sequential', 'skewed'], 'repeat': 3}
+QUICK_CONFIG = {'orders': [3, 32, 128], 'sizes': [5_000],
+                'distributions': ['uniform', 'sequential', 'skewed'], 'repeat': 5}
+NUM_QUERIES = 5_000
+
+
+def _make_dataset(size: int, distribution: str, rng: random.Random) -> list[Product]:
+    """
+    生成商品数据：
+        uniform     ID 随机、价格均匀分布
+        sequential  ID 单调递增（与 ProductManager 生成的时间戳ID相同的模式）、价格均匀分布
+        skewed      ID 随机、价格集中在少数热门价位上，同一价格下有大量商品
+    """
+    if distribution == 'sequential':
+        ids = [f"PROD-{i:012d}" for i in range(size)]
+    else:
+        ids = [f"PROD-{rng.getrandbits(64):016x}-{i}" for i in range(size)]
+    if distribution == 'skewed':
+        hot_prices = [9.9, 19.9, 49.0, 99.0, 199.0]
+        prices = [rng.choice(hot_prices) if rng.random() < 0.8 else round(rng.uniform(1, 1000), 1)
+                  for _ in range(size)]
+    else:
+        prices = [round(rng.uniform(1, 1000), 2) for _ in range(size)]
+    return [Product(product_id, price=price, heat=float(rng.randint(0, 1000)))
+            for product_id, price in zip(ids, prices)]
+
+
+def _best_of(repeat: int, setup, work) -> float:
+    """重复运行 work(setup()) 并返回最短的耗时（秒），setup 的耗时不计入；与 timeit 一样计时期间关闭垃圾回收"""
+    best = float('inf')
+    for _ in range(repeat):
+        state = setup()
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            work(state)
+            best = min(best, time.perf_counter() - start)
+        finally:
+            gc.enable()
+    return best
+
+
+def _run_scenario(order: int, size: int, distribution: str, repeat: int, seed: int) -> list[dict]:
+    rng = random.Random(f"{seed}-{size}-{distribution}")
+    products = _make_dataset(size, distribution, rng)
+    by_id = sorted(products, key=lambda p: p.product_id)
+    by_price = sorted(((p.price, p.product_id, p.heat) for p in products), key=lambda item: item[0])
+    lookup = [rng.choice(products) for _ in range(NUM_QUERIES)]
+    ranges = []
+    for _ in range(NUM_QUERIES // 10):
+        low = rng.uniform(1, 990)
+        ranges.append((low, low + 10))
+    churn = [Product(f"PROD-new-{i:08d}", price=round(rng.uniform(1, 1000), 2)) for i in range(NUM_QUERIES)]
+
+    def build_trees():
+        id_tree = BPlusTreeID.bulk_load(by_id, order=order)
+        price_tree = BPlusTreeProducts.bulk_load(by_price, order=order)
+        return id_tree, price_tree
+
+    trees = build_trees()
+
+    def insert_all(_):
+        id_tree, price_tree = BPlusTreeID(order), BPlusTreeProducts(order)
+        for product in products:
+            id_tree.insert(product)
+            price_tree.insert(product.price, product.product_id, product.heat)
+
+    def bulk_load_all(_):
+        build_trees()
+
+    def search(state):
+        id_tree, price_tree = state
+        for product in lookup:
+            id_tree.search(product.product_id)
+            price_tree.search_exact(product.price)
+
+    def range_scan(state):
+        _, price_tree = state
+        for low, high in ranges:
+            price_tree.search_range(low, high)
+
+    def mixed(state):
+        id_tree, price_tree = state
+        for new, old in zip(churn, lookup):
+            id_tree.insert(new)
+            price_tree.insert(new.price, new.product_id, new.heat)
+            id_tree.delete(old.product_id)
+            price_tree.delete(old.price, old.product_id)
+
+    workloads = [
+        ('insert', size * 2, lambda: None, insert_all),
+        ('bulk_load', size * 2, lambda: None, bulk_load_all),
+        ('search', len(lookup) * 2, lambda: trees, search),
+        ('range_scan', len(ranges), lambda: trees, range_scan),
+        ('mixed', len(churn) * 4, build_trees, mixed),
+    ]
+    results = []
+    for name, operations, setup, work in workloads:
+        seconds = _best_of(repeat, setup, work)
+        results.append({'workload': name, 'order': order, 'size': size, 'distribution': distribution,
+                        'operations': operations, 'seconds': seconds, 'ops_per_sec': operations / seconds})
+    return results
+
+
+def run(config: dict, seed: int = 0) -> dict:
+    """按配置运行全部场景，返回可以直接写成 JSON 的结果"""
+    results = []
+    for size in config['sizes']:
+        for distribution in config['distributions']:
+            for order in config['orders']:
+                for result in _run_scenario(order, size, distribution, config['repeat'], seed):
+                    results.append(result)
+                    print(f"{result['workload']:>10} order={order:<4} size={size:<7} {distribution:<10} "
+                          f"{result['ops_per_sec']:>14,.0f} ops/s", flush=True)
+    return {'python': sys.version.split()[0], 'platform': platform.platform(), 'seed': seed,
+            'config': config, 'results': results}
+
+
+def _scenario_key(result: dict) -> tuple:
+    return result['workload'], result['order'], result['size'], result['distribution']
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[dict]:
+    """
+    把本次结果与基线逐个场景比较
+
+    返回:
+        list[dict]: 吞吐量比基线低 threshold 以上的场景，附带两次的吞吐量和比值
+    """
+    baseline_results = {_scenario_key(result): result for result in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        base = baseline_results.get(_scenario_key(result))
+        if base is None:
+            continue
+        ratio = result['ops_per_sec'] / base['ops_per_sec']
+        if ratio < 1 - threshold:
+            regressions.append({'workload': result['workload'], 'order': result['order'],
+                                'size': result['size'], 'distribution': result['distribution'],
+                                'baseline_ops_per_sec': base['ops_per_sec'],
+                                'ops_per_sec': result['ops_per_sec'], 'ratio': ratio})
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="B+树阶与工作负载的基准测试")
+    parser.add_argument('--quick', action='store_true', help="使用较小的配置，适合在提交前快速检查")
+    parser.add_argument('--orders', type=int, nargs='+', help="覆盖配置中的阶")
+    parser.add_argument('--sizes', type=int, nargs='+', help="覆盖配置中的数据规模")
+    parser.add_argument('--distributions', nargs='+', choices=['uniform', 'sequential', 'skewed'])
+    parser.add_argument('--repeat', type=int, help="每个场景的重复次数，取最快的一次")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="把结果写入该 JSON 文件")
+    parser.add_argument('--baseline', help="与该 JSON 基线比较，有回归时返回非零退出码")
+    parser.add_argument('--threshold', type=float, default=0.25, help="吞吐量下降超过该比例视为回归")
+    parser.add_argument('--save-baseline', help="把结果保存为新的基线")
+    args = parser.parse_args(argv)
+
+    config = dict(QUICK_CONFIG if args.quick else FULL_CONFIG)
+    for field in ('orders', 'sizes', 'distributions', 'repeat'):
+        if getattr(args, field) is not None:
+            config[field] = getattr(args, field)
+
+    current = run(config, args.seed)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(current, f, indent=2, ensure_ascii=False)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(current, baseline, args.threshold)
+    for item in regressions:
+        print(f"回归: {item['workload']} order={item['order']} size={item['size']} {item['distribution']} "
+              f"{item['baseline_ops_per_sec']:,.0f} -> {item['ops_per_sec']:,.0f} ops/s ({item['ratio']:.2f}x)")
+    if not regressions:
+        print("没有发现回归")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,9 @@
+import os
 import math
+import heapq
+import itertools
 import bisect   # 用于支持二分查找，二分查找不是这个数据结构的核心内容，所以为了代码简化在此使用现有函数
+from array import array
 
 from src.model.product import Product
 
@@ -8,9 +12,14 @@ from src.model.product import Product
 # ---------------- 节点类 ----------------
 class BPlusTreeNode:
     """
-    B+树的节点类
+    B+树节点的公共基类
+    叶节点和内部节点分别由 BPlusTreeLeafNode 和 BPlusTreeInternalNode 实现，
+    两者都使用 __slots__，每个节点只携带自身需要的字段
     """
-    def __init__(self, order: int, is_leaf: bool = False):
+    __slots__ = ('order', 'parent', 'keys', 'size', 'epoch')
+    is_leaf: bool = False
+
+    def __init__(self, order: int):
         """
         初始化 B+ 树节点。
 
@@ -18,23 +27,15 @@ class BPlusTreeNode:
             order (int): 节点允许存储的最大键的数量
                          内部节点将有最多 order+1 个子节点指针
                          叶节点将存储最多 order 个键值对
-            is_leaf (bool): 标记此节点是否为叶节点
         """
         if not isinstance(order, int) or order < 2:
             raise ValueError("B+树的阶必须是大于等于2的整数")
 
         self.order: int = order
-        self.is_leaf: bool = is_leaf
-        self.parent: BPlusTreeNode | None = None  
+        self.parent: BPlusTreeInternalNode | None = None
         self.keys: list = []             # 对于内部节点，keys中的键用来划分区域，对于子节点，keys中的键的位置就是对应的values的位置
-
-        # 内部节点
-        self.children: list[BPlusTreeNode] = []  # 存储指向子节点的引用
-
-        # 子节点
-        self.values: list = []
-        self.next_leaf: BPlusTreeNode | None = None
-        self.prev_leaf: BPlusTreeNode | None = None 
+        self.size: int = 0               # 以此节点为根的子树中的条目总数，用于 O(log n) 的计数与按序选择
+        self.epoch: int = 0              # 创建该节点时树所处的纪元，早于当前纪元的节点可能被快照共享，修改前必须先复制
 
     def is_overflow(self) -> bool:
         """检查节点的键数量是否超过上限"""
@@ -69,31 +70,355 @@ class BPlusTreeNode:
 
     def get_num_children(self) -> int:
         """返回当前内部节点的子节点数量"""
-        if self.is_leaf:
-            return 0
-        return len(self.children)
-    
+        return 0
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class BPlusTreeLeafNode(BPlusTreeNode):
+    """
+    B+树的叶节点，按键的顺序存储值，并通过双向链表与相邻叶节点相连
+    """
+    __slots__ = ('values', 'next_leaf', 'prev_leaf')
+    is_leaf: bool = True
+
+    def __init__(self, order: int):
+        super().__init__(order)
+        self.values: list = []
+        self.next_leaf: BPlusTreeLeafNode | None = None
+        self.prev_leaf: BPlusTreeLeafNode | None = None
+
+    def find_key(self, key) -> int:
+        """二分查找键在叶节点中的位置，不存在时返回 -1"""
+        idx = bisect.bisect_left(self.keys, key)
+        if idx < len(self.keys) and self.keys[idx] == key:
+            return idx
+        return -1
+
     # 用来Debug
     def __str__(self) -> str:
-        if self.is_leaf:
-            if len(self.values) == 0:
-                return (f"LeafNode(Order:{self.order}, Keys:{self.keys}, ValuesCounts:[{self.values}], ")
-            if isinstance(self.values[0], Product):
-                return (f"LeafNode(Order:{self.order}, Keys:{self.keys}, ValuesCounts:[{self.values}], ")
-            else:
-                val_counts_str = ", ".join([f"{k}:{len(v_list)}" for k, v_list in zip(self.keys, self.values)])
-                return (f"LeafNode(Order:{self.order}, Keys:{self.keys}, ValuesCounts:[{val_counts_str}], ")
-                
+        if len(self.values) == 0:
+            return (f"LeafNode(Order:{self.order}, Keys:{self.keys}, ValuesCounts:[{self.values}], ")
+        if isinstance(self.values[0], Product):
+            return (f"LeafNode(Order:{self.order}, Keys:{self.keys}, ValuesCounts:[{self.values}], ")
         else:
-            return (f"InternalNode(Order:{self.order}, Keys:{self.keys}, "
-                    f"ChildrenCount:{len(self.children)})")
+            val_counts_str = ", ".join([f"{k}:{len(v_list)}" for k, v_list in zip(self.keys, self.values)])
+            return (f"LeafNode(Order:{self.order}, Keys:{self.keys}, ValuesCounts:[{val_counts_str}], ")
+
+
+class BPlusTreeInternalNode(BPlusTreeNode):
+    """
+    B+树的内部节点，keys[i] 分隔 children[i] 和 children[i+1]
+    """
+    __slots__ = ('children',)
+
+    def __init__(self, order: int):
+        super().__init__(order)
+        self.children: list[BPlusTreeNode] = []  # 存储指向子节点的引用
+
+    def min_keys_for_node(self) -> int:
+        """
+        内部节点分裂时左半部分只保留 order // 2 个键，因此内部节点的下限是 order // 2，
+        这样与兄弟合并后的键数 (order//2 - 1) + order//2 + 1 也不会超过 order
+        """
+        return self.order // 2
+
+    def child_index_for(self, key) -> int:
+        """二分查找键应该进入的子节点下标，与分隔键相等的键属于右侧子树"""
+        return bisect.bisect_right(self.keys, key)
+
+    def get_num_children(self) -> int:
+        """返回当前内部节点的子节点数量"""
+        return len(self.children)
+
+    # 用来Debug
+    def __str__(self) -> str:
+        return (f"InternalNode(Order:{self.order}, Keys:{self.keys}, "
+                f"ChildrenCount:{len(self.children)})")
+
+class BPlusTreeHeatLeafNode(BPlusTreeLeafNode):
+    """
+    BPlusTreeProducts 使用的叶节点，额外记录叶节点中所有商品的最高热度
+    """
+    __slots__ = ('max_heat',)
+
+    def __init__(self, order: int):
+        super().__init__(order)
+        self.max_heat: float = float('-inf')
+
+
+class BPlusTreeHeatInternalNode(BPlusTreeInternalNode):
+    """
+    BPlusTreeProducts 使用的内部节点，额外记录整棵子树中商品的最高热度
+    """
+    __slots__ = ('max_heat',)
+
+    def __init__(self, order: int):
+        super().__init__(order)
+        self.max_heat: float = float('-inf')
+
+
+class FrontCodedKeys:
+    """
+    前缀压缩（front coding）的有序字符串键序列，供 BPlusTreeID 压缩键模式的叶节点使用
+    所有键的最长公共前缀只保存一次，其余部分首尾相接存放在一个字符串中，由偏移数组划分，
+    省去了每个键单独的 str 对象头部（约49字节）和重复的前缀。
+    查找只比较后缀，不需要还原出完整的键；修改时整体重新编码，代价与叶节点大小成正比，与列表的插入删除同阶
+    """
+    __slots__ = ('prefix', '_blob', '_offsets')
+
+    def __init__(self, keys=()):
+        self._encode(list(keys))
+
+    def _encode(self, keys: list) -> None:
+        """把完整的键编码为 公共前缀 + 后缀串 + 偏移数组"""
+        self.prefix: str = os.path.commonprefix(keys)
+        start = len(self.prefix)
+        self._blob: str = ''.join(key[start:] for key in keys)
+        self._offsets: array = array('I', [0])
+        end = 0
+        for key in keys:
+            end += len(key) - start
+            self._offsets.append(end)
+
+    def _suffix(self, i: int) -> str:
+        return self._blob[self._offsets[i]:self._offsets[i + 1]]
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.prefix + self._suffix(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("键的下标超出范围")
+        return self.prefix + self._suffix(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.prefix + self._suffix(i)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (list, FrontCodedKeys)):
+            return list(self) == list(other)
+        return NotImplemented
 
     def __repr__(self) -> str:
-        return self.__str__()
+        return repr(list(self))
+
+    # ------------------- 查找 -------------------
+
+    def bisect_left(self, key: str) -> int:
+        """与 bisect.bisect_left 相同，但只在后缀上二分"""
+        if not key.startswith(self.prefix):
+            return 0 if key < self.prefix else len(self)     # 所有键都以公共前缀开头
+        suffix = key[len(self.prefix):]
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._suffix(mid) < suffix:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find(self, key: str) -> int:
+        """返回键的位置，不存在时返回 -1"""
+        idx = self.bisect_left(key)
+        if idx < len(self) and self._suffix(idx) == key[len(self.prefix):] and key.startswith(self.prefix):
+            return idx
+        return -1
+
+    # ------------------- 修改 -------------------
+
+    def __setitem__(self, i, key) -> None:
+        keys = list(self)
+        keys[i] = key
+        self._encode(keys)
+
+    def __delitem__(self, i) -> None:
+        keys = list(self)
+        del keys[i]
+        self._encode(keys)
+
+    def insert(self, i: int, key: str) -> None:
+        keys = list(self)
+        keys.insert(i, key)
+        self._encode(keys)
+
+    def append(self, key: str) -> None:
+        self.insert(len(self), key)
+
+    def extend(self, keys) -> None:
+        self._encode(list(self) + list(keys))
+
+    def pop(self, i: int = -1) -> str:
+        keys = list(self)
+        key = keys.pop(i)
+        self._encode(keys)
+        return key
+
+
+class BPlusTreeFrontCodedLeafNode(BPlusTreeLeafNode):
+    """
+    BPlusTreeID 压缩键模式使用的叶节点，keys 总是以 FrontCodedKeys 保存，赋值为列表时自动编码，
+    因此分裂、借用、合并等直接操作 keys 的代码不需要修改
+    """
+    __slots__ = ('_coded_keys',)
+
+    @property
+    def keys(self) -> FrontCodedKeys:
+        return self._coded_keys
+
+    @keys.setter
+    def keys(self, keys) -> None:
+        self._coded_keys = FrontCodedKeys(keys)
+
+    def find_key(self, key) -> int:
+        """在后缀上二分查找键的位置，不存在时返回 -1"""
+        return self._coded_keys.find(key)
+
+
+class BPlusTreeFloatKeyLeafNode(BPlusTreeHeatLeafNode):
+    """
+    BPlusTreeProducts 连续浮点键模式使用的叶节点，价格键连续地保存在 array('d') 中，
+    每个键只占8字节，而列表中的每个键是一个指针加一个24字节的 float 对象。
+    keys 赋值为列表时自动转换，切片、insert、pop、extend 与列表的用法相同，bisect 可以直接在数组上二分，
+    因此分裂、借用、合并、快照等代码不需要修改
+    """
+    __slots__ = ('_float_keys',)
+
+    @property
+    def keys(self) -> array:
+        return self._float_keys
+
+    @keys.setter
+    def keys(self, keys) -> None:
+        self._float_keys = array('d', keys)
+
+
+# ---------------- 区间游标 ----------------
+class _KeyMax:
+    """比任何商品ID都大的哨兵，与价格组成复合键 (price, _KEY_MAX) 作为该价格下所有条目的上界"""
+    __slots__ = ()
+
+    def __lt__(self, other):
+        return False
+
+    def __le__(self, other):
+        return other is self
+
+    def __gt__(self, other):
+        return other is not self
+
+    def __ge__(self, other):
+        return True
+
+    def __repr__(self):
+        return '_KEY_MAX'
+
+
+_KEY_MAX = _KeyMax()
+
+
+class BPlusTreeRangeCursor:
+    """
+    BPlusTreeProducts 叶节点链表上的区间游标，按价格升序产出 (price, product_id)
+    游标只记录当前所在的叶节点、槽位（键的下标）以及该价格下商品列表中的偏移，
+    每次按需沿 next_leaf 向后读取，因此可以分多次取出结果而不必一次性物化整个区间
+    游标打开期间修改树会使其失效，此时应该用最后取到的 (price, product_id) 重新打开游标
+    """
+    __slots__ = ('_leaf', '_slot', '_offset', '_max_key', '_composite')
+
+    def __init__(self, leaf: BPlusTreeLeafNode | None, slot: int, offset: int, max_key, composite: bool = False):
+        self._leaf: BPlusTreeLeafNode | None = leaf
+        self._slot: int = slot
+        self._offset: int = offset
+        self._max_key = max_key
+        self._composite: bool = composite   # 复合键模式下每个槽位只有一个商品ID，键是 (price, product_id)
+
+    @property
+    def exhausted(self) -> bool:
+        """游标是否已经走完整个区间"""
+        return self._leaf is None
+
+    def fetch(self, n: int) -> list[tuple]:
+        """
+        向后读取最多 n 个条目
+
+        返回:
+            list[tuple]: (price, product_id) 列表，长度小于 n 说明区间已经读完
+        """
+        results = []
+        while len(results) < n and self._leaf is not None:
+            leaf = self._leaf
+            if self._slot >= len(leaf.keys):        # 当前叶节点读完，进入下一个叶节点
+                self._leaf = leaf.next_leaf
+                self._slot = 0
+                self._offset = 0
+                continue
+
+            key = leaf.keys[self._slot]
+            if key > self._max_key:
+                self._leaf = None
+                break
+
+            if self._composite:
+                results.append((key[0], leaf.values[self._slot]))
+                self._slot += 1
+                continue
+
+            bucket = leaf.values[self._slot]
+            taken = bucket[self._offset:self._offset + n - len(results)]
+            results.extend((key, product_id) for product_id in taken)
+            self._offset += len(taken)
+            if self._offset >= len(bucket):
+                self._slot += 1
+                self._offset = 0
+        return results
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> tuple:
+        items = self.fetch(1)
+        if not items:
+            raise StopIteration
+        return items[0]
+
 
 # ---------------- 主类 ----------------
+class BPlusTreeCounters:
+    """
+    B+树的累计操作计数器，每次计数只是一次整数加法，可以在生产环境中一直开启
+    多个线程同时修改同一棵树时计数是近似值
+    """
+    __slots__ = ('descents', 'node_visits', 'leaf_splits', 'internal_splits',
+                 'leaf_borrows', 'internal_borrows', 'leaf_merges', 'internal_merges')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        """把所有计数清零"""
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def as_dict(self) -> dict:
+        """返回所有计数，以及平均每次从根下降访问的节点数 visits_per_descent"""
+        counts = {name: getattr(self, name) for name in self.__slots__}
+        counts['visits_per_descent'] = self.node_visits / self.descents if self.descents else 0.0
+        return counts
+
+
 class BaseBPlusTree:
     """B+树基类"""
+    leaf_node_class: type = BPlusTreeLeafNode               # 子类可以替换为携带额外聚合信息的节点类型
+    internal_node_class: type = BPlusTreeInternalNode
+
     def __init__(self, order: int):
         """
         初始化B+树
@@ -104,34 +429,305 @@ class BaseBPlusTree:
         if not isinstance(order, int) or order < 2:
             raise ValueError("B+树的阶必须是大于等于2的整数")
         
-        # self.root: BPlusTreeNode = BPlusTreeNode(order, is_leaf=True)
+        # self.root: BPlusTreeNode = BPlusTreeLeafNode(order)
         self.order: int = order
+        self._epoch: int = 0            # 每次创建快照后加一
+        self.counters: BPlusTreeCounters = BPlusTreeCounters()
     
-    def _find_leaf_node(self, key) -> BPlusTreeNode:
-        """根据输入的键，找到这个键对应的叶子结点"""
+    def _find_leaf_node(self, key) -> BPlusTreeLeafNode:
+        """根据输入的键，找到这个键对应的叶子结点，每一层用二分查找确定下降的子节点"""
         current_node = self.root
+        visits = 1
         while not current_node.is_leaf:
-            found_next_node = False
-            for i, k_node in enumerate(current_node.keys):
-                if key < k_node:
-                    current_node = current_node.children[i]
-                    found_next_node = True
-                    break
-            if not found_next_node:
-                current_node = current_node.children[len(current_node.keys)]
+            current_node = current_node.children[current_node.child_index_for(key)]
+            visits += 1
+        counters = self.counters
+        counters.descents += 1
+        counters.node_visits += visits
         return current_node
     
-    def _split_leaf(self, leaf_to_split: BPlusTreeNode) -> None:
-        """辅助函数：分裂一个已满的叶节点"""
+    @staticmethod
+    def _chunk_sizes(total: int, target: int, lower: int, upper: int) -> list[int]:
+        """
+        辅助函数：把 total 个元素切分成若干段，每段长度尽量接近 target，且都落在 [lower, upper] 内
+        total 不超过 upper 时只切出一段（这一段将成为根，不受下限约束）
+        """
+        if total <= upper:
+            return [total]
 
-        # 创建新的右兄弟叶节点
+        count = math.ceil(total / target)
+        while count > 1 and total // count < lower:     # 段数太多会让某些段低于下限
+            count -= 1
+        while math.ceil(total / count) > upper:         # 段数太少会让某些段超过上限
+            count += 1
+
+        base, extra = divmod(total, count)
+        return [base + 1] * extra + [base] * (count - extra)
+
+    def _bulk_build(self, keys: list, values: list, fill_factor: float, leaf_sizes=None) -> None:
+        """
+        辅助函数：用已经按键升序排列好的键值自底向上地构建整棵树
+        先把键值紧凑地装入叶节点并串好叶节点链表，再逐层向上构建内部节点，每一层只需要一次线性扫描
+
+        参数:
+            keys (list): 升序且互不相同的键
+            values (list): 与 keys 一一对应的值
+            fill_factor (float): 叶节点和内部节点的目标装填率，取值范围 (0, 1]
+            leaf_sizes (可选): 每个叶节点中的键数，给出时按它切分叶节点层（例如恢复保存下来的叶节点布局），
+                               而不是按装填率切分，调用方需要保证每一段都在叶节点的上下限之内
+        """
+        if not isinstance(fill_factor, (int, float)) or not (0 < fill_factor <= 1):
+            raise ValueError("装填因子必须在 (0, 1] 区间内")
+        if leaf_sizes is not None and sum(leaf_sizes) != len(keys):
+            raise ValueError("叶节点的键数之和与键的数量不一致")
+
+        min_keys = math.ceil(self.order / 2)
+        target = max(min_keys, int(self.order * fill_factor))
+
+        if not keys:
+            self.root = self._new_node(self.leaf_node_class)
+            return
+
+        # 构建叶节点层
+        level = []
+        start = 0
+        prev_leaf = None
+        if leaf_sizes is None:
+            leaf_sizes = self._chunk_sizes(len(keys), target, min_keys, self.order)
+        for size in leaf_sizes:
+            leaf = self._new_node(self.leaf_node_class)
+            leaf.keys = keys[start:start + size]
+            leaf.values = values[start:start + size]
+            self._refresh_aggregates(leaf)
+            leaf.prev_leaf = prev_leaf
+            if prev_leaf is not None:
+                prev_leaf.next_leaf = leaf
+            level.append(leaf)
+            prev_leaf = leaf
+            start += size
+        subtree_min_keys = [leaf.keys[0] for leaf in level]  # 每棵子树中的最小键，用作上层的分隔键
+
+        # 逐层构建内部节点，直到只剩一个节点作为根
+        while len(level) > 1:
+            parents = []
+            parent_min_keys = []
+            start = 0
+            for size in self._chunk_sizes(len(level), target + 1, self.order // 2 + 1, self.order + 1):
+                node = self._new_node(self.internal_node_class)
+                node.children = level[start:start + size]
+                node.keys = subtree_min_keys[start + 1:start + size]
+                for child in node.children:
+                    child.parent = node
+                self._refresh_aggregates(node)
+                parents.append(node)
+                parent_min_keys.append(subtree_min_keys[start])
+                start += size
+            level = parents
+            subtree_min_keys = parent_min_keys
+
+        self.root = level[0]
+        self.root.parent = None
+
+    def __len__(self) -> int:
+        """树中的条目总数"""
+        return self.root.size
+
+    def _leaf_entry_count(self, leaf: BPlusTreeLeafNode) -> int:
+        """叶节点中的条目数，子类中一个键对应多个条目时需要重写"""
+        return len(leaf.keys)
+
+    def _refresh_aggregates(self, node: BPlusTreeNode) -> None:
+        """根据节点自身的内容重新计算它的子树聚合信息（条目数），在分裂、借用、合并后调用"""
+        if node.is_leaf:
+            node.size = self._leaf_entry_count(node)
+        else:
+            node.size = sum(child.size for child in node.children)
+
+    def _add_to_path_size(self, node: BPlusTreeNode, delta: int) -> None:
+        """插入或删除一个条目后，把条目数的变化累加到从该节点到根的路径上"""
+        while node is not None:
+            node.size += delta
+            node = node.parent
+
+    # ------------------- 写时复制 -------------------
+    # 快照持有某一时刻的根，并且只通过 keys / values / children / size 自顶向下读取。
+    # 创建快照后纪元加一，此后修改任何旧纪元节点的这些字段之前，都要先用 _writable 复制它以及到根的路径；
+    # parent、next_leaf、prev_leaf 只供当前的树使用，可以直接修改共享节点上的这些字段
+
+    def _new_node(self, node_class: type) -> BPlusTreeNode:
+        """创建一个属于当前纪元的新节点"""
+        node = node_class(self.order)
+        node.epoch = self._epoch
+        return node
+
+    def _copy_node(self, node: BPlusTreeNode) -> BPlusTreeNode:
+        """复制节点的内容，子类有额外的聚合字段或可变的值时需要重写"""
+        copy = self._new_node(type(node))
+        copy.keys = list(node.keys)
+        copy.size = node.size
+        if node.is_leaf:
+            copy.values = list(node.values)
+            copy.prev_leaf = node.prev_leaf
+            copy.next_leaf = node.next_leaf
+        else:
+            copy.children = list(node.children)
+        return copy
+
+    def _writable(self, node: BPlusTreeNode) -> BPlusTreeNode:
+        """
+        返回可以原地修改的节点：节点属于当前纪元时直接返回，
+        否则复制它并把副本挂到（同样变为可写的）父节点上，沿途的祖先最多各复制一次
+        调用方必须改用返回的节点
+        """
+        if node.epoch == self._epoch:
+            return node
+
+        copy = self._copy_node(node)
+        parent = node.parent
+        if parent is None:
+            self.root = copy
+        else:
+            parent = self._writable(parent)
+            parent.children[parent.children.index(node)] = copy
+        copy.parent = parent
+
+        # 让当前的树中指向旧节点的父指针和叶节点链表指针改为指向副本
+        if copy.is_leaf:
+            if copy.prev_leaf is not None:
+                copy.prev_leaf.next_leaf = copy
+            if copy.next_leaf is not None:
+                copy.next_leaf.prev_leaf = copy
+        else:
+            for child in copy.children:
+                child.parent = copy
+        return copy
+
+    def _freeze(self) -> BPlusTreeNode:
+        """开始一个新的纪元并返回当前的根，此后这棵根下的所有节点都不会再被原地修改"""
+        self._epoch += 1
+        return self.root
+
+    def _first_leaf(self) -> BPlusTreeLeafNode:
+        """返回最左侧的叶节点，即叶节点链表的表头"""
+        current_node = self.root
+        while not current_node.is_leaf:
+            current_node = current_node.children[0]
+        return current_node
+
+    def _iter_leaf_items(self):
+        """按键的升序沿叶节点链表依次产出 (键, 值)"""
+        current_leaf = self._first_leaf()
+        while current_leaf is not None:
+            yield from zip(current_leaf.keys, current_leaf.values)
+            current_leaf = current_leaf.next_leaf
+
+    # ------------------- 批量修改 -------------------
+
+    def _find_leaf_and_fence(self, key) -> tuple:
+        """
+        辅助函数：找到键对应的叶节点，同时记录它的右边界
+
+        返回:
+            tuple: (叶节点, 右边界)，右边界是下降路径上最小的、大于该键的分隔键，属于该叶节点的键都小于它；
+                   最右叶节点的右边界为 None
+        """
+        fence = None
+        current_node = self.root
+        visits = 1
+        while not current_node.is_leaf:
+            idx = current_node.child_index_for(key)
+            if idx < len(current_node.keys):        # 越往下的分隔键越接近叶节点的真实右边界
+                fence = current_node.keys[idx]
+            current_node = current_node.children[idx]
+            visits += 1
+        self.counters.descents += 1
+        self.counters.node_visits += visits
+        return current_node, fence
+
+    def _batch_groups(self, keys: list):
+        """
+        辅助函数：把升序排列的键按所在的叶节点分组，依次产出 (叶节点, 起始下标, 结束下标)
+        每组只从根下降一次，后续的键只要仍小于该叶节点的右边界就归入同一组。
+        调用方可以在处理完一组之后修改树（分裂、合并），下一组会在修改后的树上重新定位
+        """
+        start = 0
+        while start < len(keys):
+            leaf, fence = self._find_leaf_and_fence(keys[start])
+            end = len(keys) if fence is None else bisect.bisect_left(keys, fence, start + 1)
+            yield leaf, start, end
+            start = end
+
+    @staticmethod
+    def _merge_into_leaf(leaf: BPlusTreeLeafNode, new_keys: list, new_values: list) -> None:
+        """辅助函数：把按键升序排列的新键值一次性归并进叶节点（两段有序序列，Timsort 是线性的）"""
+        pairs = sorted(itertools.chain(zip(leaf.keys, leaf.values), zip(new_keys, new_values)),
+                       key=lambda pair: pair[0])
+        leaf.keys = [key for key, _ in pairs]
+        leaf.values = [value for _, value in pairs]
+
+    def _split_overflowing_leaf(self, leaf: BPlusTreeLeafNode) -> None:
+        """批量插入后叶节点可能超出上限不止一个键，从左到右反复对半分裂，直到每个叶节点都不超过上限"""
+        split_point = math.ceil((self.order + 1) / 2)
+        while leaf.is_overflow():
+            self._split_leaf(leaf, split_point)
+            leaf = leaf.next_leaf
 
-        new_leaf = BPlusTreeNode(self.order, is_leaf=True)
+    def _rebalance_leaf(self, leaf: BPlusTreeLeafNode) -> None:
+        """
+        批量删除后叶节点可能缺少不止一个键，反复借用或合并直到它不再下溢
+        叶节点被合并进左兄弟后就不在父节点中了，此时停止
+        """
+        while leaf.is_deficient() and leaf in leaf.parent.children:
+            self._handle_leaf_node_underflow(leaf)
+
+    def _repair_path(self, key) -> None:
+        """
+        修复从根到键所在叶节点的路径上缺少任意多个键的节点，用于整批摘除子树之后
+        自底向上逐个借用或合并；父节点只剩一个子节点时它没有兄弟可用，先跳过，等父节点在更高一层被修复后再处理。
+        每一轮结束时收缩没有分隔键的根，直到某一轮没有任何修改为止
+
+        一次合并可能级联到上层：父节点本身被合并进它的兄弟后，节点的父指针会改为吸收它的节点，
+        原来的父节点则不再在树中，因此每次处理前都重新读取父指针，节点已经不在父节点中时（被合并掉了）停止处理它
+        """
+        while True:
+            changed = False
+            node = self._find_leaf_node(key)
+            while node.parent is not None:
+                while (node.parent is not None and node.is_deficient() and node in node.parent.children
+                       and len(node.parent.children) > 1):
+                    if node.is_leaf:
+                        self._handle_leaf_node_underflow(node)
+                    else:
+                        self._handle_internal_node_underflow(node)
+                    changed = True
+                if node.parent is None:
+                    break
+                node = node.parent          # 被合并掉的节点仍然保留着父指针，沿它向上，没修复完的部分留给下一轮
+            while not self.root.is_leaf and not self.root.keys:
+                self.root = self.root.children[0]
+                self.root.parent = None
+                changed = True
+            if not changed:
+                return
+
+    def _split_leaf(self, leaf_to_split: BPlusTreeLeafNode, split_point: int = None) -> None:
+        """
+        辅助函数：分裂一个已满的叶节点
+
+        参数:
+            leaf_to_split (BPlusTreeLeafNode): 要分裂的叶节点
+            split_point (int, 可选): 分裂后留在左节点中的键数，默认对半分裂
+        """
+
+        # 创建新的右兄弟叶节点
+        self.counters.leaf_splits += 1
+        new_leaf = self._new_node(self.leaf_node_class)
         new_leaf.parent = leaf_to_split.parent # 新节点与旧节点有相同的父节点 (暂时)
 
         # print("原节点:", leaf_to_split.keys)
 
-        split_point = math.ceil((self.order + 1) / 2)
+        if split_point is None:
+            split_point = math.ceil((self.order + 1) / 2)
         # print("midpoint index:", mid_point_index)
 
         # 将原叶节点后半部分的键和值移动到新叶节点
@@ -153,6 +749,9 @@ class BaseBPlusTree:
         leaf_to_split.next_leaf = new_leaf
         new_leaf.prev_leaf = leaf_to_split 
 
+        self._refresh_aggregates(leaf_to_split)
+        self._refresh_aggregates(new_leaf)
+
         # 获取要上推到父节点的键 (新叶节点的第一个键)
         key_to_push_up = new_leaf.keys[0]
 
@@ -167,12 +766,13 @@ class BaseBPlusTree:
         parent = left_child.parent
 
         if parent is None: # 如果 left_child 是根节点，需要创建一个新的根
-            new_root = BPlusTreeNode(self.order, is_leaf=False)
+            new_root = self._new_node(self.internal_node_class)
             new_root.keys = [key_to_insert]
             new_root.children = [left_child, right_child]
             self.root = new_root
             left_child.parent = new_root
             right_child.parent = new_root
+            self._refresh_aggregates(new_root)
             return
 
         # 非根节点，将 key_to_insert 和 right_child 插入父节点
@@ -187,9 +787,10 @@ class BaseBPlusTree:
         if parent.is_overflow(): 
             self._split_internal_node(parent)
 
-    def _split_internal_node(self, node_to_split: BPlusTreeNode):
+    def _split_internal_node(self, node_to_split: BPlusTreeInternalNode):
         """辅助函数：分裂一个已满的内部节点"""
-        new_internal_node = BPlusTreeNode(self.order, is_leaf=False)
+        self.counters.internal_splits += 1
+        new_internal_node = self._new_node(self.internal_node_class)
         new_internal_node.parent = node_to_split.parent
 
         # 计算分裂点
@@ -210,6 +811,9 @@ class BaseBPlusTree:
         node_to_split.keys = node_to_split.keys[:mid_key_index]
         node_to_split.children = node_to_split.children[:mid_key_index + 1]
 
+        self._refresh_aggregates(node_to_split)
+        self._refresh_aggregates(new_internal_node)
+
         # 将上推的键和新内部节点插入到父节点
         self._insert_into_parent(node_to_split, key_to_push_up, new_internal_node)
 
@@ -264,7 +868,7 @@ class BaseBPlusTree:
 
 
 
-    def _handle_leaf_node_underflow(self, leaf_node: BPlusTreeNode):
+    def _handle_leaf_node_underflow(self, leaf_node: BPlusTreeLeafNode):
         """处理叶节点下溢。尝试从兄弟节点借用，否则进行合并"""
         if leaf_node.parent is None:        # 根节点作为叶子，如果键为空则树为空，已在delete中处理
             return
@@ -278,6 +882,7 @@ class BaseBPlusTree:
         if child_index < len(parent.children) - 1:                      # 如果有右兄弟
             right_sibling = parent.children[child_index + 1]
             if right_sibling.is_leaf and right_sibling.can_lend_key():  # 且右兄弟是叶子且有富余key
+                right_sibling = self._writable(right_sibling)
                 
                 # 获取右兄弟第一个key和value
                 borrowed_key = right_sibling.keys.pop(0)                
@@ -289,12 +894,16 @@ class BaseBPlusTree:
 
                 # 更新父节点中分隔这两个兄弟的键
                 parent.keys[child_index] = right_sibling.keys[0]
+                self.counters.leaf_borrows += 1
+                self._refresh_aggregates(leaf_node)
+                self._refresh_aggregates(right_sibling)
                 return
 
         # 尝试从左兄弟借用
         if child_index > 0:                                             # 如果有左兄弟
             left_sibling = parent.children[child_index - 1]
             if left_sibling.is_leaf and left_sibling.can_lend_key():    # 且左兄弟是叶子且有富余key
+                left_sibling = self._writable(left_sibling)
                 
                 # 获取右兄弟最后一个key和value
                 borrowed_key = left_sibling.keys.pop()
@@ -306,16 +915,21 @@ class BaseBPlusTree:
 
                 # 更新父节点中分隔这两个兄弟的键
                 parent.keys[child_index - 1] = leaf_node.keys[0]
+                self.counters.leaf_borrows += 1
+                self._refresh_aggregates(leaf_node)
+                self._refresh_aggregates(left_sibling)
                 return
 
 
         # 如果无法从兄弟节点借用，则进行合并
         if child_index < len(parent.children) - 1:                      # 如果有右兄弟，则与右兄弟合并
             
-            # 合并右兄弟
-            right_sibling = parent.children[child_index + 1]
+            # 合并右兄弟（它的值会被当前节点接管，因此也要先变为可写的副本，避免与快照共享可变的值）
+            right_sibling = self._writable(parent.children[child_index + 1])
             leaf_node.keys.extend(right_sibling.keys)
             leaf_node.values.extend(right_sibling.values)
+            self.counters.leaf_merges += 1
+            self._refresh_aggregates(leaf_node)
             
             # 更新链表指针
             leaf_node.next_leaf = right_sibling.next_leaf
@@ -336,9 +950,11 @@ class BaseBPlusTree:
         elif child_index > 0:                                           # 只有左兄弟，与左兄弟合并
 
             # 把当前节点合并到左兄弟
-            left_sibling = parent.children[child_index - 1]
+            left_sibling = self._writable(parent.children[child_index - 1])
             left_sibling.keys.extend(leaf_node.keys)
             left_sibling.values.extend(leaf_node.values)
+            self.counters.leaf_merges += 1
+            self._refresh_aggregates(left_sibling)
 
             # 更新链表指针
             left_sibling.next_leaf = leaf_node.next_leaf
@@ -356,7 +972,7 @@ class BaseBPlusTree:
             if parent.is_deficient():
                  self._handle_internal_node_underflow(parent)
 
-    def _handle_internal_node_underflow(self, internal_node: BPlusTreeNode):
+    def _handle_internal_node_underflow(self, internal_node: BPlusTreeInternalNode):
         """处理内部节点下溢。尝试从兄弟节点借用，否则进行合并"""
 
         # if internal_node.parent is None: # 如果是根内部节点
@@ -392,6 +1008,7 @@ class BaseBPlusTree:
         if child_index < len(parent.children) - 1:
             right_sibling = parent.children[child_index + 1]
             if not right_sibling.is_leaf and right_sibling.can_lend_key():
+                right_sibling = self._writable(right_sibling)
 
                 # 父节点中分隔 right_sibling 和 internal_node 的键下放 internal_node
                 key_from_parent = parent.keys[child_index]
@@ -404,12 +1021,16 @@ class BaseBPlusTree:
                 
                 # right_sibling的第一个键上移到父节点，替换原来的分隔键
                 parent.keys[child_index] = right_sibling.keys.pop(0)
+                self.counters.internal_borrows += 1
+                self._refresh_aggregates(internal_node)
+                self._refresh_aggregates(right_sibling)
                 return
 
         # 尝试从左兄弟内部节点借用
         if child_index > 0:
             left_sibling = parent.children[child_index - 1]
             if not left_sibling.is_leaf and left_sibling.can_lend_key():
+                left_sibling = self._writable(left_sibling)
 
                 # 父节点中分隔 left_sibling 和 internal_node 的键下放 internal_node
                 key_from_parent = parent.keys[child_index - 1]
@@ -422,6 +1043,9 @@ class BaseBPlusTree:
 
                 # left_sibling 的最后一个键上移到父节点，替换原来的分隔键
                 parent.keys[child_index - 1] = left_sibling.keys.pop(-1)
+                self.counters.internal_borrows += 1
+                self._refresh_aggregates(internal_node)
+                self._refresh_aggregates(left_sibling)
                 return
 
         # 如果无法借用，则进行合并
@@ -442,9 +1066,11 @@ class BaseBPlusTree:
             
             # 从父节点中移除指向右兄弟的指针
             parent.children.pop(child_index + 1)
+            self.counters.internal_merges += 1
+            self._refresh_aggregates(internal_node)
 
         elif child_index > 0:                                   # 把当前节点合并到左兄弟
-            left_sibling = parent.children[child_index - 1]
+            left_sibling = self._writable(parent.children[child_index - 1])
 
             # 父节点中分隔它们的键下放到 left_sibling
             key_from_parent = parent.keys.pop(child_index - 1)
@@ -460,6 +1086,8 @@ class BaseBPlusTree:
                 
             # 从父节点中移除指向 internal_node 的指针
             parent.children.pop(child_index)
+            self.counters.internal_merges += 1
+            self._refresh_aggregates(left_sibling)
         
         # 检查父节点是否因此次键和指针的移除而下溢
         if parent.is_deficient():
@@ -468,6 +1096,127 @@ class BaseBPlusTree:
             self._handle_internal_node_underflow(parent)
 
 
+    # ------------------- 统计与校验 -------------------
+
+    def _children_of(self, node) -> list:
+        """返回内部节点的子节点对象，子节点不直接保存在 children 中的子类需要重写"""
+        return node.children
+
+    def _min_fill(self, node) -> int:
+        """非根节点至少应有的键数"""
+        return node.min_keys_for_node()
+
+    def _recorded_child_sizes(self, node) -> list | None:
+        """内部节点记录的每棵子树的条目数，不维护子树条目数的子类返回 None"""
+        return [child.size for child in node.children]
+
+    def stats(self) -> dict:
+        """
+        逐层遍历整棵树，返回结构统计和累计操作计数，复杂度与节点数成正比
+
+        返回:
+            dict: height 树高（只有一个根叶节点时为1）、entries 条目总数、
+                  nodes_per_level 从根开始每一层的节点数、leaves 叶节点数、
+                  leaf_fill_histogram 叶节点填充率（键数 / 阶）的直方图，第 i 项是填充率落在 [i/10, (i+1)/10) 的叶节点数，
+                  满节点计入最后一项、avg_leaf_fill 叶节点的平均填充率、counters 累计操作计数
+        """
+        nodes_per_level = []
+        level = [self.root]
+        while True:
+            nodes_per_level.append(len(level))
+            if level[0].is_leaf:
+                break
+            level = [child for node in level for child in self._children_of(node)]
+
+        histogram = [0] * 10
+        leaf_keys = 0
+        for leaf in level:
+            histogram[min(len(leaf.keys) * 10 // self.order, 9)] += 1
+            leaf_keys += len(leaf.keys)
+        return {
+            'height': len(nodes_per_level),
+            'entries': len(self),
+            'nodes_per_level': nodes_per_level,
+            'leaves': len(level),
+            'leaf_fill_histogram': histogram,
+            'avg_leaf_fill': leaf_keys / (len(level) * self.order),
+            'counters': self.counters.as_dict(),
+        }
+
+    def validate(self) -> list[str]:
+        """
+        检查整棵树的结构约束（调试用），复杂度与节点数成正比：
+        节点内的键严格升序并落在分隔键划定的区间内、子节点数等于键数加一、节点的键数在上下限之间、父指针、
+        叶节点等深、沿 next_leaf / prev_leaf 遍历的结果与中序遍历一致，以及记录的子树条目数
+
+        返回:
+            list[str]: 发现的问题，树的结构正确时为空列表
+        """
+        problems = []
+        leaves = []
+        depths = set()
+        total = self._validate_subtree(self.root, 0, None, None, problems, leaves, depths)
+        if len(depths) > 1:
+            problems.append(f"叶节点不在同一层，深度为 {sorted(depths)}")
+        if total != len(self):
+            problems.append(f"记录的条目总数 {len(self)} 与叶节点中的条目数 {total} 不一致")
+
+        in_order = [list(leaf.keys) for leaf in leaves]
+        forward = []
+        leaf = self._first_leaf()
+        while leaf is not None and len(forward) <= len(leaves):
+            forward.append(list(leaf.keys))
+            leaf = leaf.next_leaf
+        if forward != in_order:
+            problems.append("沿 next_leaf 遍历叶节点的结果与中序遍历不一致")
+        backward = []
+        leaf = leaves[-1] if leaves else None
+        while leaf is not None and len(backward) <= len(leaves):
+            backward.append(list(leaf.keys))
+            leaf = leaf.prev_leaf
+        if backward[::-1] != in_order:
+            problems.append("沿 prev_leaf 遍历叶节点的结果与中序遍历不一致")
+        return problems
+
+    def _validate_subtree(self, node, depth: int, lower, upper, problems: list, leaves: list, depths: set) -> int:
+        """辅助函数：递归检查覆盖键区间 [lower, upper)（None 表示无界）的子树，按顺序收集叶节点，返回子树中的条目数"""
+        keys = node.keys
+        where = f"深度 {depth} 的{'叶' if node.is_leaf else '内部'}节点 (首键 {keys[0] if len(keys) else None!r})"
+        if any(left >= right for left, right in zip(keys, keys[1:])):
+            problems.append(f"{where} 的键不是严格升序")
+        if len(keys) and lower is not None and keys[0] < lower:
+            problems.append(f"{where} 的键小于下界 {lower!r}")
+        if len(keys) and upper is not None and keys[-1] >= upper:
+            problems.append(f"{where} 的键不小于上界 {upper!r}")
+        if len(keys) > self.order:
+            problems.append(f"{where} 有 {len(keys)} 个键，超过了阶 {self.order}")
+        if depth > 0 and len(keys) < self._min_fill(node):
+            problems.append(f"{where} 只有 {len(keys)} 个键，少于下限 {self._min_fill(node)}")
+        if depth == 0 and not node.is_leaf and not len(keys):
+            problems.append("根内部节点没有分隔键，应该被它唯一的子节点取代")
+
+        if node.is_leaf:
+            if len(keys) != len(node.values):
+                problems.append(f"{where} 的键数与值数不一致")
+            leaves.append(node)
+            depths.add(depth)
+            return self._leaf_entry_count(node)
+
+        children = self._children_of(node)
+        if len(children) != len(keys) + 1:
+            problems.append(f"{where} 有 {len(keys)} 个键但有 {len(children)} 个子节点")
+            return 0
+        bounds = [lower, *keys, upper]
+        sizes = []
+        for i, child in enumerate(children):
+            if getattr(child, 'parent', node) is not node:     # 页文件中的节点不保存父指针
+                problems.append(f"{where} 的第 {i} 个子节点的父指针错误")
+            sizes.append(self._validate_subtree(child, depth + 1, bounds[i], bounds[i + 1], problems, leaves, depths))
+        recorded = self._recorded_child_sizes(node)
+        if recorded is not None and recorded != sizes:
+            problems.append(f"{where} 记录的子树条目数 {recorded} 与实际的 {sizes} 不一致")
+        return sum(sizes)
+
     def _print_tree_structure(self, node: BPlusTreeNode = None, level: int = 0, prefix: str = "Root:"):
         """辅助函数，用于打印树的结构 (调试用)。"""
         if node is None:
@@ -495,27 +1244,337 @@ class BaseBPlusTree:
 class BPlusTreeProducts(BaseBPlusTree):
     """
     B+树数据结构，用于存储和检索Product ID，以商品价格为键
+    每个节点还记录子树中商品的最高热度，用于按热度剪枝的 top-k 查询
+
+    默认模式下每个价格键对应一个商品ID列表；复合键模式下每个条目的键是 (price, product_id)，
+    值是 product_id，同一价格下的商品按ID有序地分布在叶节点中，删除和查重都是 O(log n) 的树操作
+
+    连续浮点键模式（只适用于默认模式）下叶节点的价格键保存在 array('d') 中，叶节点较大时更省内存，
+    复制和分裂叶节点也只是一次内存拷贝；代价是每次读取键都要重新构造 float 对象
     """
+    leaf_node_class: type = BPlusTreeHeatLeafNode
+    internal_node_class: type = BPlusTreeHeatInternalNode
 
-    def __init__(self, order: int):
+    def __init__(self, order: int, composite_keys: bool = False, float_keys: bool = False):
         """
         初始化B+树
 
         参数:
             order (int): B+树的阶
+            composite_keys (bool): 是否使用 (price, product_id) 复合键
+            float_keys (bool): 叶节点是否把价格键连续地保存在 array('d') 中，不能与 composite_keys 同时使用
         """
         super().__init__(order)
-        self.root = BPlusTreeNode(order, is_leaf=True)
+        if float_keys:
+            if composite_keys:
+                raise ValueError("复合键不是浮点数，不能使用连续浮点键的叶节点")
+            self.leaf_node_class = BPlusTreeFloatKeyLeafNode
+        self.root = self.leaf_node_class(order)
+        self.composite_keys: bool = composite_keys
+        self.float_keys: bool = float_keys
+        self._heats: dict = {}      # product_id - 热度
+
+    @classmethod
+    def bulk_load(cls, sorted_items, order: int = 3, fill_factor: float = 1.0,
+                  composite_keys: bool = False, float_keys: bool = False) -> "BPlusTreeProducts":
+        """
+        用按价格升序排列的 (price, product_id) 或 (price, product_id, heat) 序列自底向上地批量构建一棵树，比逐个 insert 快得多
 
-    # def _find_leaf_node(self, price: float) -> BPlusTreeNode:
-    #     """
-    #     从根开始查找给定价格应该属于的叶节点，返回包含该价格或价格应插入位置的叶节点
-    #     """
-    #     current_node = self.root
-    #     while not current_node.is_leaf:
-    #         idx = bisect.bisect_right(current_node.keys, price)
-    #         current_node = current_node.children[idx]
-    #     return current_node
+        参数:
+            sorted_items: 按价格升序排列的可迭代对象，相同价格的商品ID会归入同一个键，未给出热度时按0处理；
+                          复合键模式下必须按 (price, product_id) 严格升序排列
+            order (int): B+树的阶
+            fill_factor (float): 节点的目标装填率，取值范围 (0, 1]，为后续插入预留空间时可以调小
+            composite_keys (bool): 是否使用 (price, product_id) 复合键
+            float_keys (bool): 叶节点是否把价格键连续地保存在 array('d') 中
+
+        返回:
+            BPlusTreeProducts: 构建好的B+树
+        """
+        tree = cls(order, composite_keys=composite_keys, float_keys=float_keys)
+        keys = []
+        values = []
+        for price, product_id, *heat in sorted_items:
+            tree._heats[product_id] = heat[0] if heat else 0.0
+            if composite_keys:
+                key = (price, product_id)
+                if keys and key <= keys[-1]:
+                    raise ValueError("批量构建的输入必须按 (价格, 商品ID) 严格升序排列")
+                keys.append(key)
+                values.append(product_id)
+            elif keys and price == keys[-1]:
+                values[-1].append(product_id)
+            elif keys and price < keys[-1]:
+                raise ValueError("批量构建的输入必须按价格升序排列")
+            else:
+                keys.append(price)
+                values.append([product_id])
+        tree._bulk_build(keys, values, fill_factor)
+        return tree
+
+    # ------------------- 键的表示 -------------------
+
+    def _low_key(self, price: float):
+        """不大于该价格下任何条目的键，用于定位区间的起点"""
+        return (price,) if self.composite_keys else price
+
+    def _high_key(self, price: float):
+        """不小于该价格下任何条目的键，用于定位区间的终点"""
+        return (price, _KEY_MAX) if self.composite_keys else price
+
+    def _slot_ids(self, leaf: BPlusTreeLeafNode, start: int, end: int) -> list:
+        """按顺序返回叶节点中第 start 到 end-1 个槽位上的全部商品ID"""
+        if self.composite_keys:
+            return leaf.values[start:end]
+        return [product_id for product_ids in leaf.values[start:end] for product_id in product_ids]
+
+    def _locate(self, price: float, product_id: str) -> tuple:
+        """
+        辅助函数：查找一个具体条目所在的叶节点和槽位
+
+        返回:
+            tuple: (叶节点, 槽位)，条目不存在时槽位为 -1
+        """
+        if self.composite_keys:
+            key = (price, product_id)
+            leaf_node = self._find_leaf_node(key)
+            return leaf_node, leaf_node.find_key(key)
+
+        leaf_node = self._find_leaf_node(price)
+        key_index = leaf_node.find_key(price)
+        if key_index != -1 and product_id not in leaf_node.values[key_index]:
+            key_index = -1
+        return leaf_node, key_index
+
+    def _copy_node(self, node: BPlusTreeNode) -> BPlusTreeNode:
+        """写时复制时连同最高热度一起复制；默认模式下每个价格的ID列表会被原地修改，也要逐个复制"""
+        copy = super()._copy_node(node)
+        copy.max_heat = node.max_heat
+        if node.is_leaf and not self.composite_keys:
+            copy.values = [list(product_ids) for product_ids in node.values]
+        return copy
+
+    def snapshot(self) -> "BPlusTreeProductsSnapshot":
+        """
+        返回当前价格索引的只读快照，O(1)
+        快照与树共享所有节点，之后的修改只复制被修改路径上的 O(log n) 个节点，
+        因此快照上的长时间扫描不需要加锁，也不会看到分裂或合并的中间状态
+        """
+        return BPlusTreeProductsSnapshot(self._freeze(), self.composite_keys)
+
+    def _leaf_entry_count(self, leaf: BPlusTreeLeafNode) -> int:
+        """每个价格键下可能有多个商品ID，条目数是所有ID列表长度之和"""
+        if self.composite_keys:
+            return len(leaf.keys)
+        return sum(len(product_ids) for product_ids in leaf.values)
+
+    # ------------------- 热度聚合 -------------------
+
+    def _compute_max_heat(self, node: BPlusTreeNode) -> float:
+        """根据节点自身的内容计算子树中的最高热度"""
+        if node.is_leaf:
+            heats = self._heats
+            return max((heats[product_id] for product_id in self._slot_ids(node, 0, len(node.keys))),
+                       default=float('-inf'))
+        return max((child.max_heat for child in node.children), default=float('-inf'))
+
+    def _refresh_aggregates(self, node: BPlusTreeNode) -> None:
+        super()._refresh_aggregates(node)
+        node.max_heat = self._compute_max_heat(node)
+
+    def _raise_max_heat(self, node: BPlusTreeNode, heat: float) -> None:
+        """某个条目的热度升高后，沿到根的路径向上更新最高热度，遇到已经不低于它的祖先即可停止"""
+        while node is not None and heat > node.max_heat:
+            node.max_heat = heat
+            node = node.parent
+
+    def _recompute_max_heat_upwards(self, node: BPlusTreeNode) -> None:
+        """最高热度的条目被删除或降温后，从该节点开始向上重新计算，直到某个祖先的值不再变化"""
+        while node is not None:
+            new_max_heat = self._compute_max_heat(node)
+            if new_max_heat == node.max_heat:
+                return
+            node.max_heat = new_max_heat
+            node = node.parent
+
+    def validate(self) -> list[str]:
+        """在基类的检查之外，还检查每个节点记录的最高热度，以及热度表与树中的条目是否一致"""
+        problems = super().validate()
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.max_heat != self._compute_max_heat(node):
+                problems.append(f"首键为 {node.keys[0] if node.keys else None!r} 的节点记录的最高热度 {node.max_heat} 不正确")
+            if not node.is_leaf:
+                stack.extend(node.children)
+        if len(self._heats) != len(self):
+            problems.append(f"热度表中有 {len(self._heats)} 个商品，树中有 {len(self)} 个条目")
+        return problems
+
+    def update_heat(self, price: float, product_id: str, heat: float) -> bool:
+        """
+        更新一个商品在树中记录的热度，并维护沿途节点的最高热度
+
+        参数:
+            price (float): 商品当前的价格
+            product_id (str): 商品ID
+            heat (float): 新的热度
+
+        返回:
+            bool: 如果找到该商品则返回True，否则返回False
+        """
+        leaf_node, key_index = self._locate(price, product_id)
+        if key_index == -1:
+            return False
+
+        leaf_node = self._writable(leaf_node)
+        old_heat = self._heats[product_id]
+        self._heats[product_id] = heat
+        if heat > old_heat:
+            self._raise_max_heat(leaf_node, heat)
+        elif heat < old_heat and old_heat >= leaf_node.max_heat:
+            self._recompute_max_heat_upwards(leaf_node)
+        return True
+
+    def top_k_by_heat(self, min_price: float, max_price: float, k: int) -> list:
+        """
+        返回价格在 [min_price, max_price] 内热度最高的 k 个商品ID，按热度降序排列
+        使用分支定界：按子树最高热度从大到小展开与价格区间相交的子树，
+        一旦某棵子树的最高热度不可能进入当前的前 k 名就不再展开它
+
+        参数:
+            min_price (float): 最小价格
+            max_price (float): 最大价格
+            k (int): 需要的商品数量
+
+        返回:
+            list: 商品ID列表
+        """
+        if k <= 0 or min_price > max_price:
+            return []
+
+        low, high = self._low_key(min_price), self._high_key(max_price)
+        heats = self._heats
+        best = []                   # 最小堆，保存当前的前 k 名 (heat, 序号, product_id)
+        order = itertools.count()
+        frontier = [(-self.root.max_heat, next(order), self.root)]   # 按子树最高热度排序的最大堆
+
+        while frontier:
+            neg_bound, _, node = heapq.heappop(frontier)
+            if len(best) == k and -neg_bound <= best[0][0]:
+                break                                       # 剩余子树都不可能再进入前 k 名
+
+            if node.is_leaf:
+                start = bisect.bisect_left(node.keys, low)
+                end = bisect.bisect_right(node.keys, high)
+                for product_id in self._slot_ids(node, start, end):
+                    item = (heats[product_id], next(order), product_id)
+                    if len(best) < k:
+                        heapq.heappush(best, item)
+                    elif item[0] > best[0][0]:
+                        heapq.heapreplace(best, item)
+                continue
+
+            # 只展开键范围与价格区间相交的子节点：children[i] 覆盖 [keys[i-1], keys[i])
+            first = bisect.bisect_right(node.keys, low)
+            last = bisect.bisect_right(node.keys, high)
+            for child in node.children[first:last + 1]:
+                if len(best) < k or child.max_heat > best[0][0]:
+                    heapq.heappush(frontier, (-child.max_heat, next(order), child))
+
+        best.sort(key=lambda item: (-item[0], item[1]))
+        return [product_id for _, _, product_id in best]
+
+    # ------------------- 顺序统计 -------------------
+
+    def _count_below(self, price: float, inclusive: bool) -> int:
+        """
+        辅助函数：利用子树条目数统计价格小于 price（inclusive 为 True 时小于等于）的商品数，
+        每层只需累加目标子节点左侧兄弟的条目数
+        """
+        bound = self._high_key(price) if inclusive else self._low_key(price)
+        count = 0
+        node = self.root
+        while not node.is_leaf:
+            idx = node.child_index_for(bound)
+            for child in node.children[:idx]:
+                count += child.size
+            node = node.children[idx]
+
+        if inclusive:
+            end = bisect.bisect_right(node.keys, bound)
+        else:
+            end = bisect.bisect_left(node.keys, bound)
+        if self.composite_keys:
+            return count + end
+        for product_ids in node.values[:end]:
+            count += len(product_ids)
+        return count
+
+    def rank(self, price: float) -> int:
+        """
+        返回价格严格小于 price 的商品数量，即 price 在所有商品价格中的排名（从0开始）
+
+        参数:
+            price (float): 要查询的价格
+        """
+        return self._count_below(price, inclusive=False)
+
+    def count_range(self, min_price: float, max_price: float) -> int:
+        """
+        统计价格在 [min_price, max_price] (包含边界) 区间内的商品数量，复杂度 O(log n)，与结果数量无关
+
+        参数:
+            min_price (float): 最小价格
+            max_price (float): 最大价格
+        """
+        if min_price > max_price:
+            return 0
+        return self._count_below(max_price, inclusive=True) - self._count_below(min_price, inclusive=False)
+
+    def select(self, k: int) -> float:
+        """
+        返回所有商品按价格升序排列后第 k 个（从0开始）商品的价格，例如 select(len(tree) // 2) 即中位数价格
+
+        参数:
+            k (int): 排名，负数表示从末尾开始计数
+
+        返回:
+            float: 对应的价格
+        """
+        total = self.root.size
+        if k < 0:
+            k += total
+        if not 0 <= k < total:
+            raise IndexError("排名超出范围")
+
+        node = self.root
+        while not node.is_leaf:
+            for child in node.children:
+                if k < child.size:
+                    node = child
+                    break
+                k -= child.size
+
+        if self.composite_keys:
+            return node.keys[k][0]
+        for price, product_ids in zip(node.keys, node.values):
+            if k < len(product_ids):
+                return price
+            k -= len(product_ids)
+        raise IndexError("排名超出范围")   # 子树条目数与叶节点内容不一致时才会到达这里
+
+    def _iter_entries(self):
+        """按价格升序依次产出 (price, product_id, heat)"""
+        if self.composite_keys:
+            for (price, product_id), _ in self._iter_leaf_items():
+                yield price, product_id, self._heats[product_id]
+            return
+        for price, product_ids in self._iter_leaf_items():
+            for product_id in product_ids:
+                yield price, product_id, self._heats[product_id]
+
+    # ------------------- 查询 -------------------
 
     def search_exact(self, price: float, product_id_to_find: str = None) -> list[Product]:
         """
@@ -528,24 +1587,18 @@ class BPlusTreeProducts(BaseBPlusTree):
         返回:
             list[Product]: 包含所有匹配商品的列表。如果未找到，则为空列表
         """
-        leaf_node = self._find_leaf_node(price)
-        found_products = []
+        if product_id_to_find:
+            _, key_index = self._locate(price, product_id_to_find)
+            return [product_id_to_find] if key_index != -1 else []
 
-        try:
-            key_index = leaf_node.keys.index(price)
-            
-            products_at_this_price = leaf_node.values[key_index]
-            if product_id_to_find:
-                for product in products_at_this_price:
-                    if product == product_id_to_find:
-                        found_products.append(product)
-                        break 
-            else:
-                found_products.extend(products_at_this_price)
-        except ValueError:
-            pass 
-            
-        return found_products
+        if self.composite_keys:
+            return self.search_range(price, price)
+
+        leaf_node = self._find_leaf_node(price)
+        key_index = leaf_node.find_key(price)
+        if key_index == -1:
+            return []
+        return list(leaf_node.values[key_index])
 
     def search_range(self, min_price: float, max_price: float) -> list[str]:
         """
@@ -561,40 +1614,166 @@ class BPlusTreeProducts(BaseBPlusTree):
         if min_price > max_price:
             return []
 
+        low, high = self._low_key(min_price), self._high_key(max_price)
         results = []
-        current_leaf = self._find_leaf_node(min_price) # 定位到可能包含min_price的起始叶节点
+        current_leaf = self._find_leaf_node(low) # 定位到可能包含min_price的起始叶节点
+        start = bisect.bisect_left(current_leaf.keys, low)
 
-        # 遍历叶节点链表
+        # 遍历叶节点链表，在每个叶节点内二分查找区间的结束位置
         while current_leaf is not None:
-            for i, key_price in enumerate(current_leaf.keys):
-                if key_price > max_price:
-                    return results 
-
-                if key_price >= min_price:
-                    results.extend(current_leaf.values[i]) 
-            
-            if not current_leaf.keys or current_leaf.keys[-1] <= max_price: # 倘若当前节点的最大值小余搜索上界，进入相邻节点继续搜索
-                current_leaf = current_leaf.next_leaf
+            end = bisect.bisect_right(current_leaf.keys, high)
+            results.extend(self._slot_ids(current_leaf, start, end))
+            if end < len(current_leaf.keys):    # 当前叶节点中已经出现大于上界的键
+                return results
+            current_leaf = current_leaf.next_leaf
+            start = 0
         
         return results
 
-    def insert(self, price: float, product_id: str) -> None:
+    def iter_range(self, min_price: float, max_price: float):
         """
-        向B+树中插入一个商品ID
+        惰性地按价格升序产出 [min_price, max_price] (包含边界) 区间内的商品ID，
+        调用方只需要前若干个结果时不会物化整个区间。迭代期间不应修改树
+
+        参数:
+            min_price (float): 最小价格
+            max_price (float): 最大价格
+        """
+        if min_price > max_price:
+            return
+
+        low, high = self._low_key(min_price), self._high_key(max_price)
+        current_leaf = self._find_leaf_node(low)
+        start = bisect.bisect_left(current_leaf.keys, low)
+        while current_leaf is not None:
+            end = bisect.bisect_right(current_leaf.keys, high)
+            if self.composite_keys:
+                yield from current_leaf.values[start:end]
+            else:
+                for i in range(start, end):
+                    yield from current_leaf.values[i]
+            if end < len(current_leaf.keys):
+                return
+            current_leaf = current_leaf.next_leaf
+            start = 0
+
+    def iter_range_desc(self, max_price: float, min_price: float, resume_after: tuple = None):
+        """
+        惰性地按价格降序产出 [min_price, max_price] (包含边界) 区间内的商品ID
+        从 max_price 所在的叶节点开始沿 prev_leaf 向前遍历，产出顺序恰好是升序遍历的逆序，
+        因此取前 k 个结果的代价只与 k 有关，与区间大小无关。迭代期间不应修改树
 
         参数:
-            product (str): 要插入的商品ID
+            max_price (float): 最大价格
+            min_price (float): 最小价格
+            resume_after (tuple, 可选): 上一页最后一个条目的 (price, product_id)，从它之后（更便宜的方向）继续；
+                                        默认模式下若该商品已不在这个价格下，则从下一个更低的价格继续
+        """
+        if min_price > max_price:
+            return
+
+        if resume_after is None or resume_after[0] > max_price:
+            high = self._high_key(max_price)
+            current_leaf = self._find_leaf_node(high)
+            end = bisect.bisect_right(current_leaf.keys, high)
+        elif self.composite_keys:
+            anchor = tuple(resume_after)
+            current_leaf = self._find_leaf_node(anchor)
+            end = bisect.bisect_left(current_leaf.keys, anchor)
+        else:
+            after_price, after_id = resume_after
+            current_leaf = self._find_leaf_node(after_price)
+            end = bisect.bisect_left(current_leaf.keys, after_price)
+            if end < len(current_leaf.keys) and current_leaf.keys[end] == after_price:
+                bucket = current_leaf.values[end]
+                if after_id in bucket and after_price >= min_price:
+                    yield from reversed(bucket[:bucket.index(after_id)])
+
+        low = self._low_key(min_price)
+        while current_leaf is not None:
+            start = bisect.bisect_left(current_leaf.keys, low, 0, end)
+            yield from reversed(self._slot_ids(current_leaf, start, end))
+            if start > 0:                       # 当前叶节点中已经出现小于下界的键
+                return
+            current_leaf = current_leaf.prev_leaf
+            if current_leaf is not None:
+                end = len(current_leaf.keys)
+
+    def range_cursor(self, min_price: float, max_price: float, resume_after: tuple = None) -> BPlusTreeRangeCursor:
+        """
+        打开一个 [min_price, max_price] 区间上的可恢复游标
+
+        参数:
+            min_price (float): 最小价格
+            max_price (float): 最大价格
+            resume_after (tuple, 可选): 上一页最后一个条目的 (price, product_id)，游标从它之后开始；
+                                        默认模式下若该商品已不在这个价格下，则从下一个价格继续
+
+        返回:
+            BPlusTreeRangeCursor: 区间游标
         """
+        high = self._high_key(max_price)
+        if min_price > max_price:
+            return BPlusTreeRangeCursor(None, 0, 0, high, self.composite_keys)
+
+        if resume_after is None or resume_after[0] < min_price:
+            low = self._low_key(min_price)
+            leaf = self._find_leaf_node(low)
+            return BPlusTreeRangeCursor(leaf, bisect.bisect_left(leaf.keys, low), 0, high, self.composite_keys)
+
+        if self.composite_keys:
+            anchor = tuple(resume_after)
+            leaf = self._find_leaf_node(anchor)
+            return BPlusTreeRangeCursor(leaf, bisect.bisect_right(leaf.keys, anchor), 0, high, True)
+
+        after_price, after_id = resume_after
+        leaf = self._find_leaf_node(after_price)
+        slot = bisect.bisect_left(leaf.keys, after_price)
+        offset = 0
+        if slot < len(leaf.keys) and leaf.keys[slot] == after_price:
+            try:
+                offset = leaf.values[slot].index(after_id) + 1
+            except ValueError:
+                slot += 1
+        return BPlusTreeRangeCursor(leaf, slot, offset, high)
+
+    # ------------------- 修改 -------------------
+
+    def insert(self, price: float, product_id: str, heat: float = 0.0) -> None:
+        """
+        向B+树中插入一个商品ID
+        复合键模式下重复插入同一个 (price, product_id) 不会产生重复条目
 
-        leaf_node_to_insert_in = self._find_leaf_node(price)
+        参数:
+            price (float): 商品价格
+            product_id (str): 要插入的商品ID
+            heat (float): 商品热度，用于维护子树的最高热度
+        """
+        if self.composite_keys:
+            leaf_node_to_insert_in, key_index = self._locate(price, product_id)
+            if key_index != -1:
+                return
+        else:
+            leaf_node_to_insert_in = self._find_leaf_node(price)
 
+        leaf_node_to_insert_in = self._writable(leaf_node_to_insert_in)
         self._insert_into_leaf(leaf_node_to_insert_in, price, product_id)
+        self._heats[product_id] = heat
+        self._add_to_path_size(leaf_node_to_insert_in, 1)
+        self._raise_max_heat(leaf_node_to_insert_in, heat)
 
         if leaf_node_to_insert_in.is_overflow():        # 如果此次插入导致节点上溢了，那么尝试分裂节点
             self._split_leaf(leaf_node_to_insert_in)
             
-    def _insert_into_leaf(self, leaf: BPlusTreeNode, price: float, product: str) -> None:
+    def _insert_into_leaf(self, leaf: BPlusTreeLeafNode, price: float, product: str) -> None:
         """辅助函数：将商品插入到指定的叶节点中"""
+        if self.composite_keys:
+            key = (price, product)
+            insertion_point = bisect.bisect_left(leaf.keys, key)
+            leaf.keys.insert(insertion_point, key)
+            leaf.values.insert(insertion_point, product)
+            return
+
         insertion_point = bisect.bisect_left(leaf.keys, price)
 
         if insertion_point < len(leaf.keys) and leaf.keys[insertion_point] == price:
@@ -618,68 +1797,278 @@ class BPlusTreeProducts(BaseBPlusTree):
         返回:
             bool: 如果成功找到并删除商品则返回True，否则返回False
         """
-        leaf_node = self._find_leaf_node(price)
-        # print("找到了叶子结点！", leaf_node.keys, leaf_node.values)
         # 在叶节点中查找并移除商品
-        try:
-            key_index_in_leaf = leaf_node.keys.index(price)
+        leaf_node, key_index_in_leaf = self._locate(price, product_id)
+        if key_index_in_leaf == -1:
+            return False                                            # 价格或商品ID不存在于该叶节点
+
+        leaf_node = self._writable(leaf_node)
+        if self.composite_keys:
+            key_emptied = True
+        else:
             products_at_this_price = leaf_node.values[key_index_in_leaf]
-            
-            # print("找到了！", products_at_this_price)
+            products_at_this_price.remove(product_id)
+            key_emptied = not products_at_this_price
+        self._add_to_path_size(leaf_node, -1)
+        if self._heats.pop(product_id) >= leaf_node.max_heat and not key_emptied:   # 删除的是叶节点中最热的商品
+            self._recompute_max_heat_upwards(leaf_node)
+
+        # 如果这个价格下没有其他商品了，则需要移除整个键
+        if key_emptied:
+            leaf_node.keys.pop(key_index_in_leaf)
+            leaf_node.values.pop(key_index_in_leaf)
+            self._recompute_max_heat_upwards(leaf_node)
 
-            product_to_remove = None
-            for p_obj in products_at_this_price:
-                if p_obj == product_id:
-                    product_to_remove = p_obj
-                    break
-            
-            if product_to_remove:
-                products_at_this_price.remove(product_to_remove)
-
-                # 如果这个价格下没有其他商品了，则需要移除整个键
-                if not products_at_this_price:
-                    leaf_node.keys.pop(key_index_in_leaf)
-                    leaf_node.values.pop(key_index_in_leaf)
-
-                    # 当键被移除后，需要考察节点是否下溢
-                    if self.root == leaf_node and not leaf_node.keys:   # 根是叶子，且键空了，说明整个树是空的，跳过，如果这个根是叶子，且键非空，不对非空根叶节点设置下溢阈值
-                        pass 
-                    elif leaf_node.is_deficient():                      # 如果当前节点发生下溢，且不是空根叶子节点
-                        self._handle_leaf_node_underflow(leaf_node) 
-                
-                return True
-            else:
-                return False                                        # 商品ID在该价格下未找到
-        except ValueError:
-            # print("没找到！", [price, product_id])
-            # print("self._find_leaf_node返回的叶子结点", leaf_node.keys, leaf_node.values)
-            return False                                            # 价格不存在于该叶节点
+            # 当键被移除后，需要考察节点是否下溢
+            if self.root == leaf_node and not leaf_node.keys:   # 根是叶子，且键空了，说明整个树是空的，跳过，如果这个根是叶子，且键非空，不对非空根叶节点设置下溢阈值
+                pass 
+            elif leaf_node.is_deficient():                      # 如果当前节点发生下溢，且不是空根叶子节点
+                self._handle_leaf_node_underflow(leaf_node)
+
+        return True
+
+    def insert_many(self, items) -> None:
+        """
+        批量插入商品，与逐个调用 insert 的结果相同
+        先按键排序，落在同一叶节点中的条目只从根下降一次并一次性归并进叶节点，处理完该叶节点后再统一分裂
+
+        参数:
+            items: (price, product_id) 或 (price, product_id, heat) 的可迭代对象，未给出热度时按0处理
+        """
+        entries = sorted((((price, product_id) if self.composite_keys else price,
+                           price, product_id, heat[0] if heat else 0.0)
+                          for price, product_id, *heat in items), key=lambda entry: entry[0])
+        keys = [entry[0] for entry in entries]
+
+        for leaf_node, start, end in self._batch_groups(keys):
+            leaf_node = self._writable(leaf_node)
+            new_keys = []
+            new_values = []
+            added = 0
+            max_heat = float('-inf')
+            for key, price, product_id, heat in entries[start:end]:
+                if self.composite_keys:
+                    if leaf_node.find_key(key) != -1 or (new_keys and new_keys[-1] == key):
+                        continue                                # 与 insert 相同，忽略重复的条目
+                    new_keys.append(key)
+                    new_values.append(product_id)
+                else:
+                    key_index = leaf_node.find_key(price)
+                    if key_index != -1:
+                        leaf_node.values[key_index].append(product_id)
+                    elif new_keys and new_keys[-1] == price:
+                        new_values[-1].append(product_id)
+                    else:
+                        new_keys.append(price)
+                        new_values.append([product_id])
+                self._heats[product_id] = heat
+                added += 1
+                max_heat = max(max_heat, heat)
+
+            if new_keys:
+                self._merge_into_leaf(leaf_node, new_keys, new_values)
+            self._add_to_path_size(leaf_node, added)
+            self._raise_max_heat(leaf_node, max_heat)
+            self._split_overflowing_leaf(leaf_node)
+
+    def delete_many(self, items) -> int:
+        """
+        批量删除商品，与逐个调用 delete 的结果相同
+        先按键排序，落在同一叶节点中的条目只从根下降一次，全部移除后再统一处理该叶节点的下溢
+
+        参数:
+            items: (price, product_id) 的可迭代对象
+
+        返回:
+            int: 实际删除的商品数量
+        """
+        entries = sorted(((price, product_id) if self.composite_keys else price, product_id)
+                         for price, product_id in items)
+        keys = [key for key, _ in entries]
+        deleted = 0
+
+        for leaf_node, start, end in self._batch_groups(keys):
+            leaf_node = self._writable(leaf_node)
+            removed = 0
+            emptied = set()                     # 所有商品都被删除的槽位
+            for key, product_id in entries[start:end]:
+                key_index = leaf_node.find_key(key)
+                if key_index == -1 or key_index in emptied:
+                    continue
+                if self.composite_keys:
+                    emptied.add(key_index)
+                else:
+                    products_at_this_price = leaf_node.values[key_index]
+                    if product_id not in products_at_this_price:
+                        continue
+                    products_at_this_price.remove(product_id)
+                    if not products_at_this_price:
+                        emptied.add(key_index)
+                del self._heats[product_id]
+                removed += 1
+            if not removed:
+                continue
+
+            if emptied:
+                leaf_node.keys = [key for i, key in enumerate(leaf_node.keys) if i not in emptied]
+                leaf_node.values = [value for i, value in enumerate(leaf_node.values) if i not in emptied]
+            deleted += removed
+            self._add_to_path_size(leaf_node, -removed)
+            self._recompute_max_heat_upwards(leaf_node)
+            self._rebalance_leaf(leaf_node)
+        return deleted
+
+    def delete_range(self, min_price: float, max_price: float) -> list[str]:
+        """
+        删除价格在 [min_price, max_price] (包含边界) 区间内的所有商品
+        完全落在区间内的子树直接从父节点上摘下，不再逐个删除其中的条目；
+        只有包含区间两端的两条路径上的节点会被修改，最后沿这两条路径各修复一次下溢
+
+        参数:
+            min_price (float): 最小价格
+            max_price (float): 最大价格
+
+        返回:
+            list[str]: 按价格升序排列的被删除商品ID
+        """
+        if min_price > max_price:
+            return []
+
+        low, high = self._low_key(min_price), self._high_key(max_price)
+        removed = []
+        self._prune_range(self._writable(self.root), None, None, low, high, removed)
+        if not removed:
+            return removed
+        for product_id in removed:
+            self._heats.pop(product_id, None)
+
+        # 被修改过的节点都在两条边界路径上，自底向上重新计算它们的聚合信息
+        low_path = self._path_to(low)
+        high_path = self._path_to(high)
+        for low_node, high_node in zip(reversed(low_path), reversed(high_path)):
+            self._refresh_aggregates(low_node)
+            if high_node is not low_node:
+                self._refresh_aggregates(high_node)
+
+        # 两个边界叶节点之间的叶节点都被摘掉了，把它们直接连起来
+        low_leaf, high_leaf = low_path[-1], high_path[-1]
+        if low_leaf is not high_leaf:
+            low_leaf.next_leaf = high_leaf
+            high_leaf.prev_leaf = low_leaf
+
+        self._repair_path(low)
+        self._repair_path(high)
+        return removed
+
+    def _path_to(self, key) -> list:
+        """辅助函数：从根到键所在叶节点的路径"""
+        path = [self.root]
+        while not path[-1].is_leaf:
+            node = path[-1]
+            path.append(node.children[node.child_index_for(key)])
+        return path
+
+    def _prune_range(self, node: BPlusTreeNode, lower, upper, low, high, removed: list) -> None:
+        """
+        辅助函数：从可写的节点 node（覆盖键区间 [lower, upper)，None 表示无界）中删除 [low, high] 内的条目
+        键区间完全落在 [low, high] 内的子节点整棵摘下，与其部分相交的子节点（至多两个）递归处理。
+        包含 low 或 high 的节点永远不会被摘下，因此每个被处理的内部节点至少保留一个子节点
+
+        参数:
+            removed (list): 按键的顺序收集被删除的商品ID
+        """
+        if node.is_leaf:
+            start = bisect.bisect_left(node.keys, low)
+            end = bisect.bisect_right(node.keys, high)
+            if start < end:
+                removed.extend(self._slot_ids(node, start, end))
+                del node.keys[start:end]
+                del node.values[start:end]
+            return
+
+        bounds = [lower] + node.keys + [upper]
+        kept_keys = []
+        kept_children = []
+        for i, child in enumerate(list(node.children)):
+            child_lower, child_upper = bounds[i], bounds[i + 1]
+            if child_lower is not None and child_lower > low and child_upper is not None and child_upper <= high:
+                self._collect_subtree_ids(child, removed)       # 整棵子树都在区间内
+                continue
+            if (child_upper is None or child_upper > low) and (child_lower is None or child_lower <= high):
+                child = self._writable(child)
+                self._prune_range(child, child_lower, child_upper, low, high, removed)
+            if kept_children:
+                kept_keys.append(child_lower)                   # 被摘掉的子节点之后的第一个子节点沿用它自己的下界
+            kept_children.append(child)
+        node.keys = kept_keys
+        node.children = kept_children
+
+    def _collect_subtree_ids(self, node: BPlusTreeNode, removed: list) -> None:
+        """辅助函数：按键的顺序收集子树中的全部商品ID"""
+        if node.is_leaf:
+            removed.extend(self._slot_ids(node, 0, len(node.keys)))
+            return
+        for child in node.children:
+            self._collect_subtree_ids(child, removed)
 
 
 
 class BPlusTreeID(BaseBPlusTree):
     """
     B+树，以product id为键，Product对象为值
+
+    ProductManager 生成的商品ID以时间戳开头，几乎总是插入到最右侧的叶节点。
+    树缓存最右叶节点，新键大于当前最大键时直接追加而不必从根下降，
+    并且该叶节点满了之后按 append_split_ratio 非对称分裂，使左侧叶节点接近装满
+
+    压缩键模式下叶节点中的键用 FrontCodedKeys 前缀压缩保存。注意默认模式下叶节点的键与 Product.product_id
+    是同一个字符串对象，只占一个指针，压缩只有在索引独占键字符串时（例如键来自反序列化或外部输入）才能节省内存
     """
-    def __init__(self, order: int):
+    rightmost_append: bool = True           # 是否启用最右叶节点的追加快速路径
+    append_split_ratio: float = 0.9         # 追加导致分裂时留在左节点中的键的比例
+
+    def __init__(self, order: int, compress_keys: bool = False):
         """
         初始化B+树
 
         参数:
             order (int): B+树的阶
+            compress_keys (bool): 叶节点是否前缀压缩保存商品ID
         """
         super().__init__(order)
-        self.root = BPlusTreeNode(order, is_leaf=True)
+        self.compress_keys: bool = compress_keys
+        if compress_keys:
+            self.leaf_node_class = BPlusTreeFrontCodedLeafNode
+        self.root = self.leaf_node_class(order)
+        self._rightmost_leaf: BPlusTreeLeafNode | None = None  # 最右叶节点的缓存，为 None 时按需重新定位
+
+    @classmethod
+    def bulk_load(cls, sorted_products, order: int = 3, fill_factor: float = 1.0,
+                  compress_keys: bool = False) -> "BPlusTreeID":
+        """
+        用按商品ID升序排列的 Product 序列自底向上地批量构建一棵树，比逐个 insert 快得多
 
-    # def _find_leaf_node(self, produtid: str) -> BPlusTreeNode:
-    #     """
-    #     从根开始查找给定ID的Product对象，返回存储该对象的叶子节点
-    #     """
-    #     current_node = self.root
-    #     while not current_node.is_leaf:
-    #         idx = bisect.bisect_right(current_node.keys, produtid)
-    #         current_node = current_node.children[idx]
-    #     return current_node
+        参数:
+            sorted_products: 按 product_id 严格升序排列的 Product 可迭代对象
+            order (int): B+树的阶
+            fill_factor (float): 节点的目标装填率，取值范围 (0, 1]，为后续插入预留空间时可以调小
+            compress_keys (bool): 叶节点是否前缀压缩保存商品ID
+
+        返回:
+            BPlusTreeID: 构建好的B+树
+        """
+        tree = cls(order, compress_keys=compress_keys)
+        keys = []
+        values = []
+        for product in sorted_products:
+            if not isinstance(product, Product):
+                raise TypeError("插入的对象必须是 Product 类型")
+            if keys and product.product_id <= keys[-1]:
+                raise ValueError("批量构建的输入必须按商品ID严格升序排列")
+            keys.append(product.product_id)
+            values.append(product)
+        tree._bulk_build(keys, values, fill_factor)
+        return tree
 
     def search(self, productid: str) -> Product:
         """
@@ -693,13 +2082,51 @@ class BPlusTreeID(BaseBPlusTree):
         """
         leaf_node = self._find_leaf_node(productid)
 
-        try:
-            key_index = leaf_node.keys.index(productid)
-            products_at_this_price = leaf_node.values[key_index]
-            return products_at_this_price
-        except ValueError:
+        key_index = leaf_node.find_key(productid)
+        if key_index == -1:
             return None
+        return leaf_node.values[key_index]
+
+    def update(self, product: Product) -> bool:
+        """
+        用修改后的商品替换树中保存的同ID商品，与页文件后端保持相同的接口
+
+        返回:
+            bool: 树中存在该ID时返回True
+        """
+        leaf_node = self._find_leaf_node(product.product_id)
+        key_index = leaf_node.find_key(product.product_id)
+        if key_index == -1:
+            return False
+        self._writable(leaf_node).values[key_index] = product
+        return True
+
+    def snapshot(self) -> "BPlusTreeIDSnapshot":
+        """
+        返回当前ID索引的只读快照，O(1)，之后的修改只复制被修改路径上的节点
+        快照固定的是索引的结构，其中的 Product 对象仍与树共享
+        """
+        return BPlusTreeIDSnapshot(self._freeze())
 
+    def _min_fill(self, node) -> int:
+        """追加时的非对称分裂会留下一个较空的最右叶节点，它只要非空即可"""
+        if node.is_leaf and node.next_leaf is None:
+            return 1
+        return super()._min_fill(node)
+
+    def _get_rightmost_leaf(self) -> BPlusTreeLeafNode:
+        """辅助函数：返回最右叶节点，缓存失效时沿每层最后一个子节点重新定位"""
+        if self._rightmost_leaf is None or self._rightmost_leaf.epoch != self._epoch:    # 缓存的叶节点可能已被快照冻结
+            node = self.root
+            while not node.is_leaf:
+                node = node.children[-1]
+            self._rightmost_leaf = node
+        return self._rightmost_leaf
+
+    def _append_split_point(self) -> int:
+        """追加导致分裂时留在左节点中的键数，至少保留对半分裂的数量，至多留下 order 个"""
+        return min(self.order, max(math.ceil((self.order + 1) / 2),
+                                   int(self.append_split_ratio * (self.order + 1))))
 
     def insert(self, product: Product, test=False) -> None:
         """
@@ -712,14 +2139,30 @@ class BPlusTreeID(BaseBPlusTree):
             raise TypeError("插入的对象必须是 Product 类型")
 
         prodict_id = product.product_id
-        leaf_node_to_insert_in = self._find_leaf_node(prodict_id)
-
-        self._insert_into_leaf(leaf_node_to_insert_in, prodict_id, product, test)
+        appending = False
+        if self.rightmost_append:
+            leaf_node_to_insert_in = self._get_rightmost_leaf()
+            # 最右叶节点覆盖 [最后一个分隔键, +inf)，比其中最大键还大的ID一定属于它
+            appending = not leaf_node_to_insert_in.keys or prodict_id > leaf_node_to_insert_in.keys[-1]
+
+        if appending:
+            leaf_node_to_insert_in = self._rightmost_leaf = self._writable(leaf_node_to_insert_in)
+            leaf_node_to_insert_in.keys.append(prodict_id)
+            leaf_node_to_insert_in.values.append(product)
+        else:
+            leaf_node_to_insert_in = self._writable(self._find_leaf_node(prodict_id))
+            self._insert_into_leaf(leaf_node_to_insert_in, prodict_id, product, test)
+        self._add_to_path_size(leaf_node_to_insert_in, 1)
 
         if leaf_node_to_insert_in.is_overflow():        # 如果此次插入导致节点上溢了，那么尝试分裂节点
-            self._split_leaf(leaf_node_to_insert_in)
+            if appending:
+                self._split_leaf(leaf_node_to_insert_in, self._append_split_point())
+            else:
+                self._split_leaf(leaf_node_to_insert_in)
+            if leaf_node_to_insert_in is self._rightmost_leaf:
+                self._rightmost_leaf = leaf_node_to_insert_in.next_leaf
             
-    def _insert_into_leaf(self, leaf: BPlusTreeNode, product_id: str, product: Product, test = False) -> None:
+    def _insert_into_leaf(self, leaf: BPlusTreeLeafNode, product_id: str, product: Product, test = False) -> None:
         """辅助函数：将商品插入到指定的叶节点中"""
         insertion_point = bisect.bisect_left(leaf.keys, product_id)
         # if test:
@@ -739,23 +2182,177 @@ class BPlusTreeID(BaseBPlusTree):
             bool: 如果成功找到并删除商品则返回True，否则返回False
         """
         leaf_node = self._find_leaf_node(product_id)
-        # print("找到了叶子结点！", leaf_node.keys, leaf_node.values)
         # 在叶节点中查找并移除商品
-        try:
-            key_index_in_leaf = leaf_node.keys.index(product_id)
-            # products_to_remove = leaf_node.values[key_index_in_leaf]
-            
-            # leaf_node.values.remove(products_to_remove)
+        key_index_in_leaf = leaf_node.find_key(product_id)
+        if key_index_in_leaf == -1:
+            return False                                            # ID不存在于该叶节点
+
+        leaf_node = self._writable(leaf_node)
+        leaf_node.keys.pop(key_index_in_leaf)
+        leaf_node.values.pop(key_index_in_leaf)
+        self._add_to_path_size(leaf_node, -1)
+
+        # 当键被移除后，需要考察节点是否下溢
+        if self.root == leaf_node and not leaf_node.keys:   # 根是叶子，且现在为空的
+            pass
+        elif leaf_node.is_deficient():                      # 如果当前节点发生下溢，且不是空根叶子节点
+            self._handle_leaf_node_underflow(leaf_node)
+            self._rightmost_leaf = None                     # 合并可能移除了缓存的最右叶节点
+        return True
+
+    def insert_many(self, products) -> None:
+        """
+        批量插入商品，与逐个调用 insert 的结果相同
+        先按商品ID排序，落在同一叶节点中的商品只从根下降一次并一次性归并进叶节点，处理完该叶节点后再统一分裂
 
-            
-            leaf_node.keys.pop(key_index_in_leaf)
-            leaf_node.values.pop(key_index_in_leaf)
+        参数:
+            products: Product 的可迭代对象
+        """
+        products = sorted(products, key=self._product_id_of)
+        keys = [product.product_id for product in products]
+        for leaf_node, start, end in self._batch_groups(keys):
+            leaf_node = self._writable(leaf_node)
+            self._merge_into_leaf(leaf_node, keys[start:end], products[start:end])
+            self._add_to_path_size(leaf_node, end - start)
+            self._split_overflowing_leaf(leaf_node)
+        self._rightmost_leaf = None                         # 分裂后缓存的叶节点可能已经不是最右的了
+
+    @staticmethod
+    def _product_id_of(product: Product) -> str:
+        if not isinstance(product, Product):
+            raise TypeError("插入的对象必须是 Product 类型")
+        return product.product_id
 
-            # 当键被移除后，需要考察节点是否下溢
-            if self.root == leaf_node and not leaf_node.keys:   # 根是叶子，且现在为空的
-                pass
-            elif leaf_node.is_deficient():                      # 如果当前节点发生下溢，且不是空根叶子节点
-                self._handle_leaf_node_underflow(leaf_node) 
-            return True
-        except ValueError:
-            return False                                            # 价格不存在于该叶节点
\ No newline at end of file
+    def delete_many(self, product_ids) -> int:
+        """
+        批量删除商品，与逐个调用 delete 的结果相同
+        先按商品ID排序，落在同一叶节点中的ID只从根下降一次，全部移除后再统一处理该叶节点的下溢
+
+        参数:
+            product_ids: 商品ID的可迭代对象
+
+        返回:
+            int: 实际删除的商品数量
+        """
+        keys = sorted(set(product_ids))
+        deleted = 0
+        for leaf_node, start, end in self._batch_groups(keys):
+            targets = {key for key in keys[start:end] if leaf_node.find_key(key) != -1}
+            if not targets:
+                continue
+            leaf_node = self._writable(leaf_node)
+            kept = [i for i, key in enumerate(leaf_node.keys) if key not in targets]
+            removed = len(leaf_node.keys) - len(kept)
+            leaf_node.values = [leaf_node.values[i] for i in kept]
+            leaf_node.keys = [leaf_node.keys[i] for i in kept]
+            deleted += removed
+            self._add_to_path_size(leaf_node, -removed)
+            self._rebalance_leaf(leaf_node)
+        self._rightmost_leaf = None                         # 合并可能移除了缓存的最右叶节点
+        return deleted
+
+
+# ---------------- 快照 ----------------
+class BPlusTreeSnapshot:
+    """
+    B+树在某一时刻的只读视图
+    只通过 keys / values / children / size 自顶向下读取节点，不使用父指针和叶节点链表（它们属于当前的树），
+    因此树之后的插入、删除、分裂与合并都不会影响快照看到的内容
+    """
+    __slots__ = ('root',)
+
+    def __init__(self, root: BPlusTreeNode):
+        self.root: BPlusTreeNode = root
+
+    def __len__(self) -> int:
+        return self.root.size
+
+    def _find_leaf_node(self, key) -> BPlusTreeLeafNode:
+        node = self.root
+        while not node.is_leaf:
+            node = node.children[node.child_index_for(key)]
+        return node
+
+    def _iter_leaves(self, key=None):
+        """从 key 所在的叶节点（key 为 None 时从最左侧叶节点）开始，用显式栈按顺序产出叶节点"""
+        stack = []
+        node = self.root
+        while not node.is_leaf:
+            idx = 0 if key is None else node.child_index_for(key)
+            stack.append((node, idx))
+            node = node.children[idx]
+        yield node
+
+        while stack:
+            parent, idx = stack.pop()
+            if idx + 1 >= len(parent.children):
+                continue
+            stack.append((parent, idx + 1))
+            node = parent.children[idx + 1]
+            while not node.is_leaf:
+                stack.append((node, 0))
+                node = node.children[0]
+            yield node
+
+    def _iter_leaf_items(self):
+        """按键的升序依次产出 (键, 值)"""
+        for leaf in self._iter_leaves():
+            yield from zip(leaf.keys, leaf.values)
+
+
+class BPlusTreeIDSnapshot(BPlusTreeSnapshot):
+    """BPlusTreeID 的只读快照"""
+    __slots__ = ()
+
+    def search(self, productid: str) -> Product:
+        """精确查找具有指定ID的商品，若没找到，返回None"""
+        leaf_node = self._find_leaf_node(productid)
+        key_index = leaf_node.find_key(productid)
+        if key_index == -1:
+            return None
+        return leaf_node.values[key_index]
+
+
+class BPlusTreeProductsSnapshot(BPlusTreeSnapshot):
+    """
+    BPlusTreeProducts 的只读快照，支持精确查找、区间查询和顺序统计
+    商品热度保存在树的 _heats 中而不在节点里，因此快照不提供按热度的查询
+    """
+    __slots__ = ('composite_keys',)
+
+    def __init__(self, root: BPlusTreeNode, composite_keys: bool):
+        super().__init__(root)
+        self.composite_keys: bool = composite_keys
+
+    # 这些方法只自顶向下读取节点，直接复用价格索引的实现
+    _low_key = BPlusTreeProducts._low_key
+    _high_key = BPlusTreeProducts._high_key
+    _slot_ids = BPlusTreeProducts._slot_ids
+    _locate = BPlusTreeProducts._locate
+    _count_below = BPlusTreeProducts._count_below
+    rank = BPlusTreeProducts.rank
+    count_range = BPlusTreeProducts.count_range
+    select = BPlusTreeProducts.select
+
+    def search_exact(self, price: float, product_id_to_find: str = None) -> list[str]:
+        """精确查找具有指定价格的商品ID，可以进一步限定商品ID"""
+        if product_id_to_find:
+            _, key_index = self._locate(price, product_id_to_find)
+            return [product_id_to_find] if key_index != -1 else []
+        return self.search_range(price, price)
+
+    def iter_range(self, min_price: float, max_price: float):
+        """惰性地按价格升序产出 [min_price, max_price] (包含边界) 区间内的商品ID"""
+        if min_price > max_price:
+            return
+        low, high = self._low_key(min_price), self._high_key(max_price)
+        for leaf in self._iter_leaves(low):
+            start = bisect.bisect_left(leaf.keys, low)
+            end = bisect.bisect_right(leaf.keys, high)
+            yield from self._slot_ids(leaf, start, end)
+            if end < len(leaf.keys):
+                return
+
+    def search_range(self, min_price: float, max_price: float) -> list[str]:
+        """查找价格在 [min_price, max_price] (包含边界) 区间内的所有商品ID"""
+        return list(self.iter_range(min_price, max_price))
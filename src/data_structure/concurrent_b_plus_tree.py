@@ -0,0 +1,568 @@
+import bisect
+import heapq
+import itertools
+import threading
+from contextlib import contextmanager
+
+from src.model.product import Product
+from src.data_structure.b_plus_tree import (BPlusTreeLeafNode, BPlusTreeInternalNode, BPlusTreeHeatLeafNode,
+                                            BPlusTreeHeatInternalNode, BaseBPlusTree, BPlusTreeID, BPlusTreeProducts)
+
+
+# ---------------- 读写闩 ----------------
+class ReadWriteLatch:
+    """
+    节点上的读写闩：多个读者可以同时持有，写者独占
+    有写者在等待时新的读者也要等待，避免读多写少的负载把写者饿死
+    没有线程等待时加闩和释放只需要获取一次互斥锁，不经过条件变量
+    """
+    __slots__ = ('_mutex', '_cond', '_readers', '_writer', '_waiting_writers', '_waiting')
+
+    def __init__(self):
+        self._mutex = threading.Lock()
+        self._cond = threading.Condition(self._mutex)
+        self._readers: int = 0
+        self._writer: bool = False
+        self._waiting_writers: int = 0
+        self._waiting: int = 0          # 在条件变量上等待的读者和写者总数
+
+    def acquire_shared(self) -> None:
+        with self._mutex:
+            if self._writer or self._waiting_writers:
+                self._waiting += 1
+                while self._writer or self._waiting_writers:
+                    self._cond.wait()
+                self._waiting -= 1
+            self._readers += 1
+
+    def release_shared(self) -> None:
+        with self._mutex:
+            self._readers -= 1
+            if not self._readers and self._waiting:
+                self._cond.notify_all()
+
+    def acquire_exclusive(self) -> None:
+        with self._mutex:
+            if self._writer or self._readers:
+                self._waiting += 1
+                self._waiting_writers += 1
+                while self._writer or self._readers:
+                    self._cond.wait()
+                self._waiting_writers -= 1
+                self._waiting -= 1
+            self._writer = True
+
+    def release_exclusive(self) -> None:
+        with self._mutex:
+            self._writer = False
+            if self._waiting:
+                self._cond.notify_all()
+
+
+# ---------------- 带闩的节点类 ----------------
+class ConcurrentLeafNode(BPlusTreeLeafNode):
+    __slots__ = ('latch',)
+
+    def __init__(self, order: int):
+        super().__init__(order)
+        self.latch: ReadWriteLatch = ReadWriteLatch()
+
+
+class ConcurrentInternalNode(BPlusTreeInternalNode):
+    __slots__ = ('latch',)
+
+    def __init__(self, order: int):
+        super().__init__(order)
+        self.latch: ReadWriteLatch = ReadWriteLatch()
+
+
+class ConcurrentHeatLeafNode(BPlusTreeHeatLeafNode):
+    __slots__ = ('latch',)
+
+    def __init__(self, order: int):
+        super().__init__(order)
+        self.latch: ReadWriteLatch = ReadWriteLatch()
+
+
+class ConcurrentHeatInternalNode(BPlusTreeHeatInternalNode):
+    __slots__ = ('latch',)
+
+    def __init__(self, order: int):
+        super().__init__(order)
+        self.latch: ReadWriteLatch = ReadWriteLatch()
+
+
+# ---------------- 闩锁耦合 ----------------
+class _ConcurrentTreeMixin:
+    """
+    用闩锁耦合（latch crabbing）保护单线程B+树的读写，放在具体树类之前继承
+
+    读操作从根开始，先锁住子节点再释放父节点，任何时刻只持有一到两个读闩。
+    写操作沿路径加写闩，一旦某个节点是“安全”的（本次插入不会让它分裂，删除不会让它下溢），
+    它之上的祖先都不会被修改，于是立即释放这些祖先的写闩，随后直接复用基类的插入、分裂、借用与合并代码。
+    self.root 本身由 _root_latch 保护，它被视为根节点的父节点参与闩锁耦合。
+
+    闩只按自顶向下（以及持有父节点时锁住兄弟）的顺序获取，所以不会死锁。
+    沿路径向上维护的聚合信息（子树条目数、最高热度）会迫使每次写操作都锁住整条路径，
+    因此并发版本不维护它们，条目数由一个全树计数器记录，计数、按序选择和按热度查询都改为扫描区间。
+    区间扫描不走叶节点链表，而是每读完一个叶节点就用它的右边界重新从根下降，
+    这样读者从不横向加闩，也不会与借用、合并兄弟节点的写者形成环路
+    """
+
+    def _init_latches(self) -> None:
+        self._root_latch: ReadWriteLatch = ReadWriteLatch()
+        self._local = threading.local()         # 当前线程已经锁住的目标叶节点，供基类代码中的 _find_leaf_node 使用
+        self._count: int = 0
+        self._count_lock = threading.Lock()
+
+    # ------------------- 下降 -------------------
+
+    def _descend_shared(self, key, before: bool = False) -> tuple:
+        """
+        以读闩耦合的方式下降到键所在的叶节点
+
+        参数:
+            key: 要定位的键
+            before (bool): 为 True 时下降到包含小于 key 的最大键的叶节点（与分隔键相等时进入左侧子树），供降序扫描使用
+
+        返回:
+            tuple: (持有读闩的叶节点, 该叶节点的左边界, 右边界)，最左叶节点的左边界和最右叶节点的右边界为 None
+        """
+        self._root_latch.acquire_shared()
+        node = self.root
+        node.latch.acquire_shared()
+        self._root_latch.release_shared()
+
+        low_fence = high_fence = None
+        visits = 1
+        while not node.is_leaf:
+            idx = bisect.bisect_left(node.keys, key) if before else node.child_index_for(key)
+            if idx > 0:                         # 越往下的分隔键越接近叶节点的真实边界
+                low_fence = node.keys[idx - 1]
+            if idx < len(node.keys):
+                high_fence = node.keys[idx]
+            child = node.children[idx]
+            child.latch.acquire_shared()
+            node.latch.release_shared()
+            node = child
+            visits += 1
+        self.counters.descents += 1
+        self.counters.node_visits += visits
+        return node, low_fence, high_fence
+
+    def _descend_exclusive(self, key, is_safe) -> tuple:
+        """
+        以写闩耦合的方式下降到键所在的叶节点，遇到安全节点时释放它之上的所有写闩
+
+        参数:
+            key: 要定位的键
+            is_safe: is_safe(node, is_root) 判断本次修改是否一定不会波及该节点的父节点
+
+        返回:
+            tuple: (持有写闩的叶节点, 仍然持有的闩列表，按自顶向下排列)
+        """
+        self._root_latch.acquire_exclusive()
+        held = [self._root_latch]
+        node = self.root
+        is_root = True
+        self.counters.descents += 1
+        while True:
+            node.latch.acquire_exclusive()
+            self.counters.node_visits += 1
+            if is_safe(node, is_root):
+                self._release_exclusive(held)
+                held = []
+            held.append(node.latch)
+            if node.is_leaf:
+                return node, held
+            node = node.children[node.child_index_for(key)]
+            is_root = False
+
+    @staticmethod
+    def _release_exclusive(latches: list) -> None:
+        for latch in latches:
+            latch.release_exclusive()
+
+    @staticmethod
+    def _safe_for_insert(node, is_root: bool) -> bool:
+        """插入最多让节点多出一个键，未满的节点不会分裂"""
+        return len(node.keys) < node.order
+
+    @staticmethod
+    def _safe_for_delete(node, is_root: bool) -> bool:
+        """删除最多让节点少一个键；根叶节点可以变空，根内部节点只剩一个键时可能被子节点取代"""
+        if is_root:
+            return node.is_leaf or len(node.keys) > 1
+        return len(node.keys) > node.min_keys_for_node()
+
+    @staticmethod
+    def _safe_always(node, is_root: bool) -> bool:
+        """只修改叶节点中的值、不改变键的操作"""
+        return True
+
+    @contextmanager
+    def _reading(self, key):
+        """在持有目标叶节点读闩期间执行基类的查找代码"""
+        leaf, _, _ = self._descend_shared(key)
+        self._local.leaf = leaf
+        try:
+            yield leaf
+        finally:
+            self._local.leaf = None
+            leaf.latch.release_shared()
+
+    @contextmanager
+    def _writing(self, key, is_safe):
+        """在持有从最高的不安全节点到叶节点的写闩期间执行基类的修改代码"""
+        leaf, held = self._descend_exclusive(key, is_safe)
+        self._local.leaf = leaf
+        try:
+            yield leaf
+        finally:
+            self._local.leaf = None
+            self._release_exclusive(held)
+
+    def _find_leaf_node(self, key):
+        """基类代码中的定位直接返回当前线程已经锁住的叶节点；未持有闩时（单线程的检查代码）照常下降"""
+        leaf = getattr(self._local, 'leaf', None)
+        if leaf is not None:
+            return leaf
+        return super()._find_leaf_node(key)
+
+    def _latch_siblings(self, node) -> list:
+        """借用或合并前锁住节点的左右兄弟，调用方已经持有它们共同的父节点"""
+        parent = node.parent
+        if parent is None:
+            return []
+        idx = parent.children.index(node)
+        latches = [sibling.latch for sibling in parent.children[max(idx - 1, 0):idx + 2] if sibling is not node]
+        for latch in latches:
+            latch.acquire_exclusive()
+        return latches
+
+    def _handle_leaf_node_underflow(self, leaf_node) -> None:
+        latches = self._latch_siblings(leaf_node)
+        try:
+            super()._handle_leaf_node_underflow(leaf_node)
+        finally:
+            self._release_exclusive(latches)
+
+    def _handle_internal_node_underflow(self, internal_node) -> None:
+        latches = self._latch_siblings(internal_node)
+        try:
+            super()._handle_internal_node_underflow(internal_node)
+        finally:
+            self._release_exclusive(latches)
+
+    # ------------------- 聚合信息 -------------------
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _refresh_aggregates(self, node) -> None:
+        """并发版本不维护子树聚合信息"""
+
+    def _recorded_child_sizes(self, node) -> None:
+        return None
+
+    def _add_to_path_size(self, node, delta: int) -> None:
+        with self._count_lock:
+            self._count += delta
+
+    def _bulk_build(self, keys: list, values: list, fill_factor: float, leaf_sizes=None) -> None:
+        super()._bulk_build(keys, values, fill_factor, leaf_sizes)
+        leaf = self._first_leaf()
+        while leaf is not None:
+            self._count += self._leaf_entry_count(leaf)
+            leaf = leaf.next_leaf
+
+    def snapshot(self):
+        """写时复制快照要求修改者复制整条路径并替换根节点，与只锁住最高不安全节点以下部分的闩锁耦合不兼容"""
+        raise TypeError("并发B+树不支持 snapshot()：写时复制快照与闩锁耦合不兼容，请在单线程的树上创建快照")
+
+
+class ConcurrentRangeCursor:
+    """
+    ConcurrentBPlusTreeProducts 上的区间游标，接口与 BPlusTreeRangeCursor 相同
+    内部是一个惰性的区间扫描，两次 fetch 之间不持有任何闩，游标打开期间其他线程的修改不会使它失效
+    """
+    __slots__ = ('_entries',)
+
+    def __init__(self, entries):
+        self._entries = entries         # 产出 (price, product_id) 的迭代器，读完后为 None
+
+    @property
+    def exhausted(self) -> bool:
+        """游标是否已经走完整个区间"""
+        return self._entries is None
+
+    def fetch(self, n: int) -> list[tuple]:
+        """
+        向后读取最多 n 个条目
+
+        返回:
+            list[tuple]: (price, product_id) 列表，长度小于 n 说明区间已经读完
+        """
+        if self._entries is None:
+            return []
+        results = list(itertools.islice(self._entries, n))
+        if len(results) < n:
+            self._entries = None
+        return results
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> tuple:
+        items = self.fetch(1)
+        if not items:
+            raise StopIteration
+        return items[0]
+
+
+class ConcurrentBPlusTreeID(_ConcurrentTreeMixin, BPlusTreeID):
+    """
+    线程安全的 BPlusTreeID，接口与 BPlusTreeID 相同
+    最右叶节点的缓存会绕过闩锁耦合，因此这里关闭追加快速路径
+
+    不支持的功能：snapshot() 抛出 TypeError；compress_keys=True 抛出 ValueError，
+    前缀压缩的叶节点在插入时整体重新编码，读者无法只在持有读闩期间安全地解码它
+    """
+    leaf_node_class: type = ConcurrentLeafNode
+    internal_node_class: type = ConcurrentInternalNode
+    rightmost_append: bool = False
+
+    def __init__(self, order: int, compress_keys: bool = False):
+        if compress_keys:
+            raise ValueError("并发B+树不支持 compress_keys：前缀压缩的叶节点不能在闩锁耦合下修改")
+        super().__init__(order)
+        self._init_latches()
+
+    def search(self, productid: str) -> Product:
+        with self._reading(productid):
+            return super().search(productid)
+
+    def insert(self, product: Product, test=False) -> None:
+        if not isinstance(product, Product):
+            raise TypeError("插入的对象必须是 Product 类型")
+        with self._writing(product.product_id, self._safe_for_insert):
+            super().insert(product, test)
+
+    def update(self, product: Product) -> bool:
+        with self._writing(product.product_id, self._safe_always):
+            return super().update(product)
+
+    def delete(self, product_id: str) -> bool:
+        with self._writing(product_id, self._safe_for_delete):
+            return super().delete(product_id)
+
+    def insert_many(self, products) -> None:
+        """批量修改会一次改动整个叶节点并连续分裂，这里逐个插入，每次只锁住需要的路径"""
+        for product in products:
+            self.insert(product)
+
+    def delete_many(self, product_ids) -> int:
+        return sum(self.delete(product_id) for product_id in set(product_ids))
+
+
+class ConcurrentBPlusTreeProducts(_ConcurrentTreeMixin, BPlusTreeProducts):
+    """
+    线程安全的 BPlusTreeProducts
+    点查、插入、删除与 BPlusTreeProducts 相同；count_range、rank、select 和 top_k_by_heat 改为扫描区间，
+    复杂度与区间内的条目数成正比。iter_range_desc 和 range_cursor 不沿叶节点链表移动，
+    而是与 _scan 一样每读完一个叶节点就用它的边界重新从根下降，只在复制叶节点中的条目时持有读闩
+
+    不支持的功能：snapshot() 抛出 TypeError；float_keys=True 抛出 ValueError，
+    连续浮点键的叶节点按整块数组编码，修改时需要重建整个叶节点
+    """
+    leaf_node_class: type = ConcurrentHeatLeafNode
+    internal_node_class: type = ConcurrentHeatInternalNode
+
+    def __init__(self, order: int, composite_keys: bool = False, float_keys: bool = False):
+        if float_keys:
+            raise ValueError("并发B+树不支持 float_keys：连续浮点键的叶节点不能在闩锁耦合下修改")
+        super().__init__(order, composite_keys)
+        self._init_latches()
+
+    def _entry_key(self, price: float, product_id: str):
+        """条目所在叶节点的定位键"""
+        return (price, product_id) if self.composite_keys else price
+
+    def _raise_max_heat(self, node, heat: float) -> None:
+        """并发版本不维护最高热度"""
+
+    def _recompute_max_heat_upwards(self, node) -> None:
+        """并发版本不维护最高热度"""
+
+    def validate(self) -> list[str]:
+        """只做基类的结构检查，节点中的最高热度在并发版本中不维护"""
+        return BaseBPlusTree.validate(self)
+
+    # ------------------- 修改 -------------------
+
+    def insert(self, price: float, product_id: str, heat: float = 0.0) -> None:
+        with self._writing(self._entry_key(price, product_id), self._safe_for_insert):
+            super().insert(price, product_id, heat)
+
+    def delete(self, price: float, product_id: str) -> bool:
+        with self._writing(self._entry_key(price, product_id), self._safe_for_delete):
+            return super().delete(price, product_id)
+
+    def update_heat(self, price: float, product_id: str, heat: float) -> bool:
+        with self._writing(self._entry_key(price, product_id), self._safe_always):
+            return super().update_heat(price, product_id, heat)
+
+    def insert_many(self, items) -> None:
+        """批量修改会一次改动整个叶节点并连续分裂，这里逐个插入，每次只锁住需要的路径"""
+        for price, product_id, *heat in items:
+            self.insert(price, product_id, *heat)
+
+    def delete_many(self, items) -> int:
+        return sum(self.delete(price, product_id) for price, product_id in items)
+
+    def delete_range(self, min_price: float, max_price: float) -> list[str]:
+        """逐个删除区间内的条目；整棵摘下子树需要同时锁住两条边界路径，会长时间阻塞其他线程"""
+        if min_price > max_price:
+            return []
+        entries = list(self._scan(self._low_key(min_price), self._high_key(max_price)))
+        return [product_id for price, product_id in entries if self.delete(price, product_id)]
+
+    # ------------------- 查询 -------------------
+
+    def _leaf_items(self, leaf, start: int, end: int) -> list:
+        """按升序复制叶节点中第 start 到 end-1 个槽位上的 (price, product_id)，调用方持有该叶节点的读闩"""
+        if self.composite_keys:
+            return [(price, product_id) for price, product_id in leaf.keys[start:end]]
+        return [(price, product_id)
+                for price, product_ids in zip(leaf.keys[start:end], leaf.values[start:end])
+                for product_id in product_ids]
+
+    @staticmethod
+    def _skip_past(entries, after_price: float, after_id: str):
+        """
+        默认模式下恢复扫描：entries 以 after_price 下的商品开始，跳过其中 after_id 及之前的商品；
+        若 after_id 已不在这个价格下，则跳过整个价格
+        """
+        for price, group in itertools.groupby(entries, key=lambda entry: entry[0]):
+            if price == after_price:
+                group = list(group)
+                product_ids = [product_id for _, product_id in group]
+                group = group[product_ids.index(after_id) + 1:] if after_id in product_ids else []
+            yield from group
+
+    def _scan(self, low, high, inclusive: bool = True):
+        """
+        按键升序产出 [low, high]（inclusive 为 False 时为 [low, high)）内的 (price, product_id)
+        每个叶节点只在复制其中的条目时持有读闩，读完后用它的右边界重新从根下降找到下一个叶节点，
+        因此扫描期间其他线程的分裂与合并不会让它重复或遗漏扫描开始前就存在、且未被修改的条目
+        """
+        key = low
+        while True:
+            leaf, _, fence = self._descend_shared(key)
+            try:
+                start = bisect.bisect_left(leaf.keys, key)
+                if inclusive:
+                    end = bisect.bisect_right(leaf.keys, high)
+                else:
+                    end = bisect.bisect_left(leaf.keys, high)
+                items = self._leaf_items(leaf, start, end)
+                done = end < len(leaf.keys) or fence is None or fence > high or (not inclusive and fence == high)
+            finally:
+                leaf.latch.release_shared()
+            yield from items
+            if done:
+                return
+            key = fence
+
+    def _scan_desc(self, high, low):
+        """
+        按键降序产出 [low, high] 内的 (price, product_id)，是 _scan 的逆序版本
+        读完一个叶节点后用它的左边界下降到包含更小键的叶节点，同样从不横向加闩
+        """
+        key, before = high, False
+        while True:
+            leaf, fence, _ = self._descend_shared(key, before)
+            try:
+                if before:
+                    end = bisect.bisect_left(leaf.keys, key)
+                else:
+                    end = bisect.bisect_right(leaf.keys, high)
+                start = bisect.bisect_left(leaf.keys, low, 0, end)
+                items = self._leaf_items(leaf, start, end)
+                done = start > 0 or fence is None or fence <= low
+            finally:
+                leaf.latch.release_shared()
+            yield from reversed(items)
+            if done:
+                return
+            key, before = fence, True
+
+    def search_exact(self, price: float, product_id_to_find: str = None) -> list[str]:
+        if product_id_to_find:
+            with self._reading(self._entry_key(price, product_id_to_find)):
+                return super().search_exact(price, product_id_to_find)
+        if self.composite_keys:
+            return self.search_range(price, price)
+        with self._reading(price):
+            return super().search_exact(price)
+
+    def iter_range(self, min_price: float, max_price: float):
+        if min_price > max_price:
+            return
+        for _, product_id in self._scan(self._low_key(min_price), self._high_key(max_price)):
+            yield product_id
+
+    def search_range(self, min_price: float, max_price: float) -> list[str]:
+        return list(self.iter_range(min_price, max_price))
+
+    def iter_range_desc(self, max_price: float, min_price: float, resume_after: tuple = None):
+        """惰性地按价格降序产出 [min_price, max_price] 内的商品ID，参数与 BPlusTreeProducts.iter_range_desc 相同"""
+        if min_price > max_price:
+            return
+        low = self._low_key(min_price)
+        if resume_after is None or resume_after[0] > max_price:
+            entries = self._scan_desc(self._high_key(max_price), low)
+        elif self.composite_keys:
+            anchor = tuple(resume_after)
+            entries = itertools.dropwhile(lambda entry: entry == anchor, self._scan_desc(anchor, low))
+        else:
+            entries = self._skip_past(self._scan_desc(resume_after[0], low), *resume_after)
+        for _, product_id in entries:
+            yield product_id
+
+    def range_cursor(self, min_price: float, max_price: float, resume_after: tuple = None) -> "ConcurrentRangeCursor":
+        """打开一个 [min_price, max_price] 区间上的可恢复游标，参数与 BPlusTreeProducts.range_cursor 相同"""
+        if min_price > max_price:
+            return ConcurrentRangeCursor(None)
+        high = self._high_key(max_price)
+        if resume_after is None or resume_after[0] < min_price:
+            entries = self._scan(self._low_key(min_price), high)
+        elif self.composite_keys:
+            anchor = tuple(resume_after)
+            entries = itertools.dropwhile(lambda entry: entry == anchor, self._scan(anchor, high))
+        else:
+            entries = self._skip_past(self._scan(resume_after[0], high), *resume_after)
+        return ConcurrentRangeCursor(entries)
+
+    def count_range(self, min_price: float, max_price: float) -> int:
+        return sum(1 for _ in self.iter_range(min_price, max_price))
+
+    def rank(self, price: float) -> int:
+        return sum(1 for _ in self._scan(self._low_key(float('-inf')), self._low_key(price), inclusive=False))
+
+    def select(self, k: int) -> float:
+        if k < 0:
+            k += len(self)
+        if k < 0:
+            raise IndexError("排名超出范围")
+        entries = self._scan(self._low_key(float('-inf')), self._high_key(float('inf')))
+        for price, _ in itertools.islice(entries, k, k + 1):
+            return price
+        raise IndexError("排名超出范围")
+
+    def top_k_by_heat(self, min_price: float, max_price: float, k: int) -> list:
+        if k <= 0:
+            return []
+        heats = self._heats
+        return heapq.nlargest(k, self.iter_range(min_price, max_price),
+                              key=lambda product_id: heats.get(product_id, float('-inf')))
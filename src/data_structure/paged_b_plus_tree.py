@@ -0,0 +1,1090 @@
+import os
+import sys
+import math
+import mmap
+import zlib
+import heapq
+import struct
+import bisect
+from collections import OrderedDict
+from itertools import accumulate
+
+from src.model.product import Product
+from src.data_structure.b_plus_tree import (BaseBPlusTree, BPlusTreeLeafNode, BPlusTreeInternalNode,
+                                            BPlusTreeProducts)
+
+
+# ---------------- 页文件 ----------------
+# 文件由固定大小的页组成：第 0 页是文件头，其余每页存放一个节点，页号 0 同时充当空指针
+# 每个节点页以页头开始，CRC32 覆盖节点类型和负载，读取时校验，损坏或被篡改的页直接报错。负载按列存放：
+#   叶节点    前一个叶节点页号, 后一个叶节点页号, 条目数 n, 然后是各列（有哪些列由叶节点类决定）
+#   内部节点  键数 n, n+1 个子节点页号 (u32), n+1 个子树条目数 (u64), 然后是键的各列
+# 字符串列为 n 个字符数 (u32) + UTF-8 字节数 (u32) + 拼接后的 UTF-8，浮点数列为 n 个小端 double，
+# 一列只需要一次编码或解码调用
+# 空闲页（删除时被摘除的节点）的负载只有下一个空闲页的页号，文件头记录空闲页链表的表头，分配新页时优先复用
+# 单个条目序列化后不能超过页容量的三分之一（见 Pager.max_entry_bytes），这样节点放不下时总能分裂成两个放得下的节点
+_MAGIC = b'BPTPAGE\x00'
+_VERSION = 3
+_HEADER = struct.Struct('<8sHHIIIIQI')     # magic, 版本, 树的种类, 页大小, 阶, 根页号, 页数, 条目数, 空闲页链表表头
+_PAGE_HEADER = struct.Struct('<IIB')       # 负载字节数, CRC32, 节点类型
+_LEAF_HEADER = struct.Struct('<III')       # 前一个叶节点页号, 后一个叶节点页号, 条目数
+_INTERNAL_HEADER = struct.Struct('<I')     # 键数
+_CHILD_BYTES = 12                          # 每个子节点的页号和子树条目数
+_U32 = struct.Struct('<I')
+_FLOAT_BYTES = 8
+_NODE_LEAF, _NODE_INTERNAL, _NODE_FREE = 1, 2, 3
+MIN_PAGE_SIZE = 256
+
+KIND_ID = 1
+KIND_PRODUCTS = 2
+KIND_NAMES = 3
+
+
+def _pack_strings(parts: list, strings: list) -> None:
+    blob = ''.join(strings).encode('utf-8')
+    parts.append(struct.pack(f'<{len(strings)}I', *map(len, strings)))
+    parts.append(_U32.pack(len(blob)))
+    parts.append(blob)
+
+
+def _unpack_strings(data: bytes, offset: int, count: int) -> tuple[list, int]:
+    lengths = struct.unpack_from(f'<{count}I', data, offset)
+    offset += _U32.size * count
+    size = _U32.unpack_from(data, offset)[0]
+    offset += _U32.size
+    if offset + size > len(data):
+        raise ValueError("页中的字符串列越界")
+    text = str(data[offset:offset + size], 'utf-8')
+    ends = list(accumulate(lengths))
+    if (ends[-1] if ends else 0) != len(text):
+        raise ValueError("页中字符串列的长度与内容不符")
+    strings = [text[start:end] for start, end in zip([0] + ends, ends)]
+    return strings, offset + size
+
+
+def _strings_size(strings: list) -> int:
+    return _U32.size * (len(strings) + 1) + len(''.join(strings).encode('utf-8'))
+
+
+def _str_size(text: str) -> int:
+    """单个字符串在字符串列中占用的字节数（不含每列一次的总长度）"""
+    return _U32.size + len(text.encode('utf-8'))
+
+
+def _pack_floats(parts: list, values: list) -> None:
+    parts.append(struct.pack(f'<{len(values)}d', *values))
+
+
+def _unpack_floats(data: bytes, offset: int, count: int) -> tuple[list, int]:
+    return list(struct.unpack_from(f'<{count}d', data, offset)), offset + _FLOAT_BYTES * count
+
+
+class PagedLeafNode:
+    """
+    页文件中的叶节点，next_leaf / prev_leaf 按需从页缓存中读取相邻叶节点，
+    因此内存版的区间游标等只沿叶节点链表读取的代码可以直接作用于它
+    这个基类的键和值都是字符串，子类按条目的类型重写 entry_size / _columns / _restore_columns
+    """
+    __slots__ = ('pager', 'page_no', 'keys', 'values', 'prev_page', 'next_page')
+    is_leaf: bool = True
+    string_columns: int = 2
+    float_columns: int = 0
+
+    def __init__(self, pager: "Pager", page_no: int):
+        self.pager: Pager = pager
+        self.page_no: int = page_no
+        self.keys: list = []
+        self.values: list = []
+        self.prev_page: int = 0
+        self.next_page: int = 0
+
+    find_key = BPlusTreeLeafNode.find_key
+
+    @property
+    def next_leaf(self) -> "PagedLeafNode | None":
+        return self.pager.get(self.next_page) if self.next_page else None
+
+    @property
+    def prev_leaf(self) -> "PagedLeafNode | None":
+        return self.pager.get(self.prev_page) if self.prev_page else None
+
+    @staticmethod
+    def entry_size(key, value) -> int:
+        """一个条目序列化后的字节数"""
+        return _str_size(key) + _str_size(value)
+
+    def _columns(self) -> tuple[list, list]:
+        """返回 (字符串列, 浮点数列)"""
+        return [self.keys, self.values], []
+
+    def _restore_columns(self, strings: list, floats: list) -> None:
+        self.keys, self.values = strings
+
+    def encoded_size(self) -> int:
+        """节点序列化后的字节数（不含页头）"""
+        strings, floats = self._columns()
+        return (_LEAF_HEADER.size + sum(map(_strings_size, strings))
+                + _FLOAT_BYTES * len(self.keys) * len(floats))
+
+    def to_bytes(self) -> bytes:
+        parts = [_LEAF_HEADER.pack(self.prev_page, self.next_page, len(self.keys))]
+        strings, floats = self._columns()
+        for column in strings:
+            _pack_strings(parts, column)
+        for column in floats:
+            _pack_floats(parts, column)
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, pager: "Pager", page_no: int, data: bytes) -> "PagedLeafNode":
+        node = cls(pager, page_no)
+        node.prev_page, node.next_page, count = _LEAF_HEADER.unpack_from(data, 0)
+        offset = _LEAF_HEADER.size
+        strings, floats = [], []
+        for _ in range(cls.string_columns):
+            column, offset = _unpack_strings(data, offset, count)
+            strings.append(column)
+        for _ in range(cls.float_columns):
+            column, offset = _unpack_floats(data, offset, count)
+            floats.append(column)
+        if offset != len(data):
+            raise ValueError(f"第 {page_no} 页的长度与内容不符")
+        node._restore_columns(strings, floats)
+        return node
+
+    def move_tail(self, new_leaf: "PagedLeafNode", split_point: int) -> None:
+        """分裂时把第 split_point 个条目之后的部分移动到新的右兄弟中"""
+        new_leaf.keys = self.keys[split_point:]
+        new_leaf.values = self.values[split_point:]
+        self.keys = self.keys[:split_point]
+        self.values = self.values[:split_point]
+
+
+class PagedProductLeafNode(PagedLeafNode):
+    """ID 索引的叶节点，值是 Product 对象，写入页时保存 ID、名称、价格和热度四列"""
+    __slots__ = ()
+    string_columns: int = 2
+    float_columns: int = 2
+
+    @staticmethod
+    def entry_size(key, value) -> int:
+        return _str_size(key) + _str_size(value.name) + 2 * _FLOAT_BYTES
+
+    def _columns(self) -> tuple[list, list]:
+        values = self.values
+        return ([self.keys, [p.name for p in values]],
+                [[p.price for p in values], [p.heat for p in values]])
+
+    def _restore_columns(self, strings: list, floats: list) -> None:
+        self.keys, names = strings
+        self.values = list(map(Product._restore, self.keys, names, *floats))
+
+
+class PagedHeatLeafNode(PagedLeafNode):
+    """价格索引的叶节点，键是 (price, product_id)，值是 product_id，heats 与之一一对应；写入页时保存 ID、价格和热度三列"""
+    __slots__ = ('heats',)
+    string_columns: int = 1
+    float_columns: int = 2
+
+    def __init__(self, pager: "Pager", page_no: int):
+        super().__init__(pager, page_no)
+        self.heats: list = []
+
+    @staticmethod
+    def entry_size(key, value) -> int:
+        return _str_size(key[1]) + 2 * _FLOAT_BYTES
+
+    def _columns(self) -> tuple[list, list]:
+        return [self.values], [[key[0] for key in self.keys], self.heats]
+
+    def _restore_columns(self, strings: list, floats: list) -> None:
+        (self.values,) = strings
+        prices, self.heats = floats
+        self.keys = list(zip(prices, self.values))
+
+    def move_tail(self, new_leaf: "PagedHeatLeafNode", split_point: int) -> None:
+        super().move_tail(new_leaf, split_point)
+        new_leaf.heats = self.heats[split_point:]
+        self.heats = self.heats[:split_point]
+
+
+class PagedInternalNode:
+    """页文件中的内部节点，children 保存子节点的页号，sizes 保存每棵子树的条目数；这个基类的键是字符串"""
+    __slots__ = ('pager', 'page_no', 'keys', 'children', 'sizes')
+    is_leaf: bool = False
+    string_columns: int = 1
+
+    def __init__(self, pager: "Pager", page_no: int):
+        self.pager: Pager = pager
+        self.page_no: int = page_no
+        self.keys: list = []
+        self.children: list[int] = []
+        self.sizes: list[int] = []
+
+    child_index_for = BPlusTreeInternalNode.child_index_for
+
+    key_size = staticmethod(_str_size)
+
+    def _keys_size(self) -> int:
+        return _strings_size(self.keys)
+
+    def _pack_keys(self, parts: list) -> None:
+        _pack_strings(parts, self.keys)
+
+    def _unpack_keys(self, data: bytes, offset: int, count: int) -> int:
+        self.keys, offset = _unpack_strings(data, offset, count)
+        return offset
+
+    def encoded_size(self) -> int:
+        """节点序列化后的字节数（不含页头）"""
+        return _INTERNAL_HEADER.size + _CHILD_BYTES * len(self.children) + self._keys_size()
+
+    def to_bytes(self) -> bytes:
+        count = len(self.keys)
+        parts = [_INTERNAL_HEADER.pack(count),
+                 struct.pack(f'<{count + 1}I', *self.children),
+                 struct.pack(f'<{count + 1}Q', *self.sizes)]
+        self._pack_keys(parts)
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, pager: "Pager", page_no: int, data: bytes) -> "PagedInternalNode":
+        node = cls(pager, page_no)
+        count = _INTERNAL_HEADER.unpack_from(data, 0)[0]
+        offset = _INTERNAL_HEADER.size
+        node.children = list(struct.unpack_from(f'<{count + 1}I', data, offset))
+        offset += _U32.size * (count + 1)
+        node.sizes = list(struct.unpack_from(f'<{count + 1}Q', data, offset))
+        offset += 8 * (count + 1)
+        offset = node._unpack_keys(data, offset, count)
+        if offset != len(data) or not all(0 < child < pager.page_count for child in node.children):
+            raise ValueError(f"第 {page_no} 页的长度或子节点页号不合法")
+        return node
+
+
+class PagedCompositeInternalNode(PagedInternalNode):
+    """价格索引的内部节点，键是 (price, product_id)，写入页时分为价格列和ID列"""
+    __slots__ = ()
+
+    @staticmethod
+    def key_size(key) -> int:
+        return _FLOAT_BYTES + _str_size(key[1])
+
+    def _keys_size(self) -> int:
+        return _FLOAT_BYTES * len(self.keys) + _strings_size([key[1] for key in self.keys])
+
+    def _pack_keys(self, parts: list) -> None:
+        _pack_floats(parts, [key[0] for key in self.keys])
+        _pack_strings(parts, [key[1] for key in self.keys])
+
+    def _unpack_keys(self, data: bytes, offset: int, count: int) -> int:
+        prices, offset = _unpack_floats(data, offset, count)
+        product_ids, offset = _unpack_strings(data, offset, count)
+        self.keys = list(zip(prices, product_ids))
+        return offset
+
+
+class PagedNameLeafNode(PagedHeatLeafNode):
+    """名称索引的叶节点，键是 (name, product_id)，值是 product_id，heats 与之一一对应；写入页时保存名称、ID和热度三列"""
+    __slots__ = ()
+    string_columns: int = 2
+    float_columns: int = 1
+
+    @staticmethod
+    def entry_size(key, value) -> int:
+        return _str_size(key[0]) + _str_size(key[1]) + _FLOAT_BYTES
+
+    def _columns(self) -> tuple[list, list]:
+        return [[key[0] for key in self.keys], self.values], [self.heats]
+
+    def _restore_columns(self, strings: list, floats: list) -> None:
+        names, self.values = strings
+        (self.heats,) = floats
+        self.keys = list(zip(names, self.values))
+
+
+class PagedNameInternalNode(PagedInternalNode):
+    """名称索引的内部节点，键是 (name, product_id)，写入页时分为名称列和ID列"""
+    __slots__ = ()
+    string_columns: int = 2
+
+    @staticmethod
+    def key_size(key) -> int:
+        return _str_size(key[0]) + _str_size(key[1])
+
+    def _keys_size(self) -> int:
+        return _strings_size([key[0] for key in self.keys]) + _strings_size([key[1] for key in self.keys])
+
+    def _pack_keys(self, parts: list) -> None:
+        _pack_strings(parts, [key[0] for key in self.keys])
+        _pack_strings(parts, [key[1] for key in self.keys])
+
+    def _unpack_keys(self, data: bytes, offset: int, count: int) -> int:
+        names, offset = _unpack_strings(data, offset, count)
+        product_ids, offset = _unpack_strings(data, offset, count)
+        self.keys = list(zip(names, product_ids))
+        return offset
+
+
+class Pager:
+    """
+    管理一个页文件：通过 mmap 读取页，解码后的节点放在容量固定的 LRU 缓存中，
+    被修改的节点标记为脏页，在被淘汰或 flush 时写回
+    打开已有文件只需要读取文件头，常驻内存的节点数不超过缓存容量
+    """
+
+    def __init__(self, path: str, kind: int, order: int, page_size: int, cache_pages: int,
+                 leaf_node_class: type, internal_node_class: type):
+        if not isinstance(cache_pages, int) or cache_pages < 1:
+            raise ValueError("页缓存的容量必须是正整数")
+        self.leaf_node_class: type = leaf_node_class
+        self.internal_node_class: type = internal_node_class
+        self.cache_pages: int = cache_pages
+        self._cache: OrderedDict = OrderedDict()   # 页号 - 节点，按最近使用的顺序排列
+        self._dirty: set = set()
+        self._pinned: set = set()                   # 正在修改、暂时不能淘汰的页（修改中途的节点可能还放不进一页）
+        self.hits: int = 0
+        self.misses: int = 0
+
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        self._file = open(path, 'r+b' if exists else 'w+b')
+        if exists:
+            self._map = mmap.mmap(self._file.fileno(), 0)
+            if len(self._map) < _HEADER.size:
+                self.close()
+                raise ValueError("不是可识别的B+树页文件")
+            (magic, version, self.kind, self.page_size, self.order,
+             self.root_page, self.page_count, self.entry_count, self.free_head) = _HEADER.unpack_from(self._map, 0)
+            if magic != _MAGIC or version != _VERSION:
+                self.close()
+                raise ValueError("不是可识别的B+树页文件")
+            if self.kind != kind:
+                self.close()
+                raise ValueError("页文件中保存的不是这种B+树")
+            if (self.page_size < MIN_PAGE_SIZE or not 0 < self.root_page < self.page_count
+                    or not 0 <= self.free_head < self.page_count
+                    or len(self._map) < self.page_count * self.page_size):
+                self.close()
+                raise ValueError("页文件的文件头已损坏")
+        else:
+            if not isinstance(page_size, int) or page_size < MIN_PAGE_SIZE:
+                self._file.close()
+                raise ValueError(f"页大小至少为 {MIN_PAGE_SIZE} 字节")
+            self.kind, self.page_size, self.order = kind, page_size, order
+            self.root_page, self.page_count, self.entry_count, self.free_head = 0, 1, 0, 0
+            self._file.truncate(page_size * 2)
+            self._map = mmap.mmap(self._file.fileno(), 0)
+            self.root_page = self.allocate(leaf_node_class).page_no
+            self.flush()
+
+    @property
+    def capacity(self) -> int:
+        """一页中节点负载最多的字节数"""
+        return self.page_size - _PAGE_HEADER.size
+
+    @property
+    def max_entry_bytes(self) -> int:
+        """单个条目序列化后的上限：不超过页容量的三分之一，放不下的节点分裂成两半后每一半都放得下"""
+        return (self.capacity - 2 * _CHILD_BYTES - _LEAF_HEADER.size - 4 * _U32.size) // 3
+
+    def get(self, page_no: int):
+        """返回页号对应的节点，不在缓存中时从 mmap 读取、校验并解码"""
+        node = self._cache.get(page_no)
+        if node is not None:
+            self._cache.move_to_end(page_no)
+            self.hits += 1
+            return node
+
+        self.misses += 1
+        node_type, payload = self._read_page(page_no)
+        if node_type == _NODE_LEAF:
+            node_class = self.leaf_node_class
+        elif node_type == _NODE_INTERNAL:
+            node_class = self.internal_node_class
+        else:
+            raise ValueError(f"第 {page_no} 页的节点类型 {node_type} 未知")
+        try:
+            node = node_class.from_bytes(self, page_no, payload)
+        except (struct.error, UnicodeDecodeError) as e:
+            raise ValueError(f"第 {page_no} 页已损坏") from e
+        self._put(node)
+        return node
+
+    def _read_page(self, page_no: int) -> tuple[int, bytes]:
+        """读取并校验一页，返回 (节点类型, 负载)"""
+        if not 0 < page_no < self.page_count:
+            raise ValueError(f"页号 {page_no} 超出页文件的范围")
+        offset = page_no * self.page_size
+        length, crc, node_type = _PAGE_HEADER.unpack_from(self._map, offset)
+        start = offset + _PAGE_HEADER.size
+        payload = self._map[start:start + length] if length <= self.capacity else b''
+        if length > self.capacity or zlib.crc32(payload, node_type) != crc:
+            raise ValueError(f"第 {page_no} 页已损坏（长度或校验和不符）")
+        return node_type, payload
+
+    def _write_page(self, page_no: int, node_type: int, payload: bytes) -> None:
+        offset = page_no * self.page_size
+        self._map[offset:offset + _PAGE_HEADER.size + len(payload)] = (
+            _PAGE_HEADER.pack(len(payload), zlib.crc32(payload, node_type), node_type) + payload)
+
+    def allocate(self, node_class: type):
+        """分配一个新页，返回其中的空节点；优先复用空闲页链表中的页，没有空闲页时在文件末尾追加"""
+        if self.free_head:
+            page_no = self.free_head
+            node_type, payload = self._read_page(page_no)
+            if node_type != _NODE_FREE or len(payload) != _U32.size:
+                raise ValueError(f"空闲页链表中的第 {page_no} 页不是空闲页")
+            self.free_head = _U32.unpack(payload)[0]
+            if not 0 <= self.free_head < self.page_count:
+                raise ValueError(f"第 {page_no} 页中的下一个空闲页号不合法")
+        else:
+            page_no = self.page_count
+            self.page_count += 1
+            needed = self.page_count * self.page_size
+            if needed > len(self._map):                 # 文件按倍数增长，减少重新映射的次数
+                new_size = max(needed, 2 * len(self._map))
+                self._map.close()
+                self._file.truncate(new_size)
+                self._map = mmap.mmap(self._file.fileno(), 0)
+        node = node_class(self, page_no)
+        self.mark_dirty(node)
+        return node
+
+    def free(self, node) -> None:
+        """回收节点所在的页：把它从缓存中移除，改写为空闲页并放到空闲页链表的头部，之后不能再使用这个节点"""
+        page_no = node.page_no
+        self._cache.pop(page_no, None)
+        self._dirty.discard(page_no)
+        self._pinned.discard(page_no)
+        self._write_page(page_no, _NODE_FREE, _U32.pack(self.free_head))
+        self.free_head = page_no
+
+    def free_pages(self) -> int:
+        """空闲页链表的长度（调试和测试用，沿链表逐页读取）"""
+        count = 0
+        page_no = self.free_head
+        while page_no and count < self.page_count:
+            page_no = _U32.unpack(self._read_page(page_no)[1])[0]
+            count += 1
+        return count
+
+    def mark_dirty(self, node) -> None:
+        """
+        标记节点已被修改。节点在修改期间可能已经被淘汰出缓存，
+        因此这里总是把它重新放回缓存，保证写回的是最新的对象
+        """
+        self._dirty.add(node.page_no)
+        if self._cache.get(node.page_no) is not node:
+            self._put(node)
+        else:
+            self._cache.move_to_end(node.page_no)
+
+    def pin(self, node) -> None:
+        """修改节点期间把它钉在缓存中，缓存可以暂时超过容量"""
+        self._pinned.add(node.page_no)
+
+    def unpin(self, node) -> None:
+        self._pinned.discard(node.page_no)
+        self._evict()
+
+    def _put(self, node) -> None:
+        self._cache[node.page_no] = node
+        self._cache.move_to_end(node.page_no)
+        self._evict()
+
+    def _evict(self) -> None:
+        """
+        从最久未使用的一端淘汰没有被钉住的页，脏页先写回；
+        最近使用的一页（例如刚分配、还没有填入内容的节点）总是保留
+        """
+        while len(self._cache) > self.cache_pages:
+            newest = next(reversed(self._cache))
+            page_no = next((page_no for page_no in self._cache
+                            if page_no not in self._pinned and page_no != newest), None)
+            if page_no is None:
+                return
+            evicted = self._cache.pop(page_no)
+            if page_no in self._dirty:
+                self._write(evicted)
+
+    def _write(self, node) -> None:
+        """
+        把节点写回它的页。树在修改节点时就保证了它放得下（见 PagedBPlusTree._overflows），
+        这里的检查只是最后一道防线
+        """
+        payload = node.to_bytes()
+        if len(payload) > self.capacity:
+            raise ValueError("节点序列化后超出页大小")
+        self._write_page(node.page_no, _NODE_LEAF if node.is_leaf else _NODE_INTERNAL, payload)
+        self._dirty.discard(node.page_no)
+
+    def flush(self) -> None:
+        """把所有脏页和文件头写回文件"""
+        for page_no in sorted(self._dirty):
+            self._write(self._cache[page_no])
+        _HEADER.pack_into(self._map, 0, _MAGIC, _VERSION, self.kind, self.page_size, self.order,
+                          self.root_page, self.page_count, self.entry_count, self.free_head)
+        self._map.flush()
+
+    def close(self) -> None:
+        if not self._map.closed:
+            self._map.close()
+        self._file.close()
+
+
+# ---------------- 主类 ----------------
+class PagedBPlusTree(BaseBPlusTree):
+    """
+    以页文件为存储后端的B+树基类
+    节点之间用页号相连，不保存父指针，插入时记录从根到叶的路径来完成分裂和子树条目数的维护。
+    删除不做借用与合并，这是磁盘B+树常见的做法，可以避免删除时改写多个页；但叶节点变空时会被摘除，
+    只剩空子树的内部节点随之摘除，只剩一个子节点的根由该子节点取代，被摘除节点的页进入空闲页链表供之后的分裂复用，
+    因此按递增的键（例如带时间戳的ID）反复插入和删除时，页文件和树高都不会无限增长
+    节点在被修改时就检查序列化后的大小：键数没有超过阶、但已经放不进一页的节点同样分裂，
+    过大的单个条目在修改树之前就被拒绝，因此脏页写回时总是放得下
+    """
+    page_file_kind: int = 0
+    leaf_node_class: type = PagedLeafNode
+    internal_node_class: type = PagedInternalNode
+
+    def __init__(self, path: str, order: int = 32, page_size: int = 8192, cache_pages: int = 256):
+        """
+        打开或创建一个页文件B+树
+
+        参数:
+            path (str): 页文件路径，文件已存在时使用其中保存的阶和页大小
+            order (int): 新建时B+树的阶，阶乘以单个条目的大小不能超过页大小
+            page_size (int): 新建时每页的字节数
+            cache_pages (int): 页缓存最多保留的节点数
+        """
+        super().__init__(order)
+        self._pager: Pager = Pager(path, self.page_file_kind, order, page_size, cache_pages,
+                                   self.leaf_node_class, self.internal_node_class)
+        self.order = self._pager.order
+
+    @property
+    def root(self):
+        return self._pager.get(self._pager.root_page)
+
+    def __len__(self) -> int:
+        return self._pager.entry_count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def flush(self) -> None:
+        """把修改过的页写回文件"""
+        self._pager.flush()
+
+    def close(self) -> None:
+        """写回修改并关闭页文件"""
+        self._pager.flush()
+        self._pager.close()
+
+    def cache_info(self) -> dict:
+        """页缓存的命中、未命中次数以及当前驻留的页数"""
+        return {'hits': self._pager.hits, 'misses': self._pager.misses,
+                'resident_pages': len(self._pager._cache), 'page_count': self._pager.page_count}
+
+    def _find_leaf_path(self, key) -> tuple[list, PagedLeafNode]:
+        """从根下降到键所在的叶节点，返回沿途的 (内部节点, 子节点下标) 列表和叶节点"""
+        path = []
+        node = self.root
+        while not node.is_leaf:
+            idx = node.child_index_for(key)
+            path.append((node, idx))
+            node = self._pager.get(node.children[idx])
+        self.counters.descents += 1
+        self.counters.node_visits += len(path) + 1
+        return path, node
+
+    def _find_leaf_node(self, key) -> PagedLeafNode:
+        return self._find_leaf_path(key)[1]
+
+    def _children_of(self, node: PagedInternalNode) -> list:
+        return [self._pager.get(page_no) for page_no in node.children]
+
+    def _min_fill(self, node) -> int:
+        """删除不做借用与合并，节点没有键数下限"""
+        return 0
+
+    def _recorded_child_sizes(self, node: PagedInternalNode) -> list:
+        return list(node.sizes)
+
+    def _first_leaf(self) -> PagedLeafNode:
+        node = self.root
+        while not node.is_leaf:
+            node = self._pager.get(node.children[0])
+        return node
+
+    def _add_to_path_size(self, path: list, delta: int) -> None:
+        """沿插入或删除路径更新每个祖先中对应子树的条目数"""
+        for node, idx in path:
+            node.sizes[idx] += delta
+            self._pager.mark_dirty(node)
+        self._pager.entry_count += delta
+
+    def _check_entry(self, key, value) -> None:
+        """在修改树之前拒绝序列化后过大的条目，保证条目要么完整写入、要么完全没有写入"""
+        if self.leaf_node_class.entry_size(key, value) > self._pager.max_entry_bytes:
+            raise ValueError(f"条目序列化后超过 {self._pager.max_entry_bytes} 字节（页容量的三分之一），"
+                             f"请增大 page_size")
+
+    def _overflows(self, node) -> bool:
+        """节点的键数超过阶，或者序列化后放不进一页"""
+        return len(node.keys) > self.order or node.encoded_size() > self._pager.capacity
+
+    def _split_point(self, sizes: list, overhead: int, default: int, lo: int, hi: int, gap: int) -> int:
+        """
+        在 [lo, hi] 中选择分裂位置 m：左边是前 m 个条目，右边是第 m + gap 个之后的条目（内部节点分裂时中间的键上推，gap 为 1）
+        两边加上 overhead 都要放得进一页；满足条件时优先使用按键数对半的 default，否则选最接近它的位置。
+        单个条目不超过页容量的三分之一，因此这样的位置总是存在
+        """
+        capacity = self._pager.capacity
+        prefix = [0]
+        for size in sizes:
+            prefix.append(prefix[-1] + size)
+        fits = lambda m: (overhead(m) + prefix[m] <= capacity
+                          and overhead(len(sizes) - m - gap) + prefix[-1] - prefix[m + gap] <= capacity)
+        return min((m for m in range(lo, hi + 1) if fits(m)), key=lambda m: abs(m - default))
+
+    def _after_insert(self, path: list, leaf: PagedLeafNode) -> None:
+        """叶节点中刚插入了一个条目，更新条目数，必要时分裂；分裂完成之前叶节点不会被淘汰写回"""
+        self._pager.pin(leaf)
+        try:
+            self._pager.mark_dirty(leaf)
+            self._add_to_path_size(path, 1)
+            if self._overflows(leaf):
+                self._split_leaf(path, leaf)
+        finally:
+            self._pager.unpin(leaf)
+
+    def _split_leaf(self, path: list, leaf: PagedLeafNode) -> None:
+        """辅助函数：分裂一个键数过多或放不进一页的叶节点"""
+        self.counters.leaf_splits += 1
+        pager = self._pager
+        count = len(leaf.keys)
+        split_point = self._split_point(list(map(leaf.entry_size, leaf.keys, leaf.values)),
+                                        lambda n: _LEAF_HEADER.size + _U32.size * leaf.string_columns, min(math.ceil((self.order + 1) / 2), count - 1),
+                                        1, count - 1, 0)
+        new_leaf = pager.allocate(self.leaf_node_class)
+        leaf.move_tail(new_leaf, split_point)
+
+        new_leaf.prev_page = leaf.page_no
+        new_leaf.next_page = leaf.next_page
+        if leaf.next_page:
+            next_leaf = pager.get(leaf.next_page)
+            next_leaf.prev_page = new_leaf.page_no
+            pager.mark_dirty(next_leaf)
+        leaf.next_page = new_leaf.page_no
+        pager.mark_dirty(leaf)
+        pager.mark_dirty(new_leaf)
+
+        self._insert_into_parent(path, leaf, new_leaf.keys[0], new_leaf, len(leaf.keys), len(new_leaf.keys))
+
+    def _insert_into_parent(self, path: list, left, key, right, left_size: int, right_size: int) -> None:
+        """辅助函数：把分裂产生的分隔键和右节点插入父节点，父节点上溢时继续向上分裂"""
+        pager = self._pager
+        if not path:                                        # 分裂的是根节点，树长高一层
+            new_root = pager.allocate(self.internal_node_class)
+            new_root.keys = [key]
+            new_root.children = [left.page_no, right.page_no]
+            new_root.sizes = [left_size, right_size]
+            pager.root_page = new_root.page_no
+            return
+
+        parent, idx = path.pop()
+        parent.keys.insert(idx, key)
+        parent.children.insert(idx + 1, right.page_no)
+        parent.sizes[idx] = left_size
+        parent.sizes.insert(idx + 1, right_size)
+        pager.mark_dirty(parent)
+        if not self._overflows(parent):
+            return
+        pager.pin(parent)
+        try:
+            self._split_internal_node(path, parent)
+        finally:
+            pager.unpin(parent)
+
+    def _split_internal_node(self, path: list, parent: PagedInternalNode) -> None:
+        """辅助函数：分裂一个键数过多或放不进一页的内部节点"""
+        pager = self._pager
+
+        # 内部节点分裂：左侧通常保留 order // 2 个键，中间的键上推；键很长时按字节数选择分裂位置
+        self.counters.internal_splits += 1
+        count = len(parent.keys)
+        mid = self._split_point(list(map(parent.key_size, parent.keys)),
+                                lambda n: _INTERNAL_HEADER.size + _CHILD_BYTES * (n + 1) + _U32.size * parent.string_columns,
+                                min(self.order // 2, count - 2), 1, count - 2, 1)
+        new_node = pager.allocate(self.internal_node_class)
+        key_to_push_up = parent.keys[mid]
+        new_node.keys = parent.keys[mid + 1:]
+        new_node.children = parent.children[mid + 1:]
+        new_node.sizes = parent.sizes[mid + 1:]
+        parent.keys = parent.keys[:mid]
+        parent.children = parent.children[:mid + 1]
+        parent.sizes = parent.sizes[:mid + 1]
+        pager.mark_dirty(parent)
+        self._insert_into_parent(path, parent, key_to_push_up, new_node, sum(parent.sizes), sum(new_node.sizes))
+
+    def _remove_at(self, path: list, leaf: PagedLeafNode, idx: int) -> None:
+        """从叶节点中移除第 idx 个条目并更新条目数，叶节点因此变空且不是根时把它从树中摘除"""
+        leaf.keys.pop(idx)
+        leaf.values.pop(idx)
+        self._pager.mark_dirty(leaf)
+        self._add_to_path_size(path, -1)
+        if not leaf.keys and path:
+            self._unlink_leaf(leaf)
+            self._remove_child(path, leaf)
+
+    def _unlink_leaf(self, leaf: PagedLeafNode) -> None:
+        """辅助函数：把叶节点从叶节点双向链表中摘下"""
+        pager = self._pager
+        if leaf.prev_page:
+            prev_leaf = pager.get(leaf.prev_page)
+            prev_leaf.next_page = leaf.next_page
+            pager.mark_dirty(prev_leaf)
+        if leaf.next_page:
+            next_leaf = pager.get(leaf.next_page)
+            next_leaf.prev_page = leaf.prev_page
+            pager.mark_dirty(next_leaf)
+
+    def _remove_child(self, path: list, node) -> None:
+        """
+        辅助函数：从父节点中摘除一个空的子节点并回收它的页，同时去掉一个相邻的分隔键（被摘除的区间并入相邻的子树）
+        父节点因此没有子节点时继续向上摘除；最后根内部节点只剩一个子节点时由该子节点取代，树降低一层
+        """
+        pager = self._pager
+        while path:
+            parent, idx = path.pop()
+            parent.children.pop(idx)
+            parent.sizes.pop(idx)
+            if parent.keys:
+                parent.keys.pop(idx - 1 if idx else 0)
+            pager.free(node)
+            if parent.children:
+                pager.mark_dirty(parent)
+                break
+            node = parent
+        else:                                           # 根的子树全部为空（只有根只剩一个子节点时才会发生）
+            pager.free(node)
+            pager.root_page = pager.allocate(self.leaf_node_class).page_no
+            return
+
+        root = self.root
+        while not root.is_leaf and len(root.children) == 1:
+            pager.root_page = root.children[0]
+            pager.free(root)
+            root = self.root
+
+
+class PagedBPlusTreeID(PagedBPlusTree):
+    """
+    以页文件为存储后端的ID索引，接口与 BPlusTreeID 相同
+    """
+    page_file_kind: int = KIND_ID
+    leaf_node_class: type = PagedProductLeafNode
+
+    def search(self, productid: str) -> Product:
+        """
+        精确查找具有指定ID的商品，若没找到，返回None
+        返回的是页缓存中商品的副本，修改商品后需要调用 update 写回
+        """
+        leaf_node = self._find_leaf_node(productid)
+        key_index = leaf_node.find_key(productid)
+        if key_index == -1:
+            return None
+        product = leaf_node.values[key_index]
+        return Product._restore(product.product_id, product.name, product.price, product.heat)
+
+    def insert(self, product: Product) -> None:
+        """向B+树中插入一个商品（保存它的副本），条目过大时抛出 ValueError 且不做任何修改"""
+        if not isinstance(product, Product):
+            raise TypeError("插入的对象必须是 Product 类型")
+        self._check_entry(product.product_id, product)
+        path, leaf = self._find_leaf_path(product.product_id)
+        idx = bisect.bisect_left(leaf.keys, product.product_id)
+        leaf.keys.insert(idx, product.product_id)
+        leaf.values.insert(idx, Product._restore(product.product_id, product.name, product.price, product.heat))
+        self._after_insert(path, leaf)
+
+    def update(self, product: Product) -> bool:
+        """
+        用修改后的商品替换树中保存的同ID商品，并把所在的页标记为脏页
+        新名称使条目过大时抛出 ValueError 且不做任何修改；叶节点因此放不进一页时分裂
+        """
+        self._check_entry(product.product_id, product)
+        path, leaf_node = self._find_leaf_path(product.product_id)
+        key_index = leaf_node.find_key(product.product_id)
+        if key_index == -1:
+            return False
+        leaf_node.values[key_index] = Product._restore(product.product_id, product.name, product.price, product.heat)
+        self._pager.pin(leaf_node)
+        try:
+            self._pager.mark_dirty(leaf_node)
+            if self._overflows(leaf_node):
+                self._split_leaf(path, leaf_node)
+        finally:
+            self._pager.unpin(leaf_node)
+        return True
+
+    def delete(self, product_id: str) -> bool:
+        """从B+树中删除一个具有指定product_id的商品"""
+        path, leaf = self._find_leaf_path(product_id)
+        key_index = leaf.find_key(product_id)
+        if key_index == -1:
+            return False
+        self._remove_at(path, leaf, key_index)
+        return True
+
+    def delete_many(self, product_ids) -> int:
+        """批量删除商品，页文件中的删除不做借用与合并，逐个删除即可，返回实际删除的数量"""
+        return sum(self.delete(product_id) for product_id in set(product_ids))
+
+
+class PagedBPlusTreeProducts(PagedBPlusTree):
+    """
+    以页文件为存储后端的价格索引，接口与 BPlusTreeProducts 相同，总是使用 (price, product_id) 复合键
+    区间查询只依赖 _find_leaf_node 和叶节点的 keys / values / next_leaf / prev_leaf，直接复用内存版复合键模式的实现；
+    页中不保存子树最高热度，top_k_by_heat 需要扫描整个价格区间
+    """
+    page_file_kind: int = KIND_PRODUCTS
+    leaf_node_class: type = PagedHeatLeafNode
+    internal_node_class: type = PagedCompositeInternalNode
+    composite_keys: bool = True
+
+    _low_key = BPlusTreeProducts._low_key
+    _high_key = BPlusTreeProducts._high_key
+    _slot_ids = BPlusTreeProducts._slot_ids
+    _locate = BPlusTreeProducts._locate
+    search_exact = BPlusTreeProducts.search_exact
+    search_range = BPlusTreeProducts.search_range
+    iter_range = BPlusTreeProducts.iter_range
+    iter_range_desc = BPlusTreeProducts.iter_range_desc
+    range_cursor = BPlusTreeProducts.range_cursor
+    rank = BPlusTreeProducts.rank
+    count_range = BPlusTreeProducts.count_range
+
+    def insert(self, price: float, product_id: str, heat: float = 0.0) -> None:
+        """向B+树中插入一个商品ID，重复插入同一个 (price, product_id) 不会产生重复条目；条目过大时抛出 ValueError 且不做任何修改"""
+        key = (price, product_id)
+        self._check_entry(key, product_id)
+        path, leaf = self._find_leaf_path(key)
+        idx = bisect.bisect_left(leaf.keys, key)
+        if idx < len(leaf.keys) and leaf.keys[idx] == key:
+            return
+        leaf.keys.insert(idx, key)
+        leaf.values.insert(idx, product_id)
+        leaf.heats.insert(idx, heat)
+        self._after_insert(path, leaf)
+
+    def delete(self, price: float, product_id: str) -> bool:
+        """从B+树中删除一个具有指定价格和product_id的商品"""
+        path, leaf = self._find_leaf_path((price, product_id))
+        key_index = leaf.find_key((price, product_id))
+        if key_index == -1:
+            return False
+        leaf.heats.pop(key_index)
+        self._remove_at(path, leaf, key_index)
+        return True
+
+    def delete_range(self, min_price: float, max_price: float) -> list[str]:
+        """删除价格区间内的所有商品，页文件中的删除不做借用与合并，先取出区间内的条目再逐个删除，返回被删除的商品ID"""
+        if min_price > max_price:
+            return []
+        entries = list(self.range_cursor(min_price, max_price))
+        for price, product_id in entries:
+            self.delete(price, product_id)
+        return [product_id for _, product_id in entries]
+
+    def update_heat(self, price: float, product_id: str, heat: float) -> bool:
+        """更新一个商品在树中记录的热度"""
+        leaf, key_index = self._locate(price, product_id)
+        if key_index == -1:
+            return False
+        leaf.heats[key_index] = heat
+        self._pager.mark_dirty(leaf)
+        return True
+
+    def _iter_entries(self):
+        """按价格升序依次产出 (price, product_id, heat)"""
+        leaf = self._first_leaf()
+        while leaf is not None:
+            for (price, product_id), heat in zip(leaf.keys, leaf.heats):
+                yield price, product_id, heat
+            leaf = leaf.next_leaf
+
+    def top_k_by_heat(self, min_price: float, max_price: float, k: int) -> list:
+        """返回价格在 [min_price, max_price] 内热度最高的 k 个商品ID，按热度降序排列"""
+        if k <= 0 or min_price > max_price:
+            return []
+        low, high = self._low_key(min_price), self._high_key(max_price)
+
+        def entries():
+            leaf = self._find_leaf_node(low)
+            start = bisect.bisect_left(leaf.keys, low)
+            while leaf is not None:
+                end = bisect.bisect_right(leaf.keys, high)
+                yield from zip(leaf.heats[start:end], leaf.values[start:end])
+                if end < len(leaf.keys):
+                    return
+                leaf = leaf.next_leaf
+                start = 0
+
+        return [product_id for _, product_id in heapq.nlargest(k, entries(), key=lambda item: item[0])]
+
+    def _count_below(self, price: float, inclusive: bool) -> int:
+        """利用内部节点中记录的子树条目数统计价格小于（或小于等于）price 的商品数"""
+        bound = self._high_key(price) if inclusive else self._low_key(price)
+        count = 0
+        node = self.root
+        while not node.is_leaf:
+            idx = node.child_index_for(bound)
+            count += sum(node.sizes[:idx])
+            node = self._pager.get(node.children[idx])
+        if inclusive:
+            return count + bisect.bisect_right(node.keys, bound)
+        return count + bisect.bisect_left(node.keys, bound)
+
+    def select(self, k: int) -> float:
+        """返回所有商品按价格升序排列后第 k 个（从0开始）商品的价格"""
+        total = len(self)
+        if k < 0:
+            k += total
+        if not 0 <= k < total:
+            raise IndexError("排名超出范围")
+        node = self.root
+        while not node.is_leaf:
+            for child, size in zip(node.children, node.sizes):
+                if k < size:
+                    node = self._pager.get(child)
+                    break
+                k -= size
+        return node.keys[k][0]
+
+
+class PagedNameIndex(PagedBPlusTree):
+    """
+    以页文件为存储后端的名称索引，提供 ProductManager 使用的 ProductPrefixTrie 接口
+    键是 (name, product_id)，名称以同一前缀开头的商品在叶节点层是连续的一段，前缀查询就是一次区间扫描，
+    前缀计数利用内部节点中记录的子树条目数，代价为 O(log n)；页中不保存子树中热度最高的商品，
+    get_top_product_ids_with_prefix 需要扫描整个前缀区间
+    """
+    page_file_kind: int = KIND_NAMES
+    leaf_node_class: type = PagedNameLeafNode
+    internal_node_class: type = PagedNameInternalNode
+    top_k: int = sys.maxsize            # 没有逐节点的热度缓存，任意 k 都由 get_top_product_ids_with_prefix 扫描得到
+
+    def insert(self, name: str, product_id: str, heat: float = 0.0) -> None:
+        """插入一个 (名称, 商品ID)，重复插入不会产生重复条目；条目过大时抛出 ValueError 且不做任何修改"""
+        key = (name, product_id)
+        self._check_entry(key, product_id)
+        path, leaf = self._find_leaf_path(key)
+        idx = bisect.bisect_left(leaf.keys, key)
+        if idx < len(leaf.keys) and leaf.keys[idx] == key:
+            return
+        leaf.keys.insert(idx, key)
+        leaf.values.insert(idx, product_id)
+        leaf.heats.insert(idx, heat)
+        self._after_insert(path, leaf)
+
+    def delete(self, name: str, product_id: str) -> bool:
+        """删除一个 (名称, 商品ID)，不存在时返回 False"""
+        path, leaf = self._find_leaf_path((name, product_id))
+        key_index = leaf.find_key((name, product_id))
+        if key_index == -1:
+            return False
+        leaf.heats.pop(key_index)
+        self._remove_at(path, leaf, key_index)
+        return True
+
+    def update_heat(self, name: str, product_id: str, heat: float) -> bool:
+        """更新一个商品在索引中记录的热度"""
+        leaf = self._find_leaf_node((name, product_id))
+        key_index = leaf.find_key((name, product_id))
+        if key_index == -1:
+            return False
+        leaf.heats[key_index] = heat
+        self._pager.mark_dirty(leaf)
+        return True
+
+    @staticmethod
+    def _prefix_end(prefix: str) -> str | None:
+        """大于所有以 prefix 开头的名称的最小字符串；前缀为空（或只由最大码位组成）时没有上界，返回 None"""
+        prefix = prefix.rstrip(chr(sys.maxunicode))
+        if not prefix:
+            return None
+        return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+    def _iter_prefix(self, prefix: str, start: tuple = None):
+        """按 (名称, ID) 升序产出名称以 prefix 开头的 (name, product_id, heat)，start 给出时从不小于它的键开始"""
+        low = (prefix,)
+        if start is not None and start > low:
+            low = start
+        leaf = self._find_leaf_node(low)
+        idx = bisect.bisect_left(leaf.keys, low)
+        while leaf is not None:
+            for (name, product_id), heat in zip(leaf.keys[idx:], leaf.heats[idx:]):
+                if not name.startswith(prefix):
+                    return
+                yield name, product_id, heat
+            leaf = leaf.next_leaf
+            idx = 0
+
+    def _iter_entries(self):
+        """按 (名称, ID) 升序依次产出 (name, product_id, heat)"""
+        return self._iter_prefix("")
+
+    def _count_before(self, key) -> int:
+        """利用内部节点中记录的子树条目数统计小于 key 的条目数"""
+        count = 0
+        node = self.root
+        while not node.is_leaf:
+            idx = node.child_index_for(key)
+            count += sum(node.sizes[:idx])
+            node = self._pager.get(node.children[idx])
+        return count + bisect.bisect_left(node.keys, key)
+
+    def count_with_prefix(self, prefix: str) -> int:
+        """统计名称以 prefix 开头的商品数，代价为 O(log n)"""
+        end = self._prefix_end(prefix)
+        total = len(self) if end is None else self._count_before((end,))
+        return total - self._count_before((prefix,))
+
+    def iter_product_ids_with_prefix(self, prefix: str, limit: int = None):
+        """惰性地按名称的字典序产出名称以 prefix 开头的商品ID，产出 limit 个后立即停止"""
+        if limit is not None and limit <= 0:
+            return
+        for count, (_, product_id, _) in enumerate(self._iter_prefix(prefix), 1):
+            yield product_id
+            if count == limit:
+                return
+
+    def iter_product_ids_by_name(self, prefix: str, limit: int = None, start_after: tuple = None):
+        """与 ProductPrefixTrie.iter_product_ids_by_name 相同：按名称的字典序（名称相同时按ID）产出 (名称, 商品ID)"""
+        if limit is not None and limit <= 0:
+            return
+        start = tuple(start_after) if start_after is not None else None
+        count = 0
+        for name, product_id, _ in self._iter_prefix(prefix, start):
+            if (name, product_id) == start:
+                continue
+            yield name, product_id
+            count += 1
+            if count == limit:
+                return
+
+    def get_product_ids_with_prefix(self, prefix: str) -> set[str]:
+        """获取名称以 prefix 开头的全部商品ID"""
+        return set(self.iter_product_ids_with_prefix(prefix))
+
+    def get_top_product_ids_with_prefix(self, prefix: str, k: int) -> list[str]:
+        """按热度降序（热度相同时按ID升序）返回名称以 prefix 开头的至多 k 个商品ID，需要扫描整个前缀区间"""
+        if k <= 0:
+            return []
+        ranked = heapq.nsmallest(k, ((-heat, product_id) for _, product_id, heat in self._iter_prefix(prefix)))
+        return [product_id for _, product_id in ranked]
@@ -1,8 +1,17 @@
+import os
+import sys
+import mmap
+import heapq
+import bisect
+import struct
+from array import array
+
+
 class TrieNode:
     """
     Trie树的节点类
     """
-    __slots__ = ('children', 'is_end_of_word', 'product_ids')
+    __slots__ = ('children', 'is_end_of_word', 'product_ids', 'top', 'count')
     def __init__(self):
         """
         初始化一个Trie节点
@@ -15,6 +24,12 @@ class TrieNode:
         # 如果 is_end_of_word 为 True，则此集合存储与该单词关联的一个或多个 product_id
         self.product_ids: set[str] = set() 
 
+        # Trie树启用 top_k 时，存储子树中热度最高的至多 top_k 个 (-热度, product_id)，按升序排列（即热度降序）
+        self.top: list[tuple[float, str]] | None = None
+
+        # 子树（包括自身）中关联的 product_id 总数，按前缀计数时不必遍历子树
+        self.count: int = 0
+
     def __repr__(self):
         return (f"TrieNode(children_keys={list(self.children.keys())}, "
                 f"is_end={self.is_end_of_word}, product_ids_count={len(self.product_ids)})")
@@ -23,40 +38,261 @@ class TrieNode:
         return self.__repr__()
 
 
+class RadixTrieNode(TrieNode):
+    """
+    压缩（Radix / Patricia）Trie树的节点，入边上是一段字符串而不是单个字符
+    父节点的 children 仍以入边的第一个字符为键
+    """
+    __slots__ = ('label',)
+
+    def __init__(self, label: str = ""):
+        super().__init__()
+        self.label: str = label
+
+    def __repr__(self):
+        return (f"RadixTrieNode(label={self.label!r}, children_keys={list(self.children.keys())}, "
+                f"is_end={self.is_end_of_word}, product_ids_count={len(self.product_ids)})")
+
+
+def _common_prefix_length(a: str, b: str) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
 class ProductPrefixTrie:
     """
     用于商品名称前缀搜索的Trie树
     存储商品名称，并在单词结束节点关联一个或多个product_id
+
+    top_k 大于 0 时，每个节点还缓存自己子树中热度最高的 top_k 个商品，
+    按前缀取热度最高的 k (<= top_k) 个商品只需要 O(len(prefix) + k)，不必遍历整个子树
+
+    radix 为 True 时使用压缩Trie树：没有分叉、也不是单词结尾的单链节点合并成一条边，
+    节点数与名称的分叉点数成正比，而不是与名称的总长度成正比；前缀可以结束在一条边的中间，
+    此时它匹配的就是这条边指向的子树
     """
-    def __init__(self):
+    def __init__(self, top_k: int = 0, radix: bool = False):
         """
         初始化一个空的Trie树，包含一个根节点
+
+        参数:
+            top_k (int): 每个节点缓存的热度最高的商品数，0 表示不缓存
+            radix (bool): 是否使用压缩Trie树
         """
-        self.root = TrieNode()
+        if not isinstance(top_k, int) or top_k < 0:
+            raise ValueError("top_k 必须是非负整数")
+        self.top_k: int = top_k
+        self.radix: bool = radix
+        self._heats: dict[str, float] = {}      # 启用 top_k 时记录每个商品的热度，用于重新计算节点的缓存
+        self.root = self._new_node()
+
+    def _new_node(self, label: str = "") -> TrieNode:
+        node = RadixTrieNode(label) if self.radix else TrieNode()
+        if self.top_k:
+            node.top = []
+        return node
 
-    def insert(self, name: str, product_id: str) -> None:
+    def node_count(self) -> int:
+        """Trie树中的节点数（包括根节点）"""
+        count = 0
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            count += 1
+            stack.extend(node.children.values())
+        return count
+
+    def insert(self, name: str, product_id: str, heat: float = 0.0) -> None:
         """
         向Trie树中插入一个商品名称及其关联的 product_id
 
         参数:
             name (str): 要插入的商品名称
             product_id (str): 与该商品名称关联的商品ID
+            heat (float): 商品的热度，启用 top_k 时用于维护各节点的缓存
         """
         if not isinstance(name, str) or not name:
             return
         if not isinstance(product_id, str) or not product_id:
             return
 
-        node = self.root
-        for char in name:
-            if char not in node.children:
-                node.children[char] = TrieNode()
-            node = node.children[char]
+        if self.radix:
+            path = self._radix_insert_path(name)
+            node = path[-1]
+        else:
+            node = self.root
+            path = [node]
+            for char in name:
+                if char not in node.children:
+                    node.children[char] = self._new_node()
+                node = node.children[char]
+                path.append(node)
         
         # 到达单词末尾
         if isinstance(product_id, str) and product_id: 
+            if product_id in node.product_ids:
+                if self.top_k:
+                    self.update_heat(name, product_id, heat)
+                return
             node.is_end_of_word = True
             node.product_ids.add(product_id)
+            for path_node in path:
+                path_node.count += 1
+            if self.top_k:
+                self._heats[product_id] = heat
+                entry = (-heat, product_id)
+                for path_node in path:
+                    self._offer(path_node, entry)
+
+    def _radix_insert_path(self, name: str) -> list[TrieNode]:
+        """压缩Trie树中找到（必要时创建）name 对应的节点，名称在一条边的中间结束或分叉时拆分这条边"""
+        node = self.root
+        path = [node]
+        i = 0
+        while i < len(name):
+            child = node.children.get(name[i])
+            if child is None:
+                child = self._new_node(name[i:])
+                node.children[name[i]] = child
+                path.append(child)
+                break
+            common = _common_prefix_length(child.label, name[i:])
+            if common < len(child.label):
+                # 拆分：新节点承接公共部分，原节点保留剩下的部分，两者的子树相同，缓存和计数可以直接复制
+                middle = self._new_node(child.label[:common])
+                child.label = child.label[common:]
+                middle.children[child.label[0]] = child
+                middle.count = child.count
+                if self.top_k:
+                    middle.top = list(child.top)
+                node.children[name[i]] = middle
+                child = middle
+            node = child
+            path.append(node)
+            i += common
+        return path
+
+    # ---------------- 热度缓存 ----------------
+    def _offer(self, node: TrieNode, entry: tuple) -> None:
+        """把一个条目放入节点的缓存，缓存已满时只有比最后一个更热时才放入"""
+        top = node.top
+        if len(top) < self.top_k:
+            bisect.insort(top, entry)
+        elif entry < top[-1]:
+            bisect.insort(top, entry)
+            top.pop()
+
+    def _recompute_top(self, node: TrieNode) -> None:
+        """节点的缓存 = 自身关联的商品与各子节点缓存的并集中最热的 top_k 个（子节点的缓存必须已经正确）"""
+        candidates = [(-self._heats[product_id], product_id) for product_id in node.product_ids]
+        for child in node.children.values():
+            candidates.extend(child.top)
+        node.top = heapq.nsmallest(self.top_k, candidates)
+
+    def _discard_from_top(self, path: list[TrieNode], entry: tuple) -> None:
+        """
+        自底向上从路径上各节点的缓存中移除一个条目（调用前它已经从子树中移除），缓存原本已满的节点需要重新计算
+        一个条目不在某个节点的缓存中时，也不会在它任何祖先的缓存中，可以提前结束
+        """
+        for node in reversed(path):
+            top = node.top
+            i = bisect.bisect_left(top, entry)
+            if i == len(top) or top[i] != entry:
+                return
+            if len(top) < self.top_k:
+                del top[i]
+            else:
+                self._recompute_top(node)
+
+    def update_heat(self, name: str, product_id: str, heat: float) -> bool:
+        """
+        修改一个商品的热度并更新名称路径上各节点的缓存，未启用 top_k 时什么也不做
+
+        返回:
+            bool: 名称与商品的关联存在时返回 True
+        """
+        path = self._find_path(name)
+        if path is None or product_id not in path[-1].product_ids:
+            return False
+        if not self.top_k:
+            return True
+        old_entry = (-self._heats[product_id], product_id)
+        new_entry = (-heat, product_id)
+        self._heats[product_id] = heat
+        for node in reversed(path):
+            top = node.top
+            i = bisect.bisect_left(top, old_entry)
+            if i == len(top) or top[i] != old_entry:
+                self._offer(node, new_entry)
+                continue
+            full = len(top) == self.top_k
+            del top[i]
+            # 剩下的是子树中其他商品里最热的 top_k - 1 个，新条目比其中最后一个更热时，它一定排在其他商品第 top_k 名之前
+            if not full or (top and new_entry < top[-1]):
+                bisect.insort(top, new_entry)
+            else:
+                self._recompute_top(node)
+        return True
+
+    def rebuild_top(self, heats: dict[str, float]) -> None:
+        """按给定的 product_id - 热度 自底向上重新计算所有节点的缓存，用于直接构建节点后（例如从快照恢复）"""
+        if not self.top_k:
+            return
+        self._heats = heats
+        stack = [(self.root, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if children_done:
+                self._recompute_top(node)
+            else:
+                stack.append((node, True))
+                stack.extend((child, False) for child in node.children.values())
+
+    def get_top_product_ids_with_prefix(self, prefix: str, k: int) -> list[str]:
+        """
+        按热度降序（热度相同时按ID升序）返回名称以 prefix 开头的至多 k 个商品ID
+        k 不超过 top_k 时直接读取前缀节点的缓存，否则收集整个子树后排序
+
+        参数:
+            prefix (str): 商品名称前缀
+            k (int): 最多返回的商品数
+
+        返回:
+            list[str]: 商品ID列表
+        """
+        if not self.top_k:
+            raise ValueError("Trie树没有启用 top_k 缓存")
+        prefix_node = self._find_prefix_node(prefix)
+        if prefix_node is None or k <= 0:
+            return []
+        if k <= self.top_k:
+            return [product_id for _, product_id in prefix_node.top[:k]]
+        ranked = sorted((-self._heats[product_id], product_id)
+                        for product_id in self.get_product_ids_with_prefix(prefix))
+        return [product_id for _, product_id in ranked[:k]]
+
+    def _find_path(self, name: str) -> list[TrieNode] | None:
+        """返回从根节点到 name 末尾字符对应节点的路径，名称不存在（压缩Trie树中包括结束在边的中间）时返回 None"""
+        node = self.root
+        path = [node]
+        if self.radix:
+            i = 0
+            while i < len(name):
+                node = node.children.get(name[i])
+                if node is None or not name.startswith(node.label, i):
+                    return None
+                path.append(node)
+                i += len(node.label)
+            return path
+        for char in name:
+            node = node.children.get(char)
+            if node is None:
+                return None
+            path.append(node)
+        return path
 
     def _find_prefix_node(self, prefix: str) -> TrieNode | None:
         """
@@ -67,8 +303,17 @@ class ProductPrefixTrie:
 
         返回:
             TrieNode | None: 如果前缀存在，则返回前缀末尾字符对应的节点；否则返回None
+                             （压缩Trie树中前缀结束在边的中间时，返回这条边指向的节点）
         """
         node = self.root
+        if self.radix:
+            i = 0
+            while i < len(prefix):
+                node = node.children.get(prefix[i])
+                if node is None or not node.label.startswith(prefix[i:i + len(node.label)]):
+                    return None
+                i += len(node.label)
+            return node
         for char in prefix:
             if char in node.children:
                 node = node.children[char]
@@ -76,6 +321,93 @@ class ProductPrefixTrie:
                 return None
         return node
 
+    def _locate_prefix(self, prefix: str) -> tuple[TrieNode, str] | None:
+        """返回 (前缀对应的节点, 该节点的完整名称)；压缩Trie树中前缀结束在边的中间时，名称包含这条边剩下的部分"""
+        if not self.radix:
+            node = self._find_prefix_node(prefix)
+            return None if node is None else (node, prefix)
+        node = self.root
+        name = ""
+        while len(name) < len(prefix):
+            node = node.children.get(prefix[len(name)])
+            if node is None or not node.label.startswith(prefix[len(name):len(name) + len(node.label)]):
+                return None
+            name += node.label
+        return node, name
+
+    def iter_product_ids_with_prefix(self, prefix: str, limit: int = None):
+        """
+        惰性地产出名称以 prefix 开头的商品ID（顺序不保证），产出 limit 个后立即停止，不收集整个子树
+        迭代期间不应修改Trie树
+
+        参数:
+            prefix (str): 商品名称前缀
+            limit (int, 可选): 最多产出的商品数
+        """
+        if limit is not None and limit <= 0:
+            return
+        node = self._find_prefix_node(prefix)
+        if node is None:
+            return
+        count = 0
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.is_end_of_word:
+                for product_id in node.product_ids:
+                    yield product_id
+                    count += 1
+                    if count == limit:
+                        return
+            stack.extend(node.children.values())
+
+    def iter_product_ids_by_name(self, prefix: str, limit: int = None, start_after: tuple = None):
+        """
+        按名称的字典序（名称相同时按ID）惰性地产出名称以 prefix 开头的 (名称, 商品ID)
+        只对实际访问到的节点的子节点排序；start_after 传入上一页最后一项 (名称, 商品ID) 时，
+        整个子树都排在它之前的节点直接跳过，翻页的代价只与路径长度和本页大小有关
+
+        参数:
+            prefix (str): 商品名称前缀
+            limit (int, 可选): 最多产出的商品数
+            start_after (tuple, 可选): 只产出排在这一项之后的商品
+        """
+        if limit is not None and limit <= 0:
+            return
+        located = self._locate_prefix(prefix)
+        if located is None:
+            return
+        after_name, after_id = start_after if start_after is not None else (None, None)
+        count = 0
+        stack = [located]
+        while stack:
+            node, name = stack.pop()
+            if after_name is not None and name < after_name and not after_name.startswith(name):
+                continue                # 整个子树都排在 start_after 之前
+            if node.is_end_of_word and (after_name is None or name >= after_name):
+                for product_id in sorted(node.product_ids):
+                    if name == after_name and product_id <= after_id:
+                        continue
+                    yield name, product_id
+                    count += 1
+                    if count == limit:
+                        return
+            for char, child in sorted(node.children.items(), reverse=True):
+                stack.append((child, name + (child.label if self.radix else char)))
+
+    def count_with_prefix(self, prefix: str) -> int:
+        """
+        统计名称以 prefix 开头的商品数，读取前缀节点的子树计数，代价为 O(len(prefix))
+
+        参数:
+            prefix (str): 商品名称前缀
+
+        返回:
+            int: 匹配的商品数，等于 len(get_product_ids_with_prefix(prefix))
+        """
+        node = self._find_prefix_node(prefix)
+        return 0 if node is None else node.count
+
     def get_product_ids_with_prefix(self, prefix: str) -> set[str]:
         """
         获取所有以指定前缀开头的商品名称所关联的product_id集合
@@ -118,6 +450,8 @@ class ProductPrefixTrie:
         返回:
             bool: 如果成功找到并移除了关联，则返回 True；否则返回 False
         """
+        if self.radix:
+            return self._radix_delete(name, product_id)
 
         # 找到单词路径上的所有节点，并记录每个节点的父节点和对应的字符
         path_trace = []
@@ -139,8 +473,14 @@ class ProductPrefixTrie:
         current_node.product_ids.remove(product_id)
         if not current_node.product_ids:    # 如果当前的节点不再存储商品名，那么将当前节点标注为非单词结尾
             current_node.is_end_of_word = False
+        if self.top_k:
+            entry = (-self._heats.pop(product_id), product_id)
+            self._discard_from_top([self.root] + [step['node'] for step in path_trace], entry)
 
-        # 回溯并清理冗余节点
+        # 回溯更新子树计数并清理冗余节点（计数减为 0 的节点子树中已经没有商品）
+        self.root.count -= 1
+        for step in path_trace:
+            step['node'].count -= 1
         if not current_node.is_end_of_word and not current_node.children:
             for i in range(len(path_trace) - 1, -1, -1):
                 parent_of_node_to_delete = path_trace[i]['parent'] # 这是真正要修改的父节点
@@ -156,4 +496,400 @@ class ProductPrefixTrie:
                 else:
                     break 
         
-        return True
\ No newline at end of file
+        return True
+
+    def _radix_delete(self, name: str, product_id: str) -> bool:
+        """
+        压缩Trie树中的删除：不再是单词结尾的节点没有子节点时摘除，只剩一个子节点时与子节点合并成一条边；
+        摘除节点后父节点变成只有一个子节点的非结尾节点时，父节点同样与剩下的子节点合并
+        """
+        path = self._find_path(name)
+        if path is None:
+            return False
+        node = path[-1]
+        if not node.is_end_of_word or product_id not in node.product_ids:
+            return False
+
+        node.product_ids.remove(product_id)
+        if not node.product_ids:
+            node.is_end_of_word = False
+        if self.top_k:
+            entry = (-self._heats.pop(product_id), product_id)
+            self._discard_from_top(path, entry)
+        for path_node in path:
+            path_node.count -= 1
+
+        if node is self.root or node.is_end_of_word:
+            return True
+        parent = path[-2]
+        if not node.children:
+            del parent.children[node.label[0]]
+            if parent is not self.root and not parent.is_end_of_word and len(parent.children) == 1:
+                self._merge_with_only_child(path[-3], parent)
+        elif len(node.children) == 1:
+            self._merge_with_only_child(parent, node)
+        return True
+
+    def _merge_with_only_child(self, parent: RadixTrieNode, node: RadixTrieNode) -> None:
+        """把只有一个子节点的非结尾节点与子节点合并，子节点的子树不变，缓存和计数也不需要修改"""
+        (child,) = node.children.values()
+        child.label = node.label + child.label
+        parent.children[child.label[0]] = child
+
+    def freeze(self) -> "FrozenProductPrefixTrie":
+        """
+        生成当前Trie树的只读紧凑表示（见 FrozenProductPrefixTrie），之后对本Trie树的修改不会反映到其中
+
+        返回:
+            FrozenProductPrefixTrie: 冻结的Trie树，可以 save 到文件后用 mmap 打开
+        """
+        return FrozenProductPrefixTrie._from_trie(self)
+
+
+# ---------------- 冻结的Trie树 ----------------
+# 节点按先序编号（根节点为 0），子树因此是连续的一段编号 [i, subtree_end[i])，
+# 商品ID的引用也按先序排列，整个子树的商品就是 postings 中连续的一段。全部数据都是扁平数组：
+#   child_start  (n+1)  节点 i 的子节点是 children[child_start[i]:child_start[i+1]]
+#   children     (n-1)  子节点编号，同一父节点下按入边第一个字符的码位升序排列
+#   child_chars  (n-1)  与 children 对应的入边第一个字符的码位，用于二分查找
+#   subtree_end  (n)    子树之后的第一个节点编号
+#   label_start  (n+1)  入边字符串在 label_text（UTF-8）中的字节偏移，逐字符Trie树中每条边只有一个字符
+#   post_start   (n+1)  节点自身的商品在 postings 中的位置
+#   postings            商品序号
+#   id_start / id_text  商品ID，格式同 label_start / label_text
+#   top_start / top_refs / heats  原Trie树启用 top_k 时：每个节点缓存的商品序号（热度降序）和每个商品的热度
+_FROZEN_MAGIC = b'PMTRIE\x00\x00'
+_FROZEN_VERSION = 1
+_FROZEN_HEADER = struct.Struct('<8sHHII')     # magic, 版本, 标志位, top_k, 段数
+_FROZEN_SECTION = struct.Struct('<16s4sQ')    # 段名, 数组类型码, 字节数
+_FROZEN_ALIGN = 8
+_FROZEN_FLAG_RADIX = 1
+_FROZEN_ARRAYS = ('child_start', 'children', 'child_chars', 'subtree_end', 'label_start', 'label_text',
+                  'post_start', 'postings', 'id_start', 'id_text')
+_FROZEN_TOP_ARRAYS = ('top_start', 'top_refs', 'heats')
+
+
+def _utf8_column(strings) -> tuple[array, array]:
+    """返回 (字节偏移, UTF-8 拼接文本)"""
+    offsets = array('Q', [0])
+    blob = bytearray()
+    for string in strings:
+        blob += string.encode('utf-8')
+        offsets.append(len(blob))
+    return offsets, array('B', blob)
+
+
+class FrozenProductPrefixTrie:
+    """
+    只读的名称前缀Trie树，由 ProductPrefixTrie.freeze() 生成，全部节点保存在少量扁平数组中（见上方的布局说明），
+    没有逐节点的 Python 对象。save 写出的文件可以用 load 以 mmap 方式打开，数组直接映射文件内容，
+    打开时不需要解析或重建任何节点，只有查询实际读到的页才会被载入内存
+
+    支持与 ProductPrefixTrie 相同的查询接口；insert / delete / update_heat 抛出 TypeError，需要修改时在原Trie树上修改后重新 freeze
+    """
+
+    def __init__(self, arrays: dict, top_k: int, radix: bool, mapping=None):
+        self._arrays: dict = arrays
+        self.top_k: int = top_k
+        self.radix: bool = radix
+        self._mapping = mapping
+        for name in _FROZEN_ARRAYS + (_FROZEN_TOP_ARRAYS if top_k else ()):
+            setattr(self, '_' + name, arrays[name])
+
+    @classmethod
+    def _from_trie(cls, trie: ProductPrefixTrie) -> "FrozenProductPrefixTrie":
+        # 先序遍历，同时给商品分配序号
+        nodes, labels = [], []
+        stack = [("", trie.root)]
+        while stack:
+            label, node = stack.pop()
+            nodes.append(node)
+            labels.append(label)
+            items = sorted(node.children.items(), reverse=True)
+            stack.extend((child.label if trie.radix else char, child) for char, child in items)
+        index = {id(node): i for i, node in enumerate(nodes)}
+
+        ordinal = {}
+        post_start, postings = array('I', [0]), array('I')
+        for node in nodes:
+            for product_id in (sorted(node.product_ids) if node.is_end_of_word else ()):
+                postings.append(ordinal.setdefault(product_id, len(ordinal)))
+            post_start.append(len(postings))
+
+        child_start, children, child_chars = array('I', [0]), array('I'), array('I')
+        for node in nodes:
+            for char, child in sorted(node.children.items()):
+                children.append(index[id(child)])
+                child_chars.append(ord(char))
+            child_start.append(len(children))
+
+        # 子节点按字符升序先序编号，最后一个子节点的子树结束处就是整个子树的结束处
+        subtree_end = array('I', range(1, len(nodes) + 1))
+        for i in range(len(nodes) - 1, -1, -1):
+            if child_start[i + 1] > child_start[i]:
+                subtree_end[i] = subtree_end[children[child_start[i + 1] - 1]]
+
+        arrays = {'child_start': child_start, 'children': children, 'child_chars': child_chars,
+                  'subtree_end': subtree_end, 'post_start': post_start, 'postings': postings}
+        arrays['label_start'], arrays['label_text'] = _utf8_column(labels)
+        product_ids = sorted(ordinal, key=ordinal.get)
+        arrays['id_start'], arrays['id_text'] = _utf8_column(product_ids)
+        if trie.top_k:
+            top_start, top_refs = array('I', [0]), array('I')
+            for node in nodes:
+                top_refs.extend(ordinal[product_id] for _, product_id in node.top)
+                top_start.append(len(top_refs))
+            arrays['top_start'], arrays['top_refs'] = top_start, top_refs
+            arrays['heats'] = array('d', (trie._heats[product_id] for product_id in product_ids))
+        return cls(arrays, trie.top_k, trie.radix)
+
+    # ---------------- 文件 ----------------
+    def save(self, path: str) -> None:
+        """把全部数组写入文件（小端序，按 8 字节对齐），先写临时文件再原子地替换"""
+        names = _FROZEN_ARRAYS + (_FROZEN_TOP_ARRAYS if self.top_k else ())
+        flags = _FROZEN_FLAG_RADIX if self.radix else 0
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(_FROZEN_HEADER.pack(_FROZEN_MAGIC, _FROZEN_VERSION, flags, self.top_k, len(names)))
+            offset = _FROZEN_HEADER.size
+            for name in names:
+                values = self._arrays[name]
+                typecode = values.format if isinstance(values, memoryview) else values.typecode
+                values = array(typecode, values)
+                if sys.byteorder == 'big':
+                    values.byteswap()
+                data = values.tobytes()
+                f.write(_FROZEN_SECTION.pack(name.encode(), typecode.encode().ljust(4, b'\x00'), len(data)))
+                offset += _FROZEN_SECTION.size
+                padding = -offset % _FROZEN_ALIGN
+                f.write(b'\x00' * padding)
+                f.write(data)
+                offset += padding + len(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, use_mmap: bool = True) -> "FrozenProductPrefixTrie":
+        """
+        打开 save 写出的文件
+
+        参数:
+            path (str): 文件路径
+            use_mmap (bool): 为 True 时数组是文件映射上的 memoryview，不复制数据（大端序机器上总是复制并转换字节序）；
+                             为 False 时把文件读入 array
+
+        返回:
+            FrozenProductPrefixTrie: 冻结的Trie树，使用 mmap 时用完应调用 close
+        """
+        with open(path, 'rb') as f:
+            if use_mmap and sys.byteorder == 'little' and os.path.getsize(path) > 0:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                use_mmap = False
+                buffer = f.read()
+        view = memoryview(buffer)
+        arrays = {}
+        try:
+            if len(view) < _FROZEN_HEADER.size:
+                raise ValueError("不是可识别的冻结Trie树文件")
+            magic, version, flags, top_k, num_sections = _FROZEN_HEADER.unpack_from(view, 0)
+            if magic != _FROZEN_MAGIC:
+                raise ValueError("不是可识别的冻结Trie树文件")
+            if version != _FROZEN_VERSION:
+                raise ValueError(f"不支持的冻结Trie树版本 {version}")
+            offset = _FROZEN_HEADER.size
+            for _ in range(num_sections):
+                name, typecode, length = _FROZEN_SECTION.unpack_from(view, offset)
+                offset += _FROZEN_SECTION.size
+                offset += -offset % _FROZEN_ALIGN
+                if offset + length > len(view):
+                    raise ValueError("冻结Trie树文件被截断")
+                typecode = typecode.rstrip(b'\x00').decode()
+                if use_mmap:
+                    values = view[offset:offset + length].cast(typecode)
+                else:
+                    values = array(typecode)
+                    values.frombytes(view[offset:offset + length])
+                    if sys.byteorder == 'big':
+                        values.byteswap()
+                arrays[name.rstrip(b'\x00').decode()] = values
+                offset += length
+            missing = set(_FROZEN_ARRAYS + (_FROZEN_TOP_ARRAYS if top_k else ())) - set(arrays)
+            if missing:
+                raise ValueError(f"冻结Trie树文件缺少数组 {sorted(missing)}")
+        except (ValueError, struct.error) as e:
+            if use_mmap:
+                for values in arrays.values():
+                    values.release()
+            view.release()
+            if use_mmap:
+                buffer.close()
+            if isinstance(e, struct.error):
+                raise ValueError("冻结Trie树文件被截断") from e
+            raise
+        if not use_mmap:
+            view.release()
+        return cls(arrays, top_k, bool(flags & _FROZEN_FLAG_RADIX), (buffer, view) if use_mmap else None)
+
+    def close(self) -> None:
+        """释放文件映射，之后不能再查询"""
+        if self._mapping is None:
+            return
+        buffer, view = self._mapping
+        for values in self._arrays.values():
+            values.release()
+        for name in list(vars(self)):
+            if name.startswith('_') and name[1:] in self._arrays:
+                delattr(self, name)
+        self._arrays = {}
+        view.release()
+        buffer.close()
+        self._mapping = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # ---------------- 查询 ----------------
+    def node_count(self) -> int:
+        """Trie树中的节点数（包括根节点）"""
+        return len(self._subtree_end)
+
+    def _label(self, node: int) -> str:
+        return str(self._label_text[self._label_start[node]:self._label_start[node + 1]], 'utf-8')
+
+    def _product_id(self, ref: int) -> str:
+        return str(self._id_text[self._id_start[ref]:self._id_start[ref + 1]], 'utf-8')
+
+    def _find_prefix_node(self, prefix: str) -> int | None:
+        """返回前缀对应的节点编号（前缀结束在边的中间时为这条边指向的节点），前缀不存在时返回 None"""
+        node = 0
+        i = 0
+        child_start, child_chars = self._child_start, self._child_chars
+        while i < len(prefix):
+            lo, hi = child_start[node], child_start[node + 1]
+            code = ord(prefix[i])
+            j = bisect.bisect_left(child_chars, code, lo, hi)
+            if j == hi or child_chars[j] != code:
+                return None
+            node = self._children[j]
+            if not self.radix:          # 逐字符Trie树的边只有一个字符，二分查找命中即匹配
+                i += 1
+                continue
+            label = self._label(node)
+            if not label.startswith(prefix[i:i + len(label)]):
+                return None
+            i += len(label)
+        return node
+
+    def _locate_prefix(self, prefix: str) -> tuple[int, str] | None:
+        """返回 (前缀对应的节点编号, 该节点的完整名称)；压缩Trie树中前缀结束在边的中间时，名称包含这条边剩下的部分"""
+        if not self.radix:
+            node = self._find_prefix_node(prefix)
+            return None if node is None else (node, prefix)
+        node = 0
+        name = ""
+        while len(name) < len(prefix):
+            lo, hi = self._child_start[node], self._child_start[node + 1]
+            code = ord(prefix[len(name)])
+            j = bisect.bisect_left(self._child_chars, code, lo, hi)
+            if j == hi or self._child_chars[j] != code:
+                return None
+            node = self._children[j]
+            label = self._label(node)
+            if not label.startswith(prefix[len(name):len(name) + len(label)]):
+                return None
+            name += label
+        return node, name
+
+    def iter_product_ids_with_prefix(self, prefix: str, limit: int = None):
+        """惰性地产出名称以 prefix 开头的商品ID，前缀下的商品是 postings 中连续的一段，顺序就是名称的字典序"""
+        if limit is not None and limit <= 0:
+            return
+        node = self._find_prefix_node(prefix)
+        if node is None:
+            return
+        lo = self._post_start[node]
+        hi = self._post_start[self._subtree_end[node]]
+        if limit is not None:
+            hi = min(hi, lo + limit)
+        for ref in self._postings[lo:hi]:
+            yield self._product_id(ref)
+
+    def iter_product_ids_by_name(self, prefix: str, limit: int = None, start_after: tuple = None):
+        """与 ProductPrefixTrie.iter_product_ids_by_name 相同：按名称的字典序产出 (名称, 商品ID)"""
+        if limit is not None and limit <= 0:
+            return
+        located = self._locate_prefix(prefix)
+        if located is None:
+            return
+        after_name, after_id = start_after if start_after is not None else (None, None)
+        count = 0
+        stack = [located]
+        while stack:
+            node, name = stack.pop()
+            if after_name is not None and name < after_name and not after_name.startswith(name):
+                continue
+            if after_name is None or name >= after_name:
+                for ref in self._postings[self._post_start[node]:self._post_start[node + 1]]:
+                    product_id = self._product_id(ref)
+                    if name == after_name and product_id <= after_id:
+                        continue
+                    yield name, product_id
+                    count += 1
+                    if count == limit:
+                        return
+            for child in reversed(self._children[self._child_start[node]:self._child_start[node + 1]]):
+                stack.append((child, name + self._label(child)))
+
+    def count_with_prefix(self, prefix: str) -> int:
+        """统计名称以 prefix 开头的商品数，即前缀节点子树在 postings 中那一段的长度"""
+        node = self._find_prefix_node(prefix)
+        if node is None:
+            return 0
+        return self._post_start[self._subtree_end[node]] - self._post_start[node]
+
+    def get_product_ids_with_prefix(self, prefix: str) -> set[str]:
+        """
+        获取所有以指定前缀开头的商品名称所关联的product_id集合，前缀下的商品是 postings 中连续的一段，不需要遍历子树
+
+        参数:
+            prefix (str): 商品名称前缀
+
+        返回:
+            set[str]: 一个包含所有匹配商品product_id的集合
+        """
+        node = self._find_prefix_node(prefix)
+        if node is None:
+            return set()
+        lo = self._post_start[node]
+        hi = self._post_start[self._subtree_end[node]]
+        return {self._product_id(ref) for ref in self._postings[lo:hi]}
+
+    def get_top_product_ids_with_prefix(self, prefix: str, k: int) -> list[str]:
+        """与 ProductPrefixTrie.get_top_product_ids_with_prefix 相同：按热度降序（热度相同时按ID升序）返回至多 k 个商品ID"""
+        if not self.top_k:
+            raise ValueError("Trie树没有启用 top_k 缓存")
+        node = self._find_prefix_node(prefix)
+        if node is None or k <= 0:
+            return []
+        if k <= self.top_k:
+            lo = self._top_start[node]
+            hi = min(self._top_start[node + 1], lo + k)
+            return [self._product_id(ref) for ref in self._top_refs[lo:hi]]
+        lo = self._post_start[node]
+        hi = self._post_start[self._subtree_end[node]]
+        ranked = sorted((-self._heats[ref], self._product_id(ref)) for ref in self._postings[lo:hi])
+        return [product_id for _, product_id in ranked[:k]]
+
+    def insert(self, name: str, product_id: str, heat: float = 0.0) -> None:
+        raise TypeError("冻结的前缀树是只读的")
+
+    def delete(self, name: str, product_id: str) -> bool:
+        raise TypeError("冻结的前缀树是只读的")
+
+    def update_heat(self, name: str, product_id: str, heat: float) -> bool:
+        raise TypeError("冻结的前缀树是只读的")
@@ -21,6 +21,16 @@ class Product:
         self.price = price
         self.heat = heat
 
+    @classmethod
+    def _restore(cls, product_id: str, name: str, price: float, heat: float) -> "Product":
+        """从可信的数据（例如 ProductManager 保存的快照）中恢复商品，跳过各字段的校验"""
+        product = cls.__new__(cls)
+        product._product_id = product_id
+        product._name = name
+        product._price = price
+        product._heat = heat
+        return product
+
     @property
     def product_id(self) -> str:
         """获取商品ID"""
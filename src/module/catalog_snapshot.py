@@ -0,0 +1,284 @@
+import gc
+import os
+import sys
+import zlib
+import struct
+from array import array
+
+from src.model.product import Product
+from src.data_structure.trie import ProductPrefixTrie, TrieNode, RadixTrieNode
+from src.data_structure.b_plus_tree import BPlusTreeID, BPlusTreeProducts
+
+
+# ---------------- 快照文件格式 ----------------
+# 文件头之后是若干个段，每个段保存一个数组：段头记录段名、数组类型码和字节数，数据按 8 字节对齐。
+# 所有数组都按小端序保存，读取时整段拷贝进 array，不逐个解析元素。
+# 文件头中的 CRC32 覆盖文件头之后的全部内容；不认识的段会被忽略，不兼容的修改需要增加版本号
+#
+# 商品按ID升序分列保存，B+树和Trie树中的商品都用它在列中的序号引用：
+#   IDOF/IDTX  商品ID：每个字符串在拼接文本中的字符偏移（n+1 个）和 UTF-8 编码的拼接文本
+#   NMOF/NMTX  商品名称，格式同上
+#   PRIC/HEAT  价格、热度
+#   IDLF       ID索引每个叶节点中的键数（叶节点中的商品就是按ID顺序连续的若干个）
+#   PXLF       价格索引每个叶节点中的键数
+#   PXKY       价格索引每个键的价格
+#   PXBK       默认模式下每个价格键下的商品数（复合键模式下每个键恰好一个商品，不保存）
+#   PXRF       价格索引中按叶节点顺序排列的商品序号
+#   TRCH/TRCC  Trie树按先序遍历的每个节点的入边字符（根节点为0）和子节点数
+#   TRLO/TRLT  压缩Trie树中代替 TRCH，每个节点入边上的字符串，格式同 IDOF/IDTX（根节点为空串）
+#   TRIC/TRRF  每个节点关联的商品数，以及按节点顺序排列的商品序号
+_MAGIC = b'PMCATLG\x00'
+_VERSION = 1
+_HEADER = struct.Struct('<8sHHIQII')    # magic, 版本, 标志位, B+树的阶, 商品数, 段数, CRC32
+_SECTION = struct.Struct('<4s4sQ')      # 段名, 数组类型码, 字节数
+_ALIGN = 8
+_FLAG_COMPOSITE = 1
+_FLAG_RADIX = 2
+
+
+def _iter_leaves(tree):
+    leaf = tree._first_leaf()
+    while leaf is not None:
+        yield leaf
+        leaf = leaf.next_leaf
+
+
+def _encode_strings(strings) -> tuple[array, array]:
+    """返回 (字符偏移, UTF-8 拼接文本)，按字符而不是字节记录偏移，读取时解码一次整段文本后直接切片"""
+    offsets = array('Q', [0])
+    parts = []
+    end = 0
+    for string in strings:
+        end += len(string)
+        offsets.append(end)
+        parts.append(string)
+    return offsets, array('B', ''.join(parts).encode('utf-8'))
+
+
+def _decode_strings(offsets: array, blob: array) -> list[str]:
+    text = blob.tobytes().decode('utf-8')
+    return [text[start:end] for start, end in zip(offsets, offsets[1:])]
+
+
+def _write_sections(path: str, flags: int, order: int, count: int, sections: dict) -> None:
+    """先写入临时文件，落盘后再原子地替换目标文件，写到一半失败不会破坏已有的快照"""
+    body = bytearray()
+    for name, values in sections.items():
+        if sys.byteorder == 'big':
+            values = array(values.typecode, values)
+            values.byteswap()
+        data = values.tobytes()
+        body += _SECTION.pack(name, values.typecode.encode().ljust(4, b'\x00'), len(data))
+        body += data
+        body += b'\x00' * (-len(body) % _ALIGN)
+    header = _HEADER.pack(_MAGIC, _VERSION, flags, order, count, len(sections), zlib.crc32(body))
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _read_sections(path: str) -> tuple:
+    """返回 (标志位, 阶, 商品数, 段名 - array)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < _HEADER.size:
+        raise ValueError("不是可识别的商品目录快照")
+    magic, version, flags, order, count, num_sections, crc = _HEADER.unpack_from(data, 0)
+    if magic != _MAGIC:
+        raise ValueError("不是可识别的商品目录快照")
+    if version != _VERSION:
+        raise ValueError(f"不支持的快照版本 {version}")
+    view = memoryview(data)[_HEADER.size:]
+    if zlib.crc32(view) != crc:
+        raise ValueError("快照文件已损坏（校验和不一致）")
+
+    sections = {}
+    offset = 0
+    for _ in range(num_sections):
+        name, typecode, length = _SECTION.unpack_from(view, offset)
+        offset += _SECTION.size
+        values = array(typecode.rstrip(b'\x00').decode())
+        values.frombytes(view[offset:offset + length])
+        if sys.byteorder == 'big':
+            values.byteswap()
+        sections[name] = values
+        offset += length + (-(offset + length) % _ALIGN)
+    return flags, order, count, sections
+
+
+def _usable_leaf_sizes(sizes: array, order: int, short_last: bool) -> array | None:
+    """
+    保存的叶节点布局满足内存B+树的上下限时才沿用它（页文件B+树删除时不合并，叶节点可能过空），否则返回 None 重新切分
+    short_last 为 True 时允许最右叶节点只有一个键（BPlusTreeID 追加时的非对称分裂）
+    """
+    if len(sizes) <= 1:
+        return sizes
+    min_keys = (order + 1) // 2
+    for i, size in enumerate(sizes):
+        lower = 1 if short_last and i == len(sizes) - 1 else min_keys
+        if not lower <= size <= order:
+            return None
+    return sizes
+
+
+# ---------------- 保存与读取 ----------------
+def save_catalog(path: str, id_index, price_index, trie: ProductPrefixTrie,
+                 btree_order: int, composite_keys: bool) -> None:
+    """
+    把商品目录的三个索引写入快照文件
+
+    参数:
+        path (str): 快照文件路径，已存在时被原子地替换
+        id_index: ID索引（BPlusTreeID 或页文件ID索引）
+        price_index: 价格索引（BPlusTreeProducts 或页文件价格索引），其中的热度与商品的热度一致
+        trie (ProductPrefixTrie): 名称前缀Trie树
+        btree_order (int): 读取时重建B+树使用的阶
+        composite_keys (bool): 价格索引是否使用复合键
+    """
+    products = [product for leaf in _iter_leaves(id_index) for product in leaf.values]
+    ordinal = {product.product_id: i for i, product in enumerate(products)}
+    sections = {}
+    sections[b'IDOF'], sections[b'IDTX'] = _encode_strings(product.product_id for product in products)
+    sections[b'NMOF'], sections[b'NMTX'] = _encode_strings(product.name for product in products)
+    sections[b'PRIC'] = array('d', (product.price for product in products))
+    sections[b'HEAT'] = array('d', (product.heat for product in products))
+    sections[b'IDLF'] = array('I', (len(leaf.keys) for leaf in _iter_leaves(id_index)))
+
+    leaf_sizes, prices, buckets, refs = array('I'), array('d'), array('I'), array('I')
+    for leaf in _iter_leaves(price_index):
+        leaf_sizes.append(len(leaf.keys))
+        if composite_keys:
+            for price, product_id in leaf.keys:
+                prices.append(price)
+                refs.append(ordinal[product_id])
+        else:
+            for price, product_ids in zip(leaf.keys, leaf.values):
+                prices.append(price)
+                buckets.append(len(product_ids))
+                refs.extend(ordinal[product_id] for product_id in product_ids)
+    sections[b'PXLF'], sections[b'PXKY'], sections[b'PXRF'] = leaf_sizes, prices, refs
+    if not composite_keys:
+        sections[b'PXBK'] = buckets
+
+    labels, child_counts, id_counts, id_refs = [], array('I'), array('I'), array('I')
+    stack = [("", trie.root)]
+    while stack:
+        label, node = stack.pop()
+        labels.append(label)
+        child_counts.append(len(node.children))
+        product_ids = node.product_ids if node.is_end_of_word else ()
+        id_counts.append(len(product_ids))
+        id_refs.extend(ordinal[product_id] for product_id in product_ids)
+        if trie.radix:
+            stack.extend((child.label, child) for child in reversed(node.children.values()))
+        else:
+            stack.extend(reversed(node.children.items()))
+    if trie.radix:
+        sections[b'TRLO'], sections[b'TRLT'] = _encode_strings(labels)
+    else:
+        sections[b'TRCH'] = array('I', [0] + [ord(char) for char in labels[1:]])
+    sections[b'TRCC'], sections[b'TRIC'], sections[b'TRRF'] = child_counts, id_counts, id_refs
+
+    flags = (_FLAG_COMPOSITE if composite_keys else 0) | (_FLAG_RADIX if trie.radix else 0)
+    _write_sections(path, flags, btree_order, len(products), sections)
+
+
+def load_catalog(path: str, prefix_top_k: int = 0) -> tuple:
+    """
+    读取快照文件，直接按保存的叶节点布局重建两棵B+树的叶节点层，再自底向上构建内部节点，不需要排序和逐个插入
+
+    参数:
+        path (str): 快照文件路径
+        prefix_top_k (int): 重建的Trie树每个节点缓存的热度最高的商品数，缓存不保存在快照中，读取后重新计算
+
+    返回:
+        tuple: (B+树的阶, 价格索引是否使用复合键, BPlusTreeID, BPlusTreeProducts, ProductPrefixTrie)，
+               Trie树是否压缩与保存时相同
+    """
+    flags, order, count, sections = _read_sections(path)
+    composite_keys = bool(flags & _FLAG_COMPOSITE)
+    gc_enabled = gc.isenabled()
+    gc.disable()                # 恢复时一次性创建大量长期存活的对象，期间反复触发的分代回收找不到可回收的垃圾
+    try:
+        product_ids = _decode_strings(sections[b'IDOF'], sections[b'IDTX'])
+        names = _decode_strings(sections[b'NMOF'], sections[b'NMTX'])
+        prices, heats = sections[b'PRIC'], sections[b'HEAT']
+        if not len(product_ids) == len(names) == len(prices) == len(heats) == count:
+            raise ValueError("快照文件中商品各列的长度不一致")
+        products = list(map(Product._restore, product_ids, names, prices, heats))
+
+        id_index = BPlusTreeID(order)
+        id_index._bulk_build(product_ids, products, 1.0, _usable_leaf_sizes(sections[b'IDLF'], order, True))
+
+        price_index = BPlusTreeProducts(order, composite_keys=composite_keys)
+        price_index._heats = dict(zip(product_ids, heats))
+        entry_ids = [product_ids[ref] for ref in sections[b'PXRF']]
+        if composite_keys:
+            keys = list(zip(sections[b'PXKY'], entry_ids))
+            values = entry_ids
+        else:
+            keys = sections[b'PXKY'].tolist()
+            values = []
+            start = 0
+            for size in sections[b'PXBK']:
+                values.append(entry_ids[start:start + size])
+                start += size
+        if len(keys) != len(values) or len(entry_ids) != count:
+            raise ValueError("快照文件中价格索引的条目数不一致")
+        price_index._bulk_build(keys, values, 1.0, _usable_leaf_sizes(sections[b'PXLF'], order, False))
+
+        radix = bool(flags & _FLAG_RADIX)
+        trie = ProductPrefixTrie(top_k=prefix_top_k, radix=radix)
+        if radix:
+            labels = _decode_strings(sections[b'TRLO'], sections[b'TRLT'])
+        else:
+            labels = [chr(char) for char in sections[b'TRCH']]
+        trie.root = _build_trie_nodes(labels, sections[b'TRCC'], sections[b'TRIC'], sections[b'TRRF'],
+                                      product_ids, radix)
+        if prefix_top_k:
+            trie.rebuild_top(dict(zip(product_ids, heats)))
+    except (KeyError, IndexError) as e:
+        raise ValueError("快照文件缺少数据或数据不一致") from e
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return order, composite_keys, id_index, price_index, trie
+
+
+def _build_trie_nodes(labels: list[str], child_counts: array, id_counts: array, id_refs: array,
+                      product_ids: list, radix: bool) -> TrieNode:
+    """
+    按先序序列重建Trie树，栈中记录每个祖先还没有重建的子节点数；子节点在父节点中以入边的第一个字符为键
+    节点出栈时子树已经重建完，把它的子树计数累加到父节点
+    """
+    node_ids = [product_ids[ref] for ref in id_refs]
+    ref_start = 0
+    root = None
+    stack = []
+    for label, child_count, id_count in zip(labels, child_counts, id_counts):
+        node = RadixTrieNode(label) if radix else TrieNode()
+        if id_count:
+            node.is_end_of_word = True
+            node.product_ids = set(node_ids[ref_start:ref_start + id_count])
+            node.count = id_count
+            ref_start += id_count
+        if root is None:
+            root = node
+        else:
+            while stack[-1][1] == 0:
+                done = stack.pop()[0]
+                stack[-1][0].count += done.count
+            stack[-1][1] -= 1
+            stack[-1][0].children[label[0]] = node
+        stack.append([node, child_count])
+    while len(stack) > 1:
+        done = stack.pop()[0]
+        stack[-1][0].count += done.count
+    if root is None:
+        root = RadixTrieNode() if radix else TrieNode()
+    return root
@@ -1,22 +1,190 @@
+import os
 import uuid
 import time
+import itertools
 
 from src.model.product import Product
 from src.data_structure.trie import *
 from src.data_structure.b_plus_tree import *
+from src.data_structure.paged_b_plus_tree import PagedBPlusTreeID, PagedBPlusTreeProducts, PagedNameIndex
+from src.module.catalog_snapshot import save_catalog, load_catalog
+from src.module.write_ahead_log import WriteAheadLog, OP_ADD, OP_UPDATE, OP_DELETE, OP_DELETE_RANGE
 
 
 class ProductManager:
-    def __init__(self, btree_order: int = 3):
+    def __init__(self, btree_order: int = 3, composite_price_keys: bool = False, storage_dir: str = None,
+                 prefix_top_k: int = 10, prefix_radix: bool = False):
         """
         初始化商品目录管理器。
 
         参数:
             btree_order (int): 用于内部B+树的阶
+            composite_price_keys (bool): 价格索引是否使用 (price, product_id) 复合键，
+                                         同一价格下商品很多时删除和改价不再需要线性扫描ID列表
+            storage_dir (str, 可选): 给出时ID、价格和名称三个索引都使用该目录下的页文件存储（价格索引总是使用复合键），
+                                     名称索引是以 (name, product_id) 为键的页文件B+树（见 PagedNameIndex）。
+                                     目录中已有索引时打开只读取三个文件头，常驻内存的只有各自页缓存中的节点
+            prefix_top_k (int): 名称前缀Trie树每个节点缓存的热度最高的商品数，
+                                recommend_products_by_prefix 的 k 不超过它时不必遍历前缀下的整个子树（页文件存储时不使用）
+            prefix_radix (bool): 名称前缀Trie树是否使用压缩（Radix）Trie树，节点数与名称的分叉点数而不是总长度成正比
+                                 （页文件存储时不使用）
         """
-        self._product_id_index: BPlusTreeID = BPlusTreeID(order=btree_order)        # product_id - Product对象
-        self._price_index: BPlusTreeProducts = BPlusTreeProducts(order=btree_order) # price - product_id
-        self._name_prefix_trie: ProductPrefixTrie = ProductPrefixTrie()
+        self._btree_order: int = btree_order
+        self._storage_dir: str | None = storage_dir
+        self._prefix_top_k: int = prefix_top_k
+        self._prefix_radix: bool = prefix_radix
+        self._wal: WriteAheadLog | None = None
+        self._wal_max_segments: int = 0
+        if storage_dir is None:
+            self._name_prefix_trie: ProductPrefixTrie | PagedNameIndex = ProductPrefixTrie(top_k=prefix_top_k,
+                                                                                         radix=prefix_radix)
+            self._composite_price_keys: bool = composite_price_keys
+            self._product_id_index: BPlusTreeID = BPlusTreeID(order=btree_order)        # product_id - Product对象
+            self._price_index: BPlusTreeProducts = BPlusTreeProducts(order=btree_order, composite_keys=composite_price_keys) # price - product_id
+            return
+
+        os.makedirs(storage_dir, exist_ok=True)
+        self._composite_price_keys = True
+        self._product_id_index = PagedBPlusTreeID(os.path.join(storage_dir, "product_id.idx"), order=btree_order)
+        self._price_index = PagedBPlusTreeProducts(os.path.join(storage_dir, "price.idx"), order=btree_order)
+        self._name_prefix_trie = PagedNameIndex(os.path.join(storage_dir, "name.idx"), order=btree_order)
+        if not len(self._name_prefix_trie) and len(self._product_id_index):
+            # 没有名称索引文件的旧目录：从ID索引建立一次，之后随其他索引一起维护
+            for product_id, product in self._product_id_index._iter_leaf_items():
+                self._name_prefix_trie.insert(product.name, product_id, product.heat)
+
+    def flush(self) -> None:
+        """使用页文件存储时，把修改过的页写回文件；使用预写日志时，提交还在组提交缓冲区中的记录"""
+        if self._storage_dir is not None:
+            self._product_id_index.flush()
+            self._price_index.flush()
+            self._name_prefix_trie.flush()
+        if self._wal is not None:
+            self._wal.sync()
+
+    def close(self) -> None:
+        """使用页文件存储时，写回修改并关闭页文件；使用预写日志时，提交缓冲区并关闭日志"""
+        if self._storage_dir is not None:
+            self._product_id_index.close()
+            self._price_index.close()
+            self._name_prefix_trie.close()
+        if self._wal is not None:
+            self._wal.close()
+
+    def save(self, path: str) -> None:
+        """
+        把整个商品目录保存为一个二进制快照文件（格式见 catalog_snapshot 模块）
+        商品按列保存，两棵B+树只保存叶节点层的布局，Trie树按先序保存，商品都用序号引用；
+        文件先写入临时文件再原子地替换，使用页文件存储时也可以保存
+
+        参数:
+            path (str): 快照文件路径
+        """
+        trie = self._name_prefix_trie
+        if self._storage_dir is not None:       # 快照按先序保存Trie树，页文件中的名称索引先转成一棵Trie树
+            trie = ProductPrefixTrie(top_k=self._prefix_top_k, radix=self._prefix_radix)
+            for name, product_id, heat in self._name_prefix_trie._iter_entries():
+                trie.insert(name, product_id, heat)
+        save_catalog(path, self._product_id_index, self._price_index, trie,
+                     self._btree_order, self._composite_price_keys)
+
+    @classmethod
+    def load(cls, path: str, prefix_top_k: int = 10) -> "ProductManager":
+        """
+        从 save 保存的快照文件创建一个内存中的商品目录，按保存的叶节点直接重建B+树，不需要重放每次 add_product
+
+        参数:
+            path (str): 快照文件路径
+            prefix_top_k (int): 名称前缀Trie树每个节点缓存的热度最高的商品数
+
+        返回:
+            ProductManager: 恢复出的商品目录，B+树的阶、价格索引的键模式和Trie树是否压缩与保存时相同
+        """
+        order, composite_keys, id_index, price_index, trie = load_catalog(path, prefix_top_k)
+        manager = cls(btree_order=order, composite_price_keys=composite_keys, prefix_top_k=prefix_top_k,
+                      prefix_radix=trie.radix)
+        manager._product_id_index = id_index
+        manager._price_index = price_index
+        manager._name_prefix_trie = trie
+        return manager
+
+    @classmethod
+    def recover(cls, wal_dir: str, btree_order: int = 3, composite_price_keys: bool = False,
+                max_segments: int = 8, prefix_top_k: int = 10, prefix_radix: bool = False,
+                **wal_options) -> "ProductManager":
+        """
+        打开带预写日志的商品目录：读取日志目录中最新的快照，再按顺序重放之后的日志段，
+        崩溃时没写完的最后一条记录被丢弃。之后的每次增删改在校验通过后、修改索引之前写入日志
+        （组提交和落盘策略见 WriteAheadLog），日志段超过 max_segments 个时自动写一个新快照并删除它已包含的日志段
+
+        参数:
+            wal_dir (str): 日志目录，不存在时创建
+            btree_order (int): 没有快照时新建B+树使用的阶，有快照时沿用快照中的阶和键模式
+            composite_price_keys (bool): 没有快照时价格索引是否使用复合键
+            max_segments (int): 触发自动压缩的日志段数量
+            prefix_top_k (int): 名称前缀Trie树每个节点缓存的热度最高的商品数
+            prefix_radix (bool): 没有快照时名称前缀Trie树是否使用压缩Trie树，有快照时沿用快照中的设置
+            **wal_options: 传给 WriteAheadLog 的 fsync、group_size、group_interval、segment_bytes
+
+        返回:
+            ProductManager: 恢复到最后一次提交的修改的商品目录
+        """
+        if not isinstance(max_segments, int) or max_segments < 1:
+            raise ValueError("max_segments 必须是正整数")
+        wal = WriteAheadLog(wal_dir, **wal_options)
+        snapshot = wal.latest_snapshot()
+        if snapshot is None:
+            manager = cls(btree_order=btree_order, composite_price_keys=composite_price_keys,
+                          prefix_top_k=prefix_top_k, prefix_radix=prefix_radix)
+            start_seq = 0
+        else:
+            start_seq, path = snapshot
+            manager = cls.load(path, prefix_top_k=prefix_top_k)
+        for op, fields in wal.replay(start_seq):
+            manager._apply_log_record(op, fields)
+        manager._wal = wal
+        manager._wal_max_segments = max_segments
+        return manager
+
+    def checkpoint(self) -> None:
+        """
+        压缩预写日志：切换到新的日志段，把当前目录保存为对应序号的快照，再删除快照已包含的旧日志段和旧快照
+        任何一步之前崩溃，恢复时都仍能由旧快照加旧日志段得到同样的目录
+        """
+        if self._wal is None:
+            return
+        seq = self._wal.rotate()
+        self.save(self._wal.snapshot_path(seq))
+        self._wal.discard_before(seq)
+
+    def _log(self, op: int, *fields) -> None:
+        """
+        修改通过校验之后、作用到索引之前写入预写日志，写日志失败（例如磁盘已满）时异常直接抛给调用者，
+        内存中的目录保持不变，不会出现已经修改却没有记录的状态。预写日志只用于内存中的目录，
+        此时通过校验的修改一定能作用到索引上
+        """
+        if self._wal is None:
+            return
+        self._compact_if_needed()
+        self._wal.append(op, fields)
+
+    def _compact_if_needed(self) -> None:
+        """在追加下一条记录之前压缩：此时之前的每条记录都已经作用到索引上，快照与日志一致"""
+        if self._wal.segment_count > self._wal_max_segments:
+            self.checkpoint()
+
+    def _apply_log_record(self, op: int, fields: tuple) -> None:
+        """重放一条日志记录（此时还没有挂上日志，重放本身不会再写日志）"""
+        if op == OP_ADD:
+            self._index_product(Product(*fields))
+        elif op == OP_UPDATE:
+            self.update_product(*fields)
+        elif op == OP_DELETE:
+            self.delete_product(*fields)
+        elif op == OP_DELETE_RANGE:
+            self.delete_products_in_price_range(*fields)
+        else:
+            raise ValueError(f"未知的日志操作码 {op}")
 
     def _generate_product_id(self) -> str:
         """生成一个唯一的商品ID"""
@@ -43,12 +211,77 @@ class ProductManager:
         except ValueError as e:
             return None
 
-        self._product_id_index.insert(product)
-        self._price_index.insert(price, product_id) # B+树按价格索引Product对象
-        self._name_prefix_trie.insert(product.name, product.product_id)
-        
+        self._log(OP_ADD, product_id, product.name, product.price, product.heat)
+        try:
+            self._index_product(product)
+        except ValueError:              # 页文件存储放不下这个商品，ID 索引在修改之前就拒绝了它
+            return None
         return product
 
+    def _index_product(self, product: Product) -> None:
+        """
+        把一个新商品插入三个索引，ID 索引最先插入：页文件存储放不下商品时它抛出 ValueError，此时三个索引都没有修改；
+        价格索引和名称索引的条目都比ID索引的条目小，ID 索引放得下时它们也放得下
+        """
+        self._product_id_index.insert(product)
+        self._price_index.insert(product.price, product.product_id, product.heat) # B+树按价格索引Product对象
+        self._name_prefix_trie.insert(product.name, product.product_id, product.heat)
+
+    def bulk_add_products(self, items, fill_factor: float = 1.0) -> list[Product]:
+        """
+        批量添加商品。目录为空时新商品排序后自底向上地构建两棵B+树；
+        已有商品时不重建整棵树，用 insert_many 把新商品归并进它们所在的叶节点，代价只与新商品数和被改动的叶节点数有关
+
+        参数:
+            items: (name, price, heat) 的可迭代对象，不合法的条目会被跳过
+            fill_factor (float): 在空目录上构建B+树时节点的目标装填率，取值范围 (0, 1]
+
+        返回:
+            list[Product]: 成功添加的商品，顺序与输入一致
+        """
+        new_products = []
+        for name, price, heat in items:
+            try:
+                product = Product(self._generate_product_id(), name, price, heat)
+            except ValueError:
+                continue
+            new_products.append(product)
+
+        if not new_products:
+            return []
+
+        if self._wal is not None:
+            self._compact_if_needed()
+            self._wal.extend((OP_ADD, (p.product_id, p.name, p.price, p.heat)) for p in new_products)
+
+        if self._storage_dir is not None:       # 页文件索引不整体重建，逐个插入，写入由页缓存吸收
+            indexed = []
+            for product in new_products:
+                try:
+                    self._index_product(product)
+                except ValueError:              # 放不进页文件的商品与不合法的条目一样跳过
+                    continue
+                indexed.append(product)
+            return indexed
+
+        price_entries = [(p.price, p.product_id, p.heat) for p in new_products]
+        if len(self._product_id_index):
+            self._product_id_index.insert_many(new_products)
+            self._price_index.insert_many(price_entries)
+        else:
+            self._product_id_index = BPlusTreeID.bulk_load(sorted(new_products, key=lambda p: p.product_id),
+                                                           order=self._btree_order, fill_factor=fill_factor)
+            # 复合键模式下同一价格内还要按ID有序
+            sort_key = (lambda item: (item[0], item[1])) if self._composite_price_keys else (lambda item: item[0])
+            self._price_index = BPlusTreeProducts.bulk_load(
+                sorted(price_entries, key=sort_key),
+                order=self._btree_order, fill_factor=fill_factor, composite_keys=self._composite_price_keys)
+
+        for product in new_products:
+            self._name_prefix_trie.insert(product.name, product.product_id, product.heat)
+
+        return new_products
+
     def get_product_by_id(self, product_id: str) -> Product | None:
         """通过ID获取商品。"""
         return self._product_id_index.search(product_id)
@@ -61,6 +294,7 @@ class ProductManager:
         
         old_price = product_to_delete.price
         old_name = product_to_delete.name
+        self._log(OP_DELETE, product_id)
 
         # 从B+树价格索引中删除
         if not self._price_index.delete(old_price, product_id):
@@ -73,9 +307,34 @@ class ProductManager:
         # 从主存储B+树中删除
         if not self._product_id_index.delete(product_id):
             raise IndexError(f"ID索引树中找不到键 {product_id}")
-        
+
         return True
 
+    def delete_products_in_price_range(self, min_price: float, max_price: float) -> list[Product]:
+        """
+        删除价格在 [min_price, max_price] 区间内的所有商品，并同步更新所有索引
+        价格索引整批摘除区间内的子树，ID索引按排好序的ID批量删除，不再为每个商品单独修复下溢
+
+        返回:
+            list[Product]: 按价格升序排列的被删除商品
+        """
+        if not (isinstance(min_price, (int, float)) and isinstance(max_price, (int, float))):
+            return []
+
+        if self._wal is not None and self._price_index.count_range(min_price, max_price):
+            self._log(OP_DELETE_RANGE, float(min_price), float(max_price))
+        removed_ids = self._price_index.delete_range(min_price, max_price)
+        removed = []
+        for product_id in removed_ids:
+            product = self._product_id_index.search(product_id)
+            if product is None:
+                raise IndexError(f"ID索引树中找不到键 {product_id}")
+            if not self._name_prefix_trie.delete(product.name, product_id):
+                raise IndexError(f"警告: 从Trie树删除 (name:{product.name}, id:{product_id}) 时未找到或失败。")
+            removed.append(product)
+        self._product_id_index.delete_many(removed_ids)
+        return removed
+
     def update_product(self, product_id: str,
                        new_name: str = None,
                        new_price: float = None,
@@ -90,52 +349,127 @@ class ProductManager:
         
         old_price = product_to_update.price
         old_name = product_to_update.name
-        
-        something_actually_changed = False
+        old_heat = product_to_update.heat
 
+        # 先整体校验新值，避免只更新了一半字段后才发现某个值不合法
         try:
+            Product(product_id,
+                    new_name if new_name is not None else old_name,
+                    new_price if new_price is not None else old_price,
+                    new_heat if new_heat is not None else old_heat)
+        except ValueError:
+            return False
+
+        # 标记哪些关键索引字段发生了变化
+        name_changed = (new_name is not None and new_name != old_name)
+        price_changed = (new_price is not None and abs(new_price - old_price) > 1e-9) # 浮点比较
+        heat_changed = (new_heat is not None and abs(new_heat - old_heat) > 1e-9)
+
+        if not (name_changed or price_changed or heat_changed):
+            return False
+
+        self._log(OP_UPDATE, product_id,
+                  new_name if name_changed else None,
+                  float(new_price) if price_changed else None,
+                  float(new_heat) if heat_changed else None)
+        if heat_changed:
+            product_to_update.heat = new_heat
+        if name_changed:
             product_to_update.name = new_name
+        if price_changed:
             product_to_update.price = new_price
-            product_to_update.heat = new_heat
-
 
-            # 标记哪些关键索引字段发生了变化
-            name_changed = (new_name is not None and new_name != old_name)
-            price_changed = (new_price is not None and abs(new_price - old_price) > 1e-9) # 浮点比较
+        # 先写回ID索引：页文件存储中的商品是解码出的副本，新名称放不进一页时这里被拒绝，其他索引都还没有修改
+        try:
+            self._product_id_index.update(product_to_update)
+        except ValueError:
+            return False
 
-            # 如果名称改变，更新Trie树
-            if name_changed:
-                self._name_prefix_trie.delete(old_name, product_id) # 删除旧名称的关联
-                self._name_prefix_trie.insert(new_name, product_id) # 插入新名称的关联
-                something_actually_changed = True
+        # 如果名称改变，更新Trie树；只有热度改变时更新Trie树中缓存的热度
+        if name_changed:
+            self._name_prefix_trie.delete(old_name, product_id) # 删除旧名称的关联
+            self._name_prefix_trie.insert(new_name, product_id, product_to_update.heat) # 插入新名称的关联
+        elif heat_changed:
+            self._name_prefix_trie.update_heat(old_name, product_id, product_to_update.heat)
 
-            # 如果价格改变，更新B+树
-            if price_changed:
-                self._price_index.delete(old_price, product_id) # 从B+树删除旧价格条目
-                self._price_index.insert(new_price, product_id) # 将更新了价格的对象重新插入B+树
-                something_actually_changed = True
-            
-            # 更新热度 (如果提供了且有变化)
-            if new_heat is not None and abs(product_to_update.heat - new_heat) > 1e-9:
-                product_to_update.heat = new_heat
-                something_actually_changed = True
+        # 如果价格改变，以新的价格和热度重新插入价格索引；否则只需要更新价格索引中记录的热度
+        if price_changed:
+            self._price_index.delete(old_price, product_id) # 从B+树删除旧价格条目
+            self._price_index.insert(product_to_update.price, product_id, product_to_update.heat)
+        elif heat_changed:
+            self._price_index.update_heat(old_price, product_id, product_to_update.heat)
 
-        except Exception as e: 
-            return False 
-            
-        return something_actually_changed
+        return True
 
 
-    def search_by_price_range(self, min_price: float, max_price: float) -> list[Product]:
-        """按价格范围搜索商品，返回商品"""
+    def search_by_price_range(self, min_price: float, max_price: float,
+                              limit: int = None, resume_after: tuple = None,
+                              order: str = "asc") -> list[Product]:
+        """
+        按价格范围搜索商品，返回商品
+        可以用 limit 和 resume_after 做键集分页：resume_after 传入上一页最后一个商品的 (price, product_id)，
+        只读取本页需要的条目，不会物化整个区间
+        order 为 "desc" 时从最高价开始沿叶节点链表向前读取，取前 limit 个的代价只与 limit 有关
+        """
         if not (isinstance(min_price, (int, float)) and isinstance(max_price, (int, float))):
             return []
-        range_id = self._price_index.search_range(min_price, max_price)
+        if limit is not None and (not isinstance(limit, int) or limit < 0):
+            return []
+        if order not in ("asc", "desc"):
+            return []
+
+        if order == "desc":
+            range_id = self._price_index.iter_range_desc(max_price, min_price, resume_after)
+            if limit is not None:
+                range_id = itertools.islice(range_id, limit)
+        elif limit is None and resume_after is None:
+            range_id = self._price_index.search_range(min_price, max_price)
+        else:
+            cursor = self._price_index.range_cursor(min_price, max_price, resume_after)
+            entries = cursor.fetch(limit) if limit is not None else list(cursor)
+            range_id = [product_id for _, product_id in entries]
+
         product = []
         for id in range_id:
             product.append(self._product_id_index.search(id))
         return product
 
+    def count_by_price_range(self, min_price: float, max_price: float) -> int:
+        """统计价格范围内的商品数量，只需要 O(log n) 次节点访问"""
+        if not (isinstance(min_price, (int, float)) and isinstance(max_price, (int, float))):
+            return 0
+        return self._price_index.count_range(min_price, max_price)
+
+    def get_price_quantile(self, q: float) -> float | None:
+        """
+        返回商品价格的 q 分位数（q 取 0 到 1，例如 0.5 为中位数、0.9 为 p90），目录为空或 q 不合法时返回 None
+        """
+        if not isinstance(q, (int, float)) or not (0 <= q <= 1):
+            return None
+        total = len(self._price_index)
+        if total == 0:
+            return None
+        return self._price_index.select(int(q * (total - 1)))
+
+    def top_k_by_heat_in_price_range(self, min_price: float, max_price: float, k: int) -> list[Product]:
+        """
+        返回价格范围内热度最高的 k 个商品（按热度降序），
+        借助价格索引中每棵子树的最高热度剪枝，不必取出整个价格区间
+        """
+        if not (isinstance(min_price, (int, float)) and isinstance(max_price, (int, float))):
+            return []
+        if not isinstance(k, int) or k <= 0:
+            return []
+        return [self._product_id_index.search(product_id)
+                for product_id in self._price_index.top_k_by_heat(min_price, max_price, k)]
+
+    def iter_products_by_price_range(self, min_price: float, max_price: float):
+        """按价格升序惰性地产出价格范围内的商品，迭代期间不应修改目录"""
+        if not (isinstance(min_price, (int, float)) and isinstance(max_price, (int, float))):
+            return
+        for product_id in self._price_index.iter_range(min_price, max_price):
+            yield self._product_id_index.search(product_id)
+
     def search_by_exact_price(self, price: float, product_id_to_find: str = None) -> list[Product]:
         """按精确价格搜索商品（可选具体ID）"""
         if not isinstance(price, (int, float)):
@@ -149,11 +483,15 @@ class ProductManager:
     def recommend_products_by_prefix(self, name_prefix: str, k: int) -> list[Product]:
         """
         根据商品名称前缀进行搜索，并按热度推送最高的k个商品，如果k为-1，则返回所有匹配的商品
+        k 不超过 Trie树节点缓存的个数时直接读取前缀节点的缓存，代价为 O(len(name_prefix) + k)
         """
         if not isinstance(name_prefix, str): 
             return []
         if not isinstance(k, int) or k < -1:
             return []
+        if 0 <= k <= self._name_prefix_trie.top_k:
+            return [self.get_product_by_id(pid)
+                    for pid in self._name_prefix_trie.get_top_product_ids_with_prefix(name_prefix, k)]
 
         matching_product_ids = self._name_prefix_trie.get_product_ids_with_prefix(name_prefix)
         
@@ -166,8 +504,30 @@ class ProductManager:
         # 按热度降序排序
         candidate_products.sort(key=lambda p: p.heat, reverse=True)
         
-        return candidate_products[:k]
-    
+        return candidate_products if k == -1 else candidate_products[:k]
+
+    def count_by_name_prefix(self, name_prefix: str) -> int:
+        """统计名称以 name_prefix 开头的商品数量，只需要沿前缀走到Trie树节点读取子树计数"""
+        if not isinstance(name_prefix, str):
+            return 0
+        return self._name_prefix_trie.count_with_prefix(name_prefix)
+
+    def browse_products_by_name(self, name_prefix: str, limit: int = 20,
+                                resume_after: tuple = None) -> list[Product]:
+        """
+        按名称字典序（名称相同时按ID）分页浏览名称以 name_prefix 开头的商品
+        resume_after 传入上一页最后一个商品的 (name, product_id)，只遍历本页需要的Trie树节点，不枚举整个子树
+        """
+        if not isinstance(name_prefix, str):
+            return []
+        if not isinstance(limit, int) or limit < 0:
+            return []
+        if resume_after is not None and not (isinstance(resume_after, tuple) and len(resume_after) == 2
+                                             and all(isinstance(part, str) for part in resume_after)):
+            return []
+        return [self.get_product_by_id(pid) for _, pid in
+                self._name_prefix_trie.iter_product_ids_by_name(name_prefix, limit, resume_after)]
+
     def search_products_name(self, name: str) -> list[Product]:
         """根据商品名称进行搜索，仅返回名称匹配的"""
         candidate_products = self.recommend_products_by_prefix(name, -1)
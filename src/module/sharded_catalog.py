@@ -0,0 +1,404 @@
+import math
+import heapq
+import bisect
+import multiprocessing
+
+from src.model.product import Product
+from src.module.commodity_retrieval import ProductManager
+
+
+# ---------------- 分片进程 ----------------
+def _select_price(manager: ProductManager, k: int) -> float:
+    return manager._price_index.select(k)
+
+
+def _import_products(manager: ProductManager, products: list[Product]) -> int:
+    """迁移过来的商品保留原来的ID，直接插入三个索引"""
+    for product in products:
+        manager._index_product(product)
+    return len(products)
+
+
+def _pop_product(manager: ProductManager, product_id: str) -> Product | None:
+    product = manager.get_product_by_id(product_id)
+    if product is not None:
+        manager.delete_product(product_id)
+    return product
+
+
+# 除 ProductManager 的公开方法外，分片进程还支持的命令
+_SHARD_COMMANDS = {
+    'len': lambda manager: len(manager._price_index),
+    'select': _select_price,
+    'import': _import_products,
+    'pop': _pop_product,
+}
+
+
+def _shard_worker(conn, btree_order: int, composite_price_keys: bool) -> None:
+    """分片进程的主循环：收到 (命令, 参数) 后在本进程的 ProductManager 上执行，把 (是否成功, 结果或异常) 发回"""
+    manager = ProductManager(btree_order=btree_order, composite_price_keys=composite_price_keys)
+    while True:
+        try:
+            command, args = conn.recv()
+        except EOFError:
+            break
+        if command == 'close':
+            conn.send((True, None))
+            break
+        try:
+            if command in _SHARD_COMMANDS:
+                result = _SHARD_COMMANDS[command](manager, *args)
+            elif not command.startswith('_'):
+                result = getattr(manager, command)(*args)
+            else:
+                raise AttributeError(f"分片不支持命令 {command}")
+        except Exception as e:
+            conn.send((False, e))
+        else:
+            conn.send((True, result))
+    conn.close()
+
+
+# ---------------- 分片目录 ----------------
+class ShardedProductManager:
+    """
+    按价格区间分片的商品目录，每个分片是一个独立进程中的 ProductManager，各自持有自己价格段内的三个索引
+    第 i 个分片保存价格在 [boundaries[i-1], boundaries[i]) 内的商品，区间查询只发给有重叠的分片并行执行，
+    各分片的结果按分片顺序拼接即为价格序；名称前缀查询发给全部分片后按热度归并
+
+    主进程只保存 product_id - 价格 的映射，用于按ID找到商品所在的分片
+    各分片的商品数偏离平均值超过 rebalance_factor 倍时，按全局价格分位数重新划分边界，把越界的商品迁移到新的分片
+    """
+
+    def __init__(self, num_shards: int = 4, btree_order: int = 3, composite_price_keys: bool = False,
+                 boundaries: list[float] = None, rebalance_factor: float = 1.5, rebalance_min_size: int = 1000,
+                 mp_context=None):
+        """
+        启动分片进程
+
+        参数:
+            num_shards (int): 分片（进程）数
+            btree_order (int): 各分片中B+树的阶
+            composite_price_keys (bool): 各分片的价格索引是否使用复合键
+            boundaries (list[float], 可选): 初始的 num_shards - 1 个升序分片边界；不给出时商品先全部进入第一个分片，
+                                            达到 rebalance_min_size 后自动按分位数划分
+            rebalance_factor (float): 最大分片的商品数超过平均值的这么多倍时重新划分边界
+            rebalance_min_size (int): 商品总数达到该值之前不重新划分；两次检查之间至少间隔这么多次修改
+            mp_context: multiprocessing 上下文，默认使用平台默认的启动方式
+        """
+        if not isinstance(num_shards, int) or num_shards < 1:
+            raise ValueError("num_shards 必须是正整数")
+        if boundaries is None:
+            boundaries = [math.inf] * (num_shards - 1)
+        if len(boundaries) != num_shards - 1 or any(a > b for a, b in zip(boundaries, boundaries[1:])):
+            raise ValueError("boundaries 必须是 num_shards - 1 个升序排列的价格")
+        if rebalance_factor <= 1:
+            raise ValueError("rebalance_factor 必须大于 1")
+
+        self._boundaries: list[float] = [float(b) for b in boundaries]
+        self.rebalance_factor: float = rebalance_factor
+        self.rebalance_min_size: int = rebalance_min_size
+        self._prices: dict[str, float] = {}             # product_id - 价格
+        self._counts: list[int] = [0] * num_shards       # 每个分片的商品数
+        self._mutations_since_check: int = 0
+        self.rebalances: int = 0
+
+        context = mp_context or multiprocessing.get_context()
+        self._conns = []
+        self._processes = []
+        for _ in range(num_shards):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(target=_shard_worker, args=(child_conn, btree_order, composite_price_keys),
+                                      daemon=True)
+            process.start()
+            child_conn.close()
+            self._conns.append(parent_conn)
+            self._processes.append(process)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._prices)
+
+    @property
+    def num_shards(self) -> int:
+        return len(self._conns)
+
+    @property
+    def boundaries(self) -> list[float]:
+        """当前的分片边界"""
+        return list(self._boundaries)
+
+    def shard_sizes(self) -> list[int]:
+        """每个分片中的商品数"""
+        return list(self._counts)
+
+    def close(self) -> None:
+        """通知所有分片进程退出并等待它们结束"""
+        for conn in self._conns:
+            try:
+                conn.send(('close', ()))
+                conn.recv()
+            except (OSError, EOFError):
+                pass
+            conn.close()
+        for process in self._processes:
+            process.join()
+        self._conns = []
+        self._processes = []
+
+    # ---------------- 分片间的通信 ----------------
+    def _shard_for(self, price: float) -> int:
+        return bisect.bisect_right(self._boundaries, price)
+
+    def _shards_overlapping(self, min_price: float, max_price: float) -> range:
+        return range(self._shard_for(min_price), self._shard_for(max_price) + 1)
+
+    def _call(self, shard: int, command: str, *args):
+        return self._call_many([(shard, command, args)])[0]
+
+    def _call_many(self, calls: list[tuple]) -> list:
+        """先把全部 (分片, 命令, 参数) 发出去，再依次收集结果，使各分片并行执行"""
+        for shard, command, args in calls:
+            self._conns[shard].send((command, args))
+        results = [self._conns[shard].recv() for shard, _, _ in calls]
+        for ok, result in results:
+            if not ok:
+                raise result
+        return [result for _, result in results]
+
+    def _broadcast(self, shards, command: str, *args) -> list:
+        return self._call_many([(shard, command, args) for shard in shards])
+
+    # ---------------- 增删改 ----------------
+    def add_product(self, name: str, price: float, heat: float) -> Product | None:
+        """
+        向价格所在的分片添加新商品。自动生成id
+
+        返回:
+            成功则返回 Product 对象（分片进程中商品的副本），否则返回 None
+        """
+        if not isinstance(price, (int, float)):
+            return None
+        shard = self._shard_for(price)
+        product = self._call(shard, 'add_product', name, price, heat)
+        if product is not None:
+            self._prices[product.product_id] = product.price
+            self._counts[shard] += 1
+            self._after_mutation(1)
+        return product
+
+    def bulk_add_products(self, items, fill_factor: float = 1.0) -> list[Product]:
+        """
+        批量添加商品：先在主进程中过滤掉不合法的条目，再按价格分组并行地交给各分片的 bulk_add_products
+
+        返回:
+            list[Product]: 成功添加的商品，顺序与输入一致
+        """
+        groups = [[] for _ in range(self.num_shards)]
+        positions = [[] for _ in range(self.num_shards)]
+        count = 0
+        for name, price, heat in items:
+            try:
+                Product("validate", name, price, heat)
+            except ValueError:
+                continue
+            shard = self._shard_for(price)
+            groups[shard].append((name, price, heat))
+            positions[shard].append(count)
+            count += 1
+
+        shards = [shard for shard in range(self.num_shards) if groups[shard]]
+        results = self._call_many([(shard, 'bulk_add_products', (groups[shard], fill_factor)) for shard in shards])
+        added = [None] * count
+        for shard, products in zip(shards, results):
+            for position, product in zip(positions[shard], products):
+                added[position] = product
+                self._prices[product.product_id] = product.price
+            self._counts[shard] += len(products)
+        self._after_mutation(count)
+        return added
+
+    def get_product_by_id(self, product_id: str) -> Product | None:
+        """通过ID获取商品。"""
+        price = self._prices.get(product_id)
+        if price is None:
+            return None
+        return self._call(self._shard_for(price), 'get_product_by_id', product_id)
+
+    def delete_product(self, product_id: str) -> bool:
+        """通过ID删除商品。"""
+        price = self._prices.get(product_id)
+        if price is None:
+            return False
+        shard = self._shard_for(price)
+        if not self._call(shard, 'delete_product', product_id):
+            return False
+        del self._prices[product_id]
+        self._counts[shard] -= 1
+        self._after_mutation(1)
+        return True
+
+    def delete_products_in_price_range(self, min_price: float, max_price: float) -> list[Product]:
+        """删除价格在 [min_price, max_price] 区间内的所有商品，只在有重叠的分片上并行执行，返回按价格升序排列的被删除商品"""
+        if not (isinstance(min_price, (int, float)) and isinstance(max_price, (int, float))):
+            return []
+        shards = self._shards_overlapping(min_price, max_price)
+        removed = []
+        for shard, products in zip(shards, self._broadcast(shards, 'delete_products_in_price_range',
+                                                           min_price, max_price)):
+            for product in products:
+                del self._prices[product.product_id]
+            self._counts[shard] -= len(products)
+            removed.extend(products)
+        self._after_mutation(len(removed))
+        return removed
+
+    def update_product(self, product_id: str,
+                       new_name: str = None,
+                       new_price: float = None,
+                       new_heat: float = None) -> bool:
+        """更新商品信息。新价格落在别的分片时，把商品从原分片取出后放入新分片"""
+        price = self._prices.get(product_id)
+        if price is None:
+            return False
+        shard = self._shard_for(price)
+        if not self._call(shard, 'update_product', product_id, new_name, new_price, new_heat):
+            return False
+        if new_price is not None:
+            self._prices[product_id] = float(new_price)
+            new_shard = self._shard_for(new_price)
+            if new_shard != shard:
+                product = self._call(shard, 'pop', product_id)
+                self._call(new_shard, 'import', [product])
+                self._counts[shard] -= 1
+                self._counts[new_shard] += 1
+                self._after_mutation(1)
+        return True
+
+    # ---------------- 查询 ----------------
+    def search_by_price_range(self, min_price: float, max_price: float,
+                              limit: int = None, resume_after: tuple = None,
+                              order: str = "asc") -> list[Product]:
+        """
+        按价格范围搜索商品，参数含义与 ProductManager.search_by_price_range 相同
+        每个有重叠的分片各自最多返回 limit 个，按分片顺序（降序时逆序）拼接后截取前 limit 个
+        """
+        if not (isinstance(min_price, (int, float)) and isinstance(max_price, (int, float))):
+            return []
+        if limit is not None and (not isinstance(limit, int) or limit < 0):
+            return []
+        if order not in ("asc", "desc"):
+            return []
+        shards = list(self._shards_overlapping(min_price, max_price))
+        if order == "desc":
+            shards.reverse()
+        results = self._broadcast(shards, 'search_by_price_range', min_price, max_price, limit, resume_after, order)
+        merged = [product for products in results for product in products]
+        return merged if limit is None else merged[:limit]
+
+    def count_by_price_range(self, min_price: float, max_price: float) -> int:
+        """统计价格范围内的商品数量"""
+        if not (isinstance(min_price, (int, float)) and isinstance(max_price, (int, float))):
+            return 0
+        shards = self._shards_overlapping(min_price, max_price)
+        return sum(self._broadcast(shards, 'count_by_price_range', min_price, max_price))
+
+    def top_k_by_heat_in_price_range(self, min_price: float, max_price: float, k: int) -> list[Product]:
+        """各分片分别取价格范围内热度最高的 k 个，再归并出全局的前 k 个（按热度降序）"""
+        if not (isinstance(min_price, (int, float)) and isinstance(max_price, (int, float))):
+            return []
+        if not isinstance(k, int) or k <= 0:
+            return []
+        shards = self._shards_overlapping(min_price, max_price)
+        results = self._broadcast(shards, 'top_k_by_heat_in_price_range', min_price, max_price, k)
+        return heapq.nlargest(k, (product for products in results for product in products), key=lambda p: p.heat)
+
+    def get_price_quantile(self, q: float) -> float | None:
+        """返回全部商品价格的 q 分位数，先用各分片的商品数定位到分片，再在该分片内按排名选择"""
+        if not isinstance(q, (int, float)) or not (0 <= q <= 1):
+            return None
+        total = len(self._prices)
+        if total == 0:
+            return None
+        shard, rank = self._locate_rank(int(q * (total - 1)))
+        return self._call(shard, 'select', rank)
+
+    def _locate_rank(self, k: int) -> tuple[int, int]:
+        """全局第 k 个商品所在的分片和它在分片内的排名"""
+        for shard, count in enumerate(self._counts):
+            if k < count:
+                return shard, k
+            k -= count
+        raise IndexError("排名超出商品总数")
+
+    def recommend_products_by_prefix(self, name_prefix: str, k: int) -> list[Product]:
+        """各分片分别按热度取前k个匹配的商品，再归并出全局热度最高的k个；k为-1时返回所有匹配的商品"""
+        if not isinstance(name_prefix, str):
+            return []
+        if not isinstance(k, int) or k < -1:
+            return []
+        results = self._broadcast(range(self.num_shards), 'recommend_products_by_prefix', name_prefix, k)
+        candidates = [product for products in results for product in products]
+        candidates.sort(key=lambda p: p.heat, reverse=True)
+        return candidates if k == -1 else candidates[:k]
+
+    def count_by_name_prefix(self, name_prefix: str) -> int:
+        """统计名称以 name_prefix 开头的商品数量，各分片分别计数后求和"""
+        if not isinstance(name_prefix, str):
+            return 0
+        return sum(self._broadcast(range(self.num_shards), 'count_by_name_prefix', name_prefix))
+
+    def search_products_name(self, name: str) -> list[Product]:
+        """根据商品名称进行搜索，仅返回名称匹配的"""
+        results = self._broadcast(range(self.num_shards), 'search_products_name', name)
+        return [product for products in results for product in products]
+
+    # ---------------- 重新划分 ----------------
+    def _after_mutation(self, count: int) -> None:
+        self._mutations_since_check += count
+        total = len(self._prices)
+        if total < self.rebalance_min_size or self._mutations_since_check < self.rebalance_min_size:
+            return
+        self._mutations_since_check = 0
+        if max(self._counts) > self.rebalance_factor * total / self.num_shards:
+            self.rebalance()
+
+    def rebalance(self) -> None:
+        """
+        按全局价格分位数重新划分分片边界，使各分片的商品数接近，然后迁移越界的商品：
+        每个分片并行地用区间删除取出新边界之外的商品，再按新边界分组并行地插入目标分片，商品ID保持不变
+        同一价格的商品总在同一个分片中，因此大量商品价格相同时各分片不一定能完全均衡
+        """
+        total = len(self._prices)
+        if total == 0 or self.num_shards == 1:
+            return
+        ranks = [self._locate_rank(total * i // self.num_shards) for i in range(1, self.num_shards)]
+        new_boundaries = self._call_many([(shard, 'select', (rank,)) for shard, rank in ranks])
+        if new_boundaries == self._boundaries:
+            return
+
+        calls = []
+        for shard in range(self.num_shards):
+            low = new_boundaries[shard - 1] if shard > 0 else -math.inf
+            high = new_boundaries[shard] if shard < self.num_shards - 1 else math.inf
+            if low > -math.inf:
+                calls.append((shard, 'delete_products_in_price_range', (-math.inf, math.nextafter(low, -math.inf))))
+            if high < math.inf:
+                calls.append((shard, 'delete_products_in_price_range', (high, math.inf)))
+        self._boundaries = new_boundaries
+
+        moving = [[] for _ in range(self.num_shards)]
+        for (shard, _, _), products in zip(calls, self._call_many(calls)):
+            self._counts[shard] -= len(products)
+            for product in products:
+                moving[self._shard_for(product.price)].append(product)
+        imports = [(shard, 'import', (products,)) for shard, products in enumerate(moving) if products]
+        for (shard, _, _), count in zip(imports, self._call_many(imports)):
+            self._counts[shard] += count
+        self.rebalances += 1
@@ -0,0 +1,348 @@
+import os
+import re
+import time
+import zlib
+import struct
+import threading
+
+
+# ---------------- 日志文件格式 ----------------
+# 日志目录中有两种文件：
+#   wal-<序号>.log        日志段，只在末尾追加；段头之后是一条条记录
+#   snapshot-<序号>.snap  ProductManager.save 写出的快照，包含序号小于它的所有日志段中的修改
+# 恢复时读取序号最大的快照，再按序号顺序重放序号不小于它的日志段
+#
+# 每条记录由记录头和负载组成，记录头中的 CRC32 覆盖操作码和负载。负载是若干个字段，
+# 每个字段以一个类型字节开头：0 为 None，1 为 float（8 字节），2 为字符串（4 字节长度 + UTF-8）
+# 最后一个日志段末尾不完整或校验失败的记录是崩溃时没写完的，打开日志时被截掉；
+# 其他位置的损坏说明日志已不可信，直接报错
+_MAGIC = b'PMWALOG\x00'
+_VERSION = 1
+_SEGMENT_HEADER = struct.Struct('<8sHHQ')   # magic, 版本, 保留, 段序号
+_RECORD = struct.Struct('<IIB')             # 负载字节数, CRC32, 操作码
+_FLOAT_FIELD = struct.Struct('<Bd')
+_STR_FIELD = struct.Struct('<BI')
+_FIELD_NONE, _FIELD_FLOAT, _FIELD_STR = 0, 1, 2
+_SEGMENT_NAME = re.compile(r'^wal-(\d{8})\.log$')
+_SNAPSHOT_NAME = re.compile(r'^snapshot-(\d{8})\.snap$')
+
+OP_ADD = 1              # (product_id, name, price, heat)
+OP_UPDATE = 2           # (product_id, new_name, new_price, new_heat)，没有修改的字段为 None
+OP_DELETE = 3           # (product_id,)
+OP_DELETE_RANGE = 4     # (min_price, max_price)
+
+FSYNC_POLICIES = ('always', 'batch', 'never')
+
+
+def _encode_fields(fields) -> bytes:
+    parts = []
+    for field in fields:
+        if field is None:
+            parts.append(b'\x00')
+        elif isinstance(field, str):
+            data = field.encode('utf-8')
+            parts.append(_STR_FIELD.pack(_FIELD_STR, len(data)))
+            parts.append(data)
+        else:
+            parts.append(_FLOAT_FIELD.pack(_FIELD_FLOAT, field))
+    return b''.join(parts)
+
+
+def _decode_fields(payload: bytes) -> tuple:
+    fields = []
+    offset = 0
+    while offset < len(payload):
+        kind = payload[offset]
+        if kind == _FIELD_NONE:
+            fields.append(None)
+            offset += 1
+        elif kind == _FIELD_FLOAT:
+            fields.append(_FLOAT_FIELD.unpack_from(payload, offset)[1])
+            offset += _FLOAT_FIELD.size
+        elif kind == _FIELD_STR:
+            length = _STR_FIELD.unpack_from(payload, offset)[1]
+            offset += _STR_FIELD.size
+            fields.append(payload[offset:offset + length].decode('utf-8'))
+            offset += length
+        else:
+            raise ValueError(f"日志记录中有未知的字段类型 {kind}")
+    return tuple(fields)
+
+
+def encode_record(op: int, fields) -> bytes:
+    """把一次修改编码为一条日志记录"""
+    payload = _encode_fields(fields)
+    return _RECORD.pack(len(payload), zlib.crc32(payload, op), op) + payload
+
+
+class WriteAheadLog:
+    """
+    ProductManager 的预写日志，管理日志目录中的日志段和快照
+
+    写入采用组提交：append 把记录放进缓冲区，攒够 group_size 条时由 append 的调用方直接提交；
+    不满一批时由后台的提交线程在第一条未提交记录进入缓冲区 group_interval 秒后提交。
+    提交用一次 write 写出整批记录，再按 fsync 策略落盘：
+        always  每条记录都在 append 返回前写出并 fsync，返回时修改一定已经持久化
+        batch   append 返回时记录可能还在缓冲区中；每批 fsync 一次，崩溃（进程或机器）时丢失
+                最近约 group_interval 秒内、以及最多 group_size 条尚未提交的记录
+        never   每批记录只写给操作系统、不 fsync。进程崩溃时同样丢失最近约 group_interval 秒内尚未写出的记录；
+                机器崩溃或断电时还会丢失操作系统尚未写回磁盘的部分，这部分没有上限
+    需要确认某次修改已经持久化时调用 sync，它提交缓冲区中的全部记录后才返回。
+    提交线程把 write / fsync 的异常保存下来，在下一次 append、sync 或 close 时重新抛出
+    """
+
+    def __init__(self, directory: str, fsync: str = 'batch', group_size: int = 64,
+                 group_interval: float = 0.005, segment_bytes: int = 4 << 20):
+        """
+        打开（或创建）日志目录，此时还不读取日志段
+
+        参数:
+            directory (str): 日志目录
+            fsync (str): 落盘策略，'always' / 'batch' / 'never'
+            group_size (int): 组提交每批最多的记录数
+            group_interval (float): 记录在缓冲区中最长的停留时间（秒），由后台提交线程保证；为 0 时每次 append 都提交
+            segment_bytes (int): 日志段超过该大小后切换到新的日志段
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync 必须是 {FSYNC_POLICIES} 之一")
+        if not isinstance(group_size, int) or group_size < 1:
+            raise ValueError("group_size 必须是正整数")
+        if group_interval < 0 or segment_bytes <= _SEGMENT_HEADER.size:
+            raise ValueError("group_interval 不能为负数，segment_bytes 必须大于段头的大小")
+        os.makedirs(directory, exist_ok=True)
+        self.directory: str = directory
+        self.fsync: str = fsync
+        self.group_size: int = group_size
+        self.group_interval: float = group_interval
+        self.segment_bytes: int = segment_bytes
+        self._segments: list[int] = self._list_files(_SEGMENT_NAME)
+        self._file = None
+        self._file_size: int = 0
+        self._pending: list[bytes] = []
+        self._pending_since: float = 0.0
+        self.records_written: int = 0
+        self.syncs: int = 0
+        # 缓冲区、当前日志段和日志段列表由 _lock 保护；_wakeup 在缓冲区由空变为非空或关闭时唤醒提交线程
+        self._lock = threading.RLock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flusher: threading.Thread | None = None
+        self._flush_error: BaseException | None = None
+        self._closed: bool = False
+
+    # ---------------- 目录中的文件 ----------------
+    def _list_files(self, pattern) -> list[int]:
+        seqs = []
+        for name in os.listdir(self.directory):
+            match = pattern.match(name)
+            if match:
+                seqs.append(int(match.group(1)))
+        return sorted(seqs)
+
+    def segment_path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"wal-{seq:08d}.log")
+
+    def snapshot_path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"snapshot-{seq:08d}.snap")
+
+    def latest_snapshot(self) -> tuple[int, str] | None:
+        """返回序号最大的快照 (序号, 路径)，没有快照时返回 None"""
+        seqs = self._list_files(_SNAPSHOT_NAME)
+        return (seqs[-1], self.snapshot_path(seqs[-1])) if seqs else None
+
+    @property
+    def segment_count(self) -> int:
+        """目录中的日志段数量"""
+        return len(self._segments)
+
+    def _fsync_directory(self) -> None:
+        """新建、改名和删除文件之后同步目录项，否则崩溃后文件本身可能不见（不支持打开目录的平台跳过）"""
+        if self.fsync == 'never' or not hasattr(os, 'O_DIRECTORY'):
+            return
+        fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    # ---------------- 读取 ----------------
+    def _read_segment(self, seq: int) -> tuple[list, int, int]:
+        """
+        解析一个日志段，遇到不完整或校验失败的记录时停止
+
+        返回:
+            tuple: (记录 (操作码, 字段) 的列表, 最后一条完整记录之后的偏移, 文件大小)
+        """
+        with open(self.segment_path(seq), 'rb') as f:
+            data = f.read()
+        if len(data) < _SEGMENT_HEADER.size:       # 创建段时崩溃，段头都没有写完
+            return [], 0, len(data)
+        magic, version, _, header_seq = _SEGMENT_HEADER.unpack_from(data, 0)
+        if magic != _MAGIC or header_seq != seq:
+            raise ValueError(f"{self.segment_path(seq)} 不是可识别的日志段")
+        if version != _VERSION:
+            raise ValueError(f"不支持的日志版本 {version}")
+
+        records = []
+        offset = _SEGMENT_HEADER.size
+        while offset + _RECORD.size <= len(data):
+            length, crc, op = _RECORD.unpack_from(data, offset)
+            start = offset + _RECORD.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload, op) != crc:
+                break
+            records.append((op, _decode_fields(payload)))
+            offset = start + length
+        return records, offset, len(data)
+
+    def replay(self, start_seq: int = 0):
+        """
+        按顺序产出序号不小于 start_seq 的日志段中的全部记录 (操作码, 字段)
+        最后一个日志段末尾没写完的记录被忽略，其他日志段中间有损坏时抛出 ValueError
+        """
+        seqs = [seq for seq in self._segments if seq >= start_seq]
+        for i, seq in enumerate(seqs):
+            records, end, size = self._read_segment(seq)
+            if end < size and i != len(seqs) - 1:
+                raise ValueError(f"日志段 {self.segment_path(seq)} 在偏移 {end} 处损坏")
+            yield from records
+
+    # ---------------- 写入 ----------------
+    def _create_segment(self, seq: int) -> None:
+        self._file = open(self.segment_path(seq), 'wb')
+        self._file.write(_SEGMENT_HEADER.pack(_MAGIC, _VERSION, 0, seq))
+        self._file.flush()
+        if self.fsync != 'never':
+            os.fsync(self._file.fileno())
+        self._file_size = _SEGMENT_HEADER.size
+        self._segments.append(seq)
+        self._fsync_directory()
+
+    def _open_tail(self) -> None:
+        """第一次写入前打开最后一个日志段，截掉崩溃时没写完的尾部；它已被快照覆盖时新建一个日志段"""
+        snapshot = self.latest_snapshot()
+        snapshot_seq = snapshot[0] if snapshot else 1
+        if not self._segments or self._segments[-1] < snapshot_seq:
+            self._create_segment(max(snapshot_seq, self._segments[-1] + 1 if self._segments else 1))
+            return
+        seq = self._segments[-1]
+        _, end, size = self._read_segment(seq)
+        if end < _SEGMENT_HEADER.size:
+            self._segments.pop()
+            self._create_segment(seq)
+            return
+        self._file = open(self.segment_path(seq), 'r+b')
+        if end < size:
+            self._file.truncate(end)
+        self._file.seek(end)
+        self._file_size = end
+
+    def append(self, op: int, fields) -> None:
+        """追加一条记录，按组提交的条件决定是否立即提交（见类的说明）"""
+        self.extend([(op, fields)])
+
+    def extend(self, records) -> None:
+        """追加一组 (操作码, 字段) 记录，整组最多只触发一次提交"""
+        encoded = [encode_record(op, fields) for op, fields in records]
+        with self._lock:
+            self._raise_flush_error()
+            if not self._pending:
+                self._pending_since = time.monotonic()
+                self._wakeup.notify()
+            self._pending.extend(encoded)
+            self._commit_if_due()
+
+    def _commit_if_due(self) -> None:
+        if (self.fsync == 'always' or len(self._pending) >= self.group_size
+                or time.monotonic() - self._pending_since >= self.group_interval):
+            self._commit()
+        elif self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_loop, name="wal-flusher", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        """后台提交线程：第一条未提交记录进入缓冲区 group_interval 秒后提交整个缓冲区"""
+        with self._lock:
+            while not self._closed:
+                if not self._pending or self._flush_error is not None:
+                    self._wakeup.wait()
+                    continue
+                remaining = self._pending_since + self.group_interval - time.monotonic()
+                if remaining > 0:
+                    self._wakeup.wait(remaining)
+                    continue
+                try:
+                    self._commit()
+                except BaseException as e:          # 留给调用方的下一次 append / sync / close
+                    self._flush_error = e
+
+    def _raise_flush_error(self) -> None:
+        if self._flush_error is not None:
+            error, self._flush_error = self._flush_error, None
+            self._wakeup.notify()       # 让提交线程继续处理缓冲区中的记录
+            raise error
+
+    def sync(self) -> None:
+        """写出缓冲区中的全部记录并按策略落盘，返回时此前 append 的记录都已提交"""
+        with self._lock:
+            self._raise_flush_error()
+            self._commit()
+
+    def _commit(self) -> None:
+        """写出缓冲区中的全部记录并按策略落盘；日志段超过大小上限时切换到新的日志段。调用方持有 _lock"""
+        if not self._pending:
+            return
+        if self._file is None:
+            self._open_tail()
+        data = b''.join(self._pending)
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync != 'never':
+            os.fsync(self._file.fileno())
+        self.records_written += len(self._pending)
+        self.syncs += 1
+        self._file_size += len(data)
+        self._pending.clear()
+        if self._file_size >= self.segment_bytes:
+            self.rotate()
+
+    def rotate(self) -> int:
+        """
+        提交缓冲区后关闭当前日志段，之后的记录写入新的日志段
+
+        返回:
+            int: 新日志段的序号，此前的全部修改都在序号更小的日志段中
+        """
+        with self._lock:
+            self._commit()
+            if self._file is None:
+                self._open_tail()
+            self._file.close()
+            self._create_segment(self._segments[-1] + 1)
+            return self._segments[-1]
+
+    def discard_before(self, seq: int) -> None:
+        """快照写好之后删除它已经包含的日志段和更早的快照"""
+        with self._lock:
+            self._fsync_directory()     # 先确保新快照的目录项已经落盘
+            for old in [s for s in self._segments if s < seq]:
+                os.remove(self.segment_path(old))
+                self._segments.remove(old)
+            for old in self._list_files(_SNAPSHOT_NAME):
+                if old < seq:
+                    os.remove(self.snapshot_path(old))
+            self._fsync_directory()
+
+    def close(self) -> None:
+        """提交缓冲区、停止提交线程并关闭日志段"""
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+            try:
+                self.sync()
+            finally:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
@@ -1,8 +1,73 @@
+import itertools
+import math
 import unittest
+from array import array
 
 from src.data_structure.b_plus_tree import *
 from src.module.commodity_retrieval import *
 
+def _collect_leaves(testcase, node, depth, lower, upper, leaves, depths, short_rightmost=False):
+    """
+    递归检查子树的结构约束，并按顺序收集叶节点
+    short_rightmost 为 True 时允许最右叶节点低于最小填充（追加时的非对称分裂会留下一个较空的最右叶节点）
+    """
+    testcase.assertEqual(list(node.keys), sorted(node.keys))
+    for key in node.keys:
+        if lower is not None:
+            testcase.assertGreaterEqual(key, lower)
+        if upper is not None:
+            testcase.assertLess(key, upper)
+    if node.parent is not None:
+        # 内部节点分裂后左半部分有 order // 2 个键
+        min_keys = node.min_keys_for_node() if node.is_leaf else node.order // 2
+        if short_rightmost and node.is_leaf and node.next_leaf is None:
+            min_keys = 1
+        testcase.assertGreaterEqual(len(node.keys), min_keys)
+    testcase.assertLessEqual(len(node.keys), node.order)
+
+    if node.is_leaf:
+        testcase.assertEqual(len(node.keys), len(node.values))
+        leaves.append(node)
+        depths.add(depth)
+        return
+
+    testcase.assertEqual(len(node.children), len(node.keys) + 1)
+    bounds = [lower] + list(node.keys) + [upper]
+    for i, child in enumerate(node.children):
+        testcase.assertIs(child.parent, node)
+        _collect_leaves(testcase, child, depth + 1, bounds[i], bounds[i + 1], leaves, depths, short_rightmost)
+
+
+def _check_sizes(testcase, tree, node):
+    """递归检查每个节点记录的子树条目数，以及价格树中每个节点记录的最高热度"""
+    if node.is_leaf:
+        expected = tree._leaf_entry_count(node)
+    else:
+        expected = sum(_check_sizes(testcase, tree, child) for child in node.children)
+    testcase.assertEqual(node.size, expected)
+    if isinstance(tree, BPlusTreeProducts):
+        testcase.assertEqual(node.max_heat, tree._compute_max_heat(node))
+    return expected
+
+
+def assert_tree_valid(testcase, tree):
+    """检查整棵B+树的结构约束：键有序、分隔键正确、节点填充、父指针、叶子等深、叶节点链表以及子树条目数"""
+    testcase.assertIsNone(tree.root.parent)
+    _check_sizes(testcase, tree, tree.root)
+    leaves = []
+    depths = set()
+    _collect_leaves(testcase, tree.root, 0, None, None, leaves, depths, isinstance(tree, BPlusTreeID))
+    testcase.assertEqual(len(depths), 1)
+
+    testcase.assertEqual(tree.validate(), [])
+
+    testcase.assertIsNone(leaves[0].prev_leaf)
+    testcase.assertIsNone(leaves[-1].next_leaf)
+    for left, right in zip(leaves, leaves[1:]):
+        testcase.assertIs(left.next_leaf, right)
+        testcase.assertIs(right.prev_leaf, left)
+
+
 # --- 测试 BPlusTreeProducts ---
 class TestBPlusTreeProducts(unittest.TestCase):
     def setUp(self):
@@ -663,5 +728,845 @@ class TestBPlusTreeID(unittest.TestCase):
         self.assertTrue(tree.root.is_leaf)
         self.assertEqual(len(tree.root.keys), 0, f"Root keys not empty: {tree.root.keys}")
 
+# --- 测试节点类型 ---
+class TestBPlusTreeNodes(unittest.TestCase):
+    def test_01_slotted_node_types(self):
+        leaf = BPlusTreeLeafNode(4)
+        internal = BPlusTreeInternalNode(4)
+        self.assertTrue(leaf.is_leaf)
+        self.assertFalse(internal.is_leaf)
+        self.assertFalse(hasattr(leaf, '__dict__'))
+        self.assertFalse(hasattr(internal, '__dict__'))
+        self.assertFalse(hasattr(leaf, 'children'))
+        self.assertFalse(hasattr(internal, 'values'))
+        self.assertFalse(hasattr(internal, 'next_leaf'))
+        with self.assertRaises(ValueError):
+            BPlusTreeLeafNode(1)
+        with self.assertRaises(ValueError):
+            BPlusTreeInternalNode(1)
+
+    def test_02_binary_search_helpers(self):
+        leaf = BPlusTreeLeafNode(8)
+        leaf.keys = [1.0, 3.0, 5.0, 7.0]
+        self.assertEqual(leaf.find_key(5.0), 2)
+        self.assertEqual(leaf.find_key(4.0), -1)
+        self.assertEqual(leaf.find_key(9.0), -1)
+
+        internal = BPlusTreeInternalNode(8)
+        internal.keys = [10, 20, 30]
+        self.assertEqual(internal.child_index_for(5), 0)
+        self.assertEqual(internal.child_index_for(10), 1)   # 与分隔键相等的键属于右侧子树
+        self.assertEqual(internal.child_index_for(25), 2)
+        self.assertEqual(internal.child_index_for(99), 3)
+
+    def test_03_odd_order_deletes_keep_nodes_within_bounds(self):
+        import random
+        rng = random.Random(7)
+        for order in (3, 5, 7):
+            tree = BPlusTreeID(order)
+            products = [Product(f"p{i:05d}") for i in range(600)]
+            rng.shuffle(products)
+            for product in products:
+                tree.insert(product)
+            assert_tree_valid(self, tree)
+            rng.shuffle(products)
+            for i, product in enumerate(products):
+                self.assertTrue(tree.delete(product.product_id))
+                if i % 50 == 0:
+                    assert_tree_valid(self, tree)
+            self.assertTrue(tree.root.is_leaf)
+            self.assertEqual(tree.root.keys, [])
+
+    def test_04_large_order_lookups(self):
+        products = [Product(f"p{i:06d}", price=float(i % 500 + 1)) for i in range(3000)]
+        for order in (64, 256):
+            id_tree = BPlusTreeID(order)
+            price_tree = BPlusTreeProducts(order)
+            for product in products:
+                id_tree.insert(product)
+                price_tree.insert(product.price, product.product_id)
+            assert_tree_valid(self, id_tree)
+            assert_tree_valid(self, price_tree)
+            for product in products[::97]:
+                self.assertIs(id_tree.search(product.product_id), product)
+                self.assertIn(product.product_id, price_tree.search_exact(product.price))
+            self.assertEqual(len(price_tree.search_range(10.0, 20.0)), 11 * 6)
+
+
+# --- 测试惰性区间遍历与游标 ---
+class TestBPlusTreeRangeIteration(unittest.TestCase):
+    def setUp(self):
+        self.tree = BPlusTreeProducts(order=3)
+        self.entries = []
+        for i in range(120):
+            price = float(i % 40 + 1)
+            product_id = f"p{i:03d}"
+            self.tree.insert(price, product_id)
+            self.entries.append((price, product_id))
+
+    def test_01_iter_range_matches_search_range(self):
+        for low, high in [(0.0, 100.0), (5.0, 12.0), (7.0, 7.0), (12.5, 12.9), (50.0, 60.0), (20.0, 10.0)]:
+            self.assertEqual(list(self.tree.iter_range(low, high)), self.tree.search_range(low, high))
+
+    def test_02_iter_range_is_lazy(self):
+        iterator = self.tree.iter_range(1.0, 40.0)
+        first = [next(iterator) for _ in range(4)]
+        self.assertEqual(first, self.tree.search_range(1.0, 40.0)[:4])
+
+    def test_03_cursor_fetch_in_pages(self):
+        expected = [(price, pid) for price in sorted({p for p, _ in self.entries}) if 3.0 <= price <= 30.0
+                    for pid in self.tree.search_exact(price)]
+        cursor = self.tree.range_cursor(3.0, 30.0)
+        pages = []
+        while not cursor.exhausted:
+            page = cursor.fetch(7)
+            self.assertLessEqual(len(page), 7)
+            pages.extend(page)
+        self.assertEqual(pages, expected)
+        self.assertEqual(cursor.fetch(7), [])
+        self.assertEqual(list(self.tree.range_cursor(3.0, 30.0)), expected)
+
+    def test_04_cursor_resume_after(self):
+        expected = list(self.tree.range_cursor(0.0, 100.0))
+        collected = []
+        anchor = None
+        while True:
+            page = self.tree.range_cursor(0.0, 100.0, resume_after=anchor).fetch(5)
+            if not page:
+                break
+            collected.extend(page)
+            anchor = page[-1]
+        self.assertEqual(collected, expected)
+
+        # 锚点商品已被删除时，从下一个价格继续
+        price, product_id = expected[10]
+        self.tree.delete(price, product_id)
+        resumed = self.tree.range_cursor(0.0, 100.0, resume_after=(price, product_id)).fetch(1)
+        self.assertGreater(resumed[0][0], price)
+
+        # 锚点在区间下界之前时，从下界开始
+        self.assertEqual(self.tree.range_cursor(10.0, 11.0, resume_after=(2.0, "p001")).fetch(1)[0][0], 10.0)
+        self.assertTrue(self.tree.range_cursor(5.0, 1.0).exhausted)
+
+    def test_05_iter_range_desc_is_reverse_of_ascending(self):
+        for low, high in [(0.0, 100.0), (5.0, 12.0), (7.0, 7.0), (12.5, 12.9), (50.0, 60.0), (20.0, 10.0)]:
+            self.assertEqual(list(self.tree.iter_range_desc(high, low)), self.tree.search_range(low, high)[::-1])
+
+        iterator = self.tree.iter_range_desc(40.0, 1.0)
+        self.assertEqual([next(iterator) for _ in range(3)], self.tree.search_exact(40.0)[::-1])
+
+    def test_06_iter_range_desc_resume_after(self):
+        expected = list(self.tree.iter_range_desc(35.0, 4.0))
+        prices = {pid: price for price, pid in self.entries}
+        collected = []
+        anchor = None
+        while True:
+            page = list(itertools.islice(self.tree.iter_range_desc(35.0, 4.0, resume_after=anchor), 4))
+            if not page:
+                break
+            collected.extend(page)
+            anchor = (prices[page[-1]], page[-1])
+        self.assertEqual(collected, expected)
+
+
+# --- 测试顺序统计 ---
+class TestBPlusTreeOrderStatistics(unittest.TestCase):
+    def _sorted_prices(self, entries):
+        return sorted(price for price, _ in entries)
+
+    def test_01_rank_count_select_match_brute_force(self):
+        import random
+        rng = random.Random(3)
+        for order in (2, 3, 4, 8):
+            tree = BPlusTreeProducts(order)
+            entries = []
+            for i in range(300):
+                entry = (float(rng.randint(1, 60)), f"p{i}")
+                entries.append(entry)
+                tree.insert(*entry)
+            for entry in rng.sample(entries, 120):
+                entries.remove(entry)
+                self.assertTrue(tree.delete(*entry))
+            assert_tree_valid(self, tree)
+
+            prices = self._sorted_prices(entries)
+            self.assertEqual(len(tree), len(prices))
+            for probe in (0.5, 1.0, 17.0, 17.5, 33.0, 60.0, 61.0):
+                self.assertEqual(tree.rank(probe), sum(1 for p in prices if p < probe))
+            for low, high in ((1.0, 60.0), (10.0, 20.0), (15.5, 15.9), (30.0, 30.0), (50.0, 40.0)):
+                self.assertEqual(tree.count_range(low, high), len(tree.search_range(low, high)))
+            for k in range(len(prices)):
+                self.assertEqual(tree.select(k), prices[k])
+            self.assertEqual(tree.select(-1), prices[-1])
+
+    def test_02_select_out_of_range(self):
+        tree = BPlusTreeProducts(3)
+        with self.assertRaises(IndexError):
+            tree.select(0)
+        tree.insert(5.0, "a")
+        self.assertEqual(tree.select(0), 5.0)
+        with self.assertRaises(IndexError):
+            tree.select(1)
+        with self.assertRaises(IndexError):
+            tree.select(-2)
+
+    def test_03_sizes_after_bulk_load_and_id_tree(self):
+        tree = BPlusTreeProducts.bulk_load([(float(i // 3), f"p{i}") for i in range(90)], order=4)
+        assert_tree_valid(self, tree)
+        self.assertEqual(len(tree), 90)
+        self.assertEqual(tree.count_range(10.0, 19.0), 30)
+        self.assertEqual(tree.select(45), 15.0)
+
+        id_tree = BPlusTreeID(3)
+        for i in range(50):
+            id_tree.insert(Product(f"p{i:02d}"))
+        self.assertEqual(len(id_tree), 50)
+        id_tree.delete("p10")
+        self.assertEqual(len(id_tree), 49)
+        assert_tree_valid(self, id_tree)
+
+
+# --- 测试热度聚合与 top-k ---
+class TestBPlusTreeHeatAggregates(unittest.TestCase):
+    def _brute_force(self, entries, low, high, k):
+        in_range = [(heat, pid) for pid, (price, heat) in entries.items() if low <= price <= high]
+        in_range.sort(key=lambda item: -item[0])
+        return [heat for heat, _ in in_range[:k]]
+
+    def test_01_top_k_matches_brute_force_under_updates(self):
+        import random
+        rng = random.Random(11)
+        for order in (2, 3, 5, 16):
+            tree = BPlusTreeProducts(order)
+            entries = {}
+            for i in range(250):
+                pid = f"p{i}"
+                price, heat = float(rng.randint(1, 50)), float(rng.randint(0, 1000))
+                entries[pid] = (price, heat)
+                tree.insert(price, pid, heat)
+            for pid in rng.sample(sorted(entries), 80):
+                price, _ = entries.pop(pid)
+                self.assertTrue(tree.delete(price, pid))
+            for pid in rng.sample(sorted(entries), 80):
+                price, _ = entries[pid]
+                heat = float(rng.randint(0, 1000))
+                entries[pid] = (price, heat)
+                self.assertTrue(tree.update_heat(price, pid, heat))
+            assert_tree_valid(self, tree)
+
+            heats = {pid: heat for pid, (_, heat) in entries.items()}
+            for low, high, k in ((1.0, 50.0, 10), (10.0, 20.0, 5), (7.0, 7.0, 3), (30.0, 45.0, 1000), (20.0, 10.0, 3)):
+                result = tree.top_k_by_heat(low, high, k)
+                self.assertEqual([heats[pid] for pid in result], self._brute_force(entries, low, high, k))
+                self.assertTrue(all(low <= entries[pid][0] <= high for pid in result))
+
+    def test_02_update_heat_missing_entry(self):
+        tree = BPlusTreeProducts(3)
+        tree.insert(10.0, "a", 5.0)
+        self.assertFalse(tree.update_heat(10.0, "b", 1.0))
+        self.assertFalse(tree.update_heat(11.0, "a", 1.0))
+        self.assertEqual(tree.top_k_by_heat(0.0, 100.0, 0), [])
+        self.assertEqual(tree.root.max_heat, 5.0)
+        tree.delete(10.0, "a")
+        self.assertEqual(tree.root.max_heat, float('-inf'))
+
+    def test_03_bulk_load_with_heat(self):
+        items = [(float(i // 4), f"p{i}", float(i % 17)) for i in range(200)]
+        tree = BPlusTreeProducts.bulk_load(items, order=4)
+        assert_tree_valid(self, tree)
+        self.assertEqual(tree.root.max_heat, 16.0)
+        top = tree.top_k_by_heat(10.0, 20.0, 3)
+        self.assertEqual([tree._heats[pid] for pid in top], [16.0, 16.0, 15.0])
+
+
+# --- 测试批量构建 ---
+class TestBPlusTreeBulkLoad(unittest.TestCase):
+    def test_01_products_bulk_load_matches_inserts(self):
+        items = sorted((float(i % 37 + 1), f"p{i:04d}") for i in range(400))
+        for order in (2, 3, 4, 7, 32):
+            for fill_factor in (0.5, 0.7, 1.0):
+                tree = BPlusTreeProducts.bulk_load(items, order=order, fill_factor=fill_factor)
+                assert_tree_valid(self, tree)
+                self.assertEqual(sorted(tree.search_range(0.0, 100.0)), sorted(pid for _, pid in items))
+                self.assertEqual(sorted(tree.search_exact(5.0)), sorted(pid for price, pid in items if price == 5.0))
+
+    def test_02_products_bulk_load_then_modify(self):
+        items = [(float(i), f"p{i}") for i in range(1, 200)]
+        tree = BPlusTreeProducts.bulk_load(items, order=4, fill_factor=0.75)
+        for i in range(1, 200, 3):
+            self.assertTrue(tree.delete(float(i), f"p{i}"))
+        tree.insert(0.5, "p_new")
+        tree.insert(150.0, "p_dup")
+        assert_tree_valid(self, tree)
+        self.assertEqual(tree.search_exact(0.5), ["p_new"])
+        self.assertEqual(sorted(tree.search_exact(150.0)), ["p150", "p_dup"])
+        self.assertEqual(tree.search_exact(1.0), [])
+
+    def test_03_products_bulk_load_edge_cases(self):
+        empty = BPlusTreeProducts.bulk_load([], order=3)
+        self.assertTrue(empty.root.is_leaf)
+        self.assertEqual(empty.search_range(0, 100), [])
+
+        single = BPlusTreeProducts.bulk_load([(1.0, "a"), (1.0, "b")], order=3)
+        self.assertTrue(single.root.is_leaf)
+        self.assertEqual(single.search_exact(1.0), ["a", "b"])
+
+        with self.assertRaises(ValueError):
+            BPlusTreeProducts.bulk_load([(2.0, "a"), (1.0, "b")], order=3)
+        with self.assertRaises(ValueError):
+            BPlusTreeProducts.bulk_load([(1.0, "a")], order=3, fill_factor=0)
+        with self.assertRaises(ValueError):
+            BPlusTreeProducts.bulk_load([(1.0, "a")], order=3, fill_factor=1.5)
+
+    def test_04_id_bulk_load(self):
+        products = [Product(f"prod_{i:05d}", price=float(i + 1)) for i in range(500)]
+        for order in (2, 3, 5, 64):
+            tree = BPlusTreeID.bulk_load(products, order=order, fill_factor=0.8)
+            assert_tree_valid(self, tree)
+            for product in products[::17]:
+                self.assertIs(tree.search(product.product_id), product)
+            self.assertIsNone(tree.search("prod_missing"))
+
+        tree = BPlusTreeID.bulk_load(products, order=3)
+        for product in products[:250]:
+            self.assertTrue(tree.delete(product.product_id))
+        assert_tree_valid(self, tree)
+        self.assertIs(tree.search(products[300].product_id), products[300])
+
+    def test_05_id_bulk_load_rejects_bad_input(self):
+        with self.assertRaises(TypeError):
+            BPlusTreeID.bulk_load(["not_a_product"], order=3)
+        with self.assertRaises(ValueError):
+            BPlusTreeID.bulk_load([Product("b"), Product("a")], order=3)
+        with self.assertRaises(ValueError):
+            BPlusTreeID.bulk_load([Product("a"), Product("a")], order=3)
+
+    def test_06_chunk_sizes_respect_bounds(self):
+        for order in range(2, 12):
+            min_keys = math.ceil(order / 2)
+            for total in range(order + 1, 120):
+                for target in range(min_keys, order + 1):
+                    sizes = BaseBPlusTree._chunk_sizes(total, target, min_keys, order)
+                    self.assertEqual(sum(sizes), total)
+                    self.assertGreaterEqual(len(sizes), 2)
+                    self.assertTrue(all(min_keys <= size <= order for size in sizes), (order, total, target, sizes))
+
+
+# --- 测试 (price, product_id) 复合键模式 ---
+class TestBPlusTreeCompositeKeys(unittest.TestCase):
+    def _build(self, order, n=300, seed=5):
+        import random
+        rng = random.Random(seed)
+        tree = BPlusTreeProducts(order, composite_keys=True)
+        entries = {}
+        for i in range(n):
+            pid = f"p{rng.randint(0, 10 ** 6):07d}_{i}"
+            price, heat = float(rng.randint(1, 30)), float(rng.randint(0, 500))
+            entries[pid] = (price, heat)
+            tree.insert(price, pid, heat)
+        return tree, entries, rng
+
+    def test_01_queries_match_sorted_entries(self):
+        for order in (2, 3, 5, 16):
+            tree, entries, rng = self._build(order)
+            for pid in rng.sample(sorted(entries), 120):
+                price, _ = entries.pop(pid)
+                self.assertTrue(tree.delete(price, pid))
+                self.assertFalse(tree.delete(price, pid))
+            assert_tree_valid(self, tree)
+
+            ordered = sorted((price, pid) for pid, (price, _) in entries.items())
+            for low, high in ((0.0, 100.0), (5.0, 12.0), (7.0, 7.0), (12.5, 12.9), (20.0, 10.0)):
+                expected = [pid for price, pid in ordered if low <= price <= high]
+                self.assertEqual(tree.search_range(low, high), expected)
+                self.assertEqual(list(tree.iter_range(low, high)), expected)
+                self.assertEqual(list(tree.iter_range_desc(high, low)), expected[::-1])
+                self.assertEqual(tree.count_range(low, high), len(expected))
+            self.assertEqual(tree.search_exact(7.0), [pid for price, pid in ordered if price == 7.0])
+            self.assertEqual([tree.select(k) for k in range(len(ordered))], [price for price, _ in ordered])
+            self.assertEqual(tree.rank(10.0), sum(1 for price, _ in ordered if price < 10.0))
+
+            heats = {pid: heat for pid, (_, heat) in entries.items()}
+            top = tree.top_k_by_heat(5.0, 20.0, 7)
+            expected_heats = sorted((heat for pid, (price, heat) in entries.items() if 5.0 <= price <= 20.0), reverse=True)
+            self.assertEqual([heats[pid] for pid in top], expected_heats[:7])
+
+    def test_02_cursor_and_desc_resume(self):
+        tree, entries, _ = self._build(4)
+        expected = list(tree.range_cursor(3.0, 25.0))
+        self.assertEqual([pid for _, pid in expected], tree.search_range(3.0, 25.0))
+        collected = []
+        anchor = None
+        while True:
+            page = tree.range_cursor(3.0, 25.0, resume_after=anchor).fetch(9)
+            if not page:
+                break
+            collected.extend(page)
+            anchor = page[-1]
+        self.assertEqual(collected, expected)
+
+        # 锚点被删除后，复合键仍然能精确定位到它之后的位置
+        price, pid = expected[20]
+        tree.delete(price, pid)
+        self.assertEqual(tree.range_cursor(3.0, 25.0, resume_after=(price, pid)).fetch(1), [expected[21]])
+        descending = list(tree.iter_range_desc(25.0, 3.0, resume_after=expected[22]))
+        self.assertEqual(descending, [p for _, p in expected[:22] if p != pid][::-1])
+
+    def test_03_duplicates_heat_and_bulk_load(self):
+        tree = BPlusTreeProducts(3, composite_keys=True)
+        tree.insert(10.0, "a", 1.0)
+        tree.insert(10.0, "a", 1.0)
+        self.assertEqual(len(tree), 1)
+        self.assertTrue(tree.update_heat(10.0, "a", 9.0))
+        self.assertFalse(tree.update_heat(10.0, "b", 9.0))
+        self.assertEqual(tree.search_exact(10.0, "a"), ["a"])
+        self.assertEqual(tree.search_exact(10.0, "b"), [])
+        self.assertEqual(tree.root.max_heat, 9.0)
+
+        items = [(float(i // 10), f"p{i:04d}", float(i % 13)) for i in range(500)]
+        for order in (2, 3, 8):
+            loaded = BPlusTreeProducts.bulk_load(items, order=order, fill_factor=0.7, composite_keys=True)
+            assert_tree_valid(self, loaded)
+            self.assertEqual(loaded.search_range(0.0, 100.0), [pid for _, pid, _ in items])
+            for i in range(0, 500, 3):
+                self.assertTrue(loaded.delete(float(i // 10), f"p{i:04d}"))
+            assert_tree_valid(self, loaded)
+
+        with self.assertRaises(ValueError):
+            BPlusTreeProducts.bulk_load([(1.0, "b"), (1.0, "a")], order=3, composite_keys=True)
+        with self.assertRaises(ValueError):
+            BPlusTreeProducts.bulk_load([(1.0, "a"), (1.0, "a")], order=3, composite_keys=True)
+
+    def test_04_large_bucket_deletes(self):
+        tree = BPlusTreeProducts(16, composite_keys=True)
+        ids = [f"p{i:05d}" for i in range(5000)]
+        for pid in ids:
+            tree.insert(99.0, pid)
+        for pid in ids[::2]:
+            self.assertTrue(tree.delete(99.0, pid))
+        assert_tree_valid(self, tree)
+        self.assertEqual(tree.search_exact(99.0), ids[1::2])
+        self.assertEqual(tree.count_range(99.0, 99.0), 2500)
+
+
+# --- 测试最右叶节点追加快速路径 ---
+class TestBPlusTreeAppendPath(unittest.TestCase):
+    def _leaf_fill(self, tree):
+        leaves = []
+        leaf = tree._first_leaf()
+        while leaf is not None:
+            leaves.append(len(leaf.keys))
+            leaf = leaf.next_leaf
+        return sum(leaves[:-1]) / (tree.order * (len(leaves) - 1))
+
+    def test_01_monotonic_inserts_skip_descent_and_pack_leaves(self):
+        tree = BPlusTreeID(order=20)
+        descents = []
+        original = tree._find_leaf_node
+        tree._find_leaf_node = lambda key: descents.append(key) or original(key)
+        products = [Product(f"PROD-{i:06d}") for i in range(2000)]
+        for product in products:
+            tree.insert(product)
+        self.assertEqual(descents, [])
+        del tree._find_leaf_node
+        assert_tree_valid(self, tree)
+        self.assertGreaterEqual(self._leaf_fill(tree), 0.9)
+        for product in products[::37]:
+            self.assertIs(tree.search(product.product_id), product)
+
+        baseline = BPlusTreeID(order=20)
+        baseline.rightmost_append = False
+        for product in products:
+            baseline.insert(product)
+        assert_tree_valid(self, baseline)
+        self.assertLess(self._leaf_fill(baseline), 0.6)
+
+    def test_02_mixed_workload_keeps_cache_consistent(self):
+        import random
+        rng = random.Random(8)
+        for order in (2, 3, 4, 7):
+            tree = BPlusTreeID(order)
+            alive = {}
+            counter = 0
+            for step in range(1500):
+                action = rng.random()
+                if action < 0.55:
+                    counter += 1
+                    product = Product(f"P{counter:06d}")            # 单调递增的ID
+                elif action < 0.7:
+                    product = Product(f"P{rng.randint(0, counter):06d}x")  # 插入到中间
+                else:
+                    if alive:
+                        product_id = rng.choice(sorted(alive))
+                        self.assertTrue(tree.delete(product_id))
+                        del alive[product_id]
+                    continue
+                if product.product_id in alive:
+                    continue
+                tree.insert(product)
+                alive[product.product_id] = product
+            assert_tree_valid(self, tree)
+            self.assertEqual(len(tree), len(alive))
+            self.assertEqual([key for key, _ in tree._iter_leaf_items()], sorted(alive))
+            self.assertIs(tree._get_rightmost_leaf().next_leaf, None)
+            self.assertEqual(tree._get_rightmost_leaf().keys[-1], max(alive))
+
+
+# --- 测试写时复制快照 ---
+class TestBPlusTreeSnapshots(unittest.TestCase):
+    def _nodes(self, root):
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            yield node
+            if not node.is_leaf:
+                stack.extend(node.children)
+
+    def test_01_products_snapshots_stay_consistent(self):
+        import random
+        for composite_keys in (False, True):
+            for order in (2, 3, 5):
+                rng = random.Random(order)
+                tree = BPlusTreeProducts(order, composite_keys=composite_keys)
+                entries = {}
+                snapshots = []
+                for step in range(900):
+                    if entries and rng.random() < 0.4:
+                        pid = rng.choice(sorted(entries))
+                        self.assertTrue(tree.delete(entries.pop(pid), pid))
+                    else:
+                        pid = f"p{step:04d}"
+                        entries[pid] = float(rng.randint(1, 40))
+                        tree.insert(entries[pid], pid, float(step))
+                    if step % 150 == 0:
+                        expected = sorted((price, pid) for pid, price in entries.items())
+                        snapshots.append((tree.snapshot(), expected))
+                assert_tree_valid(self, tree)
+
+                for snapshot, expected in snapshots:
+                    self.assertEqual(len(snapshot), len(expected))
+                    self.assertEqual(sorted(snapshot.search_range(0.0, 100.0)), sorted(pid for _, pid in expected))
+                    self.assertEqual(snapshot.count_range(10.0, 20.0), sum(1 for price, _ in expected if 10.0 <= price <= 20.0))
+                    self.assertEqual(sorted(snapshot.search_exact(7.0)), sorted(pid for price, pid in expected if price == 7.0))
+                    if expected:
+                        self.assertEqual(snapshot.select(len(expected) // 2), expected[len(expected) // 2][0])
+                        price, pid = expected[0]
+                        self.assertEqual(snapshot.search_exact(price, pid), [pid])
+                    if composite_keys:
+                        self.assertEqual(snapshot.search_range(5.0, 25.0),
+                                         [pid for price, pid in expected if 5.0 <= price <= 25.0])
+                    self.assertEqual(list(snapshot.iter_range(30.0, 20.0)), [])
+
+    def test_02_writes_copy_only_the_modified_path(self):
+        products = [Product(f"prod_{i:05d}") for i in range(2000)]
+        tree = BPlusTreeID.bulk_load(products, order=8)
+        snapshot = tree.snapshot()
+        frozen = {id(node) for node in self._nodes(snapshot.root)}
+
+        tree.insert(Product("prod_00500x"))
+        copied = [node for node in self._nodes(tree.root) if id(node) not in frozen]
+        height = 1
+        node = tree.root
+        while not node.is_leaf:
+            node = node.children[0]
+            height += 1
+        self.assertLessEqual(len(copied), height + 2)         # 路径上的节点，外加可能的一次分裂
+
+        for product in products[::3]:
+            self.assertTrue(tree.delete(product.product_id))
+        tree.insert(Product("prod_99999"))
+        assert_tree_valid(self, tree)
+        self.assertEqual(len(snapshot), 2000)
+        self.assertEqual([key for key, _ in snapshot._iter_leaf_items()], [p.product_id for p in products])
+        self.assertIs(snapshot.search("prod_00000"), products[0])
+        self.assertIsNone(snapshot.search("prod_00500x"))
+        self.assertIsNone(tree.search("prod_00000"))
+        self.assertEqual(tree.search("prod_99999").product_id, "prod_99999")
+
+    def test_03_heat_updates_after_snapshot(self):
+        tree = BPlusTreeProducts(3)
+        for i in range(50):
+            tree.insert(float(i % 10), f"p{i}", float(i))
+        snapshot = tree.snapshot()
+        self.assertTrue(tree.update_heat(3.0, "p3", 1000.0))
+        tree.insert(3.0, "new", 5.0)
+        self.assertEqual(tree.top_k_by_heat(0.0, 10.0, 1), ["p3"])
+        assert_tree_valid(self, tree)
+        self.assertEqual(sorted(snapshot.search_exact(3.0)), sorted(f"p{i}" for i in range(3, 50, 10)))
+
+
+
+class TestBPlusTreeBatchOps(unittest.TestCase):
+    def test_01_products_batches_match_single_operations(self):
+        rng = __import__('random').Random(13)
+        for composite_keys in (False, True):
+            for order in (3, 4, 16):
+                with self.subTest(order=order, composite_keys=composite_keys):
+                    batched = BPlusTreeProducts(order, composite_keys=composite_keys)
+                    single = BPlusTreeProducts(order, composite_keys=composite_keys)
+                    entries = {}
+                    for round_ in range(4):
+                        batch = [(float(rng.randint(1, 40)), f"p{round_}-{i}", float(rng.randint(0, 999)))
+                                 for i in range(rng.randint(1, 400))]
+                        batched.insert_many(batch)
+                        for price, pid, heat in batch:
+                            single.insert(price, pid, heat)
+                            entries[pid] = price
+                        assert_tree_valid(self, batched)
+
+                        victims = rng.sample(sorted(entries), len(entries) // 2) + ["missing"]
+                        batch = [(entries.pop(pid, 1.0), pid) for pid in victims]
+                        self.assertEqual(batched.delete_many(batch), len(victims) - 1)
+                        for price, pid in batch[:-1]:
+                            single.delete(price, pid)
+                        assert_tree_valid(self, batched)
+                        self.assertEqual(list(batched._iter_entries()), list(single._iter_entries()))
+                        self.assertEqual([batched._heats[pid] for pid in batched.top_k_by_heat(1.0, 40.0, 5)],
+                                         [single._heats[pid] for pid in single.top_k_by_heat(1.0, 40.0, 5)])
+
+                    batched.delete_many([(price, pid) for pid, price in entries.items()])
+                    assert_tree_valid(self, batched)
+                    self.assertEqual(len(batched), 0)
+
+    def test_02_id_batches_and_descents(self):
+        tree = BPlusTreeID(8)
+        tree.insert_many(Product(f"prod_{i:05d}") for i in range(0, 3000, 2))
+        tree.insert_many(Product(f"prod_{i:05d}") for i in range(1, 3000, 2))
+        assert_tree_valid(self, tree)
+        self.assertEqual([key for key, _ in tree._iter_leaf_items()], [f"prod_{i:05d}" for i in range(3000)])
+
+        # 同一叶节点中的键共用一次下降
+        descents = []
+        original = tree._find_leaf_and_fence
+        tree._find_leaf_and_fence = lambda key: descents.append(key) or original(key)
+        self.assertEqual(tree.delete_many(f"prod_{i:05d}" for i in range(1000, 1100)), 100)
+        self.assertLess(len(descents), 100 // 4)
+        self.assertEqual(tree.delete_many(["prod_01000", "nope"]), 0)
+        assert_tree_valid(self, tree)
+
+        tree.insert(Product("prod_99999"))                  # 批量操作后最右叶节点的缓存仍然正确
+        assert_tree_valid(self, tree)
+        self.assertEqual(len(tree), 2901)
+        with self.assertRaises(TypeError):
+            tree.insert_many(["prod_x"])
+
+
+    def test_03_delete_range(self):
+        rng = __import__('random').Random(14)
+        for composite_keys in (False, True):
+            for order in (3, 4, 7):
+                with self.subTest(order=order, composite_keys=composite_keys):
+                    tree = BPlusTreeProducts(order, composite_keys=composite_keys)
+                    entries = {}
+                    for i in range(600):
+                        price = float(rng.randint(1, 200))
+                        entries[f"p{i}"] = price
+                        tree.insert(price, f"p{i}", float(i))
+                    snapshot = tree.snapshot()
+                    for low, high in ((50.0, 120.0), (0.0, 10.0), (190.0, 500.0), (77.0, 77.0), (60.0, 59.0),
+                                      (30.0, 45.5), (0.0, 1000.0)):
+                        expected = sorted((price, pid) for pid, price in entries.items() if low <= price <= high)
+                        removed = tree.delete_range(low, high)
+                        self.assertEqual(sorted(removed), sorted(pid for _, pid in expected))
+                        for _, pid in expected:
+                            del entries[pid]
+                        assert_tree_valid(self, tree)
+                        self.assertEqual(sorted(tree.search_range(0.0, 1000.0)), sorted(entries))
+                        self.assertEqual(tree._heats.keys(), entries.keys())
+                        if entries:
+                            hottest = max(entries, key=lambda pid: int(pid[1:]))
+                            self.assertEqual(tree.top_k_by_heat(0.0, 1000.0, 1), [hottest])
+                    self.assertEqual(len(tree), 0)
+                    tree.insert(5.0, "again")
+                    self.assertEqual(tree.search_exact(5.0), ["again"])
+                    self.assertEqual(len(snapshot), 600)
+
+    def test_04_delete_range_randomized(self):
+        """小树上的随机区间删除：修复下溢时父节点可能级联地被合并进兄弟，与列表模型比对并校验结构"""
+        for seed in range(150):
+            rng = __import__('random').Random(seed)
+            composite_keys, float_keys = rng.choice(((False, False), (True, False), (False, True)))
+            order = rng.choice((3, 4, 5))
+            with self.subTest(seed=seed, order=order, composite_keys=composite_keys, float_keys=float_keys):
+                tree = BPlusTreeProducts(order, composite_keys=composite_keys, float_keys=float_keys)
+                model = []
+                for i in range(40):
+                    price = float(rng.randint(1, 30))
+                    model.append((price, f"p{i}"))
+                    tree.insert(price, f"p{i}", float(i))
+                for _ in range(5):
+                    low = float(rng.randint(1, 30))
+                    high = float(rng.randint(int(low), 30))
+                    removed = tree.delete_range(low, high)
+                    self.assertEqual(sorted(removed), sorted(pid for price, pid in model if low <= price <= high))
+                    model = [(price, pid) for price, pid in model if not low <= price <= high]
+                    self.assertEqual(tree.validate(), [])
+                    self.assertEqual(sorted(tree.search_range(0.0, 100.0)), sorted(pid for _, pid in model))
+                    self.assertEqual(len(tree), len(model))
+
+
+class TestBPlusTreeFrontCodedKeys(unittest.TestCase):
+    def test_01_front_coded_keys_search_and_edit(self):
+        keys = FrontCodedKeys(["PROD-0010", "PROD-0012", "PROD-0020", "PROD-0300"])
+        self.assertEqual(keys.prefix, "PROD-0")
+        self.assertEqual(keys, ["PROD-0010", "PROD-0012", "PROD-0020", "PROD-0300"])
+        self.assertEqual((keys[0], keys[-1], keys[1:3]), ("PROD-0010", "PROD-0300", ["PROD-0012", "PROD-0020"]))
+        for key in ("PROD-0012", "PROD-00", "PROD-0015", "PROD-1", "PROA", "PROZ", "", "PROD-0300x"):
+            expected = __import__('bisect').bisect_left(list(keys), key)
+            self.assertEqual(keys.bisect_left(key), expected, key)
+            self.assertEqual(keys.find(key), expected if key in list(keys) else -1, key)
+
+        keys.insert(0, "PROD-1000")           # 公共前缀缩短后重新编码
+        self.assertEqual(keys.prefix, "PROD-")
+        del keys[0]
+        keys.append("PROD-0301")
+        self.assertEqual(keys.pop(0), "PROD-0010")
+        self.assertEqual((keys.prefix, len(keys)), ("PROD-0", 4))
+        with self.assertRaises(IndexError):
+            keys[4]
+        self.assertEqual(list(FrontCodedKeys()), [])
+        self.assertEqual(FrontCodedKeys().bisect_left("a"), 0)
+
+    def test_02_compressed_tree_matches_plain_tree(self):
+        rng = __import__('random').Random(15)
+        for order in (3, 4, 9):
+            with self.subTest(order=order):
+                tree = BPlusTreeID(order, compress_keys=True)
+                present = set()
+                for _ in range(2000):
+                    product_id = f"PROD-{rng.randrange(800):06d}"
+                    if rng.random() < 0.6:
+                        if product_id not in present:
+                            tree.insert(Product(product_id))
+                            present.add(product_id)
+                    else:
+                        self.assertEqual(tree.delete(product_id), product_id in present)
+                        present.discard(product_id)
+                assert_tree_valid(self, tree)
+                leaves = []
+                _collect_leaves(self, tree.root, 0, None, None, leaves, set(), True)
+                self.assertTrue(all(isinstance(leaf.keys, FrontCodedKeys) for leaf in leaves))
+                self.assertEqual([key for leaf in leaves for key in leaf.keys], sorted(present))
+                self.assertTrue(all(tree.search(product_id).product_id == product_id for product_id in present))
+                self.assertIsNone(tree.search("PROD-999999"))
+
+    def test_03_bulk_load_snapshot_and_batches(self):
+        products = [Product(f"PROD-{i:06d}") for i in range(500)]
+        tree = BPlusTreeID.bulk_load(products, order=16, compress_keys=True)
+        self.assertIsInstance(tree._first_leaf(), BPlusTreeFrontCodedLeafNode)
+        snapshot = tree.snapshot()
+        tree.delete_many(f"PROD-{i:06d}" for i in range(0, 500, 2))
+        tree.insert_many(Product(f"PROD-{i:06d}") for i in range(500, 600))
+        assert_tree_valid(self, tree)
+        self.assertEqual(len(tree), 350)
+        self.assertIs(snapshot.search("PROD-000010"), products[10])
+        self.assertIsNone(tree.search("PROD-000010"))
+        self.assertEqual(len(snapshot), 500)
+
+
+class TestBPlusTreeFloatKeys(unittest.TestCase):
+    def test_01_float_key_tree_matches_plain_tree(self):
+        rng = __import__('random').Random(16)
+        for order in (3, 4, 32):
+            with self.subTest(order=order):
+                tree = BPlusTreeProducts(order, float_keys=True)
+                plain = BPlusTreeProducts(order)
+                for i in range(1500):
+                    price = float(rng.randint(1, 300))
+                    if rng.random() < 0.65 or not plain._heats:
+                        tree.insert(price, f"p{i}", float(i))
+                        plain.insert(price, f"p{i}", float(i))
+                    else:
+                        victim = rng.choice(sorted(plain._heats))
+                        victim_price = next(p for p, pid, _ in plain._iter_entries() if pid == victim)
+                        self.assertTrue(tree.delete(victim_price, victim))
+                        plain.delete(victim_price, victim)
+                    if i == 700:
+                        snapshot = tree.snapshot()
+                        expected_snapshot = sorted(plain.search_range(0.0, 1000.0))
+                assert_tree_valid(self, tree)
+                leaves = []
+                _collect_leaves(self, tree.root, 0, None, None, leaves, set())
+                self.assertTrue(all(isinstance(leaf.keys, array) for leaf in leaves))
+                self.assertEqual(list(tree._iter_entries()), list(plain._iter_entries()))
+                for low, high in ((0.0, 1000.0), (50.0, 120.5), (77.0, 77.0)):
+                    self.assertEqual(tree.search_range(low, high), plain.search_range(low, high))
+                    self.assertEqual(list(tree.iter_range_desc(high, low)), list(plain.iter_range_desc(high, low)))
+                    self.assertEqual(tree.count_range(low, high), plain.count_range(low, high))
+                self.assertEqual(tree.search_exact(42.0), plain.search_exact(42.0))
+                self.assertEqual(tree.select(len(tree) // 2), plain.select(len(plain) // 2))
+                self.assertEqual(tree.top_k_by_heat(0.0, 1000.0, 5), plain.top_k_by_heat(0.0, 1000.0, 5))
+                self.assertEqual(sorted(snapshot.search_range(0.0, 1000.0)), expected_snapshot)
+
+                self.assertEqual(sorted(tree.delete_range(100.0, 200.0)), sorted(plain.delete_range(100.0, 200.0)))
+                batch = [(float(rng.randint(1, 300)), f"b{i}") for i in range(300)]
+                tree.insert_many(batch)
+                plain.insert_many(batch)
+                self.assertEqual(tree.delete_many(batch[::2]), plain.delete_many(batch[::2]))
+                assert_tree_valid(self, tree)
+                self.assertEqual(list(tree._iter_entries()), list(plain._iter_entries()))
+
+    def test_02_bulk_load_and_invalid_combinations(self):
+        tree = BPlusTreeProducts.bulk_load([(1.0, "a"), (1.0, "b"), (2.5, "c"), (3, "d")], order=3, float_keys=True)
+        assert_tree_valid(self, tree)
+        self.assertEqual(tree.search_exact(1.0), ["a", "b"])
+        self.assertEqual(tree.search_exact(3.0), ["d"])
+        self.assertEqual(tree.search_range(2.0, 3.0), ["c", "d"])
+        with self.assertRaises(ValueError):
+            BPlusTreeProducts(4, composite_keys=True, float_keys=True)
+
+
+class TestBPlusTreeStats(unittest.TestCase):
+    def test_01_stats_and_counters(self):
+        tree = BPlusTreeProducts(4)
+        stats = tree.stats()
+        self.assertEqual((stats['height'], stats['entries'], stats['nodes_per_level']), (1, 0, [1]))
+        self.assertEqual(stats['leaf_fill_histogram'], [1] + [0] * 9)
+
+        for i in range(200):
+            tree.insert(float(i), f"p{i}")
+        stats = tree.stats()
+        self.assertEqual(stats['entries'], 200)
+        self.assertEqual(stats['nodes_per_level'][0], 1)
+        self.assertEqual(len(stats['nodes_per_level']), stats['height'])
+        self.assertEqual(stats['nodes_per_level'][-1], stats['leaves'])
+        self.assertEqual(sum(stats['leaf_fill_histogram']), stats['leaves'])
+        self.assertAlmostEqual(stats['avg_leaf_fill'], 200 / (stats['leaves'] * 4))
+        counters = stats['counters']
+        self.assertEqual(counters['leaf_splits'], stats['leaves'] - 1)
+        # 除了每次长高时新建的根，其余内部节点都来自内部节点的分裂
+        self.assertEqual(counters['internal_splits'], sum(stats['nodes_per_level'][:-1]) - (stats['height'] - 1))
+        self.assertEqual(counters['descents'], 200)
+        self.assertGreater(counters['visits_per_descent'], 1.0)
+        self.assertEqual(counters['leaf_merges'] + counters['leaf_borrows'], 0)
+
+        for i in range(0, 200, 2):
+            tree.delete(float(i), f"p{i}")
+        counters = tree.counters.as_dict()
+        self.assertGreater(counters['leaf_merges'], 0)
+        self.assertGreater(counters['leaf_borrows'] + counters['internal_borrows'] + counters['internal_merges'], 0)
+        tree.counters.reset()
+        self.assertEqual(tree.stats()['counters']['descents'], 0)
+        self.assertEqual(tree.stats()['entries'], 100)
+
+    def test_02_validate_reports_broken_invariants(self):
+        tree = BPlusTreeProducts.bulk_load([(float(i), f"p{i}") for i in range(50)], order=4)
+        self.assertEqual(tree.validate(), [])
+        leaf = tree._first_leaf().next_leaf
+        leaf.keys[0], leaf.keys[1] = leaf.keys[1], leaf.keys[0]
+        self.assertTrue(any("严格升序" in problem for problem in tree.validate()))
+        leaf.keys[0], leaf.keys[1] = leaf.keys[1], leaf.keys[0]
+
+        leaf.size += 1
+        self.assertTrue(any("子树条目数" in problem for problem in tree.validate()))
+        leaf.size -= 1
+        leaf.prev_leaf.next_leaf = leaf.next_leaf
+        self.assertEqual(tree.validate(), ["沿 next_leaf 遍历叶节点的结果与中序遍历不一致"])
+        leaf.prev_leaf.next_leaf = leaf
+
+        tree._heats["p3"] = 99.0
+        self.assertTrue(any("最高热度" in problem for problem in tree.validate()))
+
+
 if __name__ == '__main__':
     unittest.main(argv=['first-arg-is-ignored'], exit=False)
\ No newline at end of file
@@ -0,0 +1,312 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from src.module.commodity_retrieval import ProductManager
+
+
+class TestProductManager(unittest.TestCase):
+
+    def setUp(self):
+        self.pm = ProductManager(btree_order=3)
+
+    def _ids(self, products):
+        return sorted(p.product_id for p in products)
+
+    def test_bulk_add_products_builds_all_indexes(self):
+        """测试批量添加后三个索引都能查到商品。"""
+        items = [(f"item{i % 10}", float(i % 25 + 1), float(i)) for i in range(200)]
+        added = self.pm.bulk_add_products(items)
+        self.assertEqual(len(added), 200)
+
+        for product in added[::13]:
+            self.assertIs(self.pm.get_product_by_id(product.product_id), product)
+
+        in_range = self.pm.search_by_price_range(5.0, 10.0)
+        self.assertEqual(self._ids(in_range), self._ids(p for p in added if 5.0 <= p.price <= 10.0))
+
+        named = self.pm.recommend_products_by_prefix("item3", 5)
+        self.assertEqual(len(named), 5)
+        self.assertTrue(all(p.name == "item3" for p in named))
+        self.assertEqual(len(self.pm.recommend_products_by_prefix("item3", -1)), 20)
+        self.assertEqual(len(self.pm.search_products_name("item3")), 20)
+
+    def test_bulk_add_products_skips_invalid_items(self):
+        """测试不合法的条目会被跳过。"""
+        added = self.pm.bulk_add_products([("ok", 10.0, 1.0), ("", 10.0, 1.0), ("bad", -1.0, 1.0)])
+        self.assertEqual([p.name for p in added], ["ok"])
+        self.assertEqual(self.pm.bulk_add_products([]), [])
+
+    def test_bulk_add_products_merges_with_existing(self):
+        """测试批量添加与已有商品归并，之后的增删改仍然正常。"""
+        existing = [self.pm.add_product(f"old{i}", float(i + 1), 1.0) for i in range(30)]
+        id_index, price_index = self.pm._product_id_index, self.pm._price_index
+        added = self.pm.bulk_add_products((f"new{i}", float(i + 1), 2.0) for i in range(30))
+        added += self.pm.bulk_add_products([("extra", 15.0, 3.0)])
+
+        # 已有商品时新商品插入原来的树，不整体重建
+        self.assertIs(self.pm._product_id_index, id_index)
+        self.assertIs(self.pm._price_index, price_index)
+        self.assertEqual(id_index.validate(), [])
+        self.assertEqual(price_index.validate(), [])
+        self.assertEqual(len(id_index), 61)
+        self.assertEqual(len(self.pm.search_by_exact_price(15.0)), 3)
+
+        everything = self.pm.search_by_price_range(0.0, 1000.0)
+        self.assertEqual(self._ids(everything), self._ids(existing + added))
+
+        self.assertTrue(self.pm.delete_product(existing[0].product_id))
+        self.assertTrue(self.pm.update_product(added[0].product_id, "new0", 99.0, 2.0))
+        self.assertEqual(self._ids(self.pm.search_by_exact_price(99.0)), [added[0].product_id])
+        self.assertIsNone(self.pm.get_product_by_id(existing[0].product_id))
+
+
+    def test_search_by_price_range_pagination(self):
+        """测试按价格范围的键集分页与惰性遍历。"""
+        for i in range(50):
+            self.pm.add_product(f"item{i}", float(i % 10 + 1), 1.0)
+        full = self.pm.search_by_price_range(2.0, 8.0)
+        self.assertEqual(len(full), 35)
+
+        pages = []
+        anchor = None
+        while True:
+            page = self.pm.search_by_price_range(2.0, 8.0, limit=6, resume_after=anchor)
+            if not page:
+                break
+            self.assertLessEqual(len(page), 6)
+            pages.extend(page)
+            anchor = (page[-1].price, page[-1].product_id)
+        self.assertEqual(pages, full)
+
+        self.assertEqual(self.pm.search_by_price_range(2.0, 8.0, limit=0), [])
+        self.assertEqual(self.pm.search_by_price_range(2.0, 8.0, limit=-1), [])
+        self.assertEqual(list(self.pm.iter_products_by_price_range(2.0, 8.0)), full)
+
+
+    def test_search_by_price_range_descending(self):
+        """测试按价格降序取前 k 个。"""
+        for i in range(40):
+            self.pm.add_product(f"item{i}", float(i + 1), 1.0)
+        top = self.pm.search_by_price_range(10.0, 30.0, order="desc", limit=5)
+        self.assertEqual([p.price for p in top], [30.0, 29.0, 28.0, 27.0, 26.0])
+
+        everything = self.pm.search_by_price_range(10.0, 30.0, order="desc")
+        self.assertEqual(everything, self.pm.search_by_price_range(10.0, 30.0)[::-1])
+
+        next_page = self.pm.search_by_price_range(10.0, 30.0, order="desc", limit=5,
+                                                  resume_after=(top[-1].price, top[-1].product_id))
+        self.assertEqual([p.price for p in next_page], [25.0, 24.0, 23.0, 22.0, 21.0])
+        self.assertEqual(self.pm.search_by_price_range(10.0, 30.0, order="random"), [])
+
+
+    def test_price_statistics(self):
+        """测试价格区间计数与分位数。"""
+        self.assertIsNone(self.pm.get_price_quantile(0.5))
+        for i in range(1, 101):
+            self.pm.add_product(f"item{i}", float(i), 1.0)
+        self.assertEqual(self.pm.count_by_price_range(10.0, 19.5), 10)
+        self.assertEqual(self.pm.count_by_price_range(50.0, 10.0), 0)
+        self.assertEqual(self.pm.get_price_quantile(0.0), 1.0)
+        self.assertEqual(self.pm.get_price_quantile(0.5), 50.0)
+        self.assertEqual(self.pm.get_price_quantile(0.9), 90.0)
+        self.assertEqual(self.pm.get_price_quantile(1.0), 100.0)
+        self.assertIsNone(self.pm.get_price_quantile(1.5))
+
+
+    def test_update_product_partial_fields(self):
+        """测试只更新部分字段，以及不合法的新值不会造成部分更新。"""
+        product = self.pm.add_product("phone", 100.0, 1.0)
+        self.assertTrue(self.pm.update_product(product.product_id, new_heat=50.0))
+        self.assertEqual(product.heat, 50.0)
+        self.assertEqual(product.name, "phone")
+
+        self.assertTrue(self.pm.update_product(product.product_id, new_price=80.0))
+        self.assertEqual(self.pm.search_by_exact_price(80.0), [product])
+        self.assertEqual(self.pm.search_by_exact_price(100.0), [])
+
+        self.assertFalse(self.pm.update_product(product.product_id, new_name="tablet", new_price=-1.0))
+        self.assertEqual(product.name, "phone")
+        self.assertEqual(product.price, 80.0)
+
+        self.assertFalse(self.pm.update_product(product.product_id, new_heat=50.0))   # 没有实际变化
+        self.assertFalse(self.pm.update_product("missing", new_heat=1.0))
+
+    def test_recommend_by_prefix_uses_cached_top_k(self):
+        """测试改热度、改名、删除后按前缀推荐的结果与完整排序一致，超过缓存个数时退回完整排序。"""
+        pm = ProductManager(btree_order=4, prefix_top_k=3)
+        products = [pm.add_product(f"{'ab'[i % 2]}{i % 7}", float(i + 1), float(i % 11)) for i in range(60)]
+        pm.update_product(products[0].product_id, new_heat=100.0)
+        pm.update_product(products[1].product_id, new_name="a-renamed", new_heat=90.0)
+        pm.update_product(products[2].product_id, new_heat=0.0)
+        pm.delete_product(products[3].product_id)
+        pm.delete_products_in_price_range(10.0, 20.0)
+
+        for prefix in ("", "a", "b3", "a-"):
+            full = sorted(pm.recommend_products_by_prefix(prefix, -1), key=lambda p: (-p.heat, p.product_id))
+            for k in (1, 3, 5):
+                self.assertEqual([p.heat for p in pm.recommend_products_by_prefix(prefix, k)],
+                                 [p.heat for p in full[:k]])
+        self.assertEqual(pm.recommend_products_by_prefix("a", 1), [products[0]])
+        self.assertEqual(pm.recommend_products_by_prefix("a", 0), [])
+        loaded_path = os.path.join(tempfile.mkdtemp(), "catalog.snap")
+        try:
+            pm.save(loaded_path)
+            loaded = ProductManager.load(loaded_path, prefix_top_k=3)
+            self.assertEqual(loaded.recommend_products_by_prefix("a", 3), pm.recommend_products_by_prefix("a", 3))
+        finally:
+            shutil.rmtree(os.path.dirname(loaded_path))
+
+    def test_browse_products_by_name(self):
+        """测试按名称字典序分页浏览，逐页取完与整体排序一致，非法参数返回空列表。"""
+        for radix in (False, True):
+            pm = ProductManager(btree_order=4, prefix_radix=radix)
+            rng = __import__('random').Random(5)
+            for i in range(120):
+                pm.add_product(rng.choice(["tea", "team", "teapot", "toy", "t"]) + str(rng.randint(0, 3)),
+                               float(i + 1), 1.0)
+            expected = sorted(pm.recommend_products_by_prefix("te", -1), key=lambda p: (p.name, p.product_id))
+            pages, after = [], None
+            while True:
+                page = pm.browse_products_by_name("te", limit=11, resume_after=after)
+                if not page:
+                    break
+                pages.extend(page)
+                after = (page[-1].name, page[-1].product_id)
+            self.assertEqual(pages, expected)
+            self.assertEqual(pm.browse_products_by_name("zz"), [])
+            self.assertEqual(pm.browse_products_by_name("te", limit=-1), [])
+            self.assertEqual(pm.browse_products_by_name("te", resume_after="tea"), [])
+            self.assertEqual(pm.browse_products_by_name(3), [])
+
+    def test_count_by_name_prefix(self):
+        """测试按前缀计数与前缀搜索的结果数一致，包括改名、删除和读取快照之后。"""
+        pm = ProductManager(btree_order=4)
+        products = [pm.add_product(f"{'ab'[i % 2]}{i % 7}", float(i + 1), 1.0) for i in range(60)]
+        pm.update_product(products[1].product_id, new_name="a-renamed")
+        pm.delete_product(products[3].product_id)
+        pm.delete_products_in_price_range(10.0, 20.0)
+        prefixes = ("", "a", "b3", "a-", "a-renamedx", "c")
+        for prefix in prefixes:
+            self.assertEqual(pm.count_by_name_prefix(prefix), len(pm.recommend_products_by_prefix(prefix, -1)))
+        self.assertEqual(pm.count_by_name_prefix(None), 0)
+        path = os.path.join(tempfile.mkdtemp(), "catalog.snap")
+        try:
+            pm.save(path)
+            loaded = ProductManager.load(path)
+            self.assertEqual([loaded.count_by_name_prefix(p) for p in prefixes],
+                             [pm.count_by_name_prefix(p) for p in prefixes])
+        finally:
+            shutil.rmtree(os.path.dirname(path))
+
+    def test_top_k_by_heat_in_price_range(self):
+        """测试价格区间内按热度的 top-k，并跟随热度和价格的更新。"""
+        products = [self.pm.add_product(f"item{i}", float(i % 20 + 1), float(i)) for i in range(100)]
+        top = self.pm.top_k_by_heat_in_price_range(5.0, 10.0, 3)
+        self.assertEqual([p.heat for p in top], [89.0, 88.0, 87.0])
+
+        cold = products[4]                                  # price 5.0, heat 4.0
+        self.assertTrue(self.pm.update_product(cold.product_id, new_heat=500.0))
+        self.assertEqual(self.pm.top_k_by_heat_in_price_range(5.0, 10.0, 1), [cold])
+
+        self.assertTrue(self.pm.update_product(cold.product_id, new_price=50.0))
+        self.assertNotIn(cold, self.pm.top_k_by_heat_in_price_range(5.0, 10.0, 3))
+        self.assertEqual(self.pm.top_k_by_heat_in_price_range(40.0, 60.0, 2), [cold])
+
+        self.assertTrue(self.pm.update_product(cold.product_id, new_heat=0.0))
+        self.assertEqual([p.heat for p in self.pm.top_k_by_heat_in_price_range(1.0, 100.0, 2)], [99.0, 98.0])
+        self.assertEqual(self.pm.top_k_by_heat_in_price_range(1.0, 100.0, 0), [])
+
+    def test_composite_price_keys(self):
+        """测试价格索引使用复合键时，管理器的各项操作与默认模式一致。"""
+        pm = ProductManager(btree_order=4, composite_price_keys=True)
+        products = [pm.add_product(f"item{i}", float(i % 5 + 1), float(i)) for i in range(60)]
+        added = pm.bulk_add_products([(f"bulk{i}", float(i % 5 + 1), 100.0 + i) for i in range(40)])
+        self.assertEqual(pm.count_by_price_range(1.0, 5.0), 100)
+        self.assertEqual(self._ids(pm.search_by_exact_price(3.0)),
+                         sorted(p.product_id for p in products + added if p.price == 3.0))
+
+        page = pm.search_by_price_range(1.0, 5.0, limit=30)
+        rest = pm.search_by_price_range(1.0, 5.0, resume_after=(page[-1].price, page[-1].product_id))
+        self.assertEqual(len(page) + len(rest), 100)
+        self.assertEqual([(p.price, p.product_id) for p in page + rest],
+                         sorted((p.price, p.product_id) for p in products + added))
+
+        self.assertTrue(pm.update_product(products[0].product_id, new_price=9.0))
+        self.assertTrue(pm.delete_product(products[1].product_id))
+        self.assertEqual(pm.search_by_exact_price(9.0), [products[0]])
+        self.assertEqual(pm.top_k_by_heat_in_price_range(1.0, 5.0, 1), [added[-1]])
+
+
+    def test_delete_products_in_price_range(self):
+        """测试按价格区间批量删除后，三个索引保持一致。"""
+        for composite in (False, True):
+            pm = ProductManager(btree_order=4, composite_price_keys=composite)
+            products = pm.bulk_add_products([(f"gadget{i}", float(i % 20 + 1), float(i)) for i in range(200)])
+            removed = pm.delete_products_in_price_range(5.0, 12.0)
+            expected = [p for p in products if 5.0 <= p.price <= 12.0]
+            self.assertEqual(self._ids(removed), self._ids(expected))
+            self.assertEqual([p.price for p in removed], sorted(p.price for p in expected))
+            self.assertEqual(pm.count_by_price_range(0.0, 100.0), 200 - len(expected))
+            for product in expected[:20]:
+                self.assertIsNone(pm.get_product_by_id(product.product_id))
+            self.assertEqual(len(pm._name_prefix_trie.get_product_ids_with_prefix("gadget")), 200 - len(expected))
+            self.assertEqual(pm.delete_products_in_price_range(5.0, 12.0), [])
+            self.assertEqual(pm.delete_products_in_price_range(12.0, 5.0), [])
+            self.assertEqual(pm.delete_products_in_price_range("a", 5.0), [])
+
+    def test_save_and_load_snapshot(self):
+        """测试保存快照后恢复出的目录与原目录一致，并且可以继续修改。"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "catalog.snap")
+        for composite, radix in ((False, False), (True, False), (False, True)):
+            pm = ProductManager(btree_order=4, composite_price_keys=composite, prefix_radix=radix)
+            products = [pm.add_product(f"{['苹果', 'apple', 'app'][i % 3]}{i % 7}", float(i % 13 + 1), float(i))
+                        for i in range(300)]
+            for product in products[::5]:
+                pm.delete_product(product.product_id)
+            pm.update_product(products[1].product_id, new_name="香蕉", new_heat=999.0)
+            pm.save(path)
+
+            loaded = ProductManager.load(path)
+            self.assertEqual(loaded._composite_price_keys, composite)
+            self.assertEqual(loaded._name_prefix_trie.radix, radix)
+            self.assertEqual(loaded._name_prefix_trie.node_count(), pm._name_prefix_trie.node_count())
+            self.assertEqual(loaded._product_id_index.validate(), [])
+            self.assertEqual(loaded._price_index.validate(), [])
+            self.assertEqual(loaded._product_id_index.stats()['leaves'], pm._product_id_index.stats()['leaves'])
+            self.assertEqual([(p.product_id, p.name, p.price, p.heat) for p in loaded.search_by_price_range(0, 100)],
+                             [(p.product_id, p.name, p.price, p.heat) for p in pm.search_by_price_range(0, 100)])
+            self.assertEqual(list(loaded._price_index._iter_entries()), list(pm._price_index._iter_entries()))
+            for prefix in ("", "苹果", "app", "apple3", "香蕉", "x"):
+                self.assertEqual(loaded._name_prefix_trie.get_product_ids_with_prefix(prefix),
+                                 pm._name_prefix_trie.get_product_ids_with_prefix(prefix))
+            self.assertEqual(self._ids(loaded.top_k_by_heat_in_price_range(1.0, 13.0, 5)),
+                             self._ids(pm.top_k_by_heat_in_price_range(1.0, 13.0, 5)))
+
+            self.assertTrue(loaded.delete_product(products[2].product_id))
+            self.assertIsNotNone(loaded.add_product("新商品", 5.0, 1.0))
+            self.assertTrue(loaded.delete_product(products[4].product_id))
+            self.assertEqual(len(loaded.recommend_products_by_prefix("app", -1)),
+                             len(pm.recommend_products_by_prefix("app", -1)) - 2)
+            self.assertEqual(loaded.count_by_price_range(0, 100), 300 - 61)
+
+        empty_path = os.path.join(directory, "empty.snap")
+        ProductManager(btree_order=5).save(empty_path)
+        self.assertEqual(ProductManager.load(empty_path).count_by_price_range(0, 100), 0)
+
+        with open(path, 'r+b') as f:
+            f.seek(-3, os.SEEK_END)
+            f.write(b'\xff')
+        with self.assertRaises(ValueError):
+            ProductManager.load(path)
+        with open(path, 'wb') as f:
+            f.write(b'not a snapshot')
+        with self.assertRaises(ValueError):
+            ProductManager.load(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
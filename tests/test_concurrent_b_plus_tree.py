@@ -0,0 +1,229 @@
+import sys
+import random
+import threading
+import unittest
+
+from src.model.product import Product
+from src.data_structure.b_plus_tree import BPlusTreeProducts
+from src.data_structure.concurrent_b_plus_tree import *
+from tests.test_b_plus_tree import _collect_leaves
+
+
+def _run_threads(writers, readers=()):
+    """
+    并发运行写线程和读线程，读线程反复调用 reader() 直到所有写线程结束
+    线程中抛出的第一个异常（包括断言失败）会在主线程中重新抛出
+    """
+    errors = []
+    stop = threading.Event()
+
+    def run_writer(target):
+        try:
+            target()
+        except BaseException as e:
+            errors.append(e)
+
+    def run_reader(target):
+        try:
+            while not stop.is_set():
+                target()
+        except BaseException as e:
+            errors.append(e)
+
+    writer_threads = [threading.Thread(target=run_writer, args=(target,)) for target in writers]
+    reader_threads = [threading.Thread(target=run_reader, args=(target,)) for target in readers]
+    for thread in writer_threads + reader_threads:
+        thread.start()
+    for thread in writer_threads:
+        thread.join()
+    stop.set()
+    for thread in reader_threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+class TestConcurrentBPlusTree(unittest.TestCase):
+    def setUp(self):
+        # 缩短线程切换间隔，让有GIL的解释器也能在树操作中途频繁切换线程
+        self.switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-5)
+
+    def tearDown(self):
+        sys.setswitchinterval(self.switch_interval)
+
+    def assert_structure(self, tree):
+        self.assertIsNone(tree.root.parent)
+        self.assertEqual(tree.validate(), [])
+        leaves = []
+        depths = set()
+        _collect_leaves(self, tree.root, 0, None, None, leaves, depths)
+        self.assertEqual(len(depths), 1)
+        for left, right in zip(leaves, leaves[1:]):
+            self.assertIs(left.next_leaf, right)
+            self.assertIs(right.prev_leaf, left)
+        return leaves
+
+    def test_01_id_tree_stress(self):
+        tree = ConcurrentBPlusTreeID(order=4)
+        num_writers, per_writer = 6, 400
+
+        def writer_ids(w):
+            rng = random.Random(w)
+            return [f"PROD-{i:05d}-{w}" for i in rng.sample(range(per_writer * 4), per_writer)]
+
+        def writer(w):
+            ids = writer_ids(w)
+            for product_id in ids:
+                tree.insert(Product(product_id, price=float(w + 1)))
+            for product_id in ids[::2]:
+                self.assertTrue(tree.delete(product_id))
+                self.assertFalse(tree.delete(product_id))
+            deleted = set(ids[::2])
+            for product_id in ids:
+                self.assertEqual(tree.search(product_id) is None, product_id in deleted)
+            self.assertTrue(tree.update(Product(ids[1], price=999.0)))
+
+        rng = random.Random()
+
+        def reader():
+            product = tree.search(f"PROD-{rng.randrange(per_writer * 4):05d}-{rng.randrange(num_writers)}")
+            if product is not None:
+                self.assertTrue(product.product_id.startswith("PROD-"))
+
+        _run_threads([lambda w=w: writer(w) for w in range(num_writers)], [reader] * 3)
+
+        leaves = self.assert_structure(tree)
+        expected = sorted(product_id for w in range(num_writers) for product_id in writer_ids(w)[1::2])
+        self.assertEqual([key for leaf in leaves for key in leaf.keys], expected)
+        self.assertEqual(len(tree), len(expected))
+        self.assertEqual(tree.search(writer_ids(0)[1]).price, 999.0)
+
+    def test_02_products_tree_stress(self):
+        for composite in (False, True):
+            tree = ConcurrentBPlusTreeProducts(order=4, composite_keys=composite)
+            reference = BPlusTreeProducts(order=4, composite_keys=composite)
+            num_writers, per_writer = 5, 300
+
+            def writer(w):
+                rng = random.Random(100 + w)
+                entries = [(float(rng.randint(1, 50)), f"p{w}-{i:04d}") for i in range(per_writer)]
+                for price, product_id in entries:
+                    tree.insert(price, product_id, float(rng.randint(0, 999)))
+                for price, product_id in entries[::3]:
+                    self.assertTrue(tree.delete(price, product_id))
+                for price, product_id in entries[1::3]:
+                    self.assertEqual(tree.search_exact(price, product_id), [product_id])
+                    self.assertTrue(tree.update_heat(price, product_id, 5000.0))
+
+            def reader():
+                results = tree.search_range(10.0, 40.0)
+                self.assertEqual(len(results), len(set(results)))
+
+            _run_threads([lambda w=w: writer(w) for w in range(num_writers)], [reader] * 3)
+
+            for w in range(num_writers):
+                rng = random.Random(100 + w)
+                entries = [(float(rng.randint(1, 50)), f"p{w}-{i:04d}") for i in range(per_writer)]
+                for n, (price, product_id) in enumerate(entries):
+                    if n % 3:
+                        reference.insert(price, product_id, 5000.0 if n % 3 == 1 else 0.0)
+            leaves = self.assert_structure(tree)
+            self.assertEqual(len(tree), len(reference))
+            self.assertEqual(sum(tree._leaf_entry_count(leaf) for leaf in leaves), len(reference))
+            for low, high in ((1.0, 50.0), (7.0, 7.0), (12.5, 30.0)):
+                self.assertEqual(sorted(tree.search_range(low, high)), sorted(reference.search_range(low, high)))
+                self.assertEqual(tree.count_range(low, high), reference.count_range(low, high))
+            self.assertEqual(tree.rank(20.0), reference.rank(20.0))
+            self.assertEqual([tree.select(k) for k in (0, 50, -1)], [reference.select(k) for k in (0, 50, -1)])
+            self.assertEqual(len(tree.top_k_by_heat(1.0, 50.0, 10)), 10)
+            self.assertTrue(all(tree._heats[pid] == 5000.0 for pid in tree.top_k_by_heat(1.0, 50.0, 10)))
+
+    def test_03_unsupported_and_bulk_load(self):
+        products = [Product(f"PROD-{i:04d}") for i in range(100)]
+        tree = ConcurrentBPlusTreeID.bulk_load(products, order=8)
+        self.assertEqual(len(tree), 100)
+        self.assertIsInstance(tree.root, ConcurrentInternalNode)
+        self.assertIs(tree.search("PROD-0042"), products[42])
+        with self.assertRaises(TypeError):
+            tree.snapshot()
+        with self.assertRaises(TypeError):
+            tree.insert("PROD-0100")
+
+        prices = ConcurrentBPlusTreeProducts.bulk_load([(1.0, "a"), (1.0, "b"), (2.0, "c")], order=4)
+        self.assertEqual(len(prices), 3)
+        self.assertEqual(prices.search_exact(1.0), ["a", "b"])
+        with self.assertRaises(TypeError):
+            prices.snapshot()
+        with self.assertRaises(ValueError):
+            ConcurrentBPlusTreeProducts(4, float_keys=True)
+        with self.assertRaises(ValueError):
+            ConcurrentBPlusTreeID(4, compress_keys=True)
+
+    def test_04_desc_scan_and_cursor_match_single_threaded_tree(self):
+        """测试降序扫描和区间游标（含从上一页最后一个条目恢复）与单线程的 BPlusTreeProducts 一致。"""
+        for composite_keys in (False, True):
+            for order in (3, 4, 7):
+                with self.subTest(composite_keys=composite_keys, order=order):
+                    rng = random.Random(order)
+                    tree = ConcurrentBPlusTreeProducts(order, composite_keys)
+                    reference = BPlusTreeProducts(order, composite_keys)
+                    for i in range(300):
+                        price, product_id = float(rng.randint(1, 40)), f"p{i:03d}"
+                        tree.insert(price, product_id)
+                        reference.insert(price, product_id)
+                    for i in rng.sample(range(300), 100):
+                        entry = next((p, f"p{i:03d}") for p in range(1, 41) if f"p{i:03d}" in tree.search_exact(float(p)))
+                        self.assertTrue(tree.delete(*entry))
+                        self.assertTrue(reference.delete(*entry))
+
+                    for low, high in ((1.0, 40.0), (7.0, 7.0), (12.5, 30.0), (30.0, 12.5), (50.0, 60.0)):
+                        expected = list(reference.iter_range_desc(high, low))
+                        self.assertEqual(list(tree.iter_range_desc(high, low)), expected)
+                        self.assertEqual(tree.range_cursor(low, high).fetch(1000),
+                                         reference.range_cursor(low, high).fetch(1000))
+
+                    ascending = reference.range_cursor(1.0, 40.0).fetch(1000)
+                    for after in ascending[::17] + [(20.0, "missing")]:
+                        self.assertEqual(tree.range_cursor(5.0, 35.0, after).fetch(1000),
+                                         reference.range_cursor(5.0, 35.0, after).fetch(1000))
+                        self.assertEqual(list(tree.iter_range_desc(35.0, 5.0, after)),
+                                         list(reference.iter_range_desc(35.0, 5.0, after)))
+
+                    cursor = tree.range_cursor(1.0, 40.0)
+                    pages = []
+                    while not cursor.exhausted:
+                        pages.extend(cursor.fetch(7))
+                    self.assertEqual(pages, ascending)
+                    self.assertEqual(list(cursor), [])
+
+    def test_05_cursor_during_concurrent_writes(self):
+        """测试写线程插入和删除时分页读取的游标：不重复，且不遗漏开始前就存在、未被删除的条目。"""
+        tree = ConcurrentBPlusTreeProducts(4, composite_keys=True)
+        stable = [(float(i % 50), f"s{i:04d}") for i in range(400)]
+        for price, product_id in stable:
+            tree.insert(price, product_id)
+
+        def writer(w):
+            rng = random.Random(w)
+            for i in range(300):
+                price, product_id = float(rng.randint(0, 49)), f"w{w}-{i:04d}"
+                tree.insert(price, product_id)
+                if i % 2:
+                    tree.delete(price, product_id)
+
+        def reader():
+            for entries in (tree.range_cursor(0.0, 49.0).fetch(10 ** 6), list(tree.iter_range_desc(49.0, 0.0))):
+                self.assertEqual(len(entries), len(set(entries)))
+            cursor = tree.range_cursor(0.0, 49.0)
+            seen = []
+            while not cursor.exhausted:
+                seen.extend(cursor.fetch(13))
+            self.assertEqual(seen, sorted(seen))
+            self.assertTrue(set(stable) <= set(seen))
+
+        _run_threads([lambda w=w: writer(w) for w in range(3)], [reader] * 2)
+        self.assertEqual(tree.validate(), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,321 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from src.model.product import Product
+from src.data_structure.b_plus_tree import BPlusTreeProducts
+from src.data_structure.trie import ProductPrefixTrie
+from src.data_structure.paged_b_plus_tree import *
+from src.module.commodity_retrieval import ProductManager
+
+
+class TestPagedBPlusTree(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _path(self, name):
+        return os.path.join(self.dir, name)
+
+    def test_01_products_match_in_memory_tree_across_reopen(self):
+        rng = random.Random(3)
+        memory = BPlusTreeProducts(order=8, composite_keys=True)
+        paged = PagedBPlusTreeProducts(self._path("price.idx"), order=8, page_size=1024, cache_pages=6)
+        entries = {}
+        for i in range(1500):
+            pid, price, heat = f"p{i:05d}", float(rng.randint(1, 60)), float(rng.randint(0, 999))
+            entries[pid] = price
+            memory.insert(price, pid, heat)
+            paged.insert(price, pid, heat)
+        for pid in rng.sample(sorted(entries), 500):
+            price = entries.pop(pid)
+            self.assertTrue(memory.delete(price, pid))
+            self.assertTrue(paged.delete(price, pid))
+        self.assertFalse(paged.delete(1.0, "missing"))
+        self.assertGreater(paged.counters.leaf_splits, 0)
+        self.assertEqual(paged.counters.leaf_merges, 0)
+        for pid in rng.sample(sorted(entries), 100):
+            memory.update_heat(entries[pid], pid, 5000.0 + len(pid))
+            paged.update_heat(entries[pid], pid, 5000.0 + len(pid))
+        paged.close()
+
+        with PagedBPlusTreeProducts(self._path("price.idx"), cache_pages=6) as reopened:
+            self.assertEqual(reopened.order, 8)
+            self.assertEqual(len(reopened), len(memory))
+            self.assertLessEqual(reopened.cache_info()['resident_pages'], 6)
+            for low, high in ((0.0, 100.0), (5.0, 12.0), (7.0, 7.0), (12.5, 12.9)):
+                self.assertEqual(reopened.search_range(low, high), memory.search_range(low, high))
+                self.assertEqual(list(reopened.iter_range_desc(high, low)), list(memory.iter_range_desc(high, low)))
+                self.assertEqual(reopened.count_range(low, high), memory.count_range(low, high))
+            self.assertEqual(reopened.range_cursor(3.0, 30.0).fetch(50), memory.range_cursor(3.0, 30.0).fetch(50))
+            self.assertEqual([reopened.select(k) for k in range(0, len(memory), 41)],
+                             [memory.select(k) for k in range(0, len(memory), 41)])
+            self.assertEqual(sorted(reopened.top_k_by_heat(1.0, 60.0, 100)),
+                             sorted(memory.top_k_by_heat(1.0, 60.0, 100)))
+            self.assertEqual(list(reopened._iter_entries()), list(memory._iter_entries()))
+            self.assertLessEqual(reopened.cache_info()['resident_pages'], 6)
+            self.assertEqual(reopened.validate(), [])
+            stats = reopened.stats()
+            self.assertEqual(stats['entries'], len(memory))
+            self.assertEqual(sum(stats['leaf_fill_histogram']), stats['leaves'])
+            self.assertEqual(stats['nodes_per_level'][-1], stats['leaves'])
+            self.assertGreater(stats['counters']['descents'], 0)
+
+    def test_02_id_tree_persists_products(self):
+        with PagedBPlusTreeID(self._path("id.idx"), order=16, page_size=4096, cache_pages=3) as tree:
+            for i in range(800):
+                tree.insert(Product(f"PROD-{i:05d}", name=f"item{i}", price=i + 1.0, heat=float(i % 7)))
+            for i in range(0, 800, 4):
+                self.assertTrue(tree.delete(f"PROD-{i:05d}"))
+            product = tree.search("PROD-00001")
+            product.heat = 99.0
+            self.assertTrue(tree.update(product))
+            self.assertFalse(tree.update(Product("PROD-missing")))
+
+        with PagedBPlusTreeID(self._path("id.idx")) as tree:
+            self.assertEqual(len(tree), 600)
+            self.assertIsNone(tree.search("PROD-00000"))
+            self.assertEqual(tree.search("PROD-00001").heat, 99.0)
+            self.assertEqual(tree.search("PROD-00799").name, "item799")
+            self.assertEqual([key for key, _ in tree._iter_leaf_items()],
+                             [f"PROD-{i:05d}" for i in range(800) if i % 4])
+
+    def test_03_bad_files_and_arguments(self):
+        PagedBPlusTreeID(self._path("id.idx")).close()
+        with self.assertRaises(ValueError):
+            PagedBPlusTreeProducts(self._path("id.idx"))
+        with open(self._path("junk.idx"), "wb") as f:
+            f.write(b"not a page file" * 10)
+        with self.assertRaises(ValueError):
+            PagedBPlusTreeID(self._path("junk.idx"))
+        with self.assertRaises(ValueError):
+            PagedBPlusTreeID(self._path("other.idx"), cache_pages=0)
+        with self.assertRaises(ValueError):
+            PagedBPlusTreeID(self._path("other.idx"), order=1)
+
+        with self.assertRaises(ValueError):
+            PagedBPlusTreeID(self._path("small.idx"), page_size=128)
+
+        # 页很小、阶很大时节点按字节数提前分裂；单个放不进页容量三分之一的条目在修改树之前被拒绝
+        tree = PagedBPlusTreeID(self._path("tiny.idx"), order=64, page_size=256, cache_pages=1)
+        for i in range(64):
+            tree.insert(Product(f"PROD-{i:05d}", name="x" * 20))
+        with self.assertRaises(ValueError):
+            tree.insert(Product("PROD-big", name="x" * 100))
+        self.assertIsNone(tree.search("PROD-big"))
+        self.assertEqual(len(tree), 64)
+        tree.close()
+        with PagedBPlusTreeID(self._path("tiny.idx")) as tree:
+            self.assertEqual([key for key, _ in tree._iter_leaf_items()], [f"PROD-{i:05d}" for i in range(64)])
+            self.assertEqual(tree.validate(), [])
+
+    def test_05_long_names_split_by_size(self):
+        """名称很长时叶节点在键数达到阶之前就分裂，任何时候淘汰脏页都放得下"""
+        rng = random.Random(9)
+        names = {}
+        with PagedBPlusTreeID(self._path("id.idx"), order=32, cache_pages=4) as tree:
+            for i in range(400):
+                product_id = f"PROD-{rng.randrange(10 ** 9):09d}-{i}"
+                names[product_id] = "".join(chr(0x4e00 + rng.randrange(2000)) for _ in range(240))
+                tree.insert(Product(product_id, name=names[product_id]))
+            for product_id in rng.sample(sorted(names), 50):
+                names[product_id] += "加长" * 100
+                product = tree.search(product_id)
+                product.name = names[product_id]
+                self.assertTrue(tree.update(product))
+            huge = Product("PROD-huge", name="长" * 3000)
+            with self.assertRaises(ValueError):
+                tree.insert(huge)
+            product = tree.search(product_id)
+            product.name = huge.name
+            with self.assertRaises(ValueError):
+                tree.update(product)
+            self.assertEqual(tree.search(product_id).name, names[product_id])
+            self.assertEqual(tree.validate(), [])
+        with PagedBPlusTreeID(self._path("id.idx"), cache_pages=4) as tree:
+            self.assertEqual(len(tree), 400)
+            self.assertEqual({key: product.name for key, product in tree._iter_leaf_items()}, names)
+            self.assertEqual(tree.validate(), [])
+
+    def test_06_corrupted_pages_are_rejected(self):
+        """页中的数据用显式的二进制格式保存并带有校验和，被改动的页在读取时报错"""
+        with PagedBPlusTreeProducts(self._path("price.idx"), order=8, page_size=512) as tree:
+            for i in range(200):
+                tree.insert(float(i % 50 + 1), f"p{i:04d}", float(i))
+        with open(self._path("price.idx"), "r+b") as f:
+            f.seek(2 * 512 + 20)
+            byte = f.read(1)
+            f.seek(2 * 512 + 20)
+            f.write(bytes([byte[0] ^ 0xFF]))
+        with PagedBPlusTreeProducts(self._path("price.idx")) as tree:
+            with self.assertRaises(ValueError):
+                list(tree._iter_entries())
+
+    def test_04_product_manager_with_page_files(self):
+        pm = ProductManager(btree_order=16, storage_dir=self.dir)
+        phone = pm.add_product("phone", 100.0, 5.0)
+        added = pm.bulk_add_products([(f"case{i}", float(i % 10 + 1), float(i)) for i in range(50)])
+        self.assertTrue(pm.update_product(phone.product_id, new_price=80.0, new_heat=7.0))
+        self.assertTrue(pm.delete_product(added[0].product_id))
+        pm.close()
+
+        # 打开时只读取文件头，不遍历ID索引重建名称索引
+        pm = ProductManager(btree_order=16, storage_dir=self.dir)
+        self.assertEqual(pm._product_id_index.cache_info()['misses'], 0)
+        self.assertIsInstance(pm._name_prefix_trie, PagedNameIndex)
+        self.assertEqual(pm.count_by_price_range(0.0, 1000.0), 50)
+        self.assertEqual(pm.count_by_name_prefix("case"), 49)
+        self.assertEqual([p.name for p in pm.browse_products_by_name("case1", 3)], ["case1", "case10", "case11"])
+        self.assertEqual(len(pm.recommend_products_by_prefix("case", 30)), 30)
+        reloaded = pm.get_product_by_id(phone.product_id)
+        self.assertEqual((reloaded.price, reloaded.heat), (80.0, 7.0))
+        self.assertEqual(pm.search_by_exact_price(80.0), [phone])
+        self.assertIsNone(pm.get_product_by_id(added[0].product_id))
+        self.assertEqual(len(pm.search_by_price_range(1.0, 10.0, limit=20)), 20)
+        self.assertEqual([p.product_id for p in pm.recommend_products_by_prefix("case4", 1)], [added[49].product_id])
+        removed = pm.delete_products_in_price_range(1.0, 3.0)
+        self.assertEqual(sorted(p.product_id for p in removed),
+                         sorted(p.product_id for p in added[1:] if p.price <= 3.0))
+        self.assertEqual(pm.count_by_price_range(0.0, 1000.0), 50 - len(removed))
+        self.assertIsNone(pm.get_product_by_id(removed[0].product_id))
+
+        # 放不进页文件的商品被拒绝，任何索引都没有修改
+        self.assertIsNone(pm.add_product("长" * 5000, 1.0, 1.0))
+        self.assertFalse(pm.update_product(phone.product_id, new_name="长" * 5000, new_price=1.0))
+        self.assertEqual([p.product_id for p in pm.recommend_products_by_prefix("phone", 1)], [phone.product_id])
+        self.assertEqual(pm.search_by_exact_price(80.0), [phone])
+        self.assertEqual(pm.recommend_products_by_prefix("长", -1), [])
+
+        # 页文件存储的目录也可以保存为快照，恢复为内存中的目录（页文件中过空的叶节点会重新切分）
+        pm.save(self._path("catalog.snap"))
+        loaded = ProductManager.load(self._path("catalog.snap"))
+        self.assertEqual(loaded.count_by_name_prefix("case"), pm.count_by_name_prefix("case"))
+        self.assertEqual(loaded.recommend_products_by_prefix("case", 5), pm.recommend_products_by_prefix("case", 5))
+        self.assertEqual(loaded._product_id_index.validate(), [])
+        self.assertEqual(loaded._price_index.validate(), [])
+        self.assertEqual(loaded.search_by_price_range(0.0, 1000.0), pm.search_by_price_range(0.0, 1000.0))
+        self.assertEqual(loaded.search_by_exact_price(80.0), [phone])
+        expected = sorted(p.product_id for p in pm.recommend_products_by_prefix("", -1))
+        pm.close()
+
+        # 没有名称索引文件的旧目录在打开时从ID索引建立一次
+        os.remove(self._path("name.idx"))
+        pm = ProductManager(storage_dir=self.dir)
+        self.assertEqual(sorted(p.product_id for p in pm.recommend_products_by_prefix("", -1)), expected)
+        self.assertEqual(pm._name_prefix_trie.validate(), [])
+        pm.close()
+
+
+    def _height(self, tree):
+        height, node = 1, tree.root
+        while not node.is_leaf:
+            node = tree._pager.get(node.children[0])
+            height += 1
+        return height
+
+    def test_07_churn_reuses_pages(self):
+        """按递增的键反复插入再全部删除：空叶节点被摘除、页被复用，页文件和树高不会随轮数增长"""
+        with PagedBPlusTreeID(self._path("id.idx"), order=16, page_size=1024, cache_pages=8) as ids, \
+                PagedBPlusTreeProducts(self._path("price.idx"), order=16, page_size=1024, cache_pages=8) as prices:
+            peaks = []
+            for round_no in range(5):
+                products = [Product(f"PROD-{round_no:02d}{i:06d}", f"item{i}", float(i % 97 + 1), 1.0)
+                            for i in range(2000)]
+                for product in products:
+                    ids.insert(product)
+                    prices.insert(product.price, product.product_id, product.heat)
+                peaks.append((ids._pager.page_count, prices._pager.page_count))
+                for product in products:
+                    self.assertTrue(ids.delete(product.product_id))
+                    self.assertTrue(prices.delete(product.price, product.product_id))
+                for tree in (ids, prices):
+                    self.assertEqual(len(tree), 0)
+                    self.assertTrue(tree.root.is_leaf)
+                    self.assertEqual(tree._pager.free_pages(), tree._pager.page_count - 2)
+                    self.assertEqual(tree.validate(), [])
+            self.assertEqual(peaks[1:], peaks[:1] * 4)
+
+        # 空闲页链表保存在文件头中，重新打开后继续复用
+        with PagedBPlusTreeID(self._path("id.idx")) as ids:
+            pages = ids._pager.page_count
+            for i in range(500):
+                ids.insert(Product(f"PROD-99{i:06d}", "again", 1.0, 1.0))
+            self.assertEqual(ids._pager.page_count, pages)
+            self.assertEqual(ids.validate(), [])
+
+    def test_08_random_deletes_keep_structure(self):
+        """随机删除使部分叶节点变空时，摘除叶节点、内部节点和根之后树的结构、计数和区间查询仍然正确"""
+        rng = random.Random(11)
+        for order in (3, 4, 8):
+            with self.subTest(order=order):
+                path = self._path(f"price{order}.idx")
+                memory = BPlusTreeProducts(order=order, composite_keys=True)
+                with PagedBPlusTreeProducts(path, order=order, page_size=512, cache_pages=3) as paged:
+                    live = []
+                    for step in range(3000):
+                        if live and rng.random() < 0.5:
+                            price, pid = live.pop(rng.randrange(len(live)))
+                            self.assertTrue(paged.delete(price, pid))
+                            memory.delete(price, pid)
+                        else:
+                            price, pid = float(rng.randint(1, 30)), f"p{step:05d}"
+                            live.append((price, pid))
+                            paged.insert(price, pid, 0.0)
+                            memory.insert(price, pid, 0.0)
+                        if step % 500 == 0:
+                            self.assertEqual(paged.validate(), [])
+                    removed = paged.delete_range(5.0, 25.0)
+                    self.assertEqual(sorted(removed), sorted(memory.delete_range(5.0, 25.0)))
+                    self.assertEqual(paged.validate(), [])
+                with PagedBPlusTreeProducts(path) as reopened:
+                    self.assertEqual(reopened.validate(), [])
+                    self.assertEqual(list(reopened._iter_entries()), list(memory._iter_entries()))
+                    self.assertEqual(list(reopened.iter_range_desc(30.0, 1.0)), list(memory.iter_range_desc(30.0, 1.0)))
+                    self.assertEqual(reopened.rank(20.0), memory.rank(20.0))
+
+
+    def test_09_name_index_matches_trie(self):
+        """页文件名称索引的前缀查询、计数、分页和按热度排序与 ProductPrefixTrie 一致，重新打开后仍然一致"""
+        rng = random.Random(5)
+        words = ["phone", "phones", "pho", "手机", "手机壳", "case", "c", "", chr(0x10FFFF)]
+        trie = ProductPrefixTrie(top_k=3)
+        entries = {}
+        with PagedNameIndex(self._path("name.idx"), order=4, page_size=512, cache_pages=4) as index:
+            for i in range(600):
+                name = rng.choice(words[:-2]) + rng.choice(words) + str(rng.randint(0, 9))
+                pid, heat = f"p{i:04d}", float(rng.randint(0, 50))
+                entries[pid] = name
+                trie.insert(name, pid, heat)
+                index.insert(name, pid, heat)
+            for pid in rng.sample(sorted(entries), 200):
+                self.assertTrue(trie.delete(entries[pid], pid))
+                self.assertTrue(index.delete(entries.pop(pid), pid))
+            self.assertFalse(index.delete("phone", "missing"))
+            for pid in rng.sample(sorted(entries), 50):
+                trie.update_heat(entries[pid], pid, 100.0)
+                self.assertTrue(index.update_heat(entries[pid], pid, 100.0))
+            self.assertEqual(index.validate(), [])
+
+        with PagedNameIndex(self._path("name.idx"), cache_pages=4) as index:
+            for prefix in ["", "p", "pho", "phone", "手", "手机壳", "c", "case", "x", chr(0x10FFFF), "pho" + chr(0x10FFFF)]:
+                with self.subTest(prefix=prefix):
+                    self.assertEqual(index.count_with_prefix(prefix), trie.count_with_prefix(prefix))
+                    self.assertEqual(index.get_product_ids_with_prefix(prefix), trie.get_product_ids_with_prefix(prefix))
+                    for k in (0, 1, 5, 1000):
+                        self.assertEqual(index.get_top_product_ids_with_prefix(prefix, k),
+                                         trie.get_top_product_ids_with_prefix(prefix, k))
+                    by_name = list(trie.iter_product_ids_by_name(prefix))
+                    self.assertEqual(list(index.iter_product_ids_by_name(prefix)), by_name)
+                    for after in by_name[::37]:
+                        self.assertEqual(list(index.iter_product_ids_by_name(prefix, 10, after)),
+                                         list(trie.iter_product_ids_by_name(prefix, 10, after)))
+                    self.assertEqual(list(index.iter_product_ids_with_prefix(prefix, 7)),
+                                     [pid for _, pid in by_name[:7]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import random
+import unittest
+
+from src.module.commodity_retrieval import ProductManager
+from src.module.sharded_catalog import ShardedProductManager
+
+
+class TestShardedProductManager(unittest.TestCase):
+    def setUp(self):
+        self.sharded = ShardedProductManager(num_shards=3, btree_order=4, rebalance_min_size=200)
+        self.single = ProductManager(btree_order=4)
+        self.ids = {}       # 分片目录中的ID - 单机目录中的ID
+
+    def tearDown(self):
+        self.sharded.close()
+
+    def _add(self, name, price, heat):
+        product = self.sharded.add_product(name, price, heat)
+        self.ids[product.product_id] = self.single.add_product(name, price, heat).product_id
+        return product
+
+    def _same(self, sharded_products, single_products):
+        self.assertEqual([self.ids[p.product_id] for p in sharded_products],
+                         [p.product_id for p in single_products])
+
+    def _entries(self, products):
+        return sorted((p.price, p.name, p.heat) for p in products)
+
+    def test_01_matches_single_manager_and_rebalances(self):
+        rng = random.Random(11)
+        products = [self._add(f"item{i % 17}", float(rng.randint(1, 500)), float(i)) for i in range(600)]
+        self.assertGreater(self.sharded.rebalances, 0)
+        self.assertLess(max(self.sharded.shard_sizes()), 1.5 * 600 / 3)
+        self.assertEqual(sum(self.sharded.shard_sizes()), 600)
+
+        for product in rng.sample(products, 60):
+            single_id = self.ids[product.product_id]
+            new_price = float(rng.randint(1, 500))
+            self.assertEqual(self.sharded.update_product(product.product_id, new_price=new_price, new_heat=9999.0),
+                             self.single.update_product(single_id, new_price=new_price, new_heat=9999.0))
+        deleted = rng.sample(products, 40)
+        for product in deleted:
+            self.assertTrue(self.sharded.delete_product(product.product_id))
+            self.assertTrue(self.single.delete_product(self.ids[product.product_id]))
+        self.assertFalse(self.sharded.delete_product(deleted[0].product_id))
+        self.assertFalse(self.sharded.update_product("missing", new_heat=1.0))
+        self.assertEqual(sum(self.sharded.shard_sizes()), len(self.sharded))
+
+        for low, high in ((0.0, 1000.0), (100.0, 120.0), (250.0, 250.0), (499.5, 600.0)):
+            self._same(self.sharded.search_by_price_range(low, high), self.single.search_by_price_range(low, high))
+            self.assertEqual(self.sharded.count_by_price_range(low, high), self.single.count_by_price_range(low, high))
+            self.assertEqual(self._entries(self.sharded.search_by_price_range(low, high, limit=25)),
+                             self._entries(self.single.search_by_price_range(low, high, limit=25)))
+            desc = self.sharded.search_by_price_range(low, high, limit=10, order="desc")
+            self.assertEqual([p.price for p in desc],
+                             [p.price for p in self.single.search_by_price_range(low, high, limit=10, order="desc")])
+            self.assertEqual([p.heat for p in self.sharded.top_k_by_heat_in_price_range(low, high, 7)],
+                             [p.heat for p in self.single.top_k_by_heat_in_price_range(low, high, 7)])
+        for q in (0.0, 0.25, 0.5, 0.9, 1.0):
+            self.assertEqual(self.sharded.get_price_quantile(q), self.single.get_price_quantile(q))
+        self.assertEqual([p.heat for p in self.sharded.recommend_products_by_prefix("item1", 12)],
+                         [p.heat for p in self.single.recommend_products_by_prefix("item1", 12)])
+        self.assertEqual(self.sharded.count_by_name_prefix("item1"), self.single.count_by_name_prefix("item1"))
+        self.assertEqual(self._entries(self.sharded.search_products_name("item3")),
+                         self._entries(self.single.search_products_name("item3")))
+
+        survivor = next(p for p in products if self.sharded.get_product_by_id(p.product_id))
+        self.assertEqual(self.ids[self.sharded.get_product_by_id(survivor.product_id).product_id],
+                         self.single.get_product_by_id(self.ids[survivor.product_id]).product_id)
+
+        removed = self.sharded.delete_products_in_price_range(100.0, 300.0)
+        self._same(removed, self.single.delete_products_in_price_range(100.0, 300.0))
+        self.assertEqual(sum(self.sharded.shard_sizes()), len(self.sharded))
+        self.assertIsNone(self.sharded.get_product_by_id(removed[0].product_id))
+
+    def test_02_bulk_add_and_invalid_input(self):
+        items = [(f"bulk{i}", float(i % 50 + 1), float(i)) for i in range(300)] + [("", 5.0, 1.0), ("x", -1.0, 0.0)]
+        added = self.sharded.bulk_add_products(items)
+        self.assertEqual([p.name for p in added], [f"bulk{i}" for i in range(300)])
+        self.assertEqual(self.sharded.count_by_price_range(0.0, 100.0), 300)
+        self.assertIsNone(self.sharded.add_product("bad", "cheap", 1.0))
+        self.assertIsNone(self.sharded.add_product("", 1.0, 1.0))
+        self.assertEqual(self.sharded.search_by_price_range("a", 10.0), [])
+        with self.assertRaises(ValueError):
+            ShardedProductManager(num_shards=3, boundaries=[10.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,9 @@
+import os
+import shutil
+import tempfile
 import unittest
 
-from src.data_structure.trie import ProductPrefixTrie
+from src.data_structure.trie import ProductPrefixTrie, FrozenProductPrefixTrie
 
 
 class TestProductPrefixTrie(unittest.TestCase):
@@ -240,5 +243,267 @@ class TestProductPrefixTrie(unittest.TestCase):
         self.assertEqual(node_bat.product_ids, {"B1"})
 
 
+class TestProductPrefixTrieTopK(unittest.TestCase):
+    def _expected(self, heats, names, prefix, k):
+        ranked = sorted((-heats[pid], pid) for pid, name in names.items() if name.startswith(prefix))
+        return [pid for _, pid in ranked[:k]]
+
+    def test_top_k_matches_brute_force_under_updates(self):
+        """测试随机插入、删除、改热度和改名后，各前缀缓存的结果与暴力排序一致。"""
+        rng = __import__('random').Random(5)
+        for top_k, radix in ((1, False), (3, False), (8, False), (1, True), (3, True)):
+            trie = ProductPrefixTrie(top_k=top_k, radix=radix)
+            names, heats = {}, {}
+            for step in range(1500):
+                op = rng.random()
+                if op < 0.5 or len(names) < 5:
+                    pid = f"P{step}"
+                    names[pid] = "".join(rng.choice("abc") for _ in range(rng.randint(1, 4)))
+                    heats[pid] = float(rng.randint(0, 20))
+                    trie.insert(names[pid], pid, heats[pid])
+                elif op < 0.7:
+                    pid = rng.choice(sorted(names))
+                    self.assertTrue(trie.delete(names.pop(pid), pid))
+                    del heats[pid]
+                else:
+                    pid = rng.choice(sorted(names))
+                    heats[pid] = float(rng.randint(0, 20))
+                    self.assertTrue(trie.update_heat(names[pid], pid, heats[pid]))
+                if step % 50 == 0:
+                    for prefix in ("", "a", "ab", "cab", "bb"):
+                        for k in (1, top_k, top_k + 2):
+                            self.assertEqual(trie.get_top_product_ids_with_prefix(prefix, k),
+                                             self._expected(heats, names, prefix, k))
+            self.assertFalse(trie.update_heat("zzz", "P0", 1.0))
+
+            rebuilt = ProductPrefixTrie(top_k=top_k, radix=radix)
+            rebuilt.root = trie.root
+            rebuilt.rebuild_top(dict(heats))
+            self.assertEqual(rebuilt.get_top_product_ids_with_prefix("a", top_k), self._expected(heats, names, "a", top_k))
+
+    def test_top_k_arguments(self):
+        """测试未启用缓存和不合法参数。"""
+        with self.assertRaises(ValueError):
+            ProductPrefixTrie().get_top_product_ids_with_prefix("a", 1)
+        with self.assertRaises(ValueError):
+            ProductPrefixTrie(top_k=-1)
+        trie = ProductPrefixTrie(top_k=2)
+        trie.insert("apple", "P1", 5.0)
+        trie.insert("apple", "P1", 7.0)     # 重复插入相当于修改热度
+        trie.insert("apply", "P2", 6.0)
+        self.assertEqual(trie.get_top_product_ids_with_prefix("app", 2), ["P1", "P2"])
+        self.assertEqual(trie.get_top_product_ids_with_prefix("app", 0), [])
+        self.assertEqual(trie.get_top_product_ids_with_prefix("x", 2), [])
+
+
+class TestProductPrefixTrieRadix(unittest.TestCase):
+    def _assert_compressed(self, trie):
+        stack = [trie.root]
+        while stack:
+            node = stack.pop()
+            for key, child in node.children.items():
+                self.assertTrue(child.label)
+                self.assertEqual(key, child.label[0])
+                # 除根节点外，不是单词结尾的节点至少有两个子节点，否则应当与子节点合并或被删除
+                self.assertTrue(child.is_end_of_word or len(child.children) >= 2)
+                self.assertEqual(child.is_end_of_word, bool(child.product_ids))
+                stack.append(child)
+
+    def test_radix_matches_character_trie(self):
+        """测试压缩Trie树在随机插入和删除后与逐字符Trie树的查询结果一致，且保持压缩的结构。"""
+        rng = __import__('random').Random(9)
+        plain, radix = ProductPrefixTrie(), ProductPrefixTrie(radix=True)
+        names = {}
+        words = ["手机", "手机壳", "手表", "phone", "phone case", "ph", "耳机", "apple", "app"]
+        for step in range(800):
+            if rng.random() < 0.65 or not names:
+                pid = f"P{step}"
+                names[pid] = rng.choice(words) + rng.choice(["", " pro", "壳", "s"])
+                plain.insert(names[pid], pid)
+                radix.insert(names[pid], pid)
+            else:
+                pid = rng.choice(sorted(names))
+                name = names.pop(pid)
+                self.assertTrue(radix.delete(name, pid))
+                self.assertTrue(plain.delete(name, pid))
+            if step % 40 == 0:
+                self._assert_compressed(radix)
+                for prefix in ("", "手", "手机", "手机壳", "p", "pho", "phone c", "app", "apple p", "x", "ph s"):
+                    self.assertEqual(radix.get_product_ids_with_prefix(prefix),
+                                     plain.get_product_ids_with_prefix(prefix))
+        self.assertLess(radix.node_count(), plain.node_count())
+        self.assertFalse(radix.delete("phone", "missing"))
+        self.assertFalse(radix.delete("phon", "P1"))      # 结束在边的中间
+        self.assertFalse(radix.delete("zzz", "P1"))
+
+        for pid, name in list(names.items()):
+            self.assertTrue(radix.delete(name, pid))
+        self.assertEqual(radix.node_count(), 1)
+        self.assertEqual(radix.get_product_ids_with_prefix(""), set())
+
+    def test_radix_split_and_merge(self):
+        """测试插入时拆分边、删除时合并边。"""
+        trie = ProductPrefixTrie(radix=True)
+        trie.insert("catalog", "C1")
+        self.assertEqual(trie.root.children['c'].label, "catalog")
+        trie.insert("cat", "C2")
+        trie.insert("catch", "C3")
+        cat = trie.root.children['c']
+        self.assertEqual(cat.label, "cat")
+        self.assertEqual(sorted(child.label for child in cat.children.values()), ["alog", "ch"])
+        self.assertIs(trie._find_prefix_node("cata"), cat.children['a'])
+        self.assertIs(trie._find_prefix_node("cat"), cat)
+        self.assertIsNone(trie._find_prefix_node("catz"))
+
+        self.assertTrue(trie.delete("cat", "C2"))       # "cat" 还有两个子节点，保留
+        self.assertEqual(trie.root.children['c'].label, "cat")
+        self.assertTrue(trie.delete("catch", "C3"))     # "cat" 只剩一个子节点，与 "alog" 合并
+        self.assertEqual(trie.root.children['c'].label, "catalog")
+        self.assertEqual(trie.node_count(), 2)
+
+
+class TestFrozenProductPrefixTrie(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_frozen_matches_trie_in_memory_and_from_file(self):
+        """测试冻结后的Trie树（内存中、mmap 打开、读入内存）与原Trie树的查询结果一致。"""
+        rng = __import__('random').Random(4)
+        path = os.path.join(self.dir, "names.trie")
+        prefixes = ("", "手", "手机", "手机壳1", "p", "pho", "phone 2", "app", "apple1", "x", "ph x")
+        for top_k, radix in ((0, False), (4, False), (0, True), (4, True)):
+            trie = ProductPrefixTrie(top_k=top_k, radix=radix)
+            names = {}
+            for i in range(600):
+                names[f"P{i}"] = rng.choice(["手机", "手机壳", "phone", "phone ", "ph", "apple", "app"]) + str(rng.randrange(25))
+                trie.insert(names[f"P{i}"], f"P{i}", float(rng.randrange(40)))
+            for i in range(0, 600, 7):
+                self.assertTrue(trie.delete(names[f"P{i}"], f"P{i}"))
+            frozen = trie.freeze()
+            frozen.save(path)
+            with FrozenProductPrefixTrie.load(path) as mapped:
+                for candidate in (frozen, mapped, FrozenProductPrefixTrie.load(path, use_mmap=False)):
+                    self.assertEqual(candidate.node_count(), trie.node_count())
+                    self.assertEqual(candidate.radix, radix)
+                    for prefix in prefixes:
+                        self.assertEqual(candidate.get_product_ids_with_prefix(prefix),
+                                         trie.get_product_ids_with_prefix(prefix))
+                        if top_k:
+                            for k in (1, top_k, top_k + 3):
+                                self.assertEqual(candidate.get_top_product_ids_with_prefix(prefix, k),
+                                                 trie.get_top_product_ids_with_prefix(prefix, k))
+
+            # 冻结之后原Trie树的修改不影响冻结的副本
+            trie.insert("phone new", "NEW")
+            self.assertNotIn("NEW", frozen.get_product_ids_with_prefix("phone"))
+
+    def test_frozen_is_read_only_and_rejects_bad_files(self):
+        """测试冻结的Trie树不能修改，以及不可识别或被截断的文件。"""
+        frozen = ProductPrefixTrie().freeze()
+        self.assertEqual(frozen.get_product_ids_with_prefix(""), set())
+        with self.assertRaises(TypeError):
+            frozen.insert("apple", "P1")
+        with self.assertRaises(TypeError):
+            frozen.delete("apple", "P1")
+        with self.assertRaises(TypeError):
+            frozen.update_heat("apple", "P1", 1.0)
+
+        # 修改操作被拒绝后内容不变
+        trie = ProductPrefixTrie()
+        trie.insert("apple", "P1", 2.0)
+        frozen = trie.freeze()
+        for mutate in (lambda: frozen.insert("apricot", "P2"), lambda: frozen.delete("apple", "P1"),
+                       lambda: frozen.update_heat("apple", "P1", 9.0)):
+            with self.assertRaises(TypeError):
+                mutate()
+        self.assertEqual(frozen.get_product_ids_with_prefix("ap"), {"P1"})
+        self.assertEqual(frozen.count_with_prefix("ap"), 1)
+        with self.assertRaises(ValueError):
+            frozen.get_top_product_ids_with_prefix("a", 1)
+
+        path = os.path.join(self.dir, "names.trie")
+        trie = ProductPrefixTrie()
+        trie.insert("apple", "P1")
+        trie.freeze().save(path)
+        with open(path, "r+b") as f:
+            f.truncate(os.path.getsize(path) - 4)
+        with self.assertRaises(ValueError):
+            FrozenProductPrefixTrie.load(path)
+        with open(path, "wb") as f:
+            f.write(b"not a trie file at all")
+        with self.assertRaises(ValueError):
+            FrozenProductPrefixTrie.load(path)
+
+
+class TestProductPrefixTrieIteration(unittest.TestCase):
+    def _tries(self):
+        rng = __import__('random').Random(8)
+        plain, radix = ProductPrefixTrie(), ProductPrefixTrie(radix=True)
+        names = {}
+        for i in range(400):
+            pid = f"P{i:03d}"
+            names[pid] = rng.choice(["手机", "手机壳", "phone", "phone ", "ph", "b", "ab"]) + rng.choice(["", "1", "12", "2"])
+            plain.insert(names[pid], pid)
+            radix.insert(names[pid], pid)
+        for pid in sorted(names)[::9]:
+            plain.delete(names[pid], pid)
+            radix.delete(names.pop(pid), pid)
+        return names, [plain, radix, plain.freeze(), radix.freeze()]
+
+    def test_count_with_prefix_matches_enumeration(self):
+        """测试子树计数在插入、重复插入、删除（包括压缩Trie树的拆分与合并）之后与枚举结果一致。"""
+        names, tries = self._tries()
+        plain, radix = tries[0], tries[1]
+        for trie in (plain, radix):
+            trie.insert(names["P001"], "P001")          # 重复插入不改变计数
+            self.assertFalse(trie.delete("手机", "missing"))
+        for trie in (plain, radix, plain.freeze(), radix.freeze()):
+            for prefix in ("", "手", "手机", "手机壳1", "p", "phone ", "phone 12", "ab", "x"):
+                self.assertEqual(trie.count_with_prefix(prefix), len(trie.get_product_ids_with_prefix(prefix)))
+        for pid in list(names):
+            plain.delete(names[pid], pid)
+            radix.delete(names[pid], pid)
+        self.assertEqual(plain.root.count, 0)
+        self.assertEqual(radix.count_with_prefix(""), 0)
+        self.assertEqual(radix.node_count(), 1)
+
+    def test_iter_with_limit_stops_early(self):
+        """测试惰性迭代与完整集合一致，并且 limit 生效。"""
+        names, tries = self._tries()
+        for trie in tries:
+            for prefix in ("", "手", "手机壳", "ph", "phon", "x"):
+                expected = trie.get_product_ids_with_prefix(prefix)
+                self.assertEqual(set(trie.iter_product_ids_with_prefix(prefix)), expected)
+                first = list(trie.iter_product_ids_with_prefix(prefix, limit=5))
+                self.assertEqual(len(first), min(5, len(expected)))
+                self.assertTrue(set(first) <= expected)
+                self.assertEqual(list(trie.iter_product_ids_with_prefix(prefix, limit=0)), [])
+
+    def test_iter_by_name_pages_in_lexicographic_order(self):
+        """测试按名称字典序迭代，以及用上一页最后一项翻页可以不重不漏地取完。"""
+        names, tries = self._tries()
+        for trie in tries:
+            for prefix in ("", "手机", "ph", "phone", "phon", "a", "x"):
+                expected = sorted((name, pid) for pid, name in names.items() if name.startswith(prefix))
+                self.assertEqual(list(trie.iter_product_ids_by_name(prefix)), expected)
+                pages, after = [], None
+                while True:
+                    page = list(trie.iter_product_ids_by_name(prefix, limit=7, start_after=after))
+                    if not page:
+                        break
+                    pages.extend(page)
+                    after = page[-1]
+                self.assertEqual(pages, expected)
+            # start_after 不必是前缀下已有的名称
+            self.assertEqual(list(trie.iter_product_ids_by_name("ph", start_after=("phone", ""))),
+                             sorted((n, p) for p, n in names.items() if n.startswith("ph") and n >= "phone"))
+            self.assertEqual(list(trie.iter_product_ids_by_name("ph", start_after=("zzz", ""))), [])
+            self.assertEqual(len(list(trie.iter_product_ids_by_name("ph", start_after=("a", "")))),
+                             sum(n.startswith("ph") for n in names.values()))
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
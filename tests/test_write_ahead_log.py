@@ -0,0 +1,180 @@
+import os
+import random
+import shutil
+import tempfile
+import time
+import unittest
+
+from src.module.commodity_retrieval import ProductManager
+from src.module.write_ahead_log import WriteAheadLog, OP_ADD, OP_DELETE, OP_UPDATE
+
+
+class TestWriteAheadLog(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _state(self, pm):
+        return [(p.product_id, p.name, p.price, p.heat) for p in pm.search_by_price_range(0.0, 1e9)]
+
+    def test_01_records_round_trip_and_torn_tail(self):
+        wal = WriteAheadLog(self.dir, fsync='always')
+        wal.append(OP_ADD, ("PROD-1", "手机 phone", 99.5, 3.0))
+        wal.append(OP_UPDATE, ("PROD-1", None, 80.0, None))
+        wal.extend([(OP_DELETE, ("PROD-1",)), (OP_ADD, ("PROD-2", "case", 1.0, 0.0))])
+        self.assertEqual(wal.syncs, 3)
+        wal.close()
+        expected = [(OP_ADD, ("PROD-1", "手机 phone", 99.5, 3.0)), (OP_UPDATE, ("PROD-1", None, 80.0, None)),
+                    (OP_DELETE, ("PROD-1",)), (OP_ADD, ("PROD-2", "case", 1.0, 0.0))]
+        self.assertEqual(list(WriteAheadLog(self.dir).replay()), expected)
+
+        # 模拟写最后一条记录时崩溃：截掉尾部几个字节后只剩前三条，之后追加的记录接在第三条后面
+        path = WriteAheadLog(self.dir).segment_path(1)
+        os.truncate(path, os.path.getsize(path) - 3)
+        wal = WriteAheadLog(self.dir, fsync='always')
+        self.assertEqual(list(wal.replay()), expected[:3])
+        wal.append(OP_DELETE, ("PROD-3",))
+        wal.close()
+        self.assertEqual(list(WriteAheadLog(self.dir).replay()), expected[:3] + [(OP_DELETE, ("PROD-3",))])
+
+        # 不是最后一个日志段中的损坏不能当作没写完的尾部
+        wal = WriteAheadLog(self.dir)
+        wal.rotate()
+        wal.append(OP_DELETE, ("PROD-4",))
+        wal.close()
+        with open(path, 'r+b') as f:
+            f.seek(-2, os.SEEK_END)
+            f.write(b'\xff\xff')
+        with self.assertRaises(ValueError):
+            list(WriteAheadLog(self.dir).replay())
+
+        with self.assertRaises(ValueError):
+            WriteAheadLog(self.dir, fsync='sometimes')
+        with self.assertRaises(ValueError):
+            WriteAheadLog(self.dir, group_size=0)
+
+    def test_02_recover_after_crash(self):
+        pm = ProductManager.recover(self.dir, btree_order=4, fsync='batch', group_size=8, group_interval=60.0)
+        rng = random.Random(7)
+        products = [pm.add_product(f"item{i % 13}", float(rng.randint(1, 50)), float(i)) for i in range(60)]
+        products += pm.bulk_add_products([(f"bulk{i}", float(i % 9 + 1), 1.0) for i in range(30)])
+        for product in products[:10]:
+            self.assertTrue(pm.update_product(product.product_id, new_name="renamed", new_heat=500.0))
+        self.assertTrue(pm.update_product(products[10].product_id, new_price=1234.5))
+        self.assertTrue(pm.delete_product(products[11].product_id))
+        self.assertTrue(pm.delete_products_in_price_range(2.0, 4.0))
+        self.assertFalse(pm.update_product("missing", new_heat=1.0))
+        pm.flush()
+        expected = self._state(pm)
+        renamed = len(pm.recommend_products_by_prefix("renamed", 100))
+
+        # 没有 close 就丢弃：flush 之后的修改还没到 group_interval，仍在组提交缓冲区中，恢复后丢失
+        pm.add_product("lost", 10.0, 1.0)
+        del pm
+        recovered = ProductManager.recover(self.dir)
+        self.assertEqual(self._state(recovered), expected)
+        self.assertEqual(recovered._product_id_index.validate(), [])
+        self.assertEqual(recovered._price_index.validate(), [])
+        self.assertEqual(len(recovered.recommend_products_by_prefix("renamed", 100)), renamed)
+        self.assertEqual(recovered.search_by_exact_price(1234.5)[0].product_id, products[10].product_id)
+
+        recovered.add_product("kept", 10.0, 1.0)
+        recovered.close()
+        self.assertEqual(len(self._state(ProductManager.recover(self.dir))), len(expected) + 1)
+
+    def test_03_segments_are_compacted_into_snapshots(self):
+        pm = ProductManager.recover(self.dir, btree_order=8, composite_price_keys=True, max_segments=2,
+                                    fsync='never', group_size=4, segment_bytes=512)
+        ids = [pm.add_product(f"p{i}", float(i % 40 + 1), float(i)).product_id for i in range(400)]
+        for product_id in ids[::3]:
+            pm.delete_product(product_id)
+        pm.close()
+        files = os.listdir(self.dir)
+        self.assertEqual(sum(name.endswith('.snap') for name in files), 1)
+        self.assertLessEqual(sum(name.endswith('.log') for name in files), 3)
+
+        recovered = ProductManager.recover(self.dir, max_segments=2, fsync='never', segment_bytes=512)
+        self.assertEqual(self._state(recovered), self._state(pm))
+        self.assertTrue(recovered._composite_price_keys)
+        self.assertEqual(recovered._btree_order, 8)
+
+        # 显式压缩后只剩新快照和一个空日志段
+        recovered.checkpoint()
+        recovered.close()
+        files = sorted(os.listdir(self.dir))
+        self.assertEqual(len(files), 2)
+        self.assertEqual(self._state(ProductManager.recover(self.dir)), self._state(pm))
+
+
+    def test_04_recover_keeps_prefix_trie_options(self):
+        pm = ProductManager.recover(self.dir, prefix_top_k=3, prefix_radix=True)
+        self.assertEqual((pm._name_prefix_trie.top_k, pm._name_prefix_trie.radix), (3, True))
+        for i in range(10):
+            pm.add_product(f"phone {i}", float(i + 1), float(i))
+        pm.checkpoint()
+        pm.add_product("phone case", 1.0, 100.0)
+        pm.close()
+
+        # 有快照时 top_k 使用传入的值，是否压缩沿用快照中的设置
+        recovered = ProductManager.recover(self.dir, prefix_top_k=5)
+        self.assertEqual((recovered._name_prefix_trie.top_k, recovered._name_prefix_trie.radix), (5, True))
+        self.assertEqual([p.name for p in recovered.recommend_products_by_prefix("phone", 2)],
+                         ["phone case", "phone 9"])
+        recovered.close()
+
+    def test_05_records_are_written_before_indexes_change(self):
+        pm = ProductManager.recover(self.dir)
+        kept = pm.add_product("kept", 5.0, 1.0)
+        before = self._state(pm)
+
+        def failing_append(op, fields):
+            raise OSError("磁盘已满")
+        pm._wal.append = failing_append
+        for mutate in (lambda: pm.add_product("new", 1.0, 1.0),
+                       lambda: pm.update_product(kept.product_id, new_name="renamed", new_price=9.0),
+                       lambda: pm.delete_product(kept.product_id),
+                       lambda: pm.delete_products_in_price_range(0.0, 10.0)):
+            with self.assertRaises(OSError):
+                mutate()
+            self.assertEqual(self._state(pm), before)
+        self.assertEqual(len(pm.recommend_products_by_prefix("kept", 10)), 1)
+        self.assertEqual(pm.recommend_products_by_prefix("renamed", 10), [])
+
+        # 没有需要删除的商品时不写日志
+        self.assertEqual(pm.delete_products_in_price_range(100.0, 200.0), [])
+        del pm._wal.append
+        pm.close()
+        self.assertEqual(self._state(ProductManager.recover(self.dir)), before)
+
+    def test_06_pending_records_are_committed_within_group_interval(self):
+        for fsync in ('never', 'batch'):
+            wal_dir = os.path.join(self.dir, fsync)
+            pm = ProductManager.recover(wal_dir, fsync=fsync, group_size=64, group_interval=0.01)
+            names = [pm.add_product(f"p{i}", float(i + 1), 1.0).name for i in range(10)]
+            deadline = time.monotonic() + 5.0
+            while pm._wal.syncs == 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+            # 不满一批、也没有 sync 或 close，提交线程在 group_interval 后写出缓冲区
+            recovered = ProductManager.recover(wal_dir)
+            self.assertEqual(sorted(p.name for p in recovered.search_by_price_range(0.0, 100.0)), sorted(names))
+            self.assertEqual(pm._wal.syncs, 1)
+            pm.close()
+
+        # 提交线程中的异常在下一次 append 时抛出
+        def failing_open():
+            raise OSError("磁盘已满")
+        wal = WriteAheadLog(os.path.join(self.dir, 'broken'), fsync='batch', group_interval=0.01)
+        wal._open_tail = failing_open
+        wal.append(OP_DELETE, ("PROD-1",))
+        deadline = time.monotonic() + 5.0
+        while wal._flush_error is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        with self.assertRaises(OSError):
+            wal.append(OP_DELETE, ("PROD-2",))
+
+
+if __name__ == '__main__':
+    unittest.main()